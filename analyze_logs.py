@@ -1,25 +1,30 @@
 """
 Script para analizar estadísticas de los logs de interacciones con GERARD.
 
-Este script lee los archivos de log JSON y genera estadísticas detalladas
-sobre el uso del sistema, tiempos de respuesta, usuarios más activos, etc.
+Este script compacta los logs JSONL (y los arreglos JSON antiguos) en el
+almacén columnar de log_store.py y genera estadísticas detalladas sobre el uso
+del sistema, tiempos de respuesta por fase, usuarios más activos, etc., para un
+día o para un rango de fechas (semanas o meses).
 
 Uso:
     python analyze_logs.py [fecha]
+    python analyze_logs.py [desde] [hasta]
     
     - Si no se especifica fecha, analiza el día actual
     - Formato de fecha: YYYY-MM-DD
     
 Ejemplo:
     python analyze_logs.py 2025-10-06
+    python analyze_logs.py 2025-10-01 2025-10-31
 """
 
 import sys
-import json
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
-from collections import Counter
+
+import pandas as pd
+
+from log_store import LogStore, breakdown, errors, latency_percentiles, slowest, summary
 
 
 class LogAnalyzer:
@@ -27,6 +32,7 @@ class LogAnalyzer:
     
     def __init__(self, log_dir: str = "logs"):
         self.log_dir = Path(log_dir)
+        self.store = LogStore(str(self.log_dir))
     
     def analyze_date(self, date: str = None):
         """
@@ -37,24 +43,26 @@ class LogAnalyzer:
         """
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d")
+        self.analyze_range(date, date)
         
-        json_file = self.log_dir / f"interaction_log_{date}.json"
-        
-        if not json_file.exists():
-            print(f"❌ No se encontraron logs para la fecha {date}")
-            print(f"   Buscando en: {json_file}")
-            return
+    def analyze_range(self, start: str, end: str):
+        """
+        Analiza los logs de un rango de fechas (inclusive).
         
-        # Leer datos
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        Args:
+            start: Fecha inicial YYYY-MM-DD
+            end: Fecha final YYYY-MM-DD
+        """
+        data = self.store.load(start, end)
+        title = start if start == end else f"{start} → {end}"
         
-        if not data:
-            print(f"⚠️  El archivo de logs está vacío para {date}")
+        if data.empty:
+            print(f"❌ No se encontraron logs para {title}")
+            print(f"   Buscando en: {self.log_dir}")
             return
         
         print(f"\n{'='*70}")
-        print(f"📊 ANÁLISIS DE LOGS - {date}")
+        print(f"📊 ANÁLISIS DE LOGS - {title}")
         print(f"{'='*70}\n")
         
         self._print_general_stats(data)
@@ -67,186 +75,142 @@ class LogAnalyzer:
         
         print(f"\n{'='*70}\n")
     
-    def _print_general_stats(self, data: List[Dict]):
+    def _print_general_stats(self, data: pd.DataFrame):
         """Imprime estadísticas generales."""
-        total = len(data)
-        successful = sum(1 for d in data if d.get("status") == "success")
-        failed = total - successful
+        totals = summary(data)
+        total = totals["total"]
         
         print("📈 ESTADÍSTICAS GENERALES")
         print(f"{'-'*70}")
         print(f"Total de interacciones: {total}")
-        print(f"  ✅ Exitosas: {successful} ({successful/total*100:.1f}%)")
-        print(f"  ❌ Fallidas: {failed} ({failed/total*100:.1f}%)")
+        print(f"  ✅ Exitosas: {totals['successful']} ({totals['successful']/total*100:.1f}%)")
+        print(f"  ❌ Fallidas: {totals['failed']} ({totals['failed']/total*100:.1f}%)")
+        if totals["days"] > 1:
+            print(f"Días con actividad: {totals['days']}")
+            print(f"Usuarios únicos: {totals['unique_users']}")
         print()
     
-    def _print_performance_stats(self, data: List[Dict]):
-        """Imprime estadísticas de rendimiento."""
-        times = [d["metrics"].get("tiempo_total", 0) for d in data if "metrics" in d]
+    def _print_performance_stats(self, data: pd.DataFrame):
+        """Imprime estadísticas de rendimiento por fase."""
+        percentiles = latency_percentiles(data)
         
-        if not times:
+        if "total" not in percentiles.index:
             return
         
-        avg_time = sum(times) / len(times)
-        max_time = max(times)
-        min_time = min(times)
-        
-        # Calcular percentiles
-        sorted_times = sorted(times)
-        p50 = sorted_times[len(sorted_times) // 2]
-        p95 = sorted_times[int(len(sorted_times) * 0.95)]
-        p99 = sorted_times[int(len(sorted_times) * 0.99)]
-        
+        total = percentiles.loc["total"]
         print("⚡ MÉTRICAS DE RENDIMIENTO")
         print(f"{'-'*70}")
-        print(f"Tiempo promedio de respuesta: {avg_time:.3f}s")
-        print(f"Tiempo mínimo: {min_time:.3f}s")
-        print(f"Tiempo máximo: {max_time:.3f}s")
-        print(f"Mediana (P50): {p50:.3f}s")
-        print(f"Percentil 95 (P95): {p95:.3f}s")
-        print(f"Percentil 99 (P99): {p99:.3f}s")
-        
-        # Desglose de tiempos
-        llm_times = [d["metrics"].get("tiempo_llm", 0) for d in data if "metrics" in d and "tiempo_llm" in d["metrics"]]
-        if llm_times:
-            avg_llm = sum(llm_times) / len(llm_times)
-            print(f"\nTiempo promedio de LLM: {avg_llm:.3f}s ({avg_llm/avg_time*100:.1f}% del total)")
+        print(f"Tiempo promedio de respuesta: {total['mean']:.3f}s")
+        print(f"Tiempo mínimo: {data['tiempo_total'].min():.3f}s")
+        print(f"Tiempo máximo: {total['max']:.3f}s")
+        print(f"Mediana (P50): {total['p50']:.3f}s")
+        print(f"Percentil 95 (P95): {total['p95']:.3f}s")
+        print(f"Percentil 99 (P99): {total['p99']:.3f}s")
+        
+        # Desglose de tiempos por fase
+        phases = percentiles.drop(index="total")
+        if not phases.empty:
+            print(f"\n{'Fase':<15}{'n':>6}{'prom':>10}{'P50':>10}{'P95':>10}{'P99':>10}")
+            for phase, row in phases.iterrows():
+                share = row["mean"] / total["mean"] * 100 if total["mean"] else 0
+                print(f"{phase:<15}{int(row['n']):>6}{row['mean']:>9.3f}s{row['p50']:>9.3f}s"
+                      f"{row['p95']:>9.3f}s{row['p99']:>9.3f}s  ({share:.1f}% del total)")
         
         print()
     
-    def _print_user_stats(self, data: List[Dict]):
+    def _print_user_stats(self, data: pd.DataFrame):
         """Imprime estadísticas por usuario."""
-        users = Counter([d.get("user", "Desconocido") for d in data])
+        users = breakdown(data, "user", top=10)
         
         print("👥 USUARIOS MÁS ACTIVOS")
         print(f"{'-'*70}")
-        for i, (user, count) in enumerate(users.most_common(10), 1):
-            percentage = count / len(data) * 100
-            print(f"{i:2d}. {user}: {count} consultas ({percentage:.1f}%)")
+        for i, (user, row) in enumerate(users.iterrows(), 1):
+            print(f"{i:2d}. {user}: {int(row['count'])} consultas ({row['share']*100:.1f}%)")
         print()
     
-    def _print_geographic_stats(self, data: List[Dict]):
+    def _print_geographic_stats(self, data: pd.DataFrame):
         """Imprime estadísticas geográficas."""
-        countries = Counter([
-            d.get("geo_info", {}).get("pais", "Desconocido") 
-            for d in data
-        ])
-        
-        cities = Counter([
-            f"{d.get('geo_info', {}).get('ciudad', 'Desconocido')}, {d.get('geo_info', {}).get('pais', 'Desconocido')}"
-            for d in data
-        ])
+        countries = breakdown(data, "pais", top=5)
+        cities = breakdown(data.assign(lugar=data["ciudad"] + ", " + data["pais"]), "lugar", top=5)
         
         print("🌍 DISTRIBUCIÓN GEOGRÁFICA")
         print(f"{'-'*70}")
         print("Por país:")
-        for i, (country, count) in enumerate(countries.most_common(5), 1):
-            percentage = count / len(data) * 100
-            print(f"  {i}. {country}: {count} ({percentage:.1f}%)")
+        for i, (country, row) in enumerate(countries.iterrows(), 1):
+            print(f"  {i}. {country}: {int(row['count'])} ({row['share']*100:.1f}%) - P95 {row['p95']:.3f}s")
         
         print("\nCiudades principales:")
-        for i, (city, count) in enumerate(cities.most_common(5), 1):
-            percentage = count / len(data) * 100
-            print(f"  {i}. {city}: {count} ({percentage:.1f}%)")
+        for i, (city, row) in enumerate(cities.iterrows(), 1):
+            print(f"  {i}. {city}: {int(row['count'])} ({row['share']*100:.1f}%)")
         print()
     
-    def _print_device_stats(self, data: List[Dict]):
+    def _print_device_stats(self, data: pd.DataFrame):
         """Imprime estadísticas de dispositivos."""
-        platforms = Counter([d.get("platform", "Desconocido") for d in data])
-        device_types = Counter([
-            d.get("device_info", {}).get("tipo", "Desconocido")
-            for d in data
-        ])
-        browsers = Counter([
-            d.get("device_info", {}).get("navegador", "N/A")
-            for d in data
-            if d.get("platform") == "web"
-        ])
+        platforms = breakdown(data, "platform")
+        device_types = breakdown(data, "device_tipo")
+        browsers = breakdown(data[data["platform"] == "web"], "navegador", top=5)
         
         print("💻 DISPOSITIVOS Y PLATAFORMAS")
         print(f"{'-'*70}")
         print("Por plataforma:")
-        for platform, count in platforms.most_common():
-            percentage = count / len(data) * 100
-            print(f"  {platform}: {count} ({percentage:.1f}%)")
+        for platform, row in platforms.iterrows():
+            print(f"  {platform}: {int(row['count'])} ({row['share']*100:.1f}%)")
         
         print("\nTipo de dispositivo:")
-        for device_type, count in device_types.most_common():
-            percentage = count / len(data) * 100
-            print(f"  {device_type}: {count} ({percentage:.1f}%)")
+        for device_type, row in device_types.iterrows():
+            print(f"  {device_type}: {int(row['count'])} ({row['share']*100:.1f}%)")
         
-        if browsers:
+        if not browsers.empty:
             print("\nNavegadores (solo web):")
-            for i, (browser, count) in enumerate(browsers.most_common(5), 1):
-                print(f"  {i}. {browser}: {count}")
+            for i, (browser, row) in enumerate(browsers.iterrows(), 1):
+                print(f"  {i}. {browser}: {int(row['count'])}")
         print()
     
-    def _print_slowest_queries(self, data: List[Dict], n: int = 10):
+    def _print_slowest_queries(self, data: pd.DataFrame, n: int = 10):
         """Imprime las consultas más lentas."""
-        sorted_data = sorted(
-            data,
-            key=lambda x: x["metrics"].get("tiempo_total", 0),
-            reverse=True
-        )
-        
         print(f"🐌 TOP {n} CONSULTAS MÁS LENTAS")
         print(f"{'-'*70}")
-        for i, item in enumerate(sorted_data[:n], 1):
-            time_val = item["metrics"].get("tiempo_total", 0)
-            user = item.get("user", "N/A")
-            question = item.get("question", "")
+        multi_day = data["date"].nunique() > 1
+        for i, row in enumerate(slowest(data, n).itertuples(), 1):
+            question = row.question
             question_preview = question[:60] + "..." if len(question) > 60 else question
-            timestamp = datetime.fromisoformat(item.get("timestamp", "")).strftime("%H:%M:%S")
+            when = "N/A" if pd.isna(row.timestamp) else row.timestamp.strftime(
+                "%Y-%m-%d %H:%M:%S" if multi_day else "%H:%M:%S")
             
-            print(f"{i:2d}. {time_val:6.3f}s - {timestamp} - {user}")
+            print(f"{i:2d}. {row.tiempo_total:6.3f}s - {when} - {row.user}")
             print(f"    Q: {question_preview}")
         print()
     
-    def _print_error_stats(self, data: List[Dict]):
+    def _print_error_stats(self, data: pd.DataFrame):
         """Imprime estadísticas de errores."""
-        errors = [d for d in data if d.get("status") == "error"]
+        error_types = errors(data)
         
-        if not errors:
+        if error_types.empty:
             print("✅ NO SE REGISTRARON ERRORES")
             print(f"{'-'*70}\n")
             return
         
-        error_types = Counter([
-            d.get("error", "Error desconocido")[:100]
-            for d in errors
-        ])
-        
-        print(f"⚠️  ERRORES REGISTRADOS ({len(errors)} total)")
+        print(f"⚠️  ERRORES REGISTRADOS ({int(error_types['count'].sum())} total)")
         print(f"{'-'*70}")
-        for i, (error, count) in enumerate(error_types.most_common(), 1):
+        for i, (error, row) in enumerate(error_types.iterrows(), 1):
             print(f"{i}. {error}")
-            print(f"   Ocurrencias: {count}")
+            print(f"   Ocurrencias: {int(row['count'])}")
         print()
     
     def list_available_dates(self):
         """Lista todas las fechas disponibles en los logs."""
-        json_files = list(self.log_dir.glob("interaction_log_*.json"))
+        self.store.ingest()
+        dates = self.store.dates()
         
-        if not json_files:
+        if not dates:
             print("❌ No se encontraron archivos de log")
             return
         
         print("\n📅 FECHAS DISPONIBLES:")
         print(f"{'-'*70}")
         
-        dates_info = []
-        for file in sorted(json_files):
-            try:
-                with open(file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    date = file.stem.replace("interaction_log_", "")
-                    count = len(data)
-                    dates_info.append((date, count))
-            except Exception:
-                pass
-        
-        for date, count in dates_info:
-            print(f"  {date}: {count} interacciones")
+        for date in dates:
+            print(f"  {date}: {self.store.manifest['dates'][date]['rows']} interacciones")
         print()
 
 
@@ -254,7 +218,9 @@ def main():
     """Función principal."""
     analyzer = LogAnalyzer()
     
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2:
+        analyzer.analyze_range(sys.argv[1], sys.argv[2])
+    elif len(sys.argv) > 1:
         if sys.argv[1] == "--list":
             analyzer.list_available_dates()
         else:
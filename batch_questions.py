@@ -0,0 +1,258 @@
+"""
+Modo Lote de Preguntas para GERARD (regresiones nocturnas y FAQ masivas)
+
+`consultar_terminal.py` solo tenía un bucle interactivo: una pregunta cada
+vez detrás del spinner. Este módulo procesa un archivo de preguntas sin
+intervención, con varias en paralelo y sin pasarse de la cuota del LLM.
+
+Características:
+- Entrada desde archivo o stdin ("-"): una pregunta por línea o JSONL
+  (`{"id": ..., "question": ...}`; también `pregunta` o `input`); las líneas
+  vacías y las que empiezan por "#" se ignoran
+- Concurrencia acotada (pool de hilos) y tope de peticiones por minuto
+  (ventana deslizante compartida entre hilos)
+- Salida JSONL: una línea por pregunta con respuesta, fuentes, estado y
+  tiempos (espera por el límite, recuperación, LLM, total)
+- Reanudable: cada resultado se escribe (y sincroniza a disco) en cuanto
+  termina; al relanzar con la misma salida se saltan las preguntas ya
+  respondidas y se reintentan las que fallaron
+- Ctrl+C: las preguntas en curso terminan y se guardan; las pendientes
+  quedan para la siguiente ejecución
+
+Uso:
+    python consultar_terminal.py --batch preguntas.txt --output resultados.jsonl --concurrency 4 --rpm 30
+    cat preguntas.jsonl | python consultar_terminal.py --batch - --output resultados.jsonl
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from jsonl_log import ensure_line_boundary
+from metrics import RATE_LIMITER_WAIT_SECONDS
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RPM = 30
+QUESTION_FIELDS = ("question", "pregunta", "input")
+
+
+@dataclass
+class BatchQuestion:
+    """Una pregunta del lote; `extra` conserva los demás campos de la línea JSONL."""
+    id: str
+    question: str
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+def _question_id(question: str, seen: Dict[str, int]) -> str:
+    # Estable entre ejecuciones (para reanudar) aunque se reordene el archivo
+    base = "q-" + hashlib.sha256(question.strip().encode("utf-8")).hexdigest()[:12]
+    seen[base] = seen.get(base, 0) + 1
+    return base if seen[base] == 1 else f"{base}-{seen[base]}"
+
+
+def parse_questions(lines: Iterable[str]) -> List[BatchQuestion]:
+    """
+    Interpreta líneas de texto plano o JSONL.
+
+    Returns:
+        Preguntas en orden, con id explícito o derivado del texto
+    """
+    questions = []
+    seen: Dict[str, int] = {}
+    for number, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        extra: Dict[str, Any] = {}
+        text = line
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Línea {number}: JSON no válido ({e})") from e
+            text = next((record.pop(name) for name in QUESTION_FIELDS if isinstance(record.get(name), str)), "")
+            if not text.strip():
+                raise ValueError(f"Línea {number}: falta el campo 'question'")
+            extra = record
+        explicit = extra.pop("id", None)
+        question_id = str(explicit) if explicit not in (None, "") else _question_id(text, seen)
+        questions.append(BatchQuestion(question_id, text.strip(), extra))
+    return questions
+
+
+def read_questions(source: str) -> List[BatchQuestion]:
+    """Lee las preguntas de un archivo (o de stdin con "-")."""
+    if source == "-":
+        return parse_questions(sys.stdin)
+    with open(source, "r", encoding="utf-8") as f:
+        return parse_questions(f)
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids ya respondidos con éxito en una salida anterior (las líneas truncadas se ignoran)."""
+    done: Set[str] = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("status") == "ok":
+                    done.add(str(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class RateLimiter:
+    """
+    Límite de peticiones por minuto con ventana deslizante, seguro entre hilos.
+
+    Cada hilo reserva su hueco antes de dormir, así N hilos no despiertan a
+    la vez para la misma plaza.
+    """
+
+    def __init__(self, requests_per_minute: int, window_seconds: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self.request_times: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Espera hasta que haya hueco en la ventana.
+
+        Returns:
+            Segundos esperados
+        """
+        if self.requests_per_minute <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            cutoff = now - self.window_seconds
+            while self.request_times and self.request_times[0] <= cutoff:
+                self.request_times.popleft()
+            if len(self.request_times) >= self.requests_per_minute:
+                # Hueco que deja la petición que sale de la ventana
+                slot = self.request_times[-self.requests_per_minute] + self.window_seconds
+            else:
+                slot = now
+            self.request_times.append(slot)
+        wait = max(0.0, slot - time.monotonic())
+        if wait > 0:
+            time.sleep(wait)
+            RATE_LIMITER_WAIT_SECONDS.observe(wait, limiter="batch_questions")
+        return wait
+
+
+class _ResultWriter:
+    """Añade resultados a la salida JSONL, uno por línea y sincronizado a disco."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Una ejecución interrumpida puede dejar la última línea a medias
+        with open(path, "a+b") as f:
+            ensure_line_boundary(f)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def run_batch(
+    questions: List[BatchQuestion],
+    answer_fn: Callable[[str], Dict[str, Any]],
+    output_path: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    requests_per_minute: int = DEFAULT_RPM,
+    resume: bool = True,
+    limiter: Optional[RateLimiter] = None
+) -> Dict[str, Any]:
+    """
+    Responde un lote de preguntas y guarda cada resultado en JSONL.
+
+    Args:
+        questions: Preguntas (ver `read_questions`)
+        answer_fn: Función pregunta -> {"answer", "sources"?, "timings"?}
+            (los tiempos en ms de sus etapas, por ejemplo retrieval_ms / llm_ms)
+        output_path: Archivo JSONL de resultados (se añade al final)
+        concurrency: Preguntas en paralelo
+        requests_per_minute: Tope de preguntas por minuto (0 = sin tope)
+        resume: Saltar las preguntas ya respondidas en `output_path`
+        limiter: Limitador propio (por defecto uno de `requests_per_minute`)
+
+    Returns:
+        Resumen: total, skipped, ok, errors, interrupted, elapsed_seconds
+    """
+    done = completed_ids(output_path) if resume else set()
+    pending = [q for q in questions if q.id not in done]
+    summary = {"total": len(questions), "skipped": len(questions) - len(pending), "ok": 0, "errors": 0,
+               "interrupted": False, "elapsed_seconds": 0.0}
+    if summary["skipped"]:
+        print(f"[INFO] Reanudando: {summary['skipped']} preguntas ya respondidas en {output_path}")
+    if not pending:
+        print("[OK] No quedan preguntas pendientes")
+        return summary
+
+    limiter = limiter or RateLimiter(requests_per_minute)
+    writer = _ResultWriter(output_path)
+    start = time.perf_counter()
+    print(f"[INFO] {len(pending)} preguntas, {concurrency} en paralelo, "
+          f"{requests_per_minute or 'sin'} tope por minuto -> {output_path}")
+
+    def answer(question: BatchQuestion) -> Dict[str, Any]:
+        wait = limiter.acquire()
+        started_at = datetime.now().isoformat(timespec="seconds")
+        t0 = time.perf_counter()
+        record: Dict[str, Any] = {"id": question.id, "question": question.question, **question.extra}
+        try:
+            result = answer_fn(question.question)
+            record.update(status="ok", answer=result.get("answer"), sources=result.get("sources", []))
+            timings = dict(result.get("timings") or {})
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+            timings = {}
+        timings.update(wait_ms=round(wait * 1000, 1), total_ms=round((time.perf_counter() - t0) * 1000, 1))
+        record.update(started_at=started_at, timings=timings)
+        writer.write(record)
+        return record
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="gerard-batch")
+    try:
+        futures = [executor.submit(answer, q) for q in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            summary["ok" if record["status"] == "ok" else "errors"] += 1
+            mark = "[OK]" if record["status"] == "ok" else "[ERROR]"
+            detail = f"{record['timings']['total_ms'] / 1000:.1f}s" if record["status"] == "ok" else record["error"]
+            print(f"{mark} [{finished}/{len(pending)}] {record['question'][:60]} ({detail})")
+    except KeyboardInterrupt:
+        summary["interrupted"] = True
+        print("\n[!] Interrumpido: se terminan las preguntas en curso; relanza con la misma salida para continuar")
+        executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        executor.shutdown(wait=True)
+        writer.close()
+        summary["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+    print(f"[INFO] Lote terminado: {summary['ok']} ok, {summary['errors']} con error, "
+          f"{summary['skipped']} ya respondidas ({summary['elapsed_seconds']:.1f}s)")
+    return summary
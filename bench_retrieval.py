@@ -0,0 +1,584 @@
+"""
+Benchmark Offline de la Recuperación de GERARD
+
+`test_gpu_performance.py` necesita GOOGLE_API_KEY y GPU y solo cronometra
+cinco consultas; los demás `test_*.py` son pruebas manuales con prints. Este
+módulo mide la recuperación completa sin red y deja resultados comparables
+entre ejecuciones.
+
+Características:
+- Corpus sintéticos de tamaño configurable con forma de transcripción .srt
+  (timestamps, vocabulario con distribución de Zipf, nombres de archivo como
+  los de DownSub) y consultas derivadas de sus frases
+- Embeddings deterministas: `HashingEmbeddings` (offline_embeddings.py) o
+  vectores grabados en un .npz (`record` los extrae de un índice local, sin
+  llamar a Gemini)
+- Por tipo de índice FAISS (fábricas "Flat", "HNSW32", "IVF,Flat", "SQ8"...):
+  tiempo de construcción, bytes serializados, memoria, recall@k frente al
+  Flat exacto y latencia p50/p90/p99 por número de hilos, más QPS en lote
+- Etapa por keywords (keyword_index.py), búsqueda híbrida completa con
+  embeddings ya calculados y ensamblado del contexto
+  (`format_docs_with_metadata` de consultar_terminal.py)
+- Resultados en JSON (una métrica plana por clave) y comparación con una
+  línea base: marca como regresión lo que empeora más que la tolerancia
+  (con un mínimo absoluto para no saltar por ruido de microsegundos)
+- Las trazas se crean como en producción pero no se exportan a disco
+
+Uso:
+    python bench_retrieval.py run --sizes 5000 20000 --threads 1 4 --output logs/bench/actual.json
+    python bench_retrieval.py run --baseline bench_baseline.json --save-baseline
+    python bench_retrieval.py compare logs/bench/actual.json bench_baseline.json --tolerance 0.25
+    python bench_retrieval.py record faiss_index --output bench_vectors.npz --queries 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from compact_index import recall_at_k
+from faiss_mmap import memory_usage
+
+DEFAULT_SIZES = (5000,)
+DEFAULT_INDEX_TYPES = ("Flat", "HNSW32", "IVF,Flat", "SQ8")
+DEFAULT_THREADS = (1, 4)
+DEFAULT_RESULTS_DIR = "logs/bench"
+DEFAULT_TOLERANCE = 0.25
+# Diferencias absolutas por debajo de estas no cuentan como regresión
+MIN_DELTAS = {"_ms": 0.05, "_s": 0.01, "_bytes": 1024 * 1024}
+# Métricas donde más es mejor; en el resto (tiempos, memoria) menos es mejor
+HIGHER_IS_BETTER = ("recall", "qps")
+
+_SYLLABLES = ["ra", "bis", "jac", "tric", "ma", "so", "ne", "lo", "gia", "li", "na", "je", "co", "se",
+              "cha", "al", "ma", "es", "tre", "lla", "sol", "luz", "den", "si", "dad", "vi", "bra", "ción"]
+_COMMON_WORDS = ["que", "de", "la", "el", "en", "los", "las", "una", "por", "con", "para", "como", "esto",
+                 "pero", "todo", "ustedes", "nosotros", "entonces", "porque", "cuando", "también"]
+_SOURCE_SUFFIXES = ["", " [Spanish (auto-generated)]", " [DownSub.com]",
+                    " [Spanish (auto-generated)] [DownSub.com]"]
+
+
+@dataclass
+class BenchConfig:
+    """Parámetros de una ejecución del benchmark"""
+    sizes: Sequence[int] = DEFAULT_SIZES
+    index_types: Sequence[str] = DEFAULT_INDEX_TYPES
+    threads: Sequence[int] = DEFAULT_THREADS
+    queries: int = 200
+    k: int = 10
+    k_vector: int = 100
+    k_keyword: int = 30
+    dim: int = 256                      # dimensión de HashingEmbeddings
+    vocabulary: int = 20000             # palabras distintas del corpus sintético
+    recorded: Optional[str] = None      # .npz de `record` en lugar de HashingEmbeddings
+    hnsw_ef_search: int = 64
+    ivf_nprobe: int = 16
+    seed: int = 1234
+
+
+@dataclass
+class SyntheticCorpus:
+    """Textos, metadatos y consultas de un corpus generado"""
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+    queries: List[str]
+    query_sources: List[int] = field(default_factory=list)   # documento del que sale cada consulta
+
+
+def _vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set(_COMMON_WORDS)
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _timestamp(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d},{(seconds * 37) % 1000:03d}"
+
+
+def synthetic_corpus(size: int, queries: int = 200, vocabulary: int = 20000, seed: int = 1234) -> SyntheticCorpus:
+    """
+    Genera chunks con forma de transcripción .srt y consultas sobre ellos.
+
+    Las palabras siguen una distribución de Zipf (unas pocas muy frecuentes y
+    una cola larga de raras), como en las transcripciones reales; así la
+    etapa por keywords tiene listas de documentos de tamaños realistas.
+
+    Args:
+        size: Número de chunks
+        queries: Número de consultas (frases de 4 a 8 palabras de chunks al azar)
+        vocabulary: Palabras distintas
+        seed: Semilla (mismo corpus en cada ejecución)
+
+    Returns:
+        SyntheticCorpus
+    """
+    rng = random.Random(seed)
+    words = _vocabulary(vocabulary, rng)
+    weights = np.cumsum(1.0 / np.arange(1, len(words) + 1))
+    weights /= weights[-1]
+    np_rng = np.random.default_rng(seed)
+
+    texts, metadatas, tokens_per_doc = [], [], []
+    for i in range(size):
+        tokens = [words[j] for j in np.searchsorted(weights, np_rng.random(rng.randint(40, 120)))]
+        start = rng.randint(0, 7200)
+        lines = []
+        for block, offset in enumerate(range(0, len(tokens), 12), 1):
+            lines.append(f"{block}\n{_timestamp(start + offset)} --> {_timestamp(start + offset + 4)}\n"
+                         + " ".join(tokens[offset:offset + 12]))
+        texts.append("\n\n".join(lines))
+        tokens_per_doc.append(tokens)
+        year = 2008 + i % 16
+        metadatas.append({"source": f"documentos_srt/Conferencia {year} parte {i % 97}{rng.choice(_SOURCE_SUFFIXES)}.srt"})
+
+    query_texts, query_sources = [], []
+    for _ in range(queries):
+        position = rng.randrange(size)
+        tokens = tokens_per_doc[position]
+        length = rng.randint(4, 8)
+        offset = rng.randrange(max(1, len(tokens) - length))
+        phrase = tokens[offset:offset + length]
+        if rng.random() < 0.5:
+            # Palabra rara que el top vectorial no suele traer: activa la etapa por keywords
+            phrase.append(words[rng.randrange(len(words) // 2, len(words))])
+        query_texts.append(" ".join(phrase))
+        query_sources.append(position)
+    return SyntheticCorpus(texts, metadatas, query_texts, query_sources)
+
+
+class RecordedEmbeddings(Embeddings):
+    """
+    Embeddings de textos ya conocidos (consultas del benchmark).
+
+    La búsqueda híbrida embebe las consultas; con esta clase lo hace sin
+    calcular nada, así la latencia medida es solo la de la recuperación.
+    """
+
+    def __init__(self, texts: Sequence[str], vectors: np.ndarray):
+        self._vectors = {text: np.asarray(vector, dtype=np.float32) for text, vector in zip(texts, vectors)}
+
+    def embed_array(self, texts: Sequence[str]) -> np.ndarray:
+        return np.stack([self._vectors[text] for text in texts])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vectors[text].tolist()
+
+
+def _resize_vectors(vectors: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    # Corpus mayor que lo grabado: repetir con un poco de ruido para que no
+    # haya vectores idénticos (que distorsionarían HNSW e IVF)
+    if size <= len(vectors):
+        return vectors[:size]
+    repeats = vectors[np.arange(size) % len(vectors)].copy()
+    scale = float(np.std(vectors)) * 0.05
+    repeats[len(vectors):] += rng.normal(0.0, scale, size=(size - len(vectors), vectors.shape[1])).astype(np.float32)
+    return repeats
+
+
+def embed_corpus(corpus: SyntheticCorpus, config: BenchConfig) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Vectores de documentos y consultas.
+
+    Returns:
+        (vectores de documentos, vectores de consultas, segundos de embedding)
+    """
+    start = time.perf_counter()
+    if config.recorded:
+        data = np.load(config.recorded)
+        rng = np.random.default_rng(config.seed)
+        doc_vectors = _resize_vectors(np.asarray(data["doc_vectors"], dtype=np.float32), len(corpus.texts), rng)
+        query_vectors = _resize_vectors(np.asarray(data["query_vectors"], dtype=np.float32), len(corpus.queries), rng)
+    else:
+        from offline_embeddings import HashingEmbeddings
+
+        embedder = HashingEmbeddings(dim=config.dim).fit(corpus.texts)
+        doc_vectors = embedder.embed_array(corpus.texts)
+        query_vectors = embedder.embed_array(corpus.queries)
+    elapsed = time.perf_counter() - start
+    return np.ascontiguousarray(doc_vectors, dtype=np.float32), np.ascontiguousarray(query_vectors, dtype=np.float32), elapsed
+
+
+def percentiles(latencies_ms: Sequence[float], prefix: str) -> Dict[str, float]:
+    """p50/p90/p99 y media de una lista de latencias en ms."""
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    if len(values) == 0:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {f"{prefix}.p50_ms": round(float(p50), 4), f"{prefix}.p90_ms": round(float(p90), 4),
+            f"{prefix}.p99_ms": round(float(p99), 4), f"{prefix}.mean_ms": round(float(values.mean()), 4)}
+
+
+def _factory_string(index_type: str, size: int) -> str:
+    # "IVF,Flat" sin número de listas: ~4*sqrt(n), como recomienda FAISS
+    if index_type.startswith("IVF,"):
+        nlist = max(1, min(size // 39, int(4 * np.sqrt(size))))
+        return f"IVF{nlist}{index_type[3:]}"
+    return index_type
+
+
+def build_index(index_type: str, vectors: np.ndarray, config: BenchConfig):
+    """
+    Construye un índice FAISS (entrenamiento incluido) con los parámetros de búsqueda del benchmark.
+
+    Returns:
+        (índice, segundos de construcción)
+    """
+    import faiss
+
+    start = time.perf_counter()
+    index = faiss.index_factory(vectors.shape[1], _factory_string(index_type, len(vectors)), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    elapsed = time.perf_counter() - start
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = config.hnsw_ef_search
+    try:
+        faiss.extract_index_ivf(index).nprobe = config.ivf_nprobe
+    except RuntimeError:
+        pass
+    return index, elapsed
+
+
+def _search_latencies(index, queries: np.ndarray, k: int) -> List[float]:
+    latencies = []
+    for row in range(len(queries)):
+        start = time.perf_counter()
+        index.search(queries[row:row + 1], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def bench_index(index_type: str, doc_vectors: np.ndarray, query_vectors: np.ndarray, truth: np.ndarray,
+                config: BenchConfig, prefix: str) -> Dict[str, float]:
+    """Construcción, tamaño, memoria, recall y latencia por hilos de un tipo de índice."""
+    import faiss
+
+    rss_before = memory_usage().get("rss", 0)
+    index, build_seconds = build_index(index_type, doc_vectors, config)
+    rss_after = memory_usage().get("rss", 0)
+    metrics = {
+        f"{prefix}.build_s": round(build_seconds, 4),
+        f"{prefix}.index_bytes": int(faiss.serialize_index(index).size),
+        f"{prefix}.rss_delta_bytes": max(0, rss_after - rss_before),
+    }
+    _, found = index.search(query_vectors, config.k)
+    metrics[f"{prefix}.recall_at_{config.k}"] = round(recall_at_k(truth, found, config.k), 4)
+
+    for threads in config.threads:
+        faiss.omp_set_num_threads(threads)
+        index.search(query_vectors[:1], config.k)   # calentar
+        metrics.update(percentiles(_search_latencies(index, query_vectors, config.k), f"{prefix}.t{threads}.search"))
+        start = time.perf_counter()
+        index.search(query_vectors, config.k)
+        elapsed = time.perf_counter() - start
+        metrics[f"{prefix}.t{threads}.batch_qps"] = round(len(query_vectors) / elapsed, 1) if elapsed > 0 else 0.0
+    print(f"[OK] {prefix}: construcción {build_seconds:.2f}s, "
+          f"recall@{config.k} {metrics[f'{prefix}.recall_at_{config.k}']:.3f}, "
+          f"p50 (t{config.threads[0]}) {metrics[f'{prefix}.t{config.threads[0]}.search.p50_ms']:.3f} ms")
+    return metrics
+
+
+def _vectorstore(corpus: SyntheticCorpus, doc_vectors: np.ndarray, query_vectors: np.ndarray):
+    """Vectorstore de LangChain sobre un Flat exacto, con las consultas ya embebidas."""
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    index = faiss.IndexFlatL2(doc_vectors.shape[1])
+    index.add(doc_vectors)
+    ids = [str(i) for i in range(len(corpus.texts))]
+    docstore = InMemoryDocstore({doc_id: Document(page_content=text, metadata=metadata)
+                                 for doc_id, text, metadata in zip(ids, corpus.texts, corpus.metadatas)})
+    return FAISS(RecordedEmbeddings(corpus.queries, query_vectors), index, docstore, dict(enumerate(ids)))
+
+
+def bench_pipeline(corpus: SyntheticCorpus, doc_vectors: np.ndarray, query_vectors: np.ndarray,
+                   config: BenchConfig, prefix: str) -> Dict[str, float]:
+    """Etapa por keywords, búsqueda híbrida y ensamblado del contexto."""
+    # La versión de consultar_terminal: importar consultar_web ejecuta la app
+    # de Streamlit (geolocalización por red incluida)
+    from consultar_terminal import format_docs_with_metadata
+    from keyword_index import KeywordIndex
+    from retrieval import _missing_keywords, hybrid_retrieval, hybrid_retrieval_batch, search_by_vectors
+
+    vectorstore = _vectorstore(corpus, doc_vectors, query_vectors)
+    docs = list(vectorstore.docstore._dict.values())
+    metrics: Dict[str, float] = {}
+
+    rss_before = memory_usage().get("rss", 0)
+    start = time.perf_counter()
+    keyword_index = KeywordIndex(docs)
+    metrics[f"{prefix}.keyword.build_s"] = round(time.perf_counter() - start, 4)
+    metrics[f"{prefix}.keyword.rss_delta_bytes"] = max(0, memory_usage().get("rss", 0) - rss_before)
+
+    vector_docs = [[doc for doc, _ in hits] for hits in search_by_vectors(vectorstore, query_vectors, config.k_vector)]
+    missing = [_missing_keywords(query, hits) for query, hits in zip(corpus.queries, vector_docs)]
+    # Solo las consultas que llegan a la etapa (con keywords fuera del top vectorial)
+    missing = [keywords for keywords in missing if keywords]
+    metrics[f"{prefix}.keyword.queries_with_missing"] = len(missing)
+    latencies = []
+    for keywords in missing:
+        start = time.perf_counter()
+        keyword_index.top_matches(keywords, config.k_keyword)
+        latencies.append((time.perf_counter() - start) * 1000)
+    metrics.update(percentiles(latencies, f"{prefix}.keyword.query"))
+
+    # hybrid_retrieval imprime trazas de depuración por consulta: se descartan
+    with contextlib.redirect_stdout(io.StringIO()):
+        hybrid_retrieval(vectorstore, corpus.queries[0], k_vector=config.k_vector, k_keyword=config.k_keyword)
+        results, latencies = [], []
+        for query in corpus.queries:
+            start = time.perf_counter()
+            results.append(hybrid_retrieval(vectorstore, query, k_vector=config.k_vector, k_keyword=config.k_keyword))
+            latencies.append((time.perf_counter() - start) * 1000)
+        metrics.update(percentiles(latencies, f"{prefix}.hybrid.query"))
+
+        start = time.perf_counter()
+        hybrid_retrieval_batch(vectorstore, corpus.queries, k_vector=config.k_vector, k_keyword=config.k_keyword)
+        elapsed = time.perf_counter() - start
+        metrics[f"{prefix}.hybrid.batch_qps"] = round(len(corpus.queries) / elapsed, 1) if elapsed > 0 else 0.0
+
+        latencies, context_chars = [], 0
+        for docs_for_query in results:
+            start = time.perf_counter()
+            context_chars += len(format_docs_with_metadata(docs_for_query))
+            latencies.append((time.perf_counter() - start) * 1000)
+    metrics.update(percentiles(latencies, f"{prefix}.context.assemble"))
+    metrics[f"{prefix}.context.mean_chars"] = round(context_chars / max(1, len(results)), 1)
+    print(f"[OK] {prefix}: keywords p50 {metrics[f'{prefix}.keyword.query.p50_ms']:.3f} ms, "
+          f"híbrida p50 {metrics[f'{prefix}.hybrid.query.p50_ms']:.2f} ms, "
+          f"contexto p50 {metrics[f'{prefix}.context.assemble.p50_ms']:.2f} ms")
+    return metrics
+
+
+@contextlib.contextmanager
+def quiet_tracer():
+    # Mismos spans que en producción, pero sin escribir logs/traces durante las mediciones
+    from tracing import Tracer, set_tracer
+
+    previous = set_tracer(Tracer(export_dir=None))
+    try:
+        yield
+    finally:
+        set_tracer(previous)
+
+
+def run_benchmark(config: BenchConfig) -> Dict[str, Any]:
+    """
+    Ejecuta el benchmark completo.
+
+    Returns:
+        {"meta": entorno y configuración, "metrics": {nombre: valor}}
+    """
+    import faiss
+
+    metrics: Dict[str, float] = {}
+    max_threads = faiss.omp_get_max_threads()
+    started = time.perf_counter()
+    try:
+        with quiet_tracer():
+            for size in config.sizes:
+                prefix = f"n{size}"
+                print(f"[INFO] Corpus sintético de {size} chunks, {config.queries} consultas")
+                corpus = synthetic_corpus(size, config.queries, config.vocabulary, config.seed)
+                doc_vectors, query_vectors, embed_seconds = embed_corpus(corpus, config)
+                metrics[f"{prefix}.embed_s"] = round(embed_seconds, 4)
+
+                exact = faiss.IndexFlatL2(doc_vectors.shape[1])
+                exact.add(doc_vectors)
+                _, truth = exact.search(query_vectors, config.k)
+                del exact
+
+                for index_type in config.index_types:
+                    metrics.update(bench_index(index_type, doc_vectors, query_vectors, truth, config,
+                                               f"{prefix}.{index_type}"))
+                faiss.omp_set_num_threads(max_threads)
+                metrics.update(bench_pipeline(corpus, doc_vectors, query_vectors, config, prefix))
+    finally:
+        faiss.omp_set_num_threads(max_threads)
+
+    usage = memory_usage()
+    if "rss" in usage:
+        metrics["process.rss_bytes"] = usage["rss"]
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "faiss": getattr(faiss, "__version__", "desconocida"),
+            "embeddings": config.recorded or f"hashing-{config.dim}",
+            "elapsed_seconds": round(time.perf_counter() - started, 2),
+            "config": asdict(config),
+        },
+        "metrics": metrics,
+    }
+
+
+def _min_delta(name: str) -> float:
+    for suffix, delta in MIN_DELTAS.items():
+        if name.endswith(suffix):
+            return delta
+    return 0.0
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Métricas que empeoran respecto a la línea base.
+
+    Args:
+        current: Resultado de `run_benchmark`
+        baseline: Resultado guardado de una ejecución anterior
+        tolerance: Empeoramiento relativo admitido (0.25 = 25%)
+
+    Returns:
+        [{"metric", "baseline", "current", "change"}] ordenadas por cambio
+        (solo las presentes en ambos resultados)
+    """
+    regressions = []
+    current_metrics = current.get("metrics", {})
+    for name, old in baseline.get("metrics", {}).items():
+        new = current_metrics.get(name)
+        if not isinstance(new, (int, float)) or not isinstance(old, (int, float)) or old == 0:
+            continue
+        higher_is_better = any(marker in name for marker in HIGHER_IS_BETTER)
+        change = (new - old) / abs(old)
+        worse = -change if higher_is_better else change
+        if worse > tolerance and abs(new - old) > _min_delta(name):
+            regressions.append({"metric": name, "baseline": old, "current": new, "change": round(change, 4)})
+    regressions.sort(key=lambda item: abs(item["change"]), reverse=True)
+    return regressions
+
+
+def print_regressions(regressions: List[Dict[str, Any]], tolerance: float):
+    if not regressions:
+        print(f"[OK] Sin regresiones respecto a la línea base (tolerancia {tolerance:.0%})")
+        return
+    print(f"[!] {len(regressions)} regresiones (tolerancia {tolerance:.0%}):")
+    for item in regressions:
+        print(f"    {item['metric']:<48} {item['baseline']:>14} -> {item['current']:<14} ({item['change']:+.1%})")
+
+
+def write_json_atomic(data: Dict[str, Any], path: str):
+    """Escribe el JSON en un temporal del mismo directorio y lo renombra."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(target.parent), prefix=".bench_", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, target)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+def record_vectors(index_dir: str, output: str, queries: int = 200, seed: int = 1234) -> Tuple[int, int]:
+    """
+    Graba vectores reales de un índice local para usarlos sin red.
+
+    Las consultas son vectores de documentos al azar con un poco de ruido
+    (no hay consultas reales embebidas guardadas).
+
+    Returns:
+        (número de documentos, número de consultas)
+    """
+    from faiss_mmap import read_faiss_index
+
+    index = read_faiss_index(os.path.join(index_dir, "index.faiss"), mmap=False)
+    doc_vectors = index.reconstruct_n(0, index.ntotal).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(len(doc_vectors), size=min(queries, len(doc_vectors)), replace=False)
+    query_vectors = doc_vectors[positions] + rng.normal(0.0, float(np.std(doc_vectors)) * 0.1,
+                                                        size=(len(positions), doc_vectors.shape[1])).astype(np.float32)
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(output, doc_vectors=doc_vectors, query_vectors=query_vectors)
+    return len(doc_vectors), len(query_vectors)
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de la recuperación de GERARD")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Ejecutar el benchmark")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Tamaños de corpus (chunks)")
+    run.add_argument("--index-types", nargs="+", default=list(DEFAULT_INDEX_TYPES),
+                     help="Fábricas FAISS ('IVF,Flat' elige el número de listas)")
+    run.add_argument("--threads", type=int, nargs="+", default=list(DEFAULT_THREADS), help="Hilos OpenMP a medir")
+    run.add_argument("--queries", type=int, default=200)
+    run.add_argument("--k", type=int, default=10)
+    run.add_argument("--dim", type=int, default=256, help="Dimensión de HashingEmbeddings")
+    run.add_argument("--recorded", default=None, help="Vectores grabados (.npz de 'record') en lugar de HashingEmbeddings")
+    run.add_argument("--seed", type=int, default=1234)
+    run.add_argument("--output", default=None, help=f"JSON de resultados (por defecto {DEFAULT_RESULTS_DIR}/retrieval_<fecha>.json)")
+    run.add_argument("--baseline", default=None, help="Línea base con la que comparar")
+    run.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    run.add_argument("--save-baseline", action="store_true", help="Guardar este resultado como línea base (--baseline)")
+
+    compare = subparsers.add_parser("compare", help="Comparar dos resultados")
+    compare.add_argument("current")
+    compare.add_argument("baseline")
+    compare.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+
+    record = subparsers.add_parser("record", help="Grabar vectores de un índice local")
+    record.add_argument("index_dir")
+    record.add_argument("--output", default="bench_vectors.npz")
+    record.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        docs, queries = record_vectors(args.index_dir, args.output, args.queries)
+        print(f"[OK] {docs} vectores de documentos y {queries} consultas en {args.output}")
+        return
+
+    if args.command == "compare":
+        regressions = compare_results(_load_json(args.current), _load_json(args.baseline), args.tolerance)
+        print_regressions(regressions, args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+    config = BenchConfig(sizes=args.sizes, index_types=args.index_types, threads=args.threads, queries=args.queries,
+                         k=args.k, dim=args.dim, recorded=args.recorded, seed=args.seed)
+    result = run_benchmark(config)
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"retrieval_{datetime.now():%Y%m%d_%H%M%S}.json")
+    write_json_atomic(result, output)
+    print(f"[OK] {len(result['metrics'])} métricas en {output} ({result['meta']['elapsed_seconds']:.1f}s)")
+
+    if args.baseline:
+        if args.save_baseline:
+            write_json_atomic(result, args.baseline)
+            print(f"[OK] Línea base actualizada: {args.baseline}")
+        elif os.path.exists(args.baseline):
+            regressions = compare_results(result, _load_json(args.baseline), args.tolerance)
+            print_regressions(regressions, args.tolerance)
+            sys.exit(1 if regressions else 0)
+        else:
+            print(f"[!] No existe la línea base {args.baseline}; usa --save-baseline para crearla")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Perfil Compacto del Índice FAISS para GERARD
+
+El índice guarda los vectores completos de `models/embedding-001` (768
+float32 = 3 KB por chunk) y cada uno se publica, se descarga y ocupa RAM.
+Este módulo entrena una transformación PCA/OPQ a una dimensión configurable
+combinada con cuantización escalar SQ8 o fp16 (`IndexPreTransform` +
+`IndexScalarQuantizer`), y mide cuánto se pierde.
+
+Características:
+- Fábrica FAISS: "PCAR256,SQ8", "OPQ16_256,SQfp16", "SQ8"... (misma métrica
+  que el índice original)
+- Entrenamiento sobre una muestra acotada, excluyendo un conjunto de
+  consultas reservado (held-out)
+- Reporte de tamaño (bytes/vector, reducción) frente a recall@k sobre las
+  consultas reservadas, con y sin rerank exacto
+- Rerank exacto opcional: los vectores originales se guardan aparte en
+  `index.full.faiss`; al cargar (faiss_mmap.py) se combinan con
+  `faiss.IndexRefine`, que pide `k * k_factor` candidatos al índice compacto
+  y los reordena con la distancia exacta leída del archivo mapeado
+- El perfil y el reporte quedan en `index.compact.json` junto al índice
+
+Uso:
+    index, report = compact_index(full_index, "faiss_index/index.faiss", CompactProfile(dim=256))
+    python compact_index.py faiss_index --dim 256 --quantizer sq8 --rerank 4
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from faiss_mmap import compact_profile_path, full_vectors_path
+
+TRANSFORMS = ("none", "pca", "opq")
+QUANTIZERS = ("sq8", "fp16", "flat")
+_QUANTIZER_CODES = {"sq8": "SQ8", "fp16": "SQfp16", "flat": "Flat"}
+
+
+@dataclass
+class CompactProfile:
+    """Configuración del índice compacto"""
+    dim: Optional[int] = 256            # None = sin reducción de dimensión
+    transform: str = "pca"              # "pca", "opq" o "none"
+    quantizer: str = "sq8"              # "sq8", "fp16" o "flat"
+    rerank_k_factor: int = 4            # 0 = no guardar vectores originales (sin rerank)
+    eval_queries: int = 200             # consultas reservadas para medir recall
+    eval_k: int = 10
+    max_train_points: int = 100_000
+    seed: int = 1234
+
+    def validate(self, dimension: int):
+        if self.transform not in TRANSFORMS:
+            raise ValueError(f"Transformación desconocida: {self.transform} (opciones: {', '.join(TRANSFORMS)})")
+        if self.quantizer not in QUANTIZERS:
+            raise ValueError(f"Cuantizador desconocido: {self.quantizer} (opciones: {', '.join(QUANTIZERS)})")
+        if self.dim is not None and not 0 < self.dim <= dimension:
+            raise ValueError(f"La dimensión compacta debe estar entre 1 y {dimension}")
+
+    def factory_string(self, dimension: int) -> str:
+        """Cadena de `faiss.index_factory` para este perfil."""
+        self.validate(dimension)
+        out_dim = self.dim or dimension
+        parts = []
+        if self.transform == "pca" and out_dim < dimension:
+            # PCAR: PCA seguida de una rotación aleatoria, que reparte la
+            # varianza entre componentes y ayuda a la cuantización escalar
+            parts.append(f"PCAR{out_dim}")
+        elif self.transform == "opq":
+            # OPQ necesita que M divida la dimensión de salida
+            m = next(m for m in (16, 8, 4, 2, 1) if out_dim % m == 0)
+            parts.append(f"OPQ{m}_{out_dim}")
+        parts.append(_QUANTIZER_CODES[self.quantizer])
+        return ",".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class CompactReport:
+    """Tamaño frente a calidad del índice compacto"""
+    factory: str
+    vectors: int
+    dimension: int
+    bytes_full: int
+    bytes_compact: int
+    k: int
+    queries: int
+    recall: float
+    recall_rerank: Optional[float]
+    rerank_k_factor: int
+    train_seconds: float
+
+    @property
+    def reduction(self) -> float:
+        return self.bytes_full / max(1, self.bytes_compact)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["reduction"] = round(self.reduction, 2)
+        return data
+
+    def summary(self) -> str:
+        mb = 1024 * 1024
+        lines = [
+            f"📦 Perfil compacto {self.factory} ({self.vectors} vectores de {self.dimension} dimensiones)",
+            f"   - Tamaño: {self.bytes_full / mb:.1f} MB -> {self.bytes_compact / mb:.1f} MB "
+            f"(x{self.reduction:.1f}, {self.bytes_compact / max(1, self.vectors):.0f} bytes/vector)",
+            f"   - recall@{self.k} ({self.queries} consultas reservadas): {self.recall:.3f}",
+        ]
+        if self.recall_rerank is not None:
+            lines.append(f"   - recall@{self.k} con rerank exacto (k_factor={self.rerank_k_factor}): "
+                         f"{self.recall_rerank:.3f}")
+        return "\n".join(lines)
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray, k: int) -> float:
+    """Fracción de los k vecinos exactos que aparecen entre los k encontrados."""
+    if len(truth) == 0:
+        return 1.0
+    hits = sum(len(set(t[:k]) & set(f[:k])) for t, f in zip(truth, found))
+    return hits / (len(truth) * k)
+
+
+def _serialized_size(index) -> int:
+    import faiss
+
+    return int(faiss.serialize_index(index).size)
+
+
+def _neighbors_without_self(index, vectors: np.ndarray, positions: np.ndarray, k: int) -> np.ndarray:
+    # Las consultas reservadas son documentos del índice: se descarta la
+    # coincidencia consigo mismas para no inflar el recall
+    _, found = index.search(vectors[positions], k + 1)
+    rows = []
+    for position, row in zip(positions, found):
+        row = [i for i in row if i != position and i >= 0][:k]
+        rows.append(row + [-1] * (k - len(row)))
+    return np.array(rows, dtype="int64")
+
+
+def train_compact(vectors: np.ndarray, profile: CompactProfile, metric: int, exclude: Optional[np.ndarray] = None):
+    """
+    Entrena el índice compacto y le añade todos los vectores.
+
+    Args:
+        vectors: Matriz (n, d) float32 con los vectores originales
+        profile: Perfil compacto
+        metric: Métrica FAISS del índice original
+        exclude: Posiciones que no se usan para entrenar (consultas reservadas)
+
+    Returns:
+        Índice compacto (IndexPreTransform o IndexScalarQuantizer)
+    """
+    import faiss
+
+    dimension = vectors.shape[1]
+    index = faiss.index_factory(dimension, profile.factory_string(dimension), metric)
+    if not index.is_trained:
+        candidates = np.arange(len(vectors))
+        if exclude is not None and len(exclude):
+            candidates = np.setdiff1d(candidates, exclude)
+        rng = np.random.default_rng(profile.seed)
+        if len(candidates) > profile.max_train_points:
+            candidates = rng.choice(candidates, profile.max_train_points, replace=False)
+        index.train(np.ascontiguousarray(vectors[np.sort(candidates)]))
+    index.add(vectors)
+    return index
+
+
+def evaluate_compact(full_index, compact, vectors: np.ndarray, positions: np.ndarray,
+                     k: int, rerank_k_factor: int = 0) -> Tuple[float, Optional[float]]:
+    """
+    recall@k del índice compacto (y con rerank) frente a la búsqueda exacta.
+
+    Returns:
+        (recall, recall con rerank o None)
+    """
+    import faiss
+
+    if len(positions) == 0:
+        return 1.0, None
+    truth = _neighbors_without_self(full_index, vectors, positions, k)
+    recall = recall_at_k(truth, _neighbors_without_self(compact, vectors, positions, k), k)
+    if rerank_k_factor <= 0:
+        return recall, None
+    refine = faiss.IndexRefine(compact, full_index)
+    refine.k_factor = rerank_k_factor
+    return recall, recall_at_k(truth, _neighbors_without_self(refine, vectors, positions, k), k)
+
+
+def _write_index_atomic(index, path: Path):
+    import faiss
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=str(path.parent))
+    os.close(fd)
+    try:
+        faiss.write_index(index, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def compact_index(full_index, output_path: str, profile: Optional[CompactProfile] = None):
+    """
+    Construye el índice compacto a partir del índice exacto y lo guarda.
+
+    Escribe `output_path` (índice compacto), `<nombre>.full.faiss` (vectores
+    originales, solo si hay rerank) y `<nombre>.compact.json` (perfil y
+    reporte). Las posiciones de los vectores no cambian, así el docstore y
+    `index_to_docstore_id` siguen sirviendo.
+
+    Args:
+        full_index: Índice con los vectores originales (debe admitir reconstruct)
+        output_path: Ruta del `.faiss` compacto
+        profile: Perfil compacto (por defecto PCA 256 + SQ8 con rerank x4)
+
+    Returns:
+        (índice compacto, CompactReport)
+    """
+    import faiss
+
+    profile = profile or CompactProfile()
+    output = Path(output_path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    total = full_index.ntotal
+    vectors = full_index.reconstruct_n(0, total) if total else np.zeros((0, full_index.d), dtype="float32")
+    exact = faiss.IndexFlat(full_index.d, full_index.metric_type)
+    exact.add(vectors)
+
+    rng = np.random.default_rng(profile.seed)
+    queries = np.sort(rng.choice(total, min(profile.eval_queries, total), replace=False)) if total else np.zeros(0, dtype=int)
+
+    start = time.perf_counter()
+    compact = train_compact(vectors, profile, full_index.metric_type, exclude=queries)
+    train_seconds = time.perf_counter() - start
+    recall, recall_rerank = evaluate_compact(exact, compact, vectors, queries, profile.eval_k, profile.rerank_k_factor)
+
+    report = CompactReport(
+        factory=profile.factory_string(full_index.d),
+        vectors=total,
+        dimension=full_index.d,
+        bytes_full=_serialized_size(exact),
+        bytes_compact=_serialized_size(compact),
+        k=profile.eval_k,
+        queries=len(queries),
+        recall=round(recall, 4),
+        recall_rerank=None if recall_rerank is None else round(recall_rerank, 4),
+        rerank_k_factor=profile.rerank_k_factor,
+        train_seconds=round(train_seconds, 2),
+    )
+
+    full_path = full_vectors_path(output)
+    if profile.rerank_k_factor > 0:
+        _write_index_atomic(exact, full_path)
+    elif full_path.exists():
+        full_path.unlink()
+    _write_index_atomic(compact, output)
+    profile_path = compact_profile_path(output)
+    with open(profile_path, "w", encoding="utf-8") as f:
+        json.dump({"profile": profile.to_dict(), "report": report.to_dict()}, f, ensure_ascii=False, indent=2)
+
+    print(report.summary())
+    return compact, report
+
+
+def compact_index_dir(folder: str, profile: CompactProfile, index_name: str = "index") -> CompactReport:
+    """
+    Compacta un índice ya construido (formato `save_local`) sin volver a
+    calcular embeddings. Si ya estaba compactado, parte de los vectores
+    originales guardados en `<nombre>.full.faiss`.
+    """
+    import faiss
+
+    index_path = Path(folder) / f"{index_name}.faiss"
+    full_path = full_vectors_path(index_path)
+    source = full_path if full_path.exists() else index_path
+    # Lectura completa (sin mmap): el archivo de origen puede reemplazarse
+    full_index = faiss.read_index(str(source))
+    _, report = compact_index(full_index, str(index_path), profile)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta un índice FAISS (PCA/OPQ + SQ8/fp16)")
+    parser.add_argument("folder", nargs="?", default="faiss_index")
+    parser.add_argument("--dim", type=int, default=256, help="Dimensión tras la transformación (0 = sin reducir)")
+    parser.add_argument("--transform", choices=TRANSFORMS, default="pca")
+    parser.add_argument("--quantizer", choices=QUANTIZERS, default="sq8")
+    parser.add_argument("--rerank", type=int, default=4, help="k_factor del rerank exacto (0 = sin rerank)")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas reservadas para medir recall")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    profile = CompactProfile(
+        dim=args.dim or None,
+        transform=args.transform,
+        quantizer=args.quantizer,
+        rerank_k_factor=args.rerank,
+        eval_queries=args.queries,
+        eval_k=args.k,
+    )
+    compact_index_dir(args.folder, profile)
+
+
+if __name__ == "__main__":
+    main()
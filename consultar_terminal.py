@@ -12,10 +12,19 @@ import uuid
 from dotenv import load_dotenv
 import keyring
 from langchain_google_genai import GoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 from datetime import datetime
+from pathlib import Path
+
+from batch_questions import DEFAULT_CONCURRENCY, DEFAULT_RPM, read_questions, run_batch
+from faiss_mmap import load_faiss_local
+from index_snapshots import resolve_snapshot
+from metrics import LLM_IN_FLIGHT, instrument_tracer, set_index_metrics, start_metrics_server
+from retrieval import DEFAULT_K_KEYWORD, DEFAULT_K_VECTOR, LocalRetriever
+from retrieval_service import connect_retrieval_service
+from tracing import get_tracer
 
 # Inicializamos colorama para que los colores funcionen en todas las terminales
 colorama.init(autoreset=True)
@@ -23,10 +32,13 @@ colorama.init(autoreset=True)
 # --- Carga la API Key ---
 # Nota: no inicializamos la API ni recursos de red al importar el módulo.
 # Creamos una función para construir la cadena de recuperación (llm + vectorstore)
-def build_retrieval_chain(api_key: str):
-    """Construye y devuelve el retrieval_chain usando la API key proporcionada.
+def build_pipeline(api_key: str):
+    """Inicializa el LLM y el recuperador; devuelve (llm, retriever).
 
-    Carga el índice FAISS persistido en `faiss_index/`.
+    Usa el servicio de recuperación compartido si GERARD_RETRIEVAL_URL está
+    definida y responde; si no, carga el índice FAISS persistido en
+    `faiss_index/` (instantánea activa). La búsqueda es la misma híbrida que
+    en la app web.
     """
     # Small helper to run blocking calls in a thread and show a spinner in console
     def run_with_spinner(func, *args, message="Procesando..."):
@@ -62,28 +74,92 @@ def build_retrieval_chain(api_key: str):
 
     # Load LLM and embeddings with spinner to give feedback for slow init
     llm = run_with_spinner(lambda: GoogleGenerativeAI(model="models/gemini-2.5-pro", google_api_key=api_key), message="Inicializando LLM...")
-    embeddings = run_with_spinner(lambda: GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key), message="Inicializando embeddings...")
+    retriever = connect_retrieval_service()
+    if retriever is None:
+        embeddings = run_with_spinner(lambda: GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key), message="Inicializando embeddings...")
+        version, index_dir = resolve_snapshot("faiss_index")
+        try:
+            vectorstore = run_with_spinner(lambda: load_faiss_local(str(index_dir), embeddings), message="Cargando índice FAISS (puede tardar)...")
+        except Exception as e:
+            print(f"Error cargando FAISS index: {e}")
+            raise
 
-    try:
-        vectorstore = run_with_spinner(lambda: FAISS.load_local(folder_path="faiss_index", embeddings=embeddings, allow_dangerous_deserialization=True), message="Cargando índice FAISS (puede tardar)...")
-    except Exception as e:
-        print(f"Error cargando FAISS index: {e}")
-        raise
+        set_index_metrics(vectorstore, str(index_dir))
+        retriever = LocalRetriever.from_vectorstore(vectorstore, version, str(index_dir))
+
+    return llm, retriever
+
+
+def build_retrieval_chain(api_key: str):
+    """Construye y devuelve el retrieval_chain usando la API key proporcionada."""
+    llm, retriever = build_pipeline(api_key)
+
+    def llm_call(prompt_value):
+        with get_tracer().span("llm.generate", prompt_chars=len(prompt_value.to_string())), LLM_IN_FLIGHT.track_inprogress():
+            return llm.invoke(prompt_value)
+
+    def hybrid_retriever_func(query: str):
+        return retriever.hybrid_search(query, k_vector=DEFAULT_K_VECTOR, k_keyword=DEFAULT_K_KEYWORD)
 
-    retriever = vectorstore.as_retriever()
     retrieval_chain = (
         {
-            "context": (lambda x: x["input"]) | retriever | format_docs_with_metadata,
+            "context": (lambda x: x["input"]) | RunnableLambda(hybrid_retriever_func) | format_docs_with_metadata,
             "input": (lambda x: x["input"]) 
         }
         | prompt
-        | llm
+        | RunnableLambda(llm_call)
         | StrOutputParser()
     )
 
     return retrieval_chain
 
 
+def answer_question(llm, retriever, question: str) -> dict:
+    """Responde una pregunta del modo lote midiendo recuperación y LLM por separado."""
+    timings = {}
+    with get_tracer().span("interaction", platform="batch", question_chars=len(question)):
+        start = time.perf_counter()
+        docs = retriever.hybrid_search(question, k_vector=DEFAULT_K_VECTOR, k_keyword=DEFAULT_K_KEYWORD)
+        context = format_docs_with_metadata(docs)
+        timings["retrieval_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        prompt_value = prompt.invoke({
+            "context": context,
+            "input": question,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "session_hash": str(uuid.uuid4())
+        })
+        start = time.perf_counter()
+        with get_tracer().span("llm.generate", prompt_chars=len(prompt_value.to_string())), LLM_IN_FLIGHT.track_inprogress():
+            answer = StrOutputParser().invoke(llm.invoke(prompt_value))
+        timings["llm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    sources = list(dict.fromkeys(os.path.basename(doc.metadata.get("source", "")) for doc in docs))
+    return {"answer": answer, "sources": sources, "timings": timings}
+
+
+def run_batch_mode(args, api_key: str) -> int:
+    """Modo lote (--batch): ver batch_questions.py. Devuelve el código de salida."""
+    try:
+        questions = read_questions(args.batch)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] No se pudieron leer las preguntas: {e}")
+        return 2
+    output = args.output or (
+        "batch_results.jsonl" if args.batch == "-" else str(Path(args.batch).with_suffix(".results.jsonl"))
+    )
+    llm, retriever = build_pipeline(api_key)
+    summary = run_batch(
+        questions,
+        lambda question: answer_question(llm, retriever, question),
+        output,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        resume=not args.no_resume
+    )
+    return 1 if summary["errors"] or summary["interrupted"] else 0
+
+
 def get_api_key():
     """Intentar obtener la API key de varias fuentes en orden:
     1. keyring del sistema (servicio 'consultor-gerard', nombre 'google_api_key')
@@ -319,12 +395,32 @@ def main():
     """Función principal que lanza el loop interactivo. Protegida para que no se ejecute al importar."""
     parser = argparse.ArgumentParser()
     parser.add_argument("--no-store", action="store_true", help="No almacenar la API key en keyring aunque se provea interactiva")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Exponer métricas Prometheus en http://127.0.0.1:<puerto>/metrics")
+    parser.add_argument("--batch", metavar="ARCHIVO", default=None,
+                        help="Modo lote: preguntas (una por línea o JSONL) desde un archivo, o '-' para stdin")
+    parser.add_argument("--output", default=None,
+                        help="Resultados JSONL del modo lote (por defecto <archivo>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Preguntas en paralelo en modo lote")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM, help="Tope de preguntas por minuto en modo lote (0 = sin tope)")
+    parser.add_argument("--no-resume", action="store_true", help="Repetir también las preguntas ya respondidas en la salida")
     args = parser.parse_args()
 
+    tracer = get_tracer()
+    if args.metrics_port:
+        instrument_tracer(tracer)
+        start_metrics_server(args.metrics_port)
+
     load_dotenv()
 
     # Intentar obtener la key desde keyring o entornos
     api_key = get_api_key()
+    if args.batch:
+        # Sin interacción: la clave debe estar en keyring o en el entorno
+        if not api_key:
+            print("[ERROR] Modo lote sin GOOGLE_API_KEY (keyring o entorno).")
+            sys.exit(2)
+        sys.exit(run_batch_mode(args, api_key))
+
     if not api_key:
         # Pedir interactivamente la clave al usuario
         print("No se encontró GOOGLE_API_KEY en keyring/entorno. Puedes pegar tu clave ahora (se ocultará).")
@@ -373,7 +469,8 @@ def main():
         try:
             ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             session_hash = str(uuid.uuid4())
-            answer = retrieval_chain.invoke({"input": pregunta, "date": ts, "session_hash": session_hash})
+            with tracer.span("interaction", platform="terminal", question_chars=len(pregunta)):
+                answer = retrieval_chain.invoke({"input": pregunta, "date": ts, "session_hash": session_hash})
             print("\nRespuesta de GERARD:")
             print_json_answer(answer)
             save_to_log(pregunta, user_name.upper(), answer)
@@ -22,10 +22,12 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from datetime import datetime
+from pathlib import Path
 import uuid
 from typing import Any, Iterable, List, Pattern
 import streamlit as st
 import streamlit.components.v1 as components
+from streamlit import runtime as st_runtime
 import requests  # Para obtener la IP y geolocalización
 import io
 import textwrap
@@ -33,7 +35,26 @@ import textwrap
 # Importar sistema de logging completo
 from interaction_logger import InteractionLogger
 from device_detector import DeviceDetector
+from faiss_mmap import load_faiss_local, memory_usage
 from geo_utils import GeoLocator
+from index_downloader import REQUIRED_FILES as REQUIRED_INDEX_FILES, IndexDownloader, index_ready
+from index_shards import open_sharded_index, shards_dir, shards_index_version, shards_manifest_url
+from index_snapshots import IndexSnapshot, IndexSnapshotManager, has_snapshots, resolve_snapshot
+from location_resolver import LocationResolver, get_location_resolver, to_geo_info
+from offline_embeddings import (
+    HashingEmbeddings, ensure_offline_index, offline_index_available, offline_index_dir, offline_mode_forced
+)
+from query_coalescer import get_query_coalescer
+from quick_answer import QuickAnswerChain, is_llm_overload_error, llm_overloaded
+from resource_warmup import ResourceWarmup, STATE_DOWNLOADING, STATE_LOADING
+from retrieval import DEFAULT_K_KEYWORD, DEFAULT_K_VECTOR, LocalRetriever, warm_retrieval
+from retrieval_service import connect_retrieval_service
+from services import get_services
+from tracing import current_span, get_tracer, traced
+from metrics import (
+    LLM_IN_FLIGHT, PROCESS_MEMORY_BYTES, get_registry, instrument_tracer, metrics_port_from_env,
+    record_cache, set_index_metrics, start_metrics_server
+)
 
 # Importar Google Sheets Logger (opcional, solo si está configurado)
 try:
@@ -65,74 +86,63 @@ colorama.init(autoreset=True)
 load_dotenv()
 
 # --- Descarga del índice FAISS (ANTES del cache) ---
-def download_faiss_if_needed():
-    """Descarga el índice FAISS si no existe. Ejecutar ANTES de load_resources()."""
+FAISS_URL = "https://github.com/arguellosolanogerardo-cloud/consultor-gerard-v2/releases/download/faiss-v1.0/faiss_index.zip"
+
+
+def download_faiss_if_needed(progress_callback=None):
+    """Descarga el índice FAISS si no existe. Ejecutar ANTES de load_resources().
+
+    La descarga va a disco, se reanuda tras un corte, se verifica contra el
+    manifiesto SHA-256 publicado (o GERARD_INDEX_SHA256) y se instala de forma
+    atómica (ver index_downloader.py).
+
+    progress_callback: función opcional que recibe el porcentaje descargado (0-100).
+    """
     
     faiss_marker = "faiss_index/.faiss_ready"
     faiss_index_file = "faiss_index/index.faiss"
     
+    # Instantáneas versionadas (index_snapshots.py): se publican sin descargar
+    if has_snapshots("faiss_index"):
+        print(f"[INFO] FAISS versionado - Instantánea activa: {resolve_snapshot('faiss_index')[0]}")
+        return
+
     # Verificar si ya está completamente descargado
-    if os.path.exists(faiss_marker) and os.path.exists(faiss_index_file):
+    if index_ready("faiss_index"):
         print(f"[INFO] FAISS ya descargado - Marker: {os.path.exists(faiss_marker)}, Index: {os.path.exists(faiss_index_file)}")
         return  # Ya descargado completamente
     
-    # Si solo existe el archivo pero no el marcador, crear el marcador
-    if os.path.exists(faiss_index_file) and not os.path.exists(faiss_marker):
+    # Índice de versiones anteriores (completo pero sin marcador): crear el marcador
+    if all(os.path.exists(os.path.join("faiss_index", name)) for name in REQUIRED_INDEX_FILES):
         print("[INFO] Archivo FAISS existe, creando marcador...")
-        os.makedirs("faiss_index", exist_ok=True)
         with open(faiss_marker, "w") as f:
             f.write("downloaded")
         return
     
-    # Solo descargar si no existe el archivo índice
-    if not os.path.exists(faiss_index_file):
-        print("[>] Descargando indice FAISS pre-construido...")
-        print("[tiempo] Descarga unica (~250 MB, espera 1-2 min)")
-        
-        try:
-            import requests
-            import zipfile
-            from io import BytesIO
-            
-            FAISS_URL = "https://github.com/arguellosolanogerardo-cloud/consultor-gerard-v2/releases/download/faiss-v1.0/faiss_index.zip"
-            
-            response = requests.get(FAISS_URL, stream=True, timeout=600)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            zip_data = BytesIO()
-            
-            print("[>] Iniciando descarga...")
-            for chunk in response.iter_content(chunk_size=1024*1024):
-                zip_data.write(chunk)
-                downloaded += len(chunk)
-                if total_size > 0:
-                    progress = int((downloaded / total_size) * 100)
-                    print(f"[>] {progress}% descargado ({downloaded // (1024*1024)} MB / {total_size // (1024*1024)} MB)")
-            
-            print("[paquete] Extrayendo...")
-            os.makedirs("faiss_index", exist_ok=True)
-            zip_data.seek(0)
-            with zipfile.ZipFile(zip_data) as zf:
-                zf.extractall("faiss_index")
-            
-            # Crear archivo de marca
-            with open(faiss_marker, "w") as f:
-                f.write("downloaded")
-            
-            print("[OK] Indice descargado! No se volvera a descargar.")
-            
-        except Exception as e:
-            print(f"[ERROR] Error descargando: {str(e)}")
-            raise
+    print("[>] Descargando indice FAISS pre-construido...")
+    print("[tiempo] Descarga unica (~250 MB, espera 1-2 min)")
+    try:
+        downloader = IndexDownloader(
+            FAISS_URL,
+            "faiss_index",
+            expected_sha256=os.environ.get("GERARD_INDEX_SHA256") or None,
+            # Sin manifiesto publicado (ni GERARD_INDEX_SHA256) no se instala
+            require_checksum=True,
+            progress_callback=progress_callback
+        )
+        downloader.ensure()
+        print("[OK] Indice descargado! No se volvera a descargar.")
+    except Exception as e:
+        print(f"[ERROR] Error descargando: {str(e)}")
+        raise
 
-# --- Carga de Modelos y Base de Datos (con caché de Streamlit) ---
-@st.cache_resource
-def load_resources():
-    # Descargar FAISS antes de cargar (solo se ejecutará una vez debido al caché)
-    download_faiss_if_needed()
-    
+# --- Carga de Modelos y Base de Datos ---
+class MissingApiKeyError(RuntimeError):
+    """No se encontró GOOGLE_API_KEY en entorno, Streamlit secrets ni keyring."""
+
+
+def resolve_api_key():
+    """Busca la API key en entorno, Streamlit secrets y keyring (en ese orden)."""
     # Preferir la variable de entorno; en Streamlit tomar como fallback st.secrets
     api_key = os.environ.get("GOOGLE_API_KEY")
     try:
@@ -150,132 +160,261 @@ def load_resources():
         except Exception:
             # si keyring falla, seguimos el flujo normal y mostraremos el error abajo
             pass
-    if not api_key:
-        st.error(
-            "Error: La variable de entorno GOOGLE_API_KEY no está configurada. Añade la clave a las variables de entorno o a Streamlit Secrets."
-        )
-        st.stop()
+    return api_key
 
+
+def build_resources(api_key: str, notices: list, shards_url: str = "", index_dir: str = "faiss_index",
+                    load_index: bool = True):
+    """Inicializa LLM, embeddings y FAISS sin tocar la interfaz de Streamlit.
+
+    Puede ejecutarse en un hilo de fondo. Los avisos para el usuario se acumulan
+    en `notices` como tuplas (nivel, mensaje) con nivel 'warning' o 'error'.
+    Con `shards_url` el índice se carga por fragmentos (ver index_shards.py) y
+    vuelve en cuanto el primero está listo. `index_dir` es el directorio de la
+    instantánea activa (ver index_snapshots.py). Con `load_index=False` (el
+    índice lo sirve retrieval_service.py) solo se inicializa el LLM.
+    Devuelve (llm, faiss_vs); lanza excepción si el índice no se puede cargar.
+    """
     # Pasar la API key explícitamente evita que la librería intente usar ADC
     # Intentar inicializar el LLM y embeddings de forma perezosa; si falla, devolver llm=None
     llm = None
     embeddings = None
 
-    with st.spinner('Inicializando LLM y embeddings (de forma perezosa)...'):
-        # Importar las clases de Google solo cuando las necesitemos, y capturar errores
+    # Importar las clases de Google solo cuando las necesitemos, y capturar errores
+    try:
+        from langchain_google_genai import GoogleGenerativeAI
+    except Exception as e:
+        GoogleGenerativeAI = None
+        notices.append(("warning", f"No se pudo importar GoogleGenerativeAI: {e}"))
+
+    try:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    except Exception as e:
+        GoogleGenerativeAIEmbeddings = None
+        notices.append(("warning", f"No se pudo importar GoogleGenerativeAIEmbeddings: {e}"))
+
+    # Inicializar LLM si la clase está disponible
+    if not api_key:
+        notices.append(("warning", "GOOGLE_API_KEY no configurada: modo offline con recuperación local y sin LLM."))
+    elif GoogleGenerativeAI is not None:
         try:
-            from langchain_google_genai import GoogleGenerativeAI
+            llm = GoogleGenerativeAI(
+                model="models/gemini-2.5-pro", 
+                google_api_key=api_key,
+                temperature=0.4,  # Precisión quirúrgica según prompt GERARD
+                top_p=0.90,
+                top_k=25
+            )
         except Exception as e:
-            GoogleGenerativeAI = None
-            st.warning(f"No se pudo importar GoogleGenerativeAI: {e}")
+            notices.append(("warning", f"No se pudo inicializar el LLM (GoogleGenerativeAI): {e}. La aplicación usará un modo de recuperación local sin LLM."))
+
+    if not load_index:
+        return llm, None
 
+    # Inicializar embeddings (o usar el índice offline) y cargar FAISS
+    if api_key and offline_mode_forced():
+        notices.append(("warning", "GERARD_OFFLINE_EMBEDDINGS activo: se usan embeddings locales sin llamadas a Google."))
+    elif api_key and GoogleGenerativeAIEmbeddings is not None:
         try:
-            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
+            print("[DEBUG] Embeddings de Google inicializadas correctamente")
         except Exception as e:
-            GoogleGenerativeAIEmbeddings = None
-            st.warning(f"No se pudo importar GoogleGenerativeAIEmbeddings: {e}")
+            notices.append(("warning", f"No fue posible inicializar GoogleEmbeddings: {e}. Usando embeddings locales (TF-IDF de n-gramas)."))
+    elif api_key:
+        notices.append(("warning", "GoogleGenerativeAIEmbeddings no disponible, usando embeddings locales (TF-IDF de n-gramas)."))
+
+    if embeddings is None:
+        # Los vectores locales no son comparables con los de Gemini: se usa el
+        # índice offline (mismo docstore, re-embebido sin red; se construye la
+        # primera vez a partir de faiss_index)
+        if shards_url:
+            download_faiss_if_needed()
+        faiss_vs = ensure_offline_index(str(index_dir), offline_index_dir())
+        notices.append(("warning", "⚠️ Modo offline: búsqueda con embeddings locales (TF-IDF de n-gramas). Los resultados dependen más de las palabras exactas de la pregunta."))
+        print(f"[DEBUG build_resources] Índice offline cargado con {faiss_vs.index.ntotal} documentos")
+        return llm, faiss_vs
+
+    if shards_url:
+        faiss_vs = open_sharded_index(shards_url, embeddings, shards_dir())
+        if not faiss_vs.complete:
+            notices.append(("warning", f"⏳ Índice cargándose por partes ({len(faiss_vs.loaded_shards)}/{faiss_vs.total_shards}): las primeras respuestas pueden no cubrir todos los documentos."))
+        return llm, faiss_vs
+
+    # Con mmap los vectores se comparten entre procesos vía page cache
+    faiss_vs = load_faiss_local(str(index_dir), embeddings)
+    # Debug: verificar que se cargó correctamente
+    doc_count = faiss_vs.index.ntotal if hasattr(faiss_vs, 'index') else 'unknown'
+    print(f"[DEBUG build_resources] FAISS cargado exitosamente con {doc_count} documentos")
+    return llm, faiss_vs
 
-        # Inicializar LLM si la clase está disponible
-        if GoogleGenerativeAI is not None:
-            try:
-                llm = GoogleGenerativeAI(
-                    model="models/gemini-2.5-pro", 
-                    google_api_key=api_key,
-                    temperature=0.4,  # Precisión quirúrgica según prompt GERARD
-                    top_p=0.90,
-                    top_k=25
-                )
-            except Exception as e:
-                st.warning(f"No se pudo inicializar el LLM (GoogleGenerativeAI): {e}. La aplicación usará un modo de recuperación local sin LLM.")
 
-        # Inicializar embeddings (o usar fallback) y cargar FAISS
-        try:
-            # Intentar usar la clase oficial si está disponible
-            if GoogleGenerativeAIEmbeddings is not None:
-                try:
-                    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
-                    print("[DEBUG] Embeddings de Google inicializadas correctamente")
-                except Exception as e:
-                    st.warning(f"No fue posible inicializar GoogleEmbeddings: {e}. Usando embeddings de fallback (hash-based).")
-            else:
-                st.warning("GoogleGenerativeAIEmbeddings no disponible, usando embeddings de fallback (hash-based).")
+def _warm_up_resources(report):
+    """Tarea de fondo: descarga el índice y carga modelos + FAISS."""
+    report(STATE_DOWNLOADING)
+    api_key = resolve_api_key()
+    # Servicio de recuperación compartido (GERARD_RETRIEVAL_URL): el índice ya
+    # está cargado en otro proceso de la máquina
+    service = connect_retrieval_service()
+    if service is not None:
+        report(STATE_LOADING)
+        notices = []
+        llm, _ = build_resources(api_key, notices, load_index=False)
+        return {"llm": llm, "vectorstore": None, "snapshots": None, "retriever": service, "notices": notices}
+
+    # El índice fragmentado necesita los embeddings de Google; sin ellos se
+    # usa el índice monolítico (base del índice offline)
+    shards_url = shards_manifest_url() if api_key and not offline_mode_forced() else ""
+    if not shards_url:
+        download_faiss_if_needed(progress_callback=lambda pct: report(STATE_DOWNLOADING, f"{pct}%"))
+
+    report(STATE_LOADING)
+    version, index_dir = resolve_snapshot("faiss_index")
+    # Sin API key el índice offline se construye sin red desde faiss_index;
+    # sólo es un error si no hay ni índice offline ni índice base
+    if (not api_key and not offline_index_available(offline_index_dir())
+            and not (Path(index_dir) / "index.faiss").exists()):
+        raise MissingApiKeyError(
+            "Error: La variable de entorno GOOGLE_API_KEY no está configurada. Añade la clave a las variables de entorno o a Streamlit Secrets."
+        )
+    notices = []
+    llm, faiss_vs = build_resources(api_key, notices, shards_url, str(index_dir))
+    if shards_url:
+        # Los fragmentos se completan solos en segundo plano; sin cambio en caliente
+        snapshots = IndexSnapshotManager(
+            shards_dir(), initial=IndexSnapshot(shards_index_version(shards_dir()), Path(shards_dir()), faiss_vs)
+        )
+    else:
+        # Índice de palabras de la búsqueda híbrida listo antes de la primera consulta
+        warm_retrieval(faiss_vs)
+        snapshots = IndexSnapshotManager(
+            "faiss_index",
+            loader=_snapshot_loader(faiss_vs),
+            warm=warm_retrieval,
+            initial=IndexSnapshot(version, index_dir, faiss_vs)
+        )
+        snapshots.add_listener(_on_index_swap)
+        snapshots.start_watcher()
+    set_index_metrics(faiss_vs, str(snapshots.current().path))
+    return {"llm": llm, "vectorstore": faiss_vs, "snapshots": snapshots,
+            "retriever": LocalRetriever(snapshots), "notices": notices}
 
-            if embeddings is None:
-                import hashlib
-                # Intentar deducir la dimensión del índice FAISS para generar vectores compatibles
-                target_dim = 768
-                try:
-                    import faiss
-                    idx_path = os.path.join('faiss_index', 'index.faiss')
-                    if os.path.exists(idx_path):
-                        idx = faiss.read_index(idx_path)
-                        target_dim = getattr(idx, 'd', target_dim)
-                except Exception:
-                    # Si faiss no está disponible o falla, seguimos con el valor por defecto
-                    pass
 
-                class FakeEmbeddings:
-                    def __init__(self, dim: int = target_dim):
-                        self.dim = dim
+def _snapshot_loader(faiss_vs):
+    """Carga nuevas instantáneas con los mismos embeddings que la inicial."""
+    if isinstance(faiss_vs.embedding_function, HashingEmbeddings):
+        # Modo offline: el índice offline se reconstruye desde la nueva instantánea
+        return lambda path: ensure_offline_index(str(path), offline_index_dir())
+    return lambda path: load_faiss_local(str(path), faiss_vs.embedding_function)
 
-                    def _text_to_vector(self, text: str) -> List[float]:
-                        out_bytes = b''
-                        counter = 0
-                        while len(out_bytes) < self.dim:
-                            h = hashlib.sha256((text + '|' + str(counter)).encode('utf-8')).digest()
-                            out_bytes += h
-                            counter += 1
-                        vec = [b / 255.0 for b in out_bytes[: self.dim]]
-                        return vec
 
-                    def embed_documents(self, texts: Iterable[str]) -> List[List[float]]:
-                        return [self._text_to_vector(t) for t in texts]
+def _on_index_swap(previous, snapshot):
+    """Tras un cambio de instantánea: métricas del índice nuevo y cachés por versión."""
+    set_index_metrics(snapshot.vectorstore, str(snapshot.path))
+    # Las claves del coalescer llevan la versión del índice: las nuevas consultas
+    # ya no comparten respuesta con las que siguen en curso sobre la anterior
+    print(f"[INFO] Consultas nuevas sobre {snapshot.version}; {previous.leases} en curso terminan sobre {previous.version}")
 
-                    def embed_query(self, text: str) -> List[float]:
-                        return self._text_to_vector(text)
 
-                embeddings = FakeEmbeddings()
-                st.error("⚠️ ADVERTENCIA: Usando embeddings simuladas (hash-based). La búsqueda semántica será limitada. Verifica la API key de Google.")
+@st.cache_resource
+def get_resource_warmup() -> ResourceWarmup:
+    """Pre-calentador único del proceso; arranca la carga en segundo plano."""
+    warmup = ResourceWarmup(_warm_up_resources)
+    warmup.start()
+    return warmup
 
-            
-            # === DESCARGA MOVIDA FUERA DE CACHE ===
-            # Ver funcion download_faiss_if_needed() antes de load_resources()
-            
 
-            faiss_vs = FAISS.load_local(folder_path="faiss_index", embeddings=embeddings, allow_dangerous_deserialization=True)
-            # Debug: verificar que se cargó correctamente
-            doc_count = faiss_vs.index.ntotal if hasattr(faiss_vs, 'index') else 'unknown'
-            print(f"[DEBUG load_resources] FAISS cargado exitosamente con {doc_count} documentos")
-            # Mostrar mensaje con estilo tenue y sin fondo
-            st.markdown(
-                f'<p style="color: rgba(128, 128, 128, 0.5); font-size: 0.85em; margin: 5px 0;">✅ Base vectorial cargada: {doc_count} BLOQUES CHUNKS disponibles</p>',
-                unsafe_allow_html=True
-            )
-        except Exception as e:
-            print(f"[ERROR load_resources] Error al cargar FAISS: {e}")
-            st.error(f"❌ No fue posible cargar el índice FAISS: {e}")
-            st.stop()
+def _collect_service_metrics():
+    """Colector de métricas: filas pendientes del escritor de Google Sheets y memoria del proceso."""
+    for kind, value in memory_usage().items():
+        PROCESS_MEMORY_BYTES.set(value, kind=kind)
+    sheets = get_services()._sheets_logger
+    writer = getattr(sheets, "writer", None)
+    if writer is not None:
+        get_registry().gauge(
+            "gerard_sheets_pending_rows", "Filas pendientes de envío a Google Sheets"
+        ).set(writer.pending_count())
+
+
+@st.cache_resource
+def get_metrics_server():
+    """
+    Endpoint Prometheus del proceso (http://127.0.0.1:9464/metrics).
+    GERARD_METRICS_PORT cambia el puerto; 0 lo desactiva.
+    """
+    instrument_tracer(get_tracer())
+    get_registry().register_collector(_collect_service_metrics)
+    port = metrics_port_from_env()
+    if port <= 0:
+        return None
+    return start_metrics_server(port)
+
+
+# --- Carga de Modelos y Base de Datos (con caché de Streamlit) ---
+@st.cache_resource
+def load_resources():
+    warmup = get_resource_warmup()
+    # Si una carga anterior falló, reintentar; si ya está en curso, sólo esperar
+    warmup.start()
+    if not warmup.is_ready():
+        with st.spinner('Inicializando LLM y embeddings...'):
+            warmup.wait()
+
+    if warmup.error is not None:
+        if isinstance(warmup.error, MissingApiKeyError):
+            st.error(str(warmup.error))
+        else:
+            print(f"[ERROR load_resources] Error al cargar FAISS: {warmup.error}")
+            st.error(f"❌ No fue posible cargar el índice FAISS: {warmup.error}")
+        st.stop()
+
+    resources = warmup.result
+    for level, message in resources["notices"]:
+        getattr(st, level)(message)
+
+    llm = resources["llm"]
+    retriever = resources["retriever"]
+    try:
+        doc_count = retriever.document_count()
+    except Exception:
+        doc_count = 'unknown'
+    # Mostrar mensaje con estilo tenue y sin fondo
+    st.markdown(
+        f'<p style="color: rgba(128, 128, 128, 0.5); font-size: 0.85em; margin: 5px 0;">✅ Base vectorial cargada: {doc_count} BLOQUES CHUNKS disponibles</p>',
+        unsafe_allow_html=True
+    )
+    return llm, retriever
+
+def get_index_snapshots() -> IndexSnapshotManager:
+    """Gestor de instantáneas del índice (None si lo sirve retrieval_service.py)."""
+    return get_resource_warmup().result["snapshots"]
+
+
+def get_retriever():
+    """Recuperador en uso: `LocalRetriever` o `RetrievalClient` (tras load_resources())."""
+    return get_resource_warmup().result["retriever"]
 
-    return llm, faiss_vs
+
+def get_index_version() -> str:
+    """Identifica la versión del índice FAISS en uso (o la de disco si aún no se cargó)."""
+    warmup = get_resource_warmup()
+    if warmup.is_ready() and warmup.result:
+        return get_retriever().version
+    if shards_manifest_url():
+        return shards_index_version(shards_dir())
+    return resolve_snapshot("faiss_index")[0]
 
 # NOTA: No ejecutar load_resources() al importar el módulo para evitar inicializar
-# las librerías de Google (protobuf/GRPC) en el arranque de Streamlit. La carga
-# se hará bajo demanda cuando el usuario envíe una consulta.
+# las librerías de Google (protobuf/GRPC) en el hilo del script. La carga se lanza
+# en segundo plano con get_resource_warmup() al arrancar la app, y
+# load_resources() sólo espera a que termine cuando el usuario envía una consulta.
 
 # --- Inicializar sistema de logging completo ---
 def init_logger():
     """
-    Inicializa el InteractionLogger para el registro de interacciones.
+    Obtiene el InteractionLogger compartido del proceso (ver services.py).
     """
     try:
-        logger = InteractionLogger(
-            platform="web",
-            log_dir="logs",
-            anonymize=False,
-            max_file_size_mb=10,
-            enable_json=True
-        )
-        return logger
+        return get_services().get_interaction_logger()
     except Exception as e:
         print(f"[!] Error inicializando InteractionLogger: {e}")
         # Fallback: devolver un logger dummy que no haga nada
@@ -290,13 +429,17 @@ def init_logger():
                 pass
             def mark_phase(self, *args, **kwargs):
                 pass
+            def record_spans(self, *args, **kwargs):
+                pass
+            def attach_geo_info(self, *args, **kwargs):
+                pass
         return DummyLogger()
 
 # --- Inicializar Google Sheets Logger (si está disponible) ---
 def init_sheets_logger():
-    """Inicializa el logger de Google Sheets si está configurado."""
+    """Obtiene el logger de Google Sheets compartido si está configurado y conectado."""
     if GOOGLE_SHEETS_AVAILABLE:
-        return create_sheets_logger()
+        return get_services().get_sheets_logger()
     return None
 
 prompt = ChatPromptTemplate.from_template(r"""
@@ -352,78 +495,7 @@ def get_cleaning_pattern() -> Pattern:
 
 cleaning_pattern = get_cleaning_pattern()
 
-def hybrid_retrieval(vectorstore, query: str, k_vector: int = 100, k_keyword: int = 20):
-    """
-    Búsqueda híbrida: vectorial + keyword fallback
-    
-    1. Hace búsqueda vectorial normal (k_vector docs)
-    2. Si los términos clave no aparecen en los resultados, 
-       busca directamente en el docstore por keywords
-    3. Combina resultados únicos
-    
-    Args:
-        vectorstore: FAISS vectorstore
-        query: consulta del usuario
-        k_vector: número de docs a recuperar con búsqueda vectorial
-        k_keyword: número de docs adicionales a buscar con keywords
-    
-    Returns:
-        Lista de documentos únicos combinados
-    """
-    # 1. Búsqueda vectorial normal
-    vector_docs = vectorstore.similarity_search(query, k=k_vector)
-    
-    # 2. Detectar términos clave en la query (palabras de 3+ letras)
-    keywords = [w.lower() for w in re.findall(r'\b\w{3,}\b', query)]
-    
-    # 3. Verificar si los keywords aparecen en los resultados vectoriales
-    vector_content = " ".join(doc.page_content.lower() for doc in vector_docs)
-    missing_keywords = [kw for kw in keywords if kw not in vector_content]
-    
-    # 4. Si hay keywords faltantes, hacer búsqueda directa en el docstore
-    keyword_docs = []
-    if missing_keywords:
-        print(f"[DEBUG hybrid_retrieval] Keywords faltantes en top-{k_vector}: {missing_keywords}")
-        print(f"[DEBUG hybrid_retrieval] Iniciando búsqueda keyword en docstore...")
-        
-        docstore = vectorstore.docstore._dict
-        matches = []
-        
-        for doc_id, doc in docstore.items():
-            content_lower = doc.page_content.lower()
-            # Contar cuántos keywords faltantes aparecen en este doc
-            match_count = sum(1 for kw in missing_keywords if kw in content_lower)
-            
-            if match_count > 0:
-                matches.append((match_count, doc))
-        
-        # Ordenar por número de matches (descendente) y tomar top-k_keyword
-        matches.sort(key=lambda x: x[0], reverse=True)
-        keyword_docs = [doc for _, doc in matches[:k_keyword]]
-        
-        print(f"[DEBUG hybrid_retrieval] Encontrados {len(keyword_docs)} docs adicionales con keywords")
-    
-    # 5. Combinar resultados únicos (evitar duplicados por doc_id)
-    seen_ids = set()
-    combined_docs = []
-    
-    # Priorizar docs de keyword search (tienen los términos exactos)
-    for doc in keyword_docs:
-        doc_id = id(doc)
-        if doc_id not in seen_ids:
-            combined_docs.append(doc)
-            seen_ids.add(doc_id)
-    
-    # Agregar docs vectoriales
-    for doc in vector_docs:
-        doc_id = id(doc)
-        if doc_id not in seen_ids:
-            combined_docs.append(doc)
-            seen_ids.add(doc_id)
-    
-    print(f"[DEBUG hybrid_retrieval] Total docs combinados: {len(combined_docs)}")
-    return combined_docs
-
+@traced("retrieval.format_docs")
 def format_docs_with_metadata(docs: Iterable[Any]) -> str:
     """Formatea una secuencia de documentos recuperados y limpia su contenido.
     
@@ -464,6 +536,9 @@ def format_docs_with_metadata(docs: Iterable[Any]) -> str:
     
     result = "\n\n---\n\n".join(formatted_strings)
     print(f"[DEBUG format_docs_with_metadata] Devolviendo {len(result)} caracteres de contexto")
+    format_span = current_span()
+    if format_span is not None:
+        format_span.set_attributes(doc_count=len(docs_list), context_chars=len(result))
     return result
 
 # Nota: la carga de llm y vectorstore se hace bajo demanda más abajo.
@@ -474,54 +549,48 @@ retrieval_chain = None
 # --- Funciones de Geolocalización y Registro ---
 
 # --- Geolocalización por navegador ---
-def get_user_location() -> dict:
+def _client_ip() -> str:
+    """IP del navegador según los encabezados del proxy ('' si no se conoce)."""
+    try:
+        headers = st.context.headers
+        forwarded = headers.get("X-Forwarded-For", "") or headers.get("X-Real-Ip", "")
+    except Exception:
+        return ""
+    return forwarded.split(",")[0].strip()
+
+
+def _query_param(params, name: str) -> str:
+    """Valor de un parámetro de la URL (lista en la API antigua, texto en la nueva)."""
+    value = params.get(name)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value or ""
+
+
+def start_location_resolution():
     """
-    Obtiene la ubicación del usuario usando geolocalización del navegador si está disponible.
-    Si no, usa ipinfo.io como fallback.
+    Lanza en segundo plano la resolución de la ubicación de la sesión.
+
+    Se llama al cargar la sesión: con ?geo=lat,lon (coordenadas del navegador)
+    se hace reverse geocoding; si no, se pide permiso al navegador y mientras
+    tanto se resuelve por IP. El resultado queda en un futuro de la sesión.
     """
-    # Si ya está en session_state, usarla
-    if 'geo_location' in st.session_state:
-        return st.session_state['geo_location']
+    if 'geo_location' in st.session_state or 'geo_future' in st.session_state:
+        return
 
-    # Primero, revisar si el navegador ya redirigió con ?geo=lat,lon
+    resolver = get_location_resolver()
+    ip = _client_ip()
     params = st.query_params
-    if 'geo' in params:
+    geo_val = _query_param(params, 'geo')
+    if geo_val:
         try:
-            geo_val = params.get('geo')[0]
             lat_str, lon_str = geo_val.split(',')
-            lat = float(lat_str)
-            lon = float(lon_str)
-
-            # Reverse geocoding con Nominatim (OpenStreetMap)
-            try:
-                nominatim = f"https://nominatim.openstreetmap.org/reverse?format=jsonv2&lat={lat}&lon={lon}&accept-language=es"
-                r = requests.get(nominatim, timeout=5, headers={"User-Agent": "GERARD-App/1.0"})
-                r.raise_for_status()
-                j = r.json()
-                address = j.get('address', {})
-                city = address.get('city') or address.get('town') or address.get('village') or address.get('hamlet') or address.get('municipality') or ''
-                # Algunos países devuelven state y county en lugar de city
-                if not city:
-                    city = address.get('county') or address.get('state') or ''
-                country = address.get('country') or ''
-
-                geo_dict = {
-                    'ip': params.get('ip', ['No disponible'])[0],
-                    'city': city or 'Desconocida',
-                    'country': country or 'Desconocido',
-                    'region': address.get('state', ''),
-                    'latitude': lat,
-                    'longitude': lon,
-                    'org': '',
-                    'timezone': ''
-                }
-                st.session_state['geo_location'] = geo_dict
-                return geo_dict
-            except Exception as e:
-                print(f"[!] Error reverse-geocoding Nominatim: {e}")
-                # Si falla reverse, guardar lat/lon y usar ipinfo fallback below
-        except Exception:
-            pass
+            st.session_state['geo_future'] = resolver.submit_browser(
+                float(lat_str), float(lon_str), ip or _query_param(params, 'ip')
+            )
+            return
+        except ValueError:
+            print(f"[!] Parámetro geo inválido: {geo_val}")
 
     # Si no hay geo en URL, inyectar JS que pide permiso y redirige con ?geo=lat,lon
     js = f"""
@@ -549,37 +618,31 @@ def get_user_location() -> dict:
     """
     st.components.v1.html(js, height=0)
 
-    # Mientras esperamos la redirección, usar fallback de ipinfo
-    try:
-        response = requests.get('https://ipinfo.io/json', timeout=10)
-        data = response.json()
-        loc = data.get('loc', '0,0').split(',')
-        latitude = float(loc[0]) if len(loc) > 0 else 0
-        longitude = float(loc[1]) if len(loc) > 1 else 0
-        geo_dict = {
-            'ip': data.get('ip', 'No disponible'),
-            'city': data.get('city', 'Desconocida'),
-            'country': data.get('country', 'Desconocido'),
-            'region': data.get('region', ''),
-            'latitude': latitude,
-            'longitude': longitude,
-            'org': data.get('org', ''),
-            'timezone': data.get('timezone', '')
-        }
-        st.session_state['geo_location'] = geo_dict
-        return geo_dict
-    except Exception as e:
-        print(f"[!] Error ipinfo fallback: {e}")
-        return {
-            'ip': 'No disponible',
-            'city': 'Desconocida',
-            'country': 'Desconocido',
-            'region': '',
-            'latitude': 0,
-            'longitude': 0,
-            'org': '',
-            'timezone': ''
-        }
+    # Mientras esperamos la redirección, resolver por IP (base local, luego ipinfo)
+    st.session_state['geo_future'] = resolver.submit_ip(ip)
+
+
+def get_user_location() -> dict:
+    """
+    Obtiene la ubicación del usuario sin bloquear.
+
+    Returns:
+        La ubicación resuelta (navegador, base local de IPs o ipinfo.io), o
+        una ubicación marcada como pendiente (`pending=True`) si la
+        resolución en segundo plano todavía no terminó.
+    """
+    # Si ya está en session_state, usarla
+    if 'geo_location' in st.session_state:
+        return st.session_state['geo_location']
+
+    if 'geo_future' not in st.session_state:
+        start_location_resolution()
+
+    location = LocationResolver.result_or_pending(st.session_state.get('geo_future'), _client_ip())
+    if not location.get('pending'):
+        st.session_state['geo_location'] = location
+        st.session_state.pop('geo_future', None)
+    return location
 
 def fix_utf8_encoding(text: str) -> str:
     """Corrige problemas de codificación UTF-8 comunes en Streamlit Cloud."""
@@ -1375,7 +1438,15 @@ create_utf8_wrapper()
 
 # (UI refinements removed; restored original behavior)
 
-location = get_user_location()
+# --- Pre-calentamiento del índice y modelos en segundo plano ---
+# Se lanza en la primera ejecución del script tras un deploy o reinicio, antes de
+# que nadie envíe una pregunta. Sin runtime de Streamlit (tests, import directo)
+# no se lanza para no descargar el índice.
+resource_warmup = get_resource_warmup() if st_runtime.exists() else None
+metrics_server = get_metrics_server() if st_runtime.exists() else None
+
+# La ubicación se resuelve en segundo plano desde la carga de la sesión
+start_location_resolution()
 
 if 'user_name' not in st.session_state:
     st.session_state.user_name = ''
@@ -1399,6 +1470,15 @@ with st.sidebar:
     
     # Logo/Titulo del sidebar  
     st.markdown("## GERARD")
+    if resource_warmup is not None and not resource_warmup.is_ready():
+        st.caption(f"⏳ PREPARANDO INDICE: {resource_warmup.describe()}")
+    st.toggle(
+        "⚡ Respuesta rápida (sin IA)",
+        key="quick_mode",
+        help="Muestra al instante los fragmentos de las fuentes que coinciden con la pregunta, "
+             "con sus timestamps, sin esperar al modelo. Se usa automáticamente si Gemini no "
+             "está disponible o está saturado."
+    )
     st.markdown("---")
     
     # SECCION 1: EXPORTAR CONVERSACION
@@ -1827,8 +1907,9 @@ if prompt_input:
                 """
                 st.markdown(loader_html, unsafe_allow_html=True)
 
+            trace_root = None
             try:
-                # Obtener ubicación del usuario
+                # Ubicación del usuario (no bloquea: puede seguir pendiente)
                 location = get_user_location()
                 
                 # Inicializar el logger
@@ -1848,50 +1929,74 @@ if prompt_input:
                 interaction_id = interaction_logger.start_interaction(
                     user=st.session_state.user_name,
                     question=prompt_input,
-                    request_info={"user_agent": user_agent}
+                    request_info={"user_agent": user_agent},
+                    geo_info=to_geo_info(location)
                 )
                 
+                # Traza de la interacción: los spans de recuperación, LLM,
+                # parseo y render alimentan las fases del InteractionLogger
+                tracer = get_tracer()
+                trace_root = tracer.start_span(
+                    "interaction",
+                    platform="web",
+                    session_id=interaction_id,
+                    question_chars=len(prompt_input)
+                )
+                
+                # Encolar la pregunta hasta que el pre-calentamiento termine
+                warmup = get_resource_warmup()
+                if not warmup.is_ready():
+                    warmup_status = st.empty()
+                    while not warmup.wait(timeout=1.0):
+                        warmup_status.caption(f"⏳ Tu pregunta está en cola: {warmup.describe()}")
+                    warmup_status.empty()
+
                 # Construir retrieval_chain a demanda si no existe
+                quick_fallback = None
                 if retrieval_chain is None:
                     # Intentar cargar recursos reales; esto validará la API key y el índice
                     # La descarga de FAISS ahora se hace dentro de load_resources()
                     try:
-                        llm_loaded, vs = load_resources()
-                        print(f"[DEBUG] load_resources completado - LLM: {type(llm_loaded)}, VS: {type(vs)}")
+                        llm_loaded, retriever = load_resources()
+                        print(f"[DEBUG] load_resources completado - LLM: {type(llm_loaded)}, retriever: {type(retriever)}")
                     except Exception as e:
                         print(f"[ERROR] load_resources falló: {e}")
                         response_placeholder.error(f"No fue posible inicializar los recursos: {e}")
                         raise
                     
-                    # BÚSQUEDA HÍBRIDA: vectorial + keyword fallback
-                    # Usar lambda para pasar el vectorstore a hybrid_retrieval
+                    # BÚSQUEDA HÍBRIDA: vectorial + keyword fallback, local o en el
+                    # servicio compartido. Cada búsqueda termina sobre la instantánea
+                    # del índice con la que empezó (ver index_snapshots.lease())
                     def hybrid_retriever_func(query: str):
-                        return hybrid_retrieval(vs, query, k_vector=100, k_keyword=30)
+                        return retriever.hybrid_search(query, k_vector=DEFAULT_K_VECTOR, k_keyword=DEFAULT_K_KEYWORD)
                     
-                    print(f"[DEBUG] Retriever híbrido creado (k_vector=100, k_keyword=30)")
+                    print(f"[DEBUG] Retriever híbrido creado (k_vector={DEFAULT_K_VECTOR}, k_keyword={DEFAULT_K_KEYWORD})")
 
-                    # Si el LLM no se pudo inicializar, usamos un FakeChain que sólo regresa documentos
+                    # Modo rápido extractivo (sin LLM): elegido por el usuario, o
+                    # automático si Gemini no está disponible o está saturado
+                    quick_fallback = QuickAnswerChain(
+                        hybrid_retriever_func, notice="El modelo está saturado en este momento."
+                    )
                     if llm_loaded is None:
-                        class FakeChain:
-                            def __init__(self, retriever_func):
-                                self.retriever_func = retriever_func
-
-                            def invoke(self, payload):
-                                query = payload if isinstance(payload, str) else payload.get('input', '')
-                                # obtener documentos relevantes usando búsqueda híbrida
-                                docs = self.retriever_func(query)
-
-                                items = []
-                                for d in list(docs)[:3]:
-                                    src = os.path.basename(d.metadata.get('source', 'desconocido'))
-                                    snippet = re.sub(r'\s+', ' ', d.page_content)[:300]
-                                    items.append({"type": "normal", "content": f"Fuente: {src} - {snippet}"})
-                                if not items:
-                                    items = [{"type": "normal", "content": "No se encontraron documentos relevantes en el índice."}]
-                                return json.dumps(items, ensure_ascii=False)
-
-                        retrieval_chain = FakeChain(hybrid_retriever_func)
+                        retrieval_chain = QuickAnswerChain(
+                            hybrid_retriever_func, notice="El modelo de IA no está disponible."
+                        )
+                    elif st.session_state.get("quick_mode"):
+                        retrieval_chain = QuickAnswerChain(hybrid_retriever_func)
+                    elif llm_overloaded():
+                        print("[!] Demasiadas llamadas al LLM en curso; respondiendo en modo rápido")
+                        retrieval_chain = quick_fallback
                     else:
+                        def llm_with_span(prompt_value):
+                            with get_tracer().span(
+                                "llm.generate",
+                                model=getattr(llm_loaded, "model", type(llm_loaded).__name__),
+                                prompt_chars=len(prompt_value.to_string())
+                            ) as llm_span, LLM_IN_FLIGHT.track_inprogress():
+                                message = llm_loaded.invoke(prompt_value)
+                                llm_span.set_attribute("response_chars", len(getattr(message, "content", "") or ""))
+                                return message
+                        
                         # Reconstruir retrieval_chain con búsqueda híbrida
                         retrieval_chain = (
                             {
@@ -1901,7 +2006,7 @@ if prompt_input:
                                 "session_hash": lambda x: x.get("session_hash", "")
                             }
                             | prompt
-                            | llm_loaded
+                            | RunnableLambda(llm_with_span)
                             | StrOutputParser()
                         )
 
@@ -1911,7 +2016,32 @@ if prompt_input:
                 payload = {"input": prompt_input, "date": ts, "session_hash": session_hash}
                 
                 print(f"[DEBUG] Antes de invoke - retrieval_chain type: {type(retrieval_chain)}")
-                answer_raw = retrieval_chain.invoke(payload)
+                quick_mode = isinstance(retrieval_chain, QuickAnswerChain)
+
+                def invoke_chain():
+                    try:
+                        return retrieval_chain.invoke(payload)
+                    except Exception as e:
+                        # Cuota agotada o modelo saturado: responder con los fragmentos
+                        if quick_mode or quick_fallback is None or not is_llm_overload_error(e):
+                            raise
+                        print(f"[!] LLM saturado o sin cuota ({e}); respondiendo en modo rápido")
+                        return quick_fallback.invoke(payload)
+
+                # Coalescer preguntas idénticas en vuelo: una sola llamada real a
+                # embeddings/FAISS/Gemini y todas las sesiones reciben el resultado
+                coalescer = get_query_coalescer()
+                index_version = get_index_version()
+                coalesce_key = coalescer.make_key(
+                    prompt_input, f"{index_version}|{'rapida' if quick_mode else 'llm'}"
+                )
+                with tracer.span("chain.invoke", mode="rapida" if quick_mode else "llm",
+                                 index_version=index_version) as chain_span:
+                    answer_raw, shared_answer = coalescer.run(coalesce_key, invoke_chain)
+                    chain_span.set_attribute("coalesced", shared_answer)
+                record_cache("coalescer", hit=shared_answer)
+                if shared_answer:
+                    print(f"[INFO] Respuesta compartida con una consulta idéntica en curso. Stats: {coalescer.get_stats()}")
                 print(f"[DEBUG] Después de invoke - answer_raw type: {type(answer_raw)}, valor: {str(answer_raw)[:200]}")
                 
                 # Asegurar que answer_json sea siempre un string JSON
@@ -1928,21 +2058,21 @@ if prompt_input:
                     st.error(f"❌ DEBUG: answer_json es tipo {type(answer_json)}, convirtiendo a string...")
                     answer_json = json.dumps(answer_json, ensure_ascii=False) if isinstance(answer_json, (dict, list)) else str(answer_json)
                 
+                # La ubicación suele haber llegado mientras se generaba la respuesta
+                if location.get('pending'):
+                    location = get_user_location()
+                    if not location.get('pending'):
+                        interaction_logger.attach_geo_info(interaction_id, to_geo_info(location))
+                
                 # Registro antiguo (mantener por compatibilidad)
                 location_str = st.session_state.get('geo_location_str', f"{location.get('city', 'Desconocida')}, {location.get('country', 'Desconocido')}")
                 save_to_log(st.session_state.user_name, prompt_input, answer_json, location_str)
                 
-                # Finalizar el registro de la interacción con el logger completo
-                interaction_logger.end_interaction(
-                    session_id=interaction_id,
-                    status="success"
-                )
-                
                 # Registrar en Google Sheets si está disponible
                 if sheets_logger:
                     try:
-                        # Usar información del dispositivo y ubicación ya obtenidos
-                        device_detector = DeviceDetector()
+                        # Mismo DeviceInfo que recibió InteractionLogger (LRU por User-Agent)
+                        device_detector = get_services().get_device_detector()
                         device_raw = device_detector.detect_from_web(user_agent)
                         
                         # Mapear las claves correctamente
@@ -1999,70 +2129,84 @@ if prompt_input:
                 else:
                     print(f"[INFO] Google Sheets Logger no está disponible o no está habilitado")
                 
-                # Asegurar que answer_json esté en UTF-8 correcto
-                import unicodedata
-                if isinstance(answer_json, str):
-                    answer_json = unicodedata.normalize('NFC', answer_json)
-                    # Corregir caracteres comunes mal codificados
-                    answer_json = answer_json.replace('â€™', "'")
-                    answer_json = answer_json.replace('â€œ', '"')
-                    answer_json = answer_json.replace('â€', '"')
-                    answer_json = answer_json.replace('â€"', '–')
-                    answer_json = answer_json.replace('â€"', '—')
-                    answer_json = answer_json.replace('Ã¡', 'á')
-                    answer_json = answer_json.replace('Ã©', 'é')
-                    answer_json = answer_json.replace('Ã­', 'í')
-                    answer_json = answer_json.replace('Ã³', 'ó')
-                    answer_json = answer_json.replace('Ãº', 'ú')
-                    answer_json = answer_json.replace('Ã±', 'ñ')
-                    answer_json = answer_json.replace('Ã¼', 'ü')
+                with tracer.span("response.parse", answer_chars=len(answer_json)) as parse_span:
+                    # Asegurar que answer_json esté en UTF-8 correcto
+                    import unicodedata
+                    if isinstance(answer_json, str):
+                        answer_json = unicodedata.normalize('NFC', answer_json)
+                        # Corregir caracteres comunes mal codificados
+                        answer_json = answer_json.replace('â€™', "'")
+                        answer_json = answer_json.replace('â€œ', '"')
+                        answer_json = answer_json.replace('â€', '"')
+                        answer_json = answer_json.replace('â€"', '–')
+                        answer_json = answer_json.replace('â€"', '—')
+                        answer_json = answer_json.replace('Ã¡', 'á')
+                        answer_json = answer_json.replace('Ã©', 'é')
+                        answer_json = answer_json.replace('Ã­', 'í')
+                        answer_json = answer_json.replace('Ã³', 'ó')
+                        answer_json = answer_json.replace('Ãº', 'ú')
+                        answer_json = answer_json.replace('Ã±', 'ñ')
+                        answer_json = answer_json.replace('Ã¼', 'ü')
                     
-                    # Aplicar limpieza de textos no deseados (incluyendo Spanish_auto_generated)
-                    answer_json = cleaning_pattern.sub('', answer_json)
+                        # Aplicar limpieza de textos no deseados (incluyendo Spanish_auto_generated)
+                        answer_json = cleaning_pattern.sub('', answer_json)
                 
-                match = re.search(r'\[.*\]', answer_json, re.DOTALL)
-                if not match:
-                    st.error("La respuesta del modelo no fue un JSON válido.")
-                    response_html = f'<p style="color:red;">{answer_json}</p>'
-                else:
-                    data = json.loads(match.group(0))
-                    response_html = f'<strong style="color:#28a745;">{st.session_state.user_name}:</strong> '
-                    for item in data:
-                        content_type = item.get("type", "normal")
-                        content = item.get("content", "")
+
+                    match = re.search(r'\[.*\]', answer_json, re.DOTALL)
+                    data = json.loads(match.group(0)) if match else None
+                    parse_span.set_attribute("items", len(data) if data is not None else 0)
+                
+                with tracer.span("response.render") as render_span:
+                    if data is None:
+                        st.error("La respuesta del modelo no fue un JSON válido.")
+                        response_html = f'<p style="color:red;">{answer_json}</p>'
+                    else:
+                        response_html = f'<strong style="color:#28a745;">{st.session_state.user_name}:</strong> '
+                        for item in data:
+                            content_type = item.get("type", "normal")
+                            content = item.get("content", "")
                         
-                        # Normalizar el contenido UTF-8
-                        if content:
-                            content = unicodedata.normalize('NFC', content)
-                            # Corregir caracteres mal codificados
-                            content = content.replace('â€™', "'")
-                            content = content.replace('â€œ', '"')
-                            content = content.replace('â€', '"')
-                            content = content.replace('Ã¡', 'á')
-                            content = content.replace('Ã©', 'é')
-                            content = content.replace('Ã­', 'í')
-                            content = content.replace('Ã³', 'ó')
-                            content = content.replace('Ãº', 'ú')
-                            content = content.replace('Ã±', 'ñ')
+                            # Normalizar el contenido UTF-8
+                            if content:
+                                content = unicodedata.normalize('NFC', content)
+                                # Corregir caracteres mal codificados
+                                content = content.replace('â€™', "'")
+                                content = content.replace('â€œ', '"')
+                                content = content.replace('â€', '"')
+                                content = content.replace('Ã¡', 'á')
+                                content = content.replace('Ã©', 'é')
+                                content = content.replace('Ã­', 'í')
+                                content = content.replace('Ã³', 'ó')
+                                content = content.replace('Ãº', 'ú')
+                                content = content.replace('Ã±', 'ñ')
                         
-                        if content_type == "emphasis":
-                            # Resalta en magenta el texto entre paréntesis, el resto amarillo
-                            def magenta_parentheses(text):
-                                return re.sub(r'(\(.*?\))', r'<span style="color:#FF00FF; font-weight: bold;">\1</span>', text)
-                            content_colored = magenta_parentheses(content)
-                            response_html += f'<span style="color:yellow; background-color: #333; border-radius: 4px; padding: 2px 4px;">{content_colored}</span>'
-                        else:
-                            # Cambiar color de fuentes (texto entre paréntesis) a MAGENTA
-                            content_html = re.sub(r'(\(.*?\))', r'<span style="color:#FF00FF; font-weight: bold;">\1</span>', content)
-                            response_html += content_html
+                            if content_type == "emphasis":
+                                # Resalta en magenta el texto entre paréntesis, el resto amarillo
+                                def magenta_parentheses(text):
+                                    return re.sub(r'(\(.*?\))', r'<span style="color:#FF00FF; font-weight: bold;">\1</span>', text)
+                                content_colored = magenta_parentheses(content)
+                                response_html += f'<span style="color:yellow; background-color: #333; border-radius: 4px; padding: 2px 4px;">{content_colored}</span>'
+                            else:
+                                # Cambiar color de fuentes (texto entre paréntesis) a MAGENTA
+                                content_html = re.sub(r'(\(.*?\))', r'<span style="color:#FF00FF; font-weight: bold;">\1</span>', content)
+                                response_html += content_html
+                
+                    # Asegurar que el HTML final esté correctamente codificado
+                    import html
+                    response_html_safe = html.unescape(response_html)
+                    response_html_safe = unicodedata.normalize('NFC', response_html_safe)
                 
-                # Asegurar que el HTML final esté correctamente codificado
-                import html
-                response_html_safe = html.unescape(response_html)
-                response_html_safe = unicodedata.normalize('NFC', response_html_safe)
+                    response_placeholder.markdown(response_html_safe, unsafe_allow_html=True)
+                    st.session_state.messages.append({"role": "assistant", "content": response_html_safe})
+                    render_span.set_attribute("html_chars", len(response_html_safe))
                 
-                response_placeholder.markdown(response_html_safe, unsafe_allow_html=True)
-                st.session_state.messages.append({"role": "assistant", "content": response_html_safe})
+                # Finalizar el registro de la interacción con el logger completo
+                interaction_logger.record_spans(interaction_id, tracer.finished_spans(trace_root.trace_id))
+                interaction_logger.end_interaction(
+                    session_id=interaction_id,
+                    status="success"
+                )
+                trace_root.end()
                 
                 # Marcar que se agregó un mensaje nuevo para actualizar el sidebar
                 st.session_state['_new_message_added'] = True
@@ -2120,6 +2264,9 @@ if prompt_input:
             except Exception as e:
                 # Registrar el error en el logger
                 try:
+                    if trace_root is not None:
+                        trace_root.record_exception(e)
+                        interaction_logger.record_spans(interaction_id, tracer.finished_spans(trace_root.trace_id))
                     interaction_logger.end_interaction(
                         session_id=interaction_id,
                         status="error",
@@ -2127,6 +2274,9 @@ if prompt_input:
                     )
                 except:
                     pass  # Si el logger falla, no queremos romper la app
+                finally:
+                    if trace_root is not None:
+                        trace_root.end()
                 
                 response_placeholder.error(f"Ocurrió un error al procesar tu pregunta: {e}")
 
@@ -5,7 +5,9 @@ Este módulo detecta información del dispositivo y sistema del usuario,
 tanto para entornos web como terminal.
 
 Características:
-- Análisis de User-Agent para entornos web
+- Análisis de User-Agent para entornos web con tablas de reglas por
+  dimensión (subcadenas + patrones de versión precompilados, por prioridad)
+- Cache LRU acotada por User-Agent con resultados inmutables (DeviceInfo)
 - Detección de sistema operativo
 - Detección de navegador y versión
 - Información de hardware cuando está disponible
@@ -15,10 +17,159 @@ Características:
 import platform
 import os
 import shutil
-from typing import Dict, Optional
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 import re
 
 
+@dataclass(frozen=True, slots=True)
+class DeviceInfo:
+    """
+    Resultado inmutable del análisis de un User-Agent.
+
+    Se comparte entre llamadas con el mismo User-Agent (InteractionLogger y
+    Google Sheets reciben el mismo objeto). Admite `info["tipo"]` e
+    `info.get("tipo")` como el diccionario que se devolvía antes.
+    """
+
+    tipo: str = "Desconocido"
+    os: str = "Desconocido"
+    os_version: str = "N/A"
+    navegador: str = "Desconocido"
+    navegador_version: str = "N/A"
+    resolucion: str = "N/A"
+    user_agent: str = "No disponible"
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Copia en diccionario (para serializar en los logs)."""
+        return asdict(self)
+
+
+# --- Tablas de reglas, en orden de prioridad: gana la primera que coincide ---
+# Cada regla es (resultado, alguna_de, todas_de, patrón_de_versión, versión
+# por defecto). `alguna_de` y `todas_de` son subcadenas (búsqueda en C, más
+# rápida que una alternancia de regex en CPython); el patrón de versión se
+# compila una sola vez y solo se evalúa para la regla ganadora.
+
+_MOBILE = ('android', 'iphone', 'ipad', 'ipod', 'blackberry', 'windows phone', 'mobile', 'webos', 'opera mini')
+
+Rule = Tuple[str, Tuple[str, ...], Tuple[str, ...], Optional[str], str]
+
+DEVICE_RULES: List[Rule] = [
+    ("Tablet", ('ipad', 'tablet'), (), None, ""),
+    ("Móvil", _MOBILE, (), None, ""),
+    ("Tablet", ('kindle', 'silk', 'playbook'), (), None, ""),
+]
+
+OS_RULES: List[Rule] = [
+    ("Windows", ('windows nt 10.0',), (), None, "10/11"),
+    ("Windows", ('windows nt 6.3',), (), None, "8.1"),
+    ("Windows", ('windows nt 6.2',), (), None, "8"),
+    ("Windows", ('windows nt 6.1',), (), None, "7"),
+    ("Windows", ('windows',), (), None, "Desconocido"),
+    # iOS antes que macOS: los UA de iPhone/iPad incluyen "like Mac OS X"
+    ("iOS", ('iphone os', 'cpu os', 'ipad', 'ipod'), (), r'\bos ([\d_]+)', "Desconocido"),
+    ("macOS", ('mac os x', 'macos'), (), r'mac os x ([\d_.]+)', "Desconocido"),
+    ("Android", ('android',), (), r'android ([\d.]+)', "Desconocido"),
+    ("Ubuntu", ('ubuntu',), ('linux',), None, "Desconocido"),
+    ("Fedora", ('fedora',), ('linux',), None, "Desconocido"),
+    ("Linux", ('linux',), (), None, "Desconocido"),
+]
+
+BROWSER_RULES: List[Rule] = [
+    # Edge y Opera antes que Chrome (sus UA también dicen Chrome/ y Safari/)
+    ("Edge", ('Edg/',), (), r'Edg/([\d.]+)', "Desconocido"),
+    ("Opera", ('OPR/', 'Opera/'), (), r'(?:OPR|Opera)/([\d.]+)', "Desconocido"),
+    ("Chrome", ('Chrome/',), ('Safari/',), r'Chrome/([\d.]+)', "Desconocido"),
+    ("Firefox", ('Firefox/',), (), r'Firefox/([\d.]+)', "Desconocido"),
+    # Safari después de Chrome
+    ("Safari", ('Safari/',), (), r'Version/([\d.]+)', "Desconocido"),
+    ("Internet Explorer", ('MSIE', 'Trident/'), (), r'(?:MSIE |rv:)([\d.]+)', "Desconocido"),
+]
+
+
+class _RuleTable:
+    """Reglas de una dimensión con sus patrones de versión precompilados."""
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = [
+            (name, any_of, all_of, re.compile(pattern) if pattern else None, default_version)
+            for name, any_of, all_of, pattern, default_version in rules
+        ]
+
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """
+        Args:
+            text: User-Agent (en minúsculas para las tablas que lo requieren)
+
+        Returns:
+            (resultado, versión) de la primera regla que coincide, o None
+        """
+        for name, any_of, all_of, version_re, default_version in self.rules:
+            # Bucles explícitos: any()/all() con generador cuestan más que la búsqueda
+            for key in any_of:
+                if key in text:
+                    break
+            else:
+                continue
+            for key in all_of:
+                if key not in text:
+                    break
+            else:
+                found = version_re.search(text) if version_re else None
+                return name, found.group(1).replace('_', '.') if found else default_version
+        return None
+
+
+# Dispositivo y SO se evalúan sobre el UA en minúsculas; navegador, tal cual
+_DEVICE_TABLE = _RuleTable(DEVICE_RULES)
+_OS_TABLE = _RuleTable(OS_RULES)
+_BROWSER_TABLE = _RuleTable(BROWSER_RULES)
+
+DEFAULT_WEB_INFO = DeviceInfo()
+
+
+@lru_cache(maxsize=2048)
+def parse_user_agent(user_agent: str) -> DeviceInfo:
+    """
+    Analiza un User-Agent con las tablas de reglas.
+
+    El resultado se guarda en una LRU acotada por el texto exacto del
+    User-Agent: las visitas repetidas no vuelven a evaluar ninguna regla.
+
+    Args:
+        user_agent: String del User-Agent
+
+    Returns:
+        DeviceInfo inmutable (compartido entre llamadas)
+    """
+    if not user_agent:
+        return DEFAULT_WEB_INFO
+
+    ua_lower = user_agent.lower()
+    device = _DEVICE_TABLE.match(ua_lower)
+    os_match = _OS_TABLE.match(ua_lower)
+    browser = _BROWSER_TABLE.match(user_agent)
+    return DeviceInfo(
+        tipo=device[0] if device else "PC",
+        os=os_match[0] if os_match else "Desconocido",
+        os_version=os_match[1] if os_match else "N/A",
+        navegador=browser[0] if browser else "Desconocido",
+        navegador_version=browser[1] if browser else "N/A",
+        user_agent=user_agent
+    )
+
+
 class DeviceDetector:
     """
     Clase para detectar información del dispositivo y sistema.
@@ -42,7 +193,7 @@ class DeviceDetector:
         except Exception:
             return {}
     
-    def detect_from_web(self, user_agent: str) -> Dict:
+    def detect_from_web(self, user_agent: str) -> DeviceInfo:
         """
         Detecta información del dispositivo desde un User-Agent web.
         
@@ -50,36 +201,9 @@ class DeviceDetector:
             user_agent: String del User-Agent
         
         Returns:
-            Diccionario con información del dispositivo
+            DeviceInfo inmutable (usar `to_dict()` para serializarlo)
         """
-        if not user_agent:
-            return self._get_default_web_info()
-        
-        # Inicializar resultado
-        result = {
-            "tipo": "Desconocido",
-            "os": "Desconocido",
-            "os_version": "N/A",
-            "navegador": "Desconocido",
-            "navegador_version": "N/A",
-            "resolucion": "N/A",
-            "user_agent": user_agent
-        }
-        
-        # Detectar tipo de dispositivo
-        result["tipo"] = self._detect_device_type(user_agent)
-        
-        # Detectar sistema operativo
-        os_info = self._detect_os_from_ua(user_agent)
-        result["os"] = os_info["name"]
-        result["os_version"] = os_info["version"]
-        
-        # Detectar navegador
-        browser_info = self._detect_browser(user_agent)
-        result["navegador"] = browser_info["name"]
-        result["navegador_version"] = browser_info["version"]
-        
-        return result
+        return parse_user_agent(user_agent or "")
     
     def detect_from_terminal(self) -> Dict:
         """
@@ -111,111 +235,6 @@ class DeviceDetector:
         
         return result
     
-    def _detect_device_type(self, user_agent: str) -> str:
-        """Detecta el tipo de dispositivo desde el User-Agent."""
-        ua_lower = user_agent.lower()
-        
-        # Móviles
-        mobile_keywords = [
-            'android', 'iphone', 'ipad', 'ipod', 'blackberry',
-            'windows phone', 'mobile', 'webos', 'opera mini'
-        ]
-        if any(keyword in ua_lower for keyword in mobile_keywords):
-            if 'ipad' in ua_lower or 'tablet' in ua_lower:
-                return "Tablet"
-            return "Móvil"
-        
-        # Tablets específicas
-        tablet_keywords = ['tablet', 'kindle', 'silk', 'playbook']
-        if any(keyword in ua_lower for keyword in tablet_keywords):
-            return "Tablet"
-        
-        return "PC"
-    
-    def _detect_os_from_ua(self, user_agent: str) -> Dict:
-        """Detecta el sistema operativo desde el User-Agent."""
-        ua_lower = user_agent.lower()
-        
-        # Windows
-        if 'windows nt 10.0' in ua_lower:
-            return {"name": "Windows", "version": "10/11"}
-        elif 'windows nt 6.3' in ua_lower:
-            return {"name": "Windows", "version": "8.1"}
-        elif 'windows nt 6.2' in ua_lower:
-            return {"name": "Windows", "version": "8"}
-        elif 'windows nt 6.1' in ua_lower:
-            return {"name": "Windows", "version": "7"}
-        elif 'windows' in ua_lower:
-            return {"name": "Windows", "version": "Desconocido"}
-        
-        # macOS / iOS
-        if 'mac os x' in ua_lower or 'macos' in ua_lower:
-            version_match = re.search(r'mac os x ([\d_]+)', ua_lower)
-            version = version_match.group(1).replace('_', '.') if version_match else "Desconocido"
-            return {"name": "macOS", "version": version}
-        elif 'iphone os' in ua_lower or 'ios' in ua_lower:
-            version_match = re.search(r'os ([\d_]+)', ua_lower)
-            version = version_match.group(1).replace('_', '.') if version_match else "Desconocido"
-            return {"name": "iOS", "version": version}
-        
-        # Android
-        if 'android' in ua_lower:
-            version_match = re.search(r'android ([\d.]+)', ua_lower)
-            version = version_match.group(1) if version_match else "Desconocido"
-            return {"name": "Android", "version": version}
-        
-        # Linux
-        if 'linux' in ua_lower:
-            if 'ubuntu' in ua_lower:
-                return {"name": "Ubuntu", "version": "Desconocido"}
-            elif 'fedora' in ua_lower:
-                return {"name": "Fedora", "version": "Desconocido"}
-            return {"name": "Linux", "version": "Desconocido"}
-        
-        return {"name": "Desconocido", "version": "N/A"}
-    
-    def _detect_browser(self, user_agent: str) -> Dict:
-        """Detecta el navegador desde el User-Agent."""
-        ua = user_agent
-        
-        # Edge (debe ir antes de Chrome)
-        if 'Edg/' in ua:
-            version_match = re.search(r'Edg/([\d.]+)', ua)
-            version = version_match.group(1) if version_match else "Desconocido"
-            return {"name": "Edge", "version": version}
-        
-        # Chrome (debe ir antes de Safari)
-        if 'Chrome/' in ua and 'Safari/' in ua:
-            version_match = re.search(r'Chrome/([\d.]+)', ua)
-            version = version_match.group(1) if version_match else "Desconocido"
-            return {"name": "Chrome", "version": version}
-        
-        # Firefox
-        if 'Firefox/' in ua:
-            version_match = re.search(r'Firefox/([\d.]+)', ua)
-            version = version_match.group(1) if version_match else "Desconocido"
-            return {"name": "Firefox", "version": version}
-        
-        # Safari (debe ir después de Chrome)
-        if 'Safari/' in ua:
-            version_match = re.search(r'Version/([\d.]+)', ua)
-            version = version_match.group(1) if version_match else "Desconocido"
-            return {"name": "Safari", "version": version}
-        
-        # Opera
-        if 'OPR/' in ua or 'Opera/' in ua:
-            version_match = re.search(r'(?:OPR|Opera)/([\d.]+)', ua)
-            version = version_match.group(1) if version_match else "Desconocido"
-            return {"name": "Opera", "version": version}
-        
-        # Internet Explorer
-        if 'MSIE' in ua or 'Trident/' in ua:
-            version_match = re.search(r'(?:MSIE |rv:)([\d.]+)', ua)
-            version = version_match.group(1) if version_match else "Desconocido"
-            return {"name": "Internet Explorer", "version": version}
-        
-        return {"name": "Desconocido", "version": "N/A"}
-    
     def _detect_shell(self) -> str:
         """Detecta el shell en uso."""
         shell = os.environ.get('SHELL', '')
@@ -322,17 +341,9 @@ class DeviceDetector:
         
         return platform.platform()
     
-    def _get_default_web_info(self) -> Dict:
+    def _get_default_web_info(self) -> DeviceInfo:
         """Retorna información por defecto cuando no hay User-Agent."""
-        return {
-            "tipo": "Desconocido",
-            "os": "Desconocido",
-            "os_version": "N/A",
-            "navegador": "Desconocido",
-            "navegador_version": "N/A",
-            "resolucion": "N/A",
-            "user_agent": "No disponible"
-        }
+        return DEFAULT_WEB_INFO
     
     def get_screen_resolution(self) -> Optional[str]:
         """
@@ -411,17 +422,17 @@ if __name__ == "__main__":
     print("\n2. Probando detección desde User-Agent (Chrome en Windows):")
     ua_chrome = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     chrome_info = detector.detect_from_web(ua_chrome)
-    print(json.dumps(chrome_info, indent=2, ensure_ascii=False))
+    print(json.dumps(chrome_info.to_dict(), indent=2, ensure_ascii=False))
     
     print("\n3. Probando detección desde User-Agent (Safari en iPhone):")
     ua_iphone = "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1"
     iphone_info = detector.detect_from_web(ua_iphone)
-    print(json.dumps(iphone_info, indent=2, ensure_ascii=False))
+    print(json.dumps(iphone_info.to_dict(), indent=2, ensure_ascii=False))
     
     print("\n4. Probando detección desde User-Agent (Firefox en Linux):")
     ua_firefox = "Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0"
     firefox_info = detector.detect_from_web(ua_firefox)
-    print(json.dumps(firefox_info, indent=2, ensure_ascii=False))
+    print(json.dumps(firefox_info.to_dict(), indent=2, ensure_ascii=False))
     
     print("\n5. Intentando obtener resolución de pantalla:")
     resolution = detector.get_screen_resolution()
@@ -1,11 +1,13 @@
 """
 Sistema de Reportes por Email para GERARD
 
-Este módulo genera y envía reportes diarios de las interacciones
-con GERARD por correo electrónico.
+Este módulo genera y envía reportes diarios, semanales o mensuales de las
+interacciones con GERARD por correo electrónico.
 
 Características:
-- Resumen diario de interacciones
+- Resumen diario, semanal o mensual de interacciones
+- Estadísticas a partir de agregados incrementales (rollups.py), sin releer
+  el historial completo de logs
 - Estadísticas de usuarios
 - Top preguntas más frecuentes
 - Información de dispositivos y ubicaciones
@@ -26,10 +28,11 @@ from email import encoders
 from datetime import datetime, timedelta
 from pathlib import Path
 import json
-from typing import Dict, List
-from collections import Counter
+from typing import Dict, Tuple
 import os
 
+from rollups import RollupStore
+
 # --- CONFIGURACIÓN DE EMAIL ---
 EMAIL_CONFIG = {
     "smtp_server": "smtp.gmail.com",  # Para Gmail
@@ -40,6 +43,12 @@ EMAIL_CONFIG = {
     "subject_prefix": "[GERARD] Reporte Diario"
 }
 
+PERIOD_TITLES = {
+    "day": "Reporte Diario",
+    "week": "Reporte Semanal",
+    "month": "Reporte Mensual",
+}
+
 
 class EmailReporter:
     """
@@ -54,6 +63,7 @@ class EmailReporter:
             log_dir: Directorio donde están los logs
         """
         self.log_dir = Path(log_dir)
+        self.rollups = RollupStore(str(self.log_dir))
         self.config = EMAIL_CONFIG
     
     def generate_daily_report(self, date: datetime = None) -> str:
@@ -66,120 +76,71 @@ class EmailReporter:
         Returns:
             String con el HTML del reporte
         """
-        if date is None:
-            date = datetime.now() - timedelta(days=1)
+        return self.generate_period_report("day", date)
+    
+    @staticmethod
+    def period_range(period: str, date: datetime) -> Tuple[datetime, datetime]:
+        """
+        Calcula el rango de fechas (inclusive) de un periodo.
         
-        date_str = date.strftime("%Y%m%d")
+        Args:
+            period: "day", "week" (lunes a domingo) o "month" (mes calendario)
+            date: Cualquier fecha dentro del periodo
+            
+        Returns:
+            (primer día, último día)
+        """
+        if period == "day":
+            return date, date
+        if period == "week":
+            start = date - timedelta(days=date.weekday())
+            return start, start + timedelta(days=6)
+        if period == "month":
+            start = date.replace(day=1)
+            next_month = (start + timedelta(days=32)).replace(day=1)
+            return start, next_month - timedelta(days=1)
+        raise ValueError(f"Periodo no soportado: {period}")
+    
+    def period_label(self, period: str, date: datetime) -> str:
+        """Texto del periodo para el encabezado y el asunto del email."""
+        start, end = self.period_range(period, date)
+        if period == "day":
+            return start.strftime("%d/%m/%Y")
+        return f"{start.strftime('%d/%m/%Y')} - {end.strftime('%d/%m/%Y')}"
+    
+    def generate_period_report(self, period: str = "day", date: datetime = None) -> str:
+        """
+        Genera un reporte HTML combinando los agregados diarios del periodo.
         
-        # Buscar archivos de log del día
-        log_file = self.log_dir / f"interactions_{date_str}.log"
-        json_file = self.log_dir / f"interactions_{date_str}.json"
+        Args:
+            period: "day", "week" o "month"
+            date: Cualquier fecha dentro del periodo (default: ayer)
+            
+        Returns:
+            String con el HTML del reporte
+        """
+        if date is None:
+            date = datetime.now() - timedelta(days=1)
         
-        if not json_file.exists():
-            return self._generate_no_data_report(date)
+        start, end = self.period_range(period, date)
+        title = PERIOD_TITLES[period]
+        label = self.period_label(period, date)
         
-        # Cargar datos
-        interactions = self._load_json_logs(json_file)
+        # Unir los agregados de cada día (sólo se leen los logs nuevos)
+        rollup = self.rollups.period(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
         
-        if not interactions:
-            return self._generate_no_data_report(date)
+        if rollup.total == 0:
+            return self._generate_no_data_report(title, label)
         
-        # Generar estadísticas
-        stats = self._calculate_statistics(interactions)
+        stats = rollup.to_stats()
         
         # Generar HTML
-        html = self._generate_html_report(date, stats, interactions)
+        html = self._generate_html_report(title, label, stats)
         
         return html
     
-    def _load_json_logs(self, json_file: Path) -> List[Dict]:
-        """Carga las interacciones desde el archivo JSON."""
-        interactions = []
-        
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        interactions.append(json.loads(line))
-                    except json.JSONDecodeError:
-                        continue
-        except Exception as e:
-            print(f"Error cargando logs: {e}")
-        
-        return interactions
-    
-    def _calculate_statistics(self, interactions: List[Dict]) -> Dict:
-        """Calcula estadísticas de las interacciones."""
-        stats = {
-            "total_interactions": len(interactions),
-            "unique_users": len(set(i.get("user_name", "Desconocido") for i in interactions)),
-            "total_questions": len(interactions),
-            "avg_response_time": 0,
-            "top_users": [],
-            "top_questions": [],
-            "devices": Counter(),
-            "locations": Counter(),
-            "browsers": Counter(),
-            "os_types": Counter(),
-            "success_rate": 0
-        }
-        
-        # Contadores
-        user_counter = Counter()
-        question_counter = Counter()
-        response_times = []
-        successful = 0
-        
-        for interaction in interactions:
-            # Usuario
-            user_name = interaction.get("user_name", "Desconocido")
-            user_counter[user_name] += 1
-            
-            # Pregunta
-            question = interaction.get("question", "")[:100]  # Primeros 100 chars
-            question_counter[question] += 1
-            
-            # Tiempo de respuesta
-            if "timing" in interaction and "total_time" in interaction["timing"]:
-                response_times.append(interaction["timing"]["total_time"])
-            
-            # Success
-            if interaction.get("success", False):
-                successful += 1
-            
-            # Dispositivo
-            device_info = interaction.get("device", {})
-            device_type = device_info.get("device_type", "Desconocido")
-            stats["devices"][device_type] += 1
-            
-            browser = device_info.get("browser", "Desconocido")
-            stats["browsers"][browser] += 1
-            
-            os_type = device_info.get("os", "Desconocido")
-            stats["os_types"][os_type] += 1
-            
-            # Ubicación
-            location = interaction.get("location", {})
-            city = location.get("city", "Desconocida")
-            country = location.get("country", "Desconocido")
-            location_str = f"{city}, {country}"
-            stats["locations"][location_str] += 1
-        
-        # Promedios
-        if response_times:
-            stats["avg_response_time"] = sum(response_times) / len(response_times)
-        
-        stats["success_rate"] = (successful / len(interactions) * 100) if interactions else 0
-        
-        # Top 5
-        stats["top_users"] = user_counter.most_common(5)
-        stats["top_questions"] = question_counter.most_common(5)
-        
-        return stats
-    
-    def _generate_html_report(self, date: datetime, stats: Dict, interactions: List[Dict]) -> str:
+    def _generate_html_report(self, title: str, date_str: str, stats: Dict) -> str:
         """Genera el HTML del reporte."""
-        date_str = date.strftime("%d/%m/%Y")
         
         html = f"""
         <!DOCTYPE html>
@@ -279,7 +240,7 @@ class EmailReporter:
         <body>
             <div class="header">
                 <h1>🤖 GERARD</h1>
-                <p>Reporte Diario de Interacciones</p>
+                <p>{title} de Interacciones</p>
                 <p>{date_str}</p>
             </div>
             
@@ -296,6 +257,10 @@ class EmailReporter:
                     <h3>Tiempo Promedio</h3>
                     <div class="value">{stats['avg_response_time']:.2f}s</div>
                 </div>
+                <div class="stat-card">
+                    <h3>Tiempo P95</h3>
+                    <div class="value">{stats['p95_response_time']:.2f}s</div>
+                </div>
                 <div class="stat-card">
                     <h3>Tasa de Éxito</h3>
                     <div class="value">{stats['success_rate']:.1f}%</div>
@@ -396,10 +361,8 @@ class EmailReporter:
         
         return html
     
-    def _generate_no_data_report(self, date: datetime) -> str:
+    def _generate_no_data_report(self, title: str, date_str: str) -> str:
         """Genera un reporte cuando no hay datos."""
-        date_str = date.strftime("%d/%m/%Y")
-        
         return f"""
         <!DOCTYPE html>
         <html>
@@ -426,21 +389,22 @@ class EmailReporter:
         </head>
         <body>
             <div class="message">
-                <h1>📊 Reporte Diario</h1>
+                <h1>📊 {title}</h1>
                 <p><strong>{date_str}</strong></p>
-                <p>No se registraron interacciones en esta fecha.</p>
+                <p>No se registraron interacciones en este periodo.</p>
             </div>
         </body>
         </html>
         """
     
-    def send_email(self, html_content: str, date: datetime = None) -> bool:
+    def send_email(self, html_content: str, date: datetime = None, period: str = "day") -> bool:
         """
         Envía el reporte por email.
         
         Args:
             html_content: Contenido HTML del reporte
             date: Fecha del reporte
+            period: "day", "week" o "month" (define el asunto)
             
         Returns:
             True si se envió correctamente, False en caso contrario
@@ -448,14 +412,17 @@ class EmailReporter:
         if date is None:
             date = datetime.now() - timedelta(days=1)
         
-        date_str = date.strftime("%d/%m/%Y")
+        date_str = self.period_label(period, date)
+        subject_prefix = self.config['subject_prefix']
+        if period != "day":
+            subject_prefix = subject_prefix.replace(PERIOD_TITLES["day"], PERIOD_TITLES[period])
         
         try:
             # Crear mensaje
             msg = MIMEMultipart('alternative')
             msg['From'] = self.config['sender_email']
             msg['To'] = self.config['recipient_email']
-            msg['Subject'] = f"{self.config['subject_prefix']} - {date_str}"
+            msg['Subject'] = f"{subject_prefix} - {date_str}"
             
             # Adjuntar HTML
             html_part = MIMEText(html_content, 'html', 'utf-8')
@@ -487,6 +454,8 @@ def main():
     
     parser = argparse.ArgumentParser(description='Generador de reportes por email para GERARD')
     parser.add_argument('--date', type=str, help='Fecha del reporte (YYYYMMDD)', default=None)
+    parser.add_argument('--period', choices=sorted(PERIOD_TITLES), default='day',
+                        help='Periodo del reporte: day, week o month (default: day)')
     parser.add_argument('--preview', action='store_true', help='Solo generar y mostrar el HTML sin enviar')
     
     args = parser.parse_args()
@@ -503,7 +472,7 @@ def main():
     reporter = EmailReporter()
     
     print("📊 Generando reporte...")
-    html = reporter.generate_daily_report(report_date)
+    html = reporter.generate_period_report(args.period, report_date)
     
     if args.preview:
         # Guardar preview
@@ -513,7 +482,7 @@ def main():
         print(f"✅ Preview guardado en: {preview_file}")
     else:
         # Enviar por email
-        success = reporter.send_email(html, report_date)
+        success = reporter.send_email(html, report_date, args.period)
         if success:
             print("✅ Reporte enviado exitosamente!")
         else:
@@ -0,0 +1,479 @@
+"""
+Evaluación de Calidad y Latencia de la Recuperación de GERARD
+
+`test_linajes_retrieval.py`, `test_query_ranking.py` y `search_specific.py`
+fijan cada uno un caso ("linaje ra bis jac tric" en "DESCUBRIENDO LOS
+MENSAJES OCULTOS"...) y se revisan a ojo. Este módulo evalúa un conjunto de
+consultas de referencia (golden set) contra cada configuración de
+recuperación y da números para reducir k y el tamaño del contexto sin perder
+lo que importa.
+
+Características:
+- Golden set en JSONL (`eval/golden_queries.jsonl`): consulta -> fuentes
+  esperadas, con rango de tiempo opcional ("00:12:25-00:12:53") y grado de
+  relevancia para nDCG
+- Un chunk es relevante si su archivo contiene el nombre esperado (sin
+  acentos ni mayúsculas) y, si hay rango, alguno de sus timestamps .srt cae
+  dentro
+- Métricas por configuración: recall@k, MRR y nDCG@k para varios k,
+  latencia p50/p90/p99 por consulta, documentos devueltos y caracteres del
+  contexto resultante
+- Configuraciones: "vector", "hybrid" (la actual) y cualquier función
+  registrada con `register_retriever` (módulos extra con --plugin), cada una
+  con sus parámetros ("hybrid:k_vector=50,k_keyword=15")
+- Tamaños de chunk: índices alternativos construidos en memoria desde los
+  .srt con embeddings locales (offline_embeddings.py), comparables entre sí
+- Reporte JSON con el detalle por consulta (rango del primer relevante)
+
+Uso:
+    python eval_retrieval.py
+    python eval_retrieval.py --config vector:k=20 --config hybrid:k_vector=50,k_keyword=15 --k 5 10 20
+    python eval_retrieval.py --embeddings offline --chunk-sizes 2000 5000 10000
+    python eval_retrieval.py --plugin mi_recuperador --output logs/eval/actual.json
+
+Registrar una alternativa:
+    @register_retriever("mmr")
+    def mmr(vectorstore, query, k=20):
+        return vectorstore.max_marginal_relevance_search(query, k=k)
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import math
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from bench_retrieval import percentiles, quiet_tracer, write_json_atomic
+from offline_embeddings import normalize_text
+from retrieval import DEFAULT_K_KEYWORD, DEFAULT_K_VECTOR, hybrid_retrieval, vector_search
+
+DEFAULT_GOLDEN = "eval/golden_queries.jsonl"
+DEFAULT_INDEX_DIR = "faiss_index"
+DEFAULT_SRT_DIR = "documentos_srt"
+DEFAULT_RESULTS_DIR = "logs/eval"
+DEFAULT_CUTOFFS = (5, 10, 20, 50)
+DEFAULT_CONFIGS = ("vector:k=100", "hybrid", "hybrid:k_vector=50,k_keyword=15", "hybrid:k_vector=20,k_keyword=10")
+
+_TIMESTAMP_RE = re.compile(r"(\d{1,2}):(\d{2}):(\d{2})[,.]\d{1,3}\s*-->\s*(\d{1,2}):(\d{2}):(\d{2})")
+
+RetrievalFunction = Callable[..., Sequence[Any]]
+_RETRIEVERS: Dict[str, RetrievalFunction] = {}
+
+
+def register_retriever(name: str, func: Optional[RetrievalFunction] = None):
+    """
+    Registra una función de recuperación para evaluarla.
+
+    La función recibe (vectorstore, query, **parámetros) y devuelve los
+    documentos ordenados (o tuplas (documento, score)). Se puede usar como
+    decorador.
+    """
+    def decorator(f: RetrievalFunction) -> RetrievalFunction:
+        _RETRIEVERS[name] = f
+        return f
+    return decorator(func) if func is not None else decorator
+
+
+def registered_retrievers() -> Dict[str, RetrievalFunction]:
+    return dict(_RETRIEVERS)
+
+
+@register_retriever("vector")
+def _vector_only(vectorstore, query: str, k: int = DEFAULT_K_VECTOR):
+    return vector_search(vectorstore, query, k=k)
+
+
+@register_retriever("hybrid")
+def _hybrid(vectorstore, query: str, k_vector: int = DEFAULT_K_VECTOR, k_keyword: int = DEFAULT_K_KEYWORD):
+    return hybrid_retrieval(vectorstore, query, k_vector=k_vector, k_keyword=k_keyword)
+
+
+# --- Golden set ---
+
+@dataclass
+class ExpectedSource:
+    """Fuente esperada de una consulta de referencia"""
+    source: str                         # parte del nombre del archivo
+    start: Optional[float] = None       # segundos; None = cualquier parte del archivo
+    end: Optional[float] = None
+    grade: int = 1                      # relevancia para nDCG (1 = relevante, 2 = muy relevante...)
+
+
+@dataclass
+class GoldenQuery:
+    """Consulta de referencia con sus fuentes esperadas"""
+    id: str
+    query: str
+    expected: List[ExpectedSource]
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+def parse_timestamp(value: str) -> float:
+    """Segundos de "HH:MM:SS", "MM:SS" o "SS" (con ",mmm" opcional)."""
+    parts = value.strip().replace(",", ".").split(":")
+    if not 1 <= len(parts) <= 3:
+        raise ValueError(f"Timestamp no válido: {value!r}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _parse_expected(item: Any) -> ExpectedSource:
+    if isinstance(item, str):
+        return ExpectedSource(item)
+    if not isinstance(item, dict) or not str(item.get("source", "")).strip():
+        raise ValueError(f"Fuente esperada sin 'source': {item!r}")
+    start = end = None
+    timestamp = item.get("timestamp")
+    if timestamp:
+        first, _, last = str(timestamp).partition("-")
+        start = parse_timestamp(first)
+        end = parse_timestamp(last) if last else start
+    return ExpectedSource(str(item["source"]), start, end, int(item.get("grade", 1)))
+
+
+def parse_golden(lines: Sequence[str]) -> List[GoldenQuery]:
+    """
+    Interpreta el golden set (JSONL; líneas vacías y "#" se ignoran).
+
+    Formato de cada línea:
+        {"id": "...", "query": "...", "expected": ["archivo", {"source": "archivo",
+         "timestamp": "00:12:25-00:12:53", "grade": 2}], ...}
+
+    Returns:
+        Consultas en orden
+    """
+    queries = []
+    for number, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            record = json.loads(line)
+            query = str(record.pop("query")).strip()
+            expected = [_parse_expected(item) for item in record.pop("expected")]
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Golden set, línea {number}: {e}") from e
+        if not query or not expected:
+            raise ValueError(f"Golden set, línea {number}: consulta o fuentes esperadas vacías")
+        queries.append(GoldenQuery(str(record.pop("id", f"q{number}")), query, expected, record))
+    return queries
+
+
+def load_golden(path: str = DEFAULT_GOLDEN) -> List[GoldenQuery]:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_golden(f.readlines())
+
+
+# --- Relevancia y métricas ---
+
+def _document(item: Any) -> Any:
+    return item[0] if isinstance(item, tuple) else item
+
+
+def document_span(doc: Any) -> Optional[Tuple[float, float]]:
+    """Rango (segundos) que cubren los timestamps .srt del chunk, o None si no tiene."""
+    spans = [(int(h1) * 3600 + int(m1) * 60 + int(s1), int(h2) * 3600 + int(m2) * 60 + int(s2))
+             for h1, m1, s1, h2, m2, s2 in _TIMESTAMP_RE.findall(doc.page_content)]
+    if not spans:
+        return None
+    return min(start for start, _ in spans), max(end for _, end in spans)
+
+
+def matched_expectations(doc: Any, expected: Sequence[ExpectedSource]) -> Set[int]:
+    """Índices de las fuentes esperadas que cumple un documento."""
+    # Ruta completa: los índices construidos en Windows guardan rutas con "\\"
+    source = normalize_text(str(doc.metadata.get("source", "")))
+    span = None
+    matched = set()
+    for position, item in enumerate(expected):
+        if normalize_text(item.source).strip() not in source:
+            continue
+        if item.start is not None:
+            span = span or document_span(doc)
+            if span is None or span[0] > item.end or span[1] < item.start:
+                continue
+        matched.add(position)
+    return matched
+
+
+def score_ranking(matches: Sequence[Set[int]], expected: Sequence[ExpectedSource],
+                  cutoffs: Sequence[int]) -> Dict[str, float]:
+    """
+    recall@k, nDCG@k y MRR de una lista ordenada.
+
+    Args:
+        matches: Por documento devuelto, las fuentes esperadas que cumple
+        expected: Fuentes esperadas (con su grado)
+        cutoffs: Valores de k
+
+    Returns:
+        {"recall@k", "ndcg@k", "mrr", "first_relevant_rank"}
+    """
+    scores: Dict[str, float] = {}
+    first = next((rank for rank, found in enumerate(matches, 1) if found), None)
+    scores["mrr"] = 1.0 / first if first else 0.0
+    scores["first_relevant_rank"] = first or 0
+    grades = sorted((item.grade for item in expected), reverse=True)
+    for k in cutoffs:
+        found: Set[int] = set()
+        dcg = 0.0
+        for rank, matched in enumerate(matches[:k], 1):
+            # Cada fuente esperada suma una sola vez (varios chunks del mismo archivo no inflan la nota)
+            new = matched - found
+            if new:
+                dcg += (2 ** max(expected[i].grade for i in new) - 1) / math.log2(rank + 1)
+                found |= new
+        ideal = sum((2 ** grade - 1) / math.log2(rank + 1) for rank, grade in enumerate(grades[:k], 1))
+        scores[f"recall@{k}"] = len(found) / len(expected)
+        scores[f"ndcg@{k}"] = dcg / ideal if ideal else 0.0
+    return scores
+
+
+# --- Configuraciones ---
+
+@dataclass
+class EvalConfig:
+    """Una función registrada con sus parámetros"""
+    label: str
+    retriever: str
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def _parse_value(value: str) -> Any:
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_config(spec: str) -> EvalConfig:
+    """"hybrid:k_vector=50,k_keyword=15" -> EvalConfig."""
+    name, _, raw_params = spec.partition(":")
+    name = name.strip()
+    if name not in _RETRIEVERS:
+        raise ValueError(f"Función de recuperación desconocida: {name} (registradas: {', '.join(sorted(_RETRIEVERS))})")
+    params = {}
+    for pair in filter(None, (p.strip() for p in raw_params.split(","))):
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise ValueError(f"Parámetro sin valor en {spec!r}: {pair}")
+        params[key.strip()] = _parse_value(value.strip())
+    return EvalConfig(spec.strip(), name, params)
+
+
+def default_configs() -> List[EvalConfig]:
+    """Las configuraciones por defecto más cada función registrada que no aparezca en ellas."""
+    configs = [parse_config(spec) for spec in DEFAULT_CONFIGS]
+    named = {config.retriever for config in configs}
+    configs += [EvalConfig(name, name) for name in sorted(_RETRIEVERS) if name not in named]
+    return configs
+
+
+def evaluate_config(vectorstore: Any, golden: Sequence[GoldenQuery], config: EvalConfig,
+                    cutoffs: Sequence[int] = DEFAULT_CUTOFFS) -> Dict[str, Any]:
+    """
+    Evalúa una configuración sobre todo el golden set.
+
+    Returns:
+        {"metrics": promedios, "queries": detalle por consulta}
+    """
+    from consultar_terminal import format_docs_with_metadata
+
+    retrieve = _RETRIEVERS[config.retriever]
+    per_query, latencies, doc_counts, context_chars = [], [], [], []
+    for item in golden:
+        # Las funciones de recuperación imprimen depuración por consulta
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            docs = [_document(result) for result in retrieve(vectorstore, item.query, **config.params)]
+            latencies.append((time.perf_counter() - start) * 1000)
+            context_chars.append(len(format_docs_with_metadata(docs)))
+        doc_counts.append(len(docs))
+        scores = score_ranking([matched_expectations(doc, item.expected) for doc in docs], item.expected, cutoffs)
+        per_query.append({"id": item.id, "query": item.query, "docs": len(docs), **scores})
+
+    metrics: Dict[str, float] = {}
+    for key in [key for key in per_query[0] if key.startswith(("recall@", "ndcg@"))] + ["mrr"]:
+        metrics[key] = round(sum(q[key] for q in per_query) / len(per_query), 4)
+    metrics.update({key.split(".", 1)[1]: value for key, value in percentiles(latencies, "latency").items()})
+    metrics["mean_docs"] = round(sum(doc_counts) / len(doc_counts), 1)
+    metrics["mean_context_chars"] = round(sum(context_chars) / len(context_chars), 1)
+    return {"metrics": metrics, "queries": per_query}
+
+
+# --- Índices a evaluar ---
+
+def _read_srt(path: Path) -> str:
+    raw = path.read_bytes()
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def build_chunked_index(srt_dir: str, chunk_size: int, chunk_overlap: Optional[int] = None, dim: int = 768):
+    """
+    Índice en memoria de los .srt con otro tamaño de chunk y embeddings locales.
+
+    Returns:
+        Vectorstore FAISS (consultas embebidas con HashingEmbeddings)
+    """
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from offline_embeddings import HashingEmbeddings
+
+    overlap = chunk_size // 10 if chunk_overlap is None else chunk_overlap
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
+    documents = [Document(page_content=_read_srt(path), metadata={"source": str(path)})
+                 for path in sorted(Path(srt_dir).glob("*.srt"))]
+    if not documents:
+        raise FileNotFoundError(f"No hay archivos .srt en {srt_dir}")
+    chunks = splitter.split_documents(documents)
+    start = time.perf_counter()
+    embedder = HashingEmbeddings(dim=dim).fit([chunk.page_content for chunk in chunks])
+    vectors = embedder.embed_array([chunk.page_content for chunk in chunks])
+    vectorstore = FAISS.from_embeddings(
+        [(chunk.page_content, vector) for chunk, vector in zip(chunks, vectors.tolist())],
+        embedder,
+        metadatas=[chunk.metadata for chunk in chunks]
+    )
+    print(f"[INFO] Chunks de {chunk_size}: {len(chunks)} chunks de {len(documents)} archivos "
+          f"({time.perf_counter() - start:.1f}s)")
+    return vectorstore
+
+
+def load_main_index(index_dir: str, embeddings: str):
+    """
+    Índice principal con embeddings de Google, o su versión offline.
+
+    Returns:
+        (vectorstore, "google" u "offline")
+    """
+    from index_snapshots import resolve_snapshot
+
+    if embeddings == "auto":
+        from consultar_terminal import get_api_key
+
+        embeddings = "google" if get_api_key() else "offline"
+        if embeddings == "offline":
+            print("[!] Sin GOOGLE_API_KEY: se evalúa el índice offline (embeddings locales)")
+    _, snapshot_dir = resolve_snapshot(index_dir)
+    if embeddings == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        from consultar_terminal import get_api_key
+        from faiss_mmap import load_faiss_local
+
+        embedder = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=get_api_key())
+        return load_faiss_local(str(snapshot_dir), embedder), "google"
+    from offline_embeddings import ensure_offline_index
+
+    return ensure_offline_index(str(snapshot_dir)), "offline"
+
+
+def run_evaluation(indexes: Dict[str, Any], golden: Sequence[GoldenQuery], configs: Sequence[EvalConfig],
+                   cutoffs: Sequence[int] = DEFAULT_CUTOFFS) -> Dict[str, Any]:
+    """
+    Evalúa cada configuración sobre cada índice.
+
+    Args:
+        indexes: {etiqueta: vectorstore}
+        golden: Consultas de referencia
+        configs: Configuraciones (ver `parse_config`)
+        cutoffs: Valores de k para recall y nDCG
+
+    Returns:
+        {"meta", "results": [{"index", "config", "metrics", "queries"}]}
+    """
+    results = []
+    with quiet_tracer():
+        for index_label, vectorstore in indexes.items():
+            for config in configs:
+                evaluation = evaluate_config(vectorstore, golden, config, cutoffs)
+                results.append({"index": index_label, "config": config.label, **evaluation})
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "golden_queries": len(golden),
+            "cutoffs": list(cutoffs),
+        },
+        "results": results,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Tabla legible: una fila por índice y configuración."""
+    cutoffs = report["meta"]["cutoffs"]
+    ndcg_k = 10 if 10 in cutoffs else cutoffs[-1]
+    headers = ["índice", "configuración"] + [f"R@{k}" for k in cutoffs] + ["MRR", f"nDCG@{ndcg_k}", "p50 ms",
+                                                                          "p90 ms", "docs", "contexto"]
+    rows = []
+    for result in report["results"]:
+        m = result["metrics"]
+        rows.append([result["index"], result["config"]] + [f"{m[f'recall@{k}']:.3f}" for k in cutoffs]
+                    + [f"{m['mrr']:.3f}", f"{m[f'ndcg@{ndcg_k}']:.3f}", f"{m['p50_ms']:.1f}", f"{m['p90_ms']:.1f}",
+                       f"{m['mean_docs']:.0f}", f"{m['mean_context_chars']:.0f}"])
+    widths = [max(len(str(row[i])) for row in rows + [headers]) for i in range(len(headers))]
+    lines = ["  ".join(str(cell).ljust(width) for cell, width in zip(headers, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    lines += ["  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluación de la recuperación con el golden set")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN, help="Golden set JSONL")
+    parser.add_argument("--index", default=DEFAULT_INDEX_DIR, help="Índice principal")
+    parser.add_argument("--embeddings", choices=("auto", "google", "offline"), default="auto",
+                        help="Embeddings de las consultas del índice principal")
+    parser.add_argument("--no-main-index", action="store_true", help="Evaluar solo los índices de --chunk-sizes")
+    parser.add_argument("--config", action="append", default=None,
+                        help="Configuración 'función:param=valor,...' (repetible; por defecto vector e hybrid con varios k)")
+    parser.add_argument("--k", type=int, nargs="+", default=list(DEFAULT_CUTOFFS), help="Cortes para recall@k y nDCG@k")
+    parser.add_argument("--chunk-sizes", type=int, nargs="*", default=[],
+                        help="Tamaños de chunk a comparar (índices en memoria desde --srt-dir, embeddings "
+                             "locales; el índice principal usa 10000)")
+    parser.add_argument("--srt-dir", default=DEFAULT_SRT_DIR)
+    parser.add_argument("--plugin", action="append", default=[], help="Módulo que registra funciones extra (repetible)")
+    parser.add_argument("--output", default=None, help=f"Reporte JSON (por defecto {DEFAULT_RESULTS_DIR}/retrieval_<fecha>.json)")
+    args = parser.parse_args()
+
+    for module in args.plugin:
+        importlib.import_module(module)
+    golden = load_golden(args.golden)
+    configs = [parse_config(spec) for spec in args.config] if args.config else default_configs()
+    print(f"[INFO] {len(golden)} consultas de referencia, {len(configs)} configuraciones")
+
+    indexes: Dict[str, Any] = {}
+    if not args.no_main_index:
+        vectorstore, kind = load_main_index(args.index, args.embeddings)
+        indexes[f"{Path(args.index).name} ({kind})"] = vectorstore
+    for chunk_size in args.chunk_sizes:
+        indexes[f"chunks-{chunk_size} (offline)"] = build_chunked_index(args.srt_dir, chunk_size)
+    if not indexes:
+        parser.error("no hay índices que evaluar (quita --no-main-index o añade --chunk-sizes)")
+
+    report = run_evaluation(indexes, golden, configs, sorted(set(args.k)))
+    report["meta"].update(golden=args.golden, plugins=args.plugin)
+    print(format_report(report))
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"retrieval_{datetime.now():%Y%m%d_%H%M%S}.json")
+    write_json_atomic(report, output)
+    print(f"[OK] Reporte en {output}")
+
+
+if __name__ == "__main__":
+    main()
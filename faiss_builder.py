@@ -15,6 +15,9 @@ from dataclasses import dataclass, asdict
 from tqdm import tqdm
 import faiss
 
+from compact_index import CompactProfile, CompactReport, compact_index
+from metrics import RATE_LIMITER_WAIT_SECONDS
+
 
 @dataclass
 class BuilderConfig:
@@ -27,9 +30,25 @@ class BuilderConfig:
     initial_backoff: float = 2.0
     max_backoff: float = 60.0
     checkpoint_file: str = "faiss_checkpoint.json"
+    # Perfil compacto (ver compact_index.py): PCA/OPQ + SQ8/fp16 al terminar
+    compact: bool = False
+    compact_dim: Optional[int] = 256
+    compact_transform: str = "pca"
+    compact_quantizer: str = "sq8"
+    rerank_k_factor: int = 4
+    eval_queries: int = 200
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
+    
+    def compact_profile(self) -> CompactProfile:
+        return CompactProfile(
+            dim=self.compact_dim,
+            transform=self.compact_transform,
+            quantizer=self.compact_quantizer,
+            rerank_k_factor=self.rerank_k_factor,
+            eval_queries=self.eval_queries
+        )
 
 
 @dataclass
@@ -85,6 +104,7 @@ class RateLimiter:
             if wait_time > 0:
                 print(f"⏳ Rate limit alcanzado. Esperando {wait_time:.1f}s...")
                 time.sleep(wait_time)
+                RATE_LIMITER_WAIT_SECONDS.observe(wait_time, limiter="faiss_builder")
         
         # Registrar este request
         self.request_times.append(time.time())
@@ -97,6 +117,7 @@ class FAISSVectorBuilder:
     - Reintentos con backoff exponencial
     - Guardado incremental
     - Recuperación desde checkpoint
+    - Perfil compacto opcional (PCA/OPQ + cuantización escalar, rerank exacto)
     """
     
     def __init__(self, config: BuilderConfig, embedding_function: Callable):
@@ -105,6 +126,7 @@ class FAISSVectorBuilder:
         self.rate_limiter = RateLimiter(config.rate_limit_per_minute)
         self.index: Optional[faiss.Index] = None
         self.processed_count = 0
+        self.compact_report: Optional[CompactReport] = None
         
     def _exponential_backoff(self, attempt: int) -> float:
         """Calcula tiempo de espera con backoff exponencial"""
@@ -218,7 +240,7 @@ class FAISSVectorBuilder:
             resume_from_checkpoint: Si True, intenta reanudar desde checkpoint
         
         Returns:
-            Índice FAISS construido
+            Índice FAISS construido (el compacto si `config.compact`)
         """
         # Extraer textos de los documentos
         texts = [doc.page_content for doc in documents]
@@ -315,6 +337,16 @@ class FAISSVectorBuilder:
         print(f"{'='*60}")
         self._save_index(output_path)
         
+        # Perfil compacto: reemplaza output_path por el índice compacto y deja
+        # los vectores originales aparte (para el rerank exacto)
+        if self.config.compact:
+            print(f"\n{'='*60}")
+            print(f"📦 PERFIL COMPACTO")
+            print(f"{'='*60}")
+            self.index, self.compact_report = compact_index(
+                self.index, output_path, self.config.compact_profile()
+            )
+        
         # Limpiar checkpoint
         if os.path.exists(self.config.checkpoint_file):
             os.remove(self.config.checkpoint_file)
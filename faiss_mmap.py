@@ -0,0 +1,245 @@
+"""
+Carga del Índice FAISS en Memoria Compartida (mmap) para GERARD
+
+`FAISS.load_local` copia `index.faiss` entero en la memoria privada de cada
+proceso: varios workers de Streamlit, o la terminal junto a la app web en la
+misma máquina, multiplican el consumo de RAM. Aquí el índice se abre con
+`mmap` de solo lectura, así los vectores viven en el page cache del sistema y
+todos los procesos comparten las mismas páginas.
+
+Características:
+- `IO_FLAG_MMAP_IFC` para índices planos (IndexFlat*, SQ, PQ: los vectores
+  quedan respaldados por el archivo) e `IO_FLAG_MMAP` para las listas
+  invertidas de índices IVF; con versiones de faiss sin `IO_FLAG_MMAP_IFC`
+  solo se mapean las IVF
+- Devuelve el mismo vectorstore `FAISS` de LangChain (docstore, ids,
+  `similarity_search_by_vector`...), así `hybrid_retrieval` no cambia
+- Informe de memoria antes y después de cargar: RSS, su parte anónima
+  (privada) y la respaldada por archivos (compartible), más PSS
+- GERARD_FAISS_MMAP=0 desactiva el mmap (por defecto activo salvo en Windows,
+  donde un archivo mapeado no se puede reemplazar al reinstalar el índice)
+- Índices compactos (compact_index.py): si junto al índice están los
+  vectores originales (`index.full.faiss`), se añade un rerank exacto con
+  `faiss.IndexRefine` sobre ese archivo mapeado (GERARD_FAISS_RERANK=0 lo
+  desactiva)
+
+Uso:
+    vectorstore = load_faiss_local("faiss_index", embeddings)
+    python faiss_mmap.py [faiss_index] [--no-mmap]
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+_TRUE = ("1", "true", "yes", "si", "sí", "on")
+_FALSE = ("0", "false", "no", "off")
+
+FULL_VECTORS_SUFFIX = ".full.faiss"
+COMPACT_PROFILE_SUFFIX = ".compact.json"
+DEFAULT_RERANK_K_FACTOR = 4
+
+# Campos de /proc/self/status y smaps_rollup que se informan (en bytes)
+_STATUS_FIELDS = {"VmRSS": "rss", "RssAnon": "rss_anon", "RssFile": "rss_file"}
+_ROLLUP_FIELDS = {"Pss": "pss"}
+
+
+def mmap_enabled() -> bool:
+    """Indica si el índice se abre con mmap (GERARD_FAISS_MMAP; por defecto sí, salvo en Windows)."""
+    value = os.environ.get("GERARD_FAISS_MMAP", "").strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    return os.name != "nt"
+
+
+def rerank_enabled() -> bool:
+    """Indica si se usa el rerank exacto de los índices compactos (GERARD_FAISS_RERANK)."""
+    return os.environ.get("GERARD_FAISS_RERANK", "").strip().lower() not in _FALSE
+
+
+def full_vectors_path(index_path: Path) -> Path:
+    """Archivo con los vectores originales de un índice compacto (`index.faiss` -> `index.full.faiss`)."""
+    index_path = Path(index_path)
+    return index_path.with_name(index_path.name[:-len(index_path.suffix)] + FULL_VECTORS_SUFFIX)
+
+
+def compact_profile_path(index_path: Path) -> Path:
+    """Perfil y reporte de un índice compacto (`index.faiss` -> `index.compact.json`)."""
+    index_path = Path(index_path)
+    return index_path.with_name(index_path.name[:-len(index_path.suffix)] + COMPACT_PROFILE_SUFFIX)
+
+
+def mmap_io_flags() -> int:
+    """Flags de `faiss.read_index` para abrir el índice mapeado y de solo lectura."""
+    import faiss
+
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Índices planos/SQ/PQ: solo a partir de faiss 1.10
+    return flags | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+
+
+def _read_kb_fields(path: str, fields: Dict[str, str]) -> Dict[str, int]:
+    values = {}
+    try:
+        with open(path, "r", encoding="ascii", errors="replace") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    values[fields[name]] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def memory_usage() -> Dict[str, int]:
+    """
+    Memoria del proceso actual en bytes.
+
+    Returns:
+        {"rss", "rss_anon", "rss_file", "pss"} según lo que exponga el sistema
+        (Linux los da todos; en otros sistemas solo "rss" si psutil está
+        instalado; vacío si no hay forma de medirlo)
+    """
+    usage = _read_kb_fields("/proc/self/status", _STATUS_FIELDS)
+    if usage:
+        usage.update(_read_kb_fields("/proc/self/smaps_rollup", _ROLLUP_FIELDS))
+        return usage
+    try:
+        import psutil
+        return {"rss": psutil.Process().memory_info().rss}
+    except Exception:
+        return {}
+
+
+def format_memory(usage: Dict[str, int]) -> str:
+    """Resumen legible de `memory_usage()` en MB."""
+    if not usage:
+        return "sin datos"
+    labels = (("rss", "RSS"), ("rss_anon", "anon"), ("rss_file", "archivo"), ("pss", "PSS"))
+    return ", ".join(f"{label} {usage[key] / 1024 / 1024:.0f} MB" for key, label in labels if key in usage)
+
+
+def read_faiss_index(path: str, mmap: Optional[bool] = None):
+    """
+    Lee un índice FAISS, mapeado en memoria si corresponde.
+
+    Args:
+        path: Archivo `.faiss`
+        mmap: Forzar (True/False) o usar `mmap_enabled()` (None)
+
+    Returns:
+        Índice FAISS (de solo lectura si está mapeado)
+    """
+    import faiss
+
+    use_mmap = mmap_enabled() if mmap is None else mmap
+    if not use_mmap:
+        return faiss.read_index(path)
+    try:
+        return faiss.read_index(path, mmap_io_flags())
+    except RuntimeError as e:
+        # Tipos de índice que no admiten mmap: lectura normal
+        print(f"[!] No se pudo mapear {path} ({e}); se carga en memoria")
+        return faiss.read_index(path)
+
+
+def attach_rerank(index, index_path: Path, mmap: Optional[bool] = None):
+    """
+    Envuelve un índice compacto con rerank exacto si están sus vectores originales.
+
+    Returns:
+        `faiss.IndexRefine` (compacto + vectores originales mapeados) o el
+        mismo índice si no hay vectores originales o el rerank está desactivado
+    """
+    import faiss
+
+    full_path = full_vectors_path(index_path)
+    if not full_path.exists() or not rerank_enabled():
+        return index
+    k_factor = DEFAULT_RERANK_K_FACTOR
+    try:
+        with open(compact_profile_path(index_path), "r", encoding="utf-8") as f:
+            k_factor = int(json.load(f)["profile"]["rerank_k_factor"]) or DEFAULT_RERANK_K_FACTOR
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    full = read_faiss_index(str(full_path), mmap)
+    if full.ntotal != index.ntotal or full.d != index.d:
+        print(f"[!] {full_path} no corresponde al índice ({full.ntotal} vs {index.ntotal} vectores); sin rerank")
+        return index
+    refine = faiss.IndexRefine(index, full)
+    refine.k_factor = k_factor
+    return refine
+
+
+def load_faiss_local(
+    folder_path: str,
+    embeddings: Any,
+    index_name: str = "index",
+    mmap: Optional[bool] = None,
+    **kwargs
+):
+    """
+    Equivalente a `FAISS.load_local(..., allow_dangerous_deserialization=True)`
+    con el índice mapeado en memoria.
+
+    Solo debe usarse con índices propios (el docstore es un pickle).
+
+    Args:
+        folder_path: Directorio con `<index_name>.faiss` y `<index_name>.pkl`
+        embeddings: Embeddings de las consultas
+        index_name: Nombre base de los archivos
+        mmap: Forzar (True/False) o usar `mmap_enabled()` (None)
+        **kwargs: Argumentos extra del constructor de `FAISS`
+
+    Returns:
+        Vectorstore FAISS de LangChain
+    """
+    from langchain_community.vectorstores import FAISS
+
+    path = Path(folder_path)
+    use_mmap = mmap_enabled() if mmap is None else mmap
+    before = memory_usage()
+    start = time.perf_counter()
+    index_path = path / f"{index_name}.faiss"
+    base = read_faiss_index(str(index_path), use_mmap)
+    index = attach_rerank(base, index_path, use_mmap)
+    with open(path / f"{index_name}.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id, **kwargs)
+
+    after = memory_usage()
+    mode = "mmap" if use_mmap else "en memoria"
+    if index is not base:
+        mode += f", rerank exacto x{index.k_factor}"
+    print(f"[INFO] FAISS {folder_path} cargado ({mode}, {index.ntotal} vectores, "
+          f"{time.perf_counter() - start:.1f}s). Memoria antes: {format_memory(before)}; "
+          f"después: {format_memory(after)}")
+    return vectorstore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga el índice FAISS e informa del uso de memoria")
+    parser.add_argument("folder", nargs="?", default="faiss_index")
+    parser.add_argument("--no-mmap", action="store_true", help="Cargar en memoria privada (comportamiento anterior)")
+    parser.add_argument("--search", action="store_true", help="Recorrer el índice con una búsqueda tras cargarlo")
+    args = parser.parse_args()
+
+    from offline_embeddings import HashingEmbeddings
+
+    # Solo se mide la carga: las consultas no se embeben
+    vectorstore = load_faiss_local(args.folder, HashingEmbeddings(), mmap=not args.no_mmap)
+    if args.search:
+        import numpy as np
+
+        vectorstore.index.search(np.zeros((1, vectorstore.index.d), dtype="float32"), 10)
+        print(f"[INFO] Tras una búsqueda completa: {format_memory(memory_usage())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,368 +5,588 @@ Este módulo proporciona funcionalidades para obtener información geográfica
 del usuario basada en su dirección IP.
 
 Características:
-- Múltiples APIs de respaldo (ipapi.co, ip-api.com, ipinfo.io)
-- Cache de resultados para evitar llamadas repetidas
-- Manejo robusto de errores
+- Base local de rangos de IP (ip_geo_db.py) consultada primero, sin red
+- Múltiples APIs (db-ip.com, ipapi.co, ip-api.com, ipinfo.io) consultadas en
+  paralelo: gana la primera respuesta válida y el resto se descarta
+- Circuit breaker por proveedor con seguimiento de latencia y errores
+- Cache en memoria (LRU con TTL) persistido por lotes y de forma atómica
+- URLs de los proveedores configurables (pruebas con servidores locales)
 - Timeout configurable
 - Detección de IP pública
 """
 
-import requests
+import atexit
+import json
+import os
 import socket
-from typing import Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-import json
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from ip_geo_db import IPGeoDatabase, get_ip_database
+from metrics import GEO_PROVIDER_SECONDS, record_cache
+
+_USE_DEFAULT_DB = object()
+
+
+def network_lookups_enabled() -> bool:
+    """Si se permiten consultas HTTP de geolocalización (GERARD_GEO_NETWORK, default: sí)."""
+    return os.environ.get("GERARD_GEO_NETWORK", "1").lower() not in ("0", "false", "no")
+
+
+def _unknown_location(ip: str, error: str) -> Dict:
+    """Resultado por defecto cuando no se conoce la ubicación."""
+    return {
+        "ip": ip,
+        "pais": "Desconocido",
+        "ciudad": "Desconocido",
+        "region": "Desconocido",
+        "coordenadas": "N/A",
+        "codigo_pais": "N/A",
+        "timezone": "N/A",
+        "org": "N/A",
+        "error": error
+    }
+
+
+# --- Proveedores: cada uno convierte su JSON al formato común (o None) ---
+
+def _parse_dbip(ip: str, data: Dict) -> Optional[Dict]:
+    """db-ip.com (gratuito, 1000 req/día)."""
+    if 'error' in data or data.get('countryName') is None:
+        return None
+    return {
+        "ip": ip,
+        "pais": data.get("countryName", "Desconocido"),
+        "ciudad": data.get("city", "Desconocido"),
+        "region": data.get("stateProv", "Desconocido"),
+        "coordenadas": "N/A",
+        "codigo_pais": data.get("countryCode", "N/A"),
+        "timezone": "N/A",
+        "org": "N/A",
+        "fuente": "db-ip.com"
+    }
+
+
+def _parse_ipapi_co(ip: str, data: Dict) -> Optional[Dict]:
+    """ipapi.co (gratuito, 1000 req/día)."""
+    if 'error' in data:
+        return None
+    return {
+        "ip": ip,
+        "pais": data.get("country_name", "Desconocido"),
+        "ciudad": data.get("city", "Desconocido"),
+        "region": data.get("region", "Desconocido"),
+        "coordenadas": f"{data.get('latitude', 'N/A')}, {data.get('longitude', 'N/A')}",
+        "codigo_pais": data.get("country_code", "N/A"),
+        "timezone": data.get("timezone", "N/A"),
+        "org": data.get("org", "N/A"),
+        "fuente": "ipapi.co"
+    }
+
+
+def _parse_ipapi_com(ip: str, data: Dict) -> Optional[Dict]:
+    """ip-api.com (gratuito, 45 req/min)."""
+    if data.get("status") == "fail":
+        return None
+    return {
+        "ip": ip,
+        "pais": data.get("country", "Desconocido"),
+        "ciudad": data.get("city", "Desconocido"),
+        "region": data.get("regionName", "Desconocido"),
+        "coordenadas": f"{data.get('lat', 'N/A')}, {data.get('lon', 'N/A')}",
+        "codigo_pais": data.get("countryCode", "N/A"),
+        "timezone": data.get("timezone", "N/A"),
+        "org": data.get("isp", "N/A"),
+        "fuente": "ip-api.com"
+    }
+
+
+def _parse_ipinfo_io(ip: str, data: Dict) -> Optional[Dict]:
+    """ipinfo.io (gratuito, 50k req/mes)."""
+    if 'error' in data or 'bogon' in data:
+        return None
+    return {
+        "ip": ip,
+        "pais": data.get("country", "Desconocido"),
+        "ciudad": data.get("city", "Desconocido"),
+        "region": data.get("region", "Desconocido"),
+        "coordenadas": data.get("loc", "N/A"),
+        "codigo_pais": data.get("country", "N/A"),
+        "timezone": data.get("timezone", "N/A"),
+        "org": data.get("org", "N/A"),
+        "fuente": "ipinfo.io"
+    }
+
+
+PROVIDER_PARSERS: Dict[str, Callable[[str, Dict], Optional[Dict]]] = {
+    "db-ip.com": _parse_dbip,
+    "ipapi.co": _parse_ipapi_co,
+    "ip-api.com": _parse_ipapi_com,
+    "ipinfo.io": _parse_ipinfo_io,
+}
+
+# Orden = preferencia cuando varias respuestas llegan a la vez
+DEFAULT_PROVIDER_URLS: Dict[str, str] = {
+    "db-ip.com": "https://api.db-ip.com/v2/free/{ip}",
+    "ipapi.co": "https://ipapi.co/{ip}/json/",
+    "ip-api.com": "http://ip-api.com/json/{ip}",
+    "ipinfo.io": "https://ipinfo.io/{ip}/json",
+}
+
+DEFAULT_PUBLIC_IP_SERVICES: List[str] = [
+    "https://api.ipify.org?format=json",
+    "https://ipapi.co/json",
+    "http://ip-api.com/json/"
+]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de un proveedor.
+
+    Tras `failure_threshold` fallos seguidos se abre y el proveedor deja de
+    consultarse durante `reset_timeout` segundos; después deja pasar una
+    única prueba (semiabierto) que lo cierra si sale bien.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._successes = 0
+        self._failures = 0
+        self._avg_latency: Optional[float] = None
+        self._last_error = ""
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Indica si se puede consultar el proveedor ahora."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            # Abierto, o semiabierto con la prueba ya en curso
+            return False
+
+    def cancel_probe(self):
+        """
+        Devuelve a abierto un semiabierto cuya prueba se canceló sin resultado.
+
+        Sin esto el breaker quedaría semiabierto para siempre, porque allow()
+        no deja pasar otra prueba mientras crea que hay una en curso.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def _observe_latency(self, latency: float):
+        # Media móvil exponencial
+        if self._avg_latency is None:
+            self._avg_latency = latency
+        else:
+            self._avg_latency = 0.8 * self._avg_latency + 0.2 * latency
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._successes += 1
+            self._consecutive_failures = 0
+            self._state = self.CLOSED
+            self._observe_latency(latency)
+
+    def record_failure(self, latency: float, error: str = ""):
+        with self._lock:
+            self._failures += 1
+            self._consecutive_failures += 1
+            self._last_error = error
+            self._observe_latency(latency)
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estado, conteos, latencia media y último error del proveedor."""
+        with self._lock:
+            return {
+                "state": self._state,
+                "successes": self._successes,
+                "failures": self._failures,
+                "consecutive_failures": self._consecutive_failures,
+                "avg_latency": self._avg_latency,
+                "last_error": self._last_error,
+            }
+
+
+class TTLCache:
+    """
+    Cache LRU en memoria con expiración por entrada.
+
+    Los tiempos son de reloj de pared (time.time) para poder persistirlos.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[Dict, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at >= self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return dict(value)
+
+    def set(self, key: str, value: Dict, stored_at: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (dict(value), stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def items(self) -> Iterator[Tuple[str, Dict, float]]:
+        """Entradas vigentes (de la menos a la más reciente)."""
+        now = time.time()
+        with self._lock:
+            snapshot = list(self._data.items())
+        for key, (value, stored_at) in snapshot:
+            if now - stored_at < self.ttl:
+                yield key, value, stored_at
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
 
 
 class GeoLocator:
     """
     Clase para obtener información geográfica basada en IP.
     """
-    
+
     def __init__(
         self,
         cache_duration_minutes: int = 60,
-        timeout_seconds: int = 5
+        timeout_seconds: int = 5,
+        cache_file: str = "logs/.geo_cache.json",
+        provider_urls: Optional[Dict[str, str]] = None,
+        public_ip_services: Optional[List[str]] = None,
+        max_cache_entries: int = 10000,
+        persist_interval_seconds: float = 30.0,
+        persist_batch_size: int = 50,
+        failure_threshold: int = 3,
+        reset_timeout_seconds: float = 60.0,
+        local_db: Optional[IPGeoDatabase] = _USE_DEFAULT_DB,
+        network_fallback: Optional[bool] = None
     ):
         """
         Inicializa el geolocalizador.
-        
+
         Args:
             cache_duration_minutes: Duración del cache en minutos
-            timeout_seconds: Timeout para las peticiones HTTP
+            timeout_seconds: Timeout total de una consulta (todos los proveedores)
+            cache_file: Archivo donde se persiste el cache
+            provider_urls: Proveedores {nombre: plantilla de URL con {ip}}, en
+                orden de preferencia. Los nombres deben existir en PROVIDER_PARSERS.
+                Default: DEFAULT_PROVIDER_URLS
+            public_ip_services: Servicios para averiguar la IP pública
+            max_cache_entries: Entradas máximas en memoria (LRU)
+            persist_interval_seconds: Tiempo máximo con cambios sin guardar
+            persist_batch_size: Cambios acumulados que fuerzan un guardado
+            failure_threshold: Fallos seguidos que abren el circuito de un proveedor
+            reset_timeout_seconds: Tiempo con el circuito abierto antes de reintentar
+            local_db: Base de rangos de IP local. Default: la compartida del
+                proceso (None si no está instalada)
+            network_fallback: Consultar los proveedores HTTP cuando la base
+                local no conoce la IP. Default: GERARD_GEO_NETWORK (activado)
         """
         self.cache_duration = timedelta(minutes=cache_duration_minutes)
         self.timeout = timeout_seconds
-        self.cache_file = Path("logs/.geo_cache.json")
-        self.cache = self._load_cache()
-    
-    def _load_cache(self) -> Dict:
-        """Carga el cache desde el archivo."""
+        self.cache_file = Path(cache_file)
+        self.provider_urls = dict(provider_urls or DEFAULT_PROVIDER_URLS)
+        unknown = set(self.provider_urls) - set(PROVIDER_PARSERS)
+        if unknown:
+            raise ValueError(f"Proveedores sin parser: {sorted(unknown)}")
+        self.public_ip_services = list(public_ip_services or DEFAULT_PUBLIC_IP_SERVICES)
+        self.breakers = {
+            name: CircuitBreaker(name, failure_threshold, reset_timeout_seconds)
+            for name in self.provider_urls
+        }
+        self.local_db = get_ip_database() if local_db is _USE_DEFAULT_DB else local_db
+        if network_fallback is None:
+            network_fallback = network_lookups_enabled()
+        self.network_fallback = network_fallback
+        self.persist_interval = persist_interval_seconds
+        self.persist_batch_size = persist_batch_size
+
+        # Los perdedores de cada carrera terminan en segundo plano
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(4, 2 * len(self.provider_urls)),
+            thread_name_prefix="geo"
+        )
+        self._save_lock = threading.Lock()
+        self._dirty = 0
+        self._last_save = time.monotonic()
+
+        self.cache = TTLCache(self.cache_duration.total_seconds(), max_cache_entries)
+        self._load_cache()
+        atexit.register(self.flush_cache)
+
+    # --- Cache ---
+
+    def _load_cache(self):
+        """Carga las entradas vigentes del archivo de cache."""
         if not self.cache_file.exists():
-            return {}
-        
+            return
+
         try:
             with open(self.cache_file, 'r', encoding='utf-8') as f:
                 cache = json.load(f)
-                # Limpiar entradas expiradas
-                now = datetime.now()
-                valid_cache = {}
-                for key, value in cache.items():
-                    if 'timestamp' in value:
-                        cached_time = datetime.fromisoformat(value['timestamp'])
-                        if now - cached_time < self.cache_duration:
-                            valid_cache[key] = value
-                return valid_cache
-        except Exception:
-            return {}
-    
-    def _save_cache(self):
-        """Guarda el cache en el archivo."""
-        try:
-            self.cache_file.parent.mkdir(exist_ok=True)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, indent=2)
-        except Exception:
-            pass
-    
-    def _get_public_ip(self) -> Optional[str]:
-        """
-        Obtiene la dirección IP pública del usuario.
-        
-        Returns:
-            IP pública o None si no se puede obtener
-        """
-        # Lista de servicios para obtener la IP
-        ip_services = [
-            "https://api.ipify.org?format=json",
-            "https://ipapi.co/json",
-            "http://ip-api.com/json/"
-        ]
-        
-        for service in ip_services:
-            try:
-                response = requests.get(service, timeout=self.timeout)
-                if response.status_code == 200:
-                    data = response.json()
-                    # Diferentes servicios devuelven la IP con diferentes claves
-                    if 'ip' in data:
-                        return data['ip']
-                    elif 'query' in data:
-                        return data['query']
-            except Exception:
-                continue
-        
-        # Si todo falla, intentar obtener IP local (no será pública)
-        try:
-            # Truco para obtener la IP local sin conectar realmente
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-            return local_ip
-        except Exception:
-            return None
-    
+            # Las más antiguas primero para respetar el orden LRU
+            entries = []
+            for key, value in cache.items():
+                if 'timestamp' in value:
+                    stored_at = datetime.fromisoformat(value['timestamp']).timestamp()
+                    data = {k: v for k, v in value.items() if k != 'timestamp'}
+                    entries.append((stored_at, key, data))
+            for stored_at, key, data in sorted(entries, key=lambda e: e[0]):
+                self.cache.set(key, data, stored_at)
+        except Exception as e:
+            print(f"[!] No se pudo leer el cache geográfico: {e}")
 
-    def _get_location_from_dbip(self, ip: str) -> Optional[Dict]:
-        """
-        Obtiene ubicación usando db-ip.com (gratuito, 1000 req/día).
-        API más confiable y actualizada.
+    def _mark_dirty(self):
+        """Registra un cambio y guarda si toca (por lote o por tiempo)."""
+        with self._save_lock:
+            self._dirty += 1
+            due = (self._dirty >= self.persist_batch_size or
+                   time.monotonic() - self._last_save >= self.persist_interval)
+        if due:
+            self.flush_cache()
 
-        Args:
-            ip: Dirección IP
+    def flush_cache(self):
+        """Guarda el cache de forma atómica (archivo temporal + rename)."""
+        with self._save_lock:
+            if not self._dirty:
+                return
+            payload = {
+                key: {**value, 'timestamp': datetime.fromtimestamp(stored_at).isoformat()}
+                for key, value, stored_at in self.cache.items()
+            }
+            try:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.cache_file.with_name(self.cache_file.name + ".tmp")
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp, self.cache_file)
+                self._dirty = 0
+                self._last_save = time.monotonic()
+            except Exception as e:
+                print(f"[!] No se pudo guardar el cache geográfico: {e}")
 
-        Returns:
-            Diccionario con información geográfica o None
-        """
-        try:
-            url = f"https://api.db-ip.com/v2/free/{ip}"
-            response = requests.get(url, timeout=self.timeout)
+    # --- Consultas en paralelo ---
 
-            if response.status_code == 200:
-                data = response.json()
+    def _race(self, calls: List[Tuple[str, Callable[[], Any]]]) -> Any:
+        """
+        Ejecuta las funciones en paralelo y devuelve el primer resultado válido.
 
-                if 'error' in data or data.get('countryName') is None:
-                    return None
-
-                return {
-                    "ip": ip,
-                    "pais": data.get("countryName", "Desconocido"),
-                    "ciudad": data.get("city", "Desconocido"),
-                    "region": data.get("stateProv", "Desconocido"),
-                    "coordenadas": "N/A",
-                    "codigo_pais": data.get("countryCode", "N/A"),
-                    "timezone": "N/A",
-                    "org": "N/A",
-                    "fuente": "db-ip.com"
-                }
-        except Exception:
-            return None
+        Si varias terminan a la vez gana la primera de la lista. Las que
+        siguen en cola se cancelan (si eran la prueba de un breaker
+        semiabierto, éste vuelve a abierto); las que ya están en vuelo
+        terminan en segundo plano y su resultado se descarta.
 
-    def _get_location_from_ipapi_co(self, ip: str) -> Optional[Dict]:
-        """
-        Obtiene ubicación usando ipapi.co (gratuito, 1000 req/día).
-        
         Args:
-            ip: Dirección IP
-        
+            calls: Lista de (nombre, función sin argumentos que nunca lanza)
+
         Returns:
-            Diccionario con información geográfica o None
+            Primer resultado no vacío, o None si ninguno llega antes del timeout
         """
-        try:
-            url = f"https://ipapi.co/{ip}/json/"
-            response = requests.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Verificar si hay error
-                if 'error' in data:
-                    return None
-                
-                return {
-                    "ip": ip,
-                    "pais": data.get("country_name", "Desconocido"),
-                    "ciudad": data.get("city", "Desconocido"),
-                    "region": data.get("region", "Desconocido"),
-                    "coordenadas": f"{data.get('latitude', 'N/A')}, {data.get('longitude', 'N/A')}",
-                    "codigo_pais": data.get("country_code", "N/A"),
-                    "timezone": data.get("timezone", "N/A"),
-                    "org": data.get("org", "N/A"),
-                    "fuente": "ipapi.co"
-                }
-        except Exception:
+        if not calls:
             return None
-    
+        order = {}
+        names = {}
+        for position, (name, func) in enumerate(calls):
+            future = self._executor.submit(func)
+            order[future] = position
+            names[future] = name
+        pending = set(order)
+        deadline = time.monotonic() + self.timeout
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=order.get):
+                    result = future.result()
+                    if result:
+                        return result
+        finally:
+            for future in pending:
+                breaker = self.breakers.get(names[future])
+                if future.cancel() and breaker is not None:
+                    breaker.cancel_probe()
+        return None
 
-    def _get_location_from_dbip(self, ip: str) -> Optional[Dict]:
+    def _query_provider(self, name: str, ip: str) -> Optional[Dict]:
         """
-        Obtiene ubicación usando db-ip.com (gratuito, 1000 req/día).
-        API más confiable y actualizada.
+        Consulta un proveedor y actualiza su circuit breaker.
 
-        Args:
-            ip: Dirección IP
-
-        Returns:
-            Diccionario con información geográfica o None
+        Una respuesta 200 sin datos para la IP cuenta como proveedor sano;
+        errores de red, timeouts, códigos distintos de 200 o JSON inválido
+        cuentan como fallo.
         """
+        breaker = self.breakers[name]
+        start = time.perf_counter()
         try:
-            url = f"https://api.db-ip.com/v2/free/{ip}"
-            response = requests.get(url, timeout=self.timeout)
-
-            if response.status_code == 200:
-                data = response.json()
-
-                if 'error' in data or data.get('countryName') is None:
-                    return None
-
-                return {
-                    "ip": ip,
-                    "pais": data.get("countryName", "Desconocido"),
-                    "ciudad": data.get("city", "Desconocido"),
-                    "region": data.get("stateProv", "Desconocido"),
-                    "coordenadas": "N/A",
-                    "codigo_pais": data.get("countryCode", "N/A"),
-                    "timezone": "N/A",
-                    "org": "N/A",
-                    "fuente": "db-ip.com"
-                }
-        except Exception:
+            response = requests.get(self.provider_urls[name].format(ip=ip), timeout=self.timeout)
+            if response.status_code != 200:
+                raise requests.HTTPError(f"HTTP {response.status_code}")
+            result = PROVIDER_PARSERS[name](ip, response.json())
+        except Exception as e:
+            latency = time.perf_counter() - start
+            breaker.record_failure(latency, f"{type(e).__name__}: {e}")
+            GEO_PROVIDER_SECONDS.observe(latency, provider=name, result="error")
             return None
 
-    def _get_location_from_ipapi_com(self, ip: str) -> Optional[Dict]:
-        """
-        Obtiene ubicación usando ip-api.com (gratuito, 45 req/min).
-        
-        Args:
-            ip: Dirección IP
-        
-        Returns:
-            Diccionario con información geográfica o None
-        """
+        latency = time.perf_counter() - start
+        breaker.record_success(latency)
+        GEO_PROVIDER_SECONDS.observe(latency, provider=name, result="ok" if result else "empty")
+        return result
+
+    def _fetch_public_ip(self, service: str) -> Optional[str]:
         try:
-            url = f"http://ip-api.com/json/{ip}"
-            response = requests.get(url, timeout=self.timeout)
-            
+            response = requests.get(service, timeout=self.timeout)
             if response.status_code == 200:
                 data = response.json()
-                
-                # Verificar si hay error
-                if data.get("status") == "fail":
-                    return None
-                
-                return {
-                    "ip": ip,
-                    "pais": data.get("country", "Desconocido"),
-                    "ciudad": data.get("city", "Desconocido"),
-                    "region": data.get("regionName", "Desconocido"),
-                    "coordenadas": f"{data.get('lat', 'N/A')}, {data.get('lon', 'N/A')}",
-                    "codigo_pais": data.get("countryCode", "N/A"),
-                    "timezone": data.get("timezone", "N/A"),
-                    "org": data.get("isp", "N/A"),
-                    "fuente": "ip-api.com"
-                }
+                # Diferentes servicios devuelven la IP con diferentes claves
+                return data.get('ip') or data.get('query')
         except Exception:
-            return None
-    
-    def _get_location_from_ipinfo_io(self, ip: str) -> Optional[Dict]:
+            pass
+        return None
+
+    def _get_public_ip(self) -> Optional[str]:
         """
-        Obtiene ubicación usando ipinfo.io (gratuito, 50k req/mes).
-        
-        Args:
-            ip: Dirección IP
-        
+        Obtiene la dirección IP pública del usuario.
+
         Returns:
-            Diccionario con información geográfica o None
+            IP pública o None si no se puede obtener
         """
+        ip = self._race([
+            (service, lambda service=service: self._fetch_public_ip(service))
+            for service in self.public_ip_services
+        ])
+        if ip:
+            return ip
+
+        # Si todo falla, intentar obtener IP local (no será pública)
         try:
-            url = f"https://ipinfo.io/{ip}/json"
-            response = requests.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Separar ciudad y región
-                city = data.get("city", "Desconocido")
-                region = data.get("region", "Desconocido")
-                
-                return {
-                    "ip": ip,
-                    "pais": data.get("country", "Desconocido"),
-                    "ciudad": city,
-                    "region": region,
-                    "coordenadas": data.get("loc", "N/A"),
-                    "codigo_pais": data.get("country", "N/A"),
-                    "timezone": data.get("timezone", "N/A"),
-                    "org": data.get("org", "N/A"),
-                    "fuente": "ipinfo.io"
-                }
+            # Truco para obtener la IP local sin conectar realmente
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.connect(("8.8.8.8", 80))
+            local_ip = s.getsockname()[0]
+            s.close()
+            return local_ip
         except Exception:
             return None
-    
+
     def get_location(self, ip: Optional[str] = None) -> Dict:
         """
         Obtiene la información geográfica del usuario.
-        
+
         Args:
             ip: IP específica a consultar. Si None, obtiene la IP pública actual.
-        
+
         Returns:
             Diccionario con información geográfica
         """
         # Si no se proporciona IP, obtener la pública
         if ip is None:
             ip = self._get_public_ip()
-        
+
         if not ip:
-            return {
-                "ip": "Desconocido",
-                "pais": "Desconocido",
-                "ciudad": "Desconocido",
-                "region": "Desconocido",
-                "coordenadas": "N/A",
-                "codigo_pais": "N/A",
-                "timezone": "N/A",
-                "org": "N/A",
-                "error": "No se pudo obtener la IP"
-            }
-        
+            return _unknown_location("Desconocido", "No se pudo obtener la IP")
+
+        # Base local: microsegundos y sin red
+        if self.local_db is not None:
+            local = self.local_db.lookup(ip)
+            if local is not None:
+                return local
+
         # Verificar cache
-        if ip in self.cache:
-            cached_data = self.cache[ip]
-            cached_time = datetime.fromisoformat(cached_data['timestamp'])
-            if datetime.now() - cached_time < self.cache_duration:
-                # Retornar datos del cache (sin el timestamp)
-                result = {k: v for k, v in cached_data.items() if k != 'timestamp'}
-                return result
-        
-        # Intentar obtener ubicación con diferentes servicios
-        location_data = None
-        
-        # Prioridad de servicios (DB-IP primero por ser más confiable)
-        services = [
-            self._get_location_from_dbip,
-            self._get_location_from_ipapi_co,
-            self._get_location_from_ipapi_com,
-            self._get_location_from_ipinfo_io
-        ]
-        
-        for service in services:
-            location_data = service(ip)
-            if location_data:
-                break
-        
+        cached = self.cache.get(ip)
+        if cached is not None:
+            record_cache("geo", hit=True)
+            return cached
+
+        record_cache("geo", hit=False)
+
+        if not self.network_fallback:
+            return _unknown_location(ip, "IP fuera de la base local")
+
+        # Consultar en paralelo los proveedores con el circuito cerrado
+        location_data = self._race([
+            (name, lambda name=name: self._query_provider(name, ip))
+            for name in self.provider_urls
+            if self.breakers[name].allow()
+        ])
+
         # Si no se pudo obtener, retornar datos básicos
         if not location_data:
-            location_data = {
-                "ip": ip,
-                "pais": "Desconocido",
-                "ciudad": "Desconocido",
-                "region": "Desconocido",
-                "coordenadas": "N/A",
-                "codigo_pais": "N/A",
-                "timezone": "N/A",
-                "org": "N/A",
-                "error": "No se pudo obtener información geográfica"
-            }
-        
-        # Guardar en cache con timestamp
-        cache_data = location_data.copy()
-        cache_data['timestamp'] = datetime.now().isoformat()
-        self.cache[ip] = cache_data
-        self._save_cache()
-        
+            location_data = _unknown_location(ip, "No se pudo obtener información geográfica")
+
+        self.cache.set(ip, location_data)
+        self._mark_dirty()
+
         return location_data
-    
+
+    def provider_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Estado del circuit breaker de cada proveedor.
+
+        Returns:
+            {proveedor: {state, successes, failures, avg_latency, ...}}
+        """
+        return {name: breaker.get_stats() for name, breaker in self.breakers.items()}
+
     def get_location_by_hostname(self, hostname: str) -> Dict:
         """
         Obtiene la ubicación basada en un hostname.
-        
+
         Args:
             hostname: Nombre del host (ej: "google.com")
-        
+
         Returns:
             Diccionario con información geográfica
         """
@@ -374,31 +594,21 @@ class GeoLocator:
             ip = socket.gethostbyname(hostname)
             return self.get_location(ip)
         except Exception as e:
-            return {
-                "ip": "Desconocido",
-                "pais": "Desconocido",
-                "ciudad": "Desconocido",
-                "region": "Desconocido",
-                "coordenadas": "N/A",
-                "codigo_pais": "N/A",
-                "timezone": "N/A",
-                "org": "N/A",
-                "error": f"No se pudo resolver el hostname: {str(e)}"
-            }
-    
+            return _unknown_location("Desconocido", f"No se pudo resolver el hostname: {str(e)}")
+
     def is_local_ip(self, ip: str) -> bool:
         """
         Verifica si una IP es local/privada.
-        
+
         Args:
             ip: Dirección IP a verificar
-        
+
         Returns:
             True si es IP local, False si es pública
         """
         if not ip:
             return False
-        
+
         # Rangos de IPs privadas
         private_ranges = [
             "127.",  # Loopback
@@ -410,12 +620,14 @@ class GeoLocator:
             "192.168.",  # Clase C privada
             "169.254."   # Link-local
         ]
-        
+
         return any(ip.startswith(prefix) for prefix in private_ranges)
-    
+
     def clear_cache(self):
         """Limpia el cache de geolocalización."""
-        self.cache = {}
+        self.cache.clear()
+        with self._save_lock:
+            self._dirty = 0
         if self.cache_file.exists():
             self.cache_file.unlink()
 
@@ -424,7 +636,7 @@ class GeoLocator:
 def get_current_location() -> Dict:
     """
     Obtiene la ubicación geográfica actual de forma rápida.
-    
+
     Returns:
         Diccionario con información geográfica
     """
@@ -436,19 +648,22 @@ def get_current_location() -> Dict:
 if __name__ == "__main__":
     print("Probando GeoLocator...")
     locator = GeoLocator()
-    
+
     print("\n1. Obteniendo ubicación actual:")
     location = locator.get_location()
     print(json.dumps(location, indent=2, ensure_ascii=False))
-    
+
     print("\n2. Verificando cache (segunda llamada):")
     location2 = locator.get_location()
     print(json.dumps(location2, indent=2, ensure_ascii=False))
-    
+
     print("\n3. Probando con IP específica (8.8.8.8 - Google DNS):")
     google_location = locator.get_location("8.8.8.8")
     print(json.dumps(google_location, indent=2, ensure_ascii=False))
-    
+
     print("\n4. Probando detección de IP local:")
     print(f"¿127.0.0.1 es local? {locator.is_local_ip('127.0.0.1')}")
     print(f"¿8.8.8.8 es local? {locator.is_local_ip('8.8.8.8')}")
+
+    print("\n5. Estado de los proveedores:")
+    print(json.dumps(locator.provider_stats(), indent=2, ensure_ascii=False))
@@ -11,6 +11,7 @@ Caracteristicas:
 - Acceso desde cualquier dispositivo
 - Actualizacion en tiempo real
 - Sin limites de almacenamiento (hasta 10M celdas)
+- Envio asincrono por lotes con spool local (ver sheets_writer.py)
 
 Configuracion:
 1. Crear un proyecto en Google Cloud Console
@@ -23,9 +24,13 @@ Configuracion:
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+import atexit
 import json
 import os
+import threading
+
+from sheets_writer import SheetsBatchWriter
 
 
 class GoogleSheetsLogger:
@@ -37,7 +42,9 @@ class GoogleSheetsLogger:
         self,
         credentials_file: str = "google_credentials.json",
         spreadsheet_name: str = "GERARD - Logs de Usuarios",
-        worksheet_name: str = "Interacciones"
+        worksheet_name: str = "Interacciones",
+        async_writes: bool = True,
+        spool_file: str = "logs/.sheets_spool.jsonl"
     ):
         """
         Inicializa el logger de Google Sheets.
@@ -46,6 +53,9 @@ class GoogleSheetsLogger:
             credentials_file: Ruta al archivo JSON de credenciales
             spreadsheet_name: Nombre de la hoja de calculo
             worksheet_name: Nombre de la pestana/worksheet
+            async_writes: Si True, las filas se envian en lotes desde un hilo
+                de fondo; si False, se usa append_row dentro de la peticion
+            spool_file: Archivo local con las filas pendientes de envio
         """
         self.credentials_file = credentials_file
         self.spreadsheet_name = spreadsheet_name
@@ -53,9 +63,61 @@ class GoogleSheetsLogger:
         self.client = None
         self.worksheet = None
         self.enabled = False
+        self.configured = False
+        self.last_error: Optional[str] = None
+        self._needs_reconnect = False
+        # Serializa las reconexiones del hilo de la peticion y del escritor
+        self._connect_lock = threading.RLock()
         
         # Intentar conectar
         self._connect()
+        
+        self.writer: Optional[SheetsBatchWriter] = None
+        if async_writes:
+            self.writer = SheetsBatchWriter(
+                worksheet_provider=self._worksheet_for_writer,
+                spool_file=spool_file,
+                on_error=self._on_write_error
+            )
+            if self.configured:
+                # Reenviar filas que quedaron pendientes en una ejecucion anterior
+                # (si no hay conexion, el escritor reintenta con backoff)
+                self.writer.start()
+            atexit.register(self.writer.stop)
+    
+    @property
+    def accepts_rows(self) -> bool:
+        """
+        Indica si log_interaction guarda las filas.
+
+        Con el escritor asincrono las filas se encolan en el spool aunque la
+        hoja no este conectada: el hilo de fondo reconecta y las envia.
+        """
+        return self.enabled or (self.writer is not None and self.configured)
+    
+    def reconnect(self):
+        """Vuelve a autorizar y abrir la hoja tras una pérdida de conexión."""
+        with self._connect_lock:
+            self.client = None
+            self.worksheet = None
+            self.enabled = False
+            self._connect()
+    
+    def _worksheet_for_writer(self):
+        """Worksheet para el hilo de escritura; reconecta si el ultimo envio fallo."""
+        with self._connect_lock:
+            if self._needs_reconnect or self.worksheet is None:
+                self._needs_reconnect = False
+                self.reconnect()
+            worksheet = self.worksheet
+        if worksheet is None:
+            raise RuntimeError(self.last_error or "Google Sheets no conectado")
+        return worksheet
+    
+    def _on_write_error(self, error: Exception):
+        """Callback del escritor: fuerza reconexion en el proximo intento."""
+        self.last_error = str(error)
+        self._needs_reconnect = True
     
     def _connect(self):
         """Conecta con Google Sheets."""
@@ -117,6 +179,7 @@ class GoogleSheetsLogger:
             if creds is None:
                 print("[DEBUG] Intentando cargar desde archivo local...")
                 if not os.path.exists(self.credentials_file):
+                    self.configured = False
                     print(f"[!] Google Sheets Logger: Archivo de credenciales no encontrado: {self.credentials_file}")
                     print("    Para activar Google Sheets, sigue las instrucciones en GOOGLE_SHEETS_SETUP.md")
                     return
@@ -128,6 +191,7 @@ class GoogleSheetsLogger:
                     scope
                 )
             
+            self.configured = True
             self.client = gspread.authorize(creds)
             
             # Leer SHEET_ID y SHEET_NAME desde secrets si están disponibles
@@ -170,9 +234,11 @@ class GoogleSheetsLogger:
                 self._setup_headers()
             
             self.enabled = True
+            self.last_error = None
             print(f"[OK] Google Sheets Logger conectado exitosamente: {self.spreadsheet_name}")
             
         except Exception as e:
+            self.last_error = str(e)
             print(f"[!] Error conectando con Google Sheets: {e}")
             print("    El logging continuara localmente sin Google Sheets")
     
@@ -203,6 +269,69 @@ class GoogleSheetsLogger:
             'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9}
         })
     
+    def _build_row(
+        self,
+        interaction_id: str,
+        user: str,
+        question: str,
+        answer: str,
+        device_info: Optional[Dict] = None,
+        location_info: Optional[Dict] = None,
+        timing: Optional[Dict] = None,
+        success: bool = True,
+        error: Optional[str] = None
+    ) -> List:
+        """Construye la fila de la hoja para una interaccion."""
+        # Preparar datos
+        timestamp = datetime.now()
+        timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Informacion del dispositivo
+        device_type = "Desconocido"
+        browser = "Desconocido"
+        os_type = "Desconocido"
+        
+        if device_info:
+            device_type = device_info.get("device_type", "Desconocido")
+            browser = device_info.get("browser", "Desconocido")
+            os_type = device_info.get("os", "Desconocido")
+        
+        # Informacion de ubicacion
+        city = "Desconocida"
+        country = "Desconocido"
+        ip = "No disponible"
+        
+        if location_info:
+            city = location_info.get("city", "Desconocida")
+            country = location_info.get("country", "Desconocido")
+            ip = location_info.get("ip", "No disponible")
+        
+        # Tiempo de respuesta
+        response_time = 0
+        if timing:
+            response_time = timing.get("total_time", 0)
+        
+        # Estado
+        status = "[OK] Exitoso" if success else "[ERROR] Error"
+        error_msg = error if error else ""
+        
+        return [
+            interaction_id,
+            timestamp_str,
+            user,
+            question,
+            answer,  # Respuesta completa (sin límite de caracteres)
+            device_type,
+            browser,
+            os_type,
+            city,
+            country,
+            ip,
+            f"{response_time:.2f}",
+            status,
+            error_msg
+        ]
+    
     def log_interaction(
         self,
         interaction_id: str,
@@ -218,6 +347,9 @@ class GoogleSheetsLogger:
         """
         Registra una interaccion en Google Sheets.
         
+        Con el escritor asincrono la fila se encola aunque la hoja este
+        desconectada; se envia cuando el hilo de fondo logra reconectar.
+        
         Args:
             interaction_id: ID unico de la interaccion
             user: Nombre del usuario
@@ -229,63 +361,20 @@ class GoogleSheetsLogger:
             success: Si fue exitosa
             error: Mensaje de error si aplica
         """
-        if not self.enabled:
+        if not self.accepts_rows:
             return
         
         try:
-            # Preparar datos
-            timestamp = datetime.now()
-            timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            row = self._build_row(
+                interaction_id, user, question, answer,
+                device_info, location_info, timing, success, error
+            )
             
-            # Informacion del dispositivo
-            device_type = "Desconocido"
-            browser = "Desconocido"
-            os_type = "Desconocido"
-            
-            if device_info:
-                device_type = device_info.get("device_type", "Desconocido")
-                browser = device_info.get("browser", "Desconocido")
-                os_type = device_info.get("os", "Desconocido")
-            
-            # Informacion de ubicacion
-            city = "Desconocida"
-            country = "Desconocido"
-            ip = "No disponible"
-            
-            if location_info:
-                city = location_info.get("city", "Desconocida")
-                country = location_info.get("country", "Desconocido")
-                ip = location_info.get("ip", "No disponible")
-            
-            # Tiempo de respuesta
-            response_time = 0
-            if timing:
-                response_time = timing.get("total_time", 0)
-            
-            # Guardar la respuesta completa (sin límite de caracteres)
-            answer_full = answer
-            
-            # Estado
-            status = "[OK] Exitoso" if success else "[ERROR] Error"
-            error_msg = error if error else ""
-            
-            # Crear fila
-            row = [
-                interaction_id,
-                timestamp_str,
-                user,
-                question,
-                answer_full,  # Respuesta completa
-                device_type,
-                browser,
-                os_type,
-                city,
-                country,
-                ip,
-                f"{response_time:.2f}",
-                status,
-                error_msg
-            ]
+            if self.writer is not None:
+                # Sin E/S de red: el hilo de fondo envia el lote
+                self.writer.enqueue(row)
+                print(f"[INFO] Interaccion encolada para Google Sheets: {user} - {question[:50]}...")
+                return
             
             # Agregar fila a la hoja
             self.worksheet.append_row(row)
@@ -293,6 +382,10 @@ class GoogleSheetsLogger:
             print(f"[OK] Interaccion registrada en Google Sheets: {user} - {question[:50]}...")
             
         except Exception as e:
+            # Marcar como deshabilitado para que el contenedor de servicios
+            # reconecte de forma perezosa en la próxima consulta
+            self.enabled = False
+            self.last_error = str(e)
             print(f"[!] Error registrando en Google Sheets: {e}")
     
     def get_stats(self) -> Dict:
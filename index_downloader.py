@@ -0,0 +1,517 @@
+"""
+Descarga Reanudable del Índice FAISS para GERARD
+
+Reemplaza la descarga en memoria (BytesIO) de `faiss_index.zip` por una
+descarga a disco que sobrevive a cortes de conexión y nunca deja un índice a
+medio instalar en `faiss_index/`.
+
+Características:
+- Descarga por streaming a un archivo `.part` en disco (memoria constante)
+- Reanudación con HTTP Range: el estado (tamaño, ETag, avance por segmento)
+  se guarda junto al `.part`; si el archivo remoto cambió, se reinicia
+- Segmentos en paralelo (Range) cuando el servidor lo admite
+- Reintentos con backoff exponencial que continúan desde el último byte
+- Verificación SHA-256 contra un manifiesto publicado (`<url>.sha256` en
+  formato sha256sum, o JSON con hashes del zip y de cada archivo extraído);
+  `build_manifest` genera el JSON que publica upload_faiss_to_release.py
+- Extracción miembro a miembro desde el zip en disco (sin cargarlo en
+  memoria), calculando el hash de cada archivo mientras se escribe; el
+  directorio central del zip está al final, así que la extracción empieza
+  cuando termina la descarga
+- Instalación atómica: se extrae en un directorio temporal junto al destino,
+  se escribe el marcador y recién entonces se renombra a `faiss_index/`
+
+Uso:
+    downloader = IndexDownloader(FAISS_URL, "faiss_index", segments=4)
+    downloader.ensure()
+    python index_downloader.py <url> [--target faiss_index] [--segments 4] [--sha256 HEX]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+MARKER_FILE = ".faiss_ready"
+REQUIRED_FILES = ("index.faiss", "index.pkl")
+CHUNK_SIZE = 1024 * 1024
+STATE_SAVE_EVERY = 8 * 1024 * 1024
+
+
+class IndexDownloadError(RuntimeError):
+    """La descarga o la instalación del índice falló."""
+
+
+class ChecksumMismatchError(IndexDownloadError):
+    """El SHA-256 del archivo no coincide con el del manifiesto."""
+
+
+class _RangeIgnoredError(IndexDownloadError):
+    """El servidor respondió 200 a una petición con Range (no se puede reanudar)."""
+
+
+def sha256_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """SHA-256 de un archivo leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_manifest(text: str, archive_name: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    Interpreta un manifiesto de hashes.
+
+    Admite el formato de `sha256sum` ("<hex>  <archivo>" por línea) y JSON:
+        {"archive": {"name": "faiss_index.zip", "sha256": "..."},
+         "files": {"index.faiss": "...", "index.pkl": "..."}}
+
+    Args:
+        text: Contenido del manifiesto
+        archive_name: Nombre del zip (para elegir la línea correcta)
+
+    Returns:
+        (sha256 del zip o None, {archivo extraído: sha256})
+    """
+    text = text.strip()
+    if text.startswith("{"):
+        data = json.loads(text)
+        archive = data.get("archive") or {}
+        files = {name: value.lower() for name, value in (data.get("files") or {}).items()}
+        archive_hash = archive.get("sha256") if isinstance(archive, dict) else archive
+        return (archive_hash.lower() if archive_hash else None), files
+
+    archive_hash, files = None, {}
+    for line in text.splitlines():
+        parts = line.strip().split(None, 1)
+        if not parts:
+            continue
+        digest = parts[0].lower()
+        name = parts[1].lstrip("*").strip() if len(parts) > 1 else ""
+        if not name or os.path.basename(name) == archive_name:
+            archive_hash = digest
+        else:
+            files[name] = digest
+    return archive_hash, files
+
+
+def build_manifest(archive: Path, archive_name: Optional[str] = None) -> Dict[str, object]:
+    """
+    Genera el manifiesto JSON que publica el script de release junto al zip.
+
+    Los hashes de cada archivo se calculan leyendo los miembros del zip, así
+    coinciden con lo que `_extract` escribe al instalar.
+
+    Args:
+        archive: Zip del índice
+        archive_name: Nombre publicado del zip (por defecto el del archivo)
+
+    Returns:
+        {"archive": {"name": ..., "sha256": ...}, "files": {miembro: sha256}}
+    """
+    archive = Path(archive)
+    files = {}
+    with zipfile.ZipFile(archive) as zf:
+        for member in zf.infolist():
+            if member.is_dir():
+                continue
+            digest = hashlib.sha256()
+            with zf.open(member) as src:
+                for block in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    digest.update(block)
+            files[member.filename] = digest.hexdigest()
+    return {
+        "archive": {"name": archive_name or archive.name, "sha256": sha256_file(archive)},
+        "files": files,
+    }
+
+
+def index_ready(target_dir: str) -> bool:
+    """Indica si hay un índice instalado completo (marcador + archivos)."""
+    path = Path(target_dir)
+    return (path / MARKER_FILE).exists() and all((path / name).exists() for name in REQUIRED_FILES)
+
+
+class _DownloadState:
+    """Avance de la descarga guardado junto al `.part` (JSON, escritura atómica)."""
+
+    def __init__(self, path: Path, url: str, size: int, validator: str, segments: List[List[int]]):
+        self.path = path
+        self.url = url
+        self.size = size
+        self.validator = validator
+        # [inicio, fin inclusivo (-1 si se desconoce), bytes ya escritos]
+        self.segments = segments
+        self.lock = threading.Lock()
+        self._unsaved = 0
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["_DownloadState"]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(path, data["url"], data["size"], data["validator"], data["segments"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self):
+        data = {"url": self.url, "size": self.size, "validator": self.validator, "segments": self.segments}
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def advance(self, index: int, nbytes: int):
+        """Suma bytes escritos a un segmento; guarda cada STATE_SAVE_EVERY bytes."""
+        with self.lock:
+            self.segments[index][2] += nbytes
+            self._unsaved += nbytes
+            if self._unsaved >= STATE_SAVE_EVERY:
+                self._unsaved = 0
+                self.save()
+
+    @property
+    def downloaded(self) -> int:
+        return sum(segment[2] for segment in self.segments)
+
+
+class IndexDownloader:
+    """
+    Descarga, verifica e instala el zip del índice FAISS.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        target_dir: str = "faiss_index",
+        manifest_url: Optional[str] = "",
+        expected_sha256: Optional[str] = None,
+        require_checksum: bool = False,
+        segments: int = 4,
+        min_segment_bytes: int = 16 * 1024 * 1024,
+        timeout_seconds: float = 60.0,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+        chunk_size: int = CHUNK_SIZE,
+        progress_callback: Optional[Callable[[int], None]] = None
+    ):
+        """
+        Inicializa el descargador.
+
+        Args:
+            url: URL del zip del índice
+            target_dir: Directorio de instalación
+            manifest_url: Manifiesto SHA-256 ("" = `<url>.sha256`, None = no buscarlo)
+            expected_sha256: Hash del zip fijado por configuración (prioridad sobre el manifiesto)
+            require_checksum: Fallar si no hay hash con qué verificar
+            segments: Segmentos en paralelo (1 = un solo stream)
+            min_segment_bytes: Tamaño mínimo de cada segmento
+            timeout_seconds: Timeout de conexión/lectura por petición
+            max_retries: Reintentos por segmento (cada uno continúa donde quedó)
+            backoff_seconds: Espera base entre reintentos (se duplica)
+            chunk_size: Bytes por escritura
+            progress_callback: Recibe el porcentaje descargado (0-100)
+        """
+        self.url = url
+        self.target_dir = Path(target_dir)
+        self.manifest_url = url + ".sha256" if manifest_url == "" else manifest_url
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.require_checksum = require_checksum
+        self.segments = max(1, segments)
+        self.min_segment_bytes = min_segment_bytes
+        self.timeout = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff = backoff_seconds
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+
+        self.archive_name = os.path.basename(url.split("?", 1)[0]) or "index.zip"
+        self.work_dir = self.target_dir.parent / f".{self.target_dir.name}.download"
+        self.part_path = self.work_dir / (self.archive_name + ".part")
+        self.state_path = self.work_dir / (self.archive_name + ".state.json")
+        self._last_progress = -1
+
+    # --- Utilidades HTTP ---
+
+    def _probe(self) -> Tuple[int, bool, str]:
+        """
+        Consulta tamaño, soporte de Range y validador (ETag/Last-Modified).
+
+        Returns:
+            (tamaño o -1, acepta Range, validador)
+        """
+        with requests.get(self.url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified") or ""
+            if response.status_code == 206:
+                total = response.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+                return (int(total) if total.isdigit() else -1), True, validator
+            return int(response.headers.get("Content-Length") or -1), False, validator
+
+    def _report_progress(self, state: _DownloadState):
+        if not self.progress_callback or state.size <= 0:
+            return
+        percent = min(100, int(state.downloaded * 100 / state.size))
+        with state.lock:
+            if percent <= self._last_progress:
+                return
+            self._last_progress = percent
+        self.progress_callback(percent)
+
+    def _fetch_segment(self, state: _DownloadState, index: int, ranged: bool):
+        """Descarga un segmento al `.part`, reintentando desde el último byte escrito."""
+        attempt = 0
+        while True:
+            start, end, done = state.segments[index]
+            if end >= 0 and start + done > end:
+                return
+            if not ranged and done:
+                # Sin Range solo se puede volver a empezar
+                with state.lock:
+                    state.segments[index][2] = done = 0
+            headers = {}
+            if ranged:
+                headers["Range"] = f"bytes={start + done}-{end if end >= 0 else ''}"
+            try:
+                with requests.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    if ranged and response.status_code != 206:
+                        raise _RangeIgnoredError(f"El servidor ignoró Range (HTTP {response.status_code})")
+                    with open(self.part_path, "r+b") as f:
+                        f.seek(start + done)
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            if end >= 0:
+                                chunk = chunk[:end + 1 - (start + state.segments[index][2])]
+                            if not chunk:
+                                continue
+                            f.write(chunk)
+                            state.advance(index, len(chunk))
+                            self._report_progress(state)
+                start, end, done = state.segments[index]
+                if end >= 0 and start + done <= end:
+                    raise IndexDownloadError(f"Conexión cerrada en el byte {start + done} de {end + 1}")
+                return
+            except (requests.RequestException, IndexDownloadError) as e:
+                attempt += 1
+                with state.lock:
+                    state.save()
+                if attempt > self.max_retries or isinstance(e, _RangeIgnoredError):
+                    raise IndexDownloadError(f"Segmento {index} falló tras {attempt} intentos: {e}") from e
+                wait = self.backoff * (2 ** (attempt - 1))
+                print(f"[!] Descarga interrumpida ({e}); reintentando en {wait:.1f}s desde el byte "
+                      f"{state.segments[index][0] + state.segments[index][2]}")
+                time.sleep(wait)
+
+    # --- Descarga ---
+
+    def _plan_segments(self, size: int, ranged: bool) -> List[List[int]]:
+        if size <= 0 or not ranged:
+            return [[0, size - 1 if size > 0 else -1, 0]]
+        count = max(1, min(self.segments, size // max(1, self.min_segment_bytes)))
+        step = -(-size // count)
+        return [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+
+    def download(self) -> Path:
+        """
+        Descarga el zip al `.part` (reanudando si hay un avance compatible).
+
+        Returns:
+            Ruta del archivo descargado completo
+        """
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        size, ranged, validator = self._probe()
+
+        state = _DownloadState.load(self.state_path)
+        resumable = (
+            state is not None and ranged and self.part_path.exists()
+            and state.url == self.url and state.size == size and state.validator == validator
+        )
+        if resumable:
+            print(f"[INFO] Reanudando descarga: {state.downloaded // (1024 * 1024)} MB ya en disco")
+        else:
+            state = _DownloadState(self.state_path, self.url, size, validator, self._plan_segments(size, ranged))
+            with open(self.part_path, "wb") as f:
+                if size > 0:
+                    f.truncate(size)
+            state.save()
+
+        pending = [i for i, (start, end, done) in enumerate(state.segments) if end < 0 or start + done <= end]
+        if len(pending) == 1:
+            self._fetch_segment(state, pending[0], ranged)
+        elif pending:
+            errors: List[BaseException] = []
+
+            def run(index: int):
+                try:
+                    self._fetch_segment(state, index, ranged)
+                except BaseException as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=run, args=(i,), name=f"index-dl-{i}", daemon=True) for i in pending]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if errors:
+                raise errors[0]
+
+        with state.lock:
+            state.save()
+        if size > 0 and state.downloaded != size:
+            raise IndexDownloadError(f"Descarga incompleta: {state.downloaded} de {size} bytes")
+        self._report_progress(state)
+        return self.part_path
+
+    # --- Verificación e instalación ---
+
+    def _fetch_manifest(self) -> Tuple[Optional[str], Dict[str, str]]:
+        if not self.manifest_url:
+            return None, {}
+        try:
+            response = requests.get(self.manifest_url, timeout=self.timeout)
+            if response.status_code == 404:
+                return None, {}
+            response.raise_for_status()
+            return parse_manifest(response.text, self.archive_name)
+        except (requests.RequestException, ValueError) as e:
+            print(f"[!] No se pudo leer el manifiesto SHA-256 ({e})")
+            return None, {}
+
+    def verify(self, archive: Path, expected: Optional[str]):
+        """Comprueba el SHA-256 del zip; si no coincide borra el `.part` y su estado."""
+        if not expected:
+            if self.require_checksum:
+                raise IndexDownloadError("No hay SHA-256 publicado para verificar el índice")
+            print("[!] Índice sin manifiesto SHA-256: se instala sin verificar integridad")
+            return
+        actual = sha256_file(archive)
+        if actual != expected:
+            self._cleanup_download()
+            raise ChecksumMismatchError(f"SHA-256 del índice no coincide: {actual} != {expected}")
+        print("[OK] SHA-256 del índice verificado")
+
+    def _extract(self, archive: Path, destination: Path, file_hashes: Dict[str, str]):
+        """Extrae miembro a miembro (streaming desde disco) verificando hashes por archivo."""
+        root = destination.resolve()
+        with zipfile.ZipFile(archive) as zf:
+            for member in zf.infolist():
+                if member.is_dir():
+                    continue
+                # El zip puede traer los archivos dentro de una carpeta faiss_index/
+                name = member.filename
+                if name.startswith(self.target_dir.name + "/"):
+                    name = name[len(self.target_dir.name) + 1:]
+                out_path = (destination / name).resolve()
+                if root not in out_path.parents:
+                    raise IndexDownloadError(f"Ruta no permitida en el zip: {member.filename}")
+                out_path.parent.mkdir(parents=True, exist_ok=True)
+                digest = hashlib.sha256()
+                with zf.open(member) as src, open(out_path, "wb") as dst:
+                    for block in iter(lambda: src.read(self.chunk_size), b""):
+                        digest.update(block)
+                        dst.write(block)
+                expected = file_hashes.get(name) or file_hashes.get(member.filename)
+                if expected and digest.hexdigest() != expected:
+                    raise ChecksumMismatchError(f"SHA-256 de {name} no coincide")
+
+    def install(self, archive: Path, file_hashes: Optional[Dict[str, str]] = None) -> Path:
+        """
+        Extrae en un directorio temporal y lo renombra a `target_dir` de forma atómica.
+
+        Returns:
+            Directorio instalado
+        """
+        parent = self.target_dir.parent
+        parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{self.target_dir.name}.staging-", dir=str(parent)))
+        try:
+            self._extract(archive, staging, file_hashes or {})
+            missing = [name for name in REQUIRED_FILES if not (staging / name).exists()]
+            if missing:
+                raise IndexDownloadError(f"El zip no contiene {', '.join(missing)}")
+            with open(staging / MARKER_FILE, "w") as f:
+                f.write("downloaded")
+
+            previous = parent / f".{self.target_dir.name}.old"
+            shutil.rmtree(previous, ignore_errors=True)
+            if self.target_dir.exists():
+                os.replace(self.target_dir, previous)
+            os.replace(staging, self.target_dir)
+            shutil.rmtree(previous, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return self.target_dir
+
+    def _cleanup_download(self):
+        for path in (self.part_path, self.state_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            self.work_dir.rmdir()
+        except OSError:
+            pass
+
+    def ensure(self, force: bool = False) -> Path:
+        """
+        Instala el índice si no está completo: descarga, verifica, extrae y renombra.
+
+        Args:
+            force: Reinstalar aunque ya exista
+
+        Returns:
+            Directorio del índice
+        """
+        if not force and index_ready(str(self.target_dir)):
+            return self.target_dir
+
+        archive_hash, file_hashes = self._fetch_manifest()
+        expected = self.expected_sha256 or archive_hash
+
+        started = time.perf_counter()
+        archive = self.download()
+        print(f"[OK] Descarga completa en {time.perf_counter() - started:.1f}s; verificando...")
+        self.verify(archive, expected)
+        print("[paquete] Extrayendo...")
+        self.install(archive, file_hashes)
+        self._cleanup_download()
+        print(f"[OK] Índice instalado en {self.target_dir}")
+        return self.target_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga reanudable del índice FAISS")
+    parser.add_argument("url")
+    parser.add_argument("--target", default="faiss_index")
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--sha256", default=None, help="SHA-256 esperado del zip")
+    parser.add_argument("--manifest", default="", help="URL del manifiesto (por defecto <url>.sha256)")
+    parser.add_argument("--require-checksum", action="store_true")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    downloader = IndexDownloader(
+        args.url, args.target,
+        manifest_url=args.manifest,
+        expected_sha256=args.sha256,
+        require_checksum=args.require_checksum,
+        segments=args.segments,
+        progress_callback=lambda pct: print(f"[>] {pct}% descargado")
+    )
+    downloader.ensure(force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,582 @@
+"""
+Índice FAISS Fragmentado (Shards) para GERARD
+
+El índice completo (~41k chunks) se publica como un único zip y la app no
+responde nada hasta descargarlo y cargarlo entero. Este módulo lo parte en N
+fragmentos independientes (índice FAISS + segmento del docstore cada uno),
+descritos por un manifiesto pequeño, y los carga de forma perezosa: la app
+empieza a responder en cuanto llega el primer fragmento y el resto se suma en
+segundo plano.
+
+Características:
+- `build_shards`: reparte el docstore por hash estable del id (o por año del
+  archivo fuente), guarda cada fragmento con `save_local`, lo comprime y
+  publica su SHA-256, tamaño y número de vectores en `shards_manifest.json`
+- `ShardedIndexLoader`: descarga cada fragmento con IndexDownloader
+  (reanudable, verificado, instalación atómica) en paralelo y lo añade al
+  vectorstore a medida que termina; reutiliza los fragmentos ya instalados
+  cuyo hash coincide con el manifiesto
+- `ShardedVectorStore`: misma interfaz que el vectorstore FAISS que usa la
+  búsqueda híbrida (`_embed_query`, `similarity_search_by_vector`,
+  `docstore._dict`, `index.ntotal`); la búsqueda recorre los fragmentos en
+  paralelo con `faiss.IndexShards` y mezcla un top-k global
+- Cada fragmento nuevo publica una instantánea inmutable (IndexShards + ids +
+  docstore), así las búsquedas en curso nunca ven un estado a medias
+
+Uso:
+    python index_shards.py build --source faiss_index --output faiss_shards_release --shards 8
+    python index_shards.py fetch --manifest <url>/shards_manifest.json
+    store = open_sharded_index(url, embeddings)  # vuelve con el primer shard
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import numpy as np
+import requests
+
+from faiss_mmap import load_faiss_local
+from index_downloader import IndexDownloader, index_ready, sha256_file
+
+MANIFEST_FILE = "shards_manifest.json"
+MANIFEST_FORMAT = 1
+SHARD_STAMP_FILE = ".shard_sha256"
+DEFAULT_SHARDS_DIR = "faiss_shards"
+SCHEMES = ("hash", "year")
+
+# Año en el nombre del archivo fuente ("10 de abril de 2021 [3NkCcxM0aIM].es.srt")
+_YEAR_RE = re.compile(r"(?<!\d)(19[5-9]\d|20\d\d)(?!\d)")
+_BRACKETS_RE = re.compile(r"\[[^\]]*\]")
+
+
+def shards_manifest_url() -> str:
+    """URL del manifiesto de fragmentos (GERARD_INDEX_SHARDS_URL); vacía = índice monolítico."""
+    return os.environ.get("GERARD_INDEX_SHARDS_URL", "").strip()
+
+
+def shards_dir() -> str:
+    """Directorio local de los fragmentos (GERARD_INDEX_SHARDS_DIR)."""
+    return os.environ.get("GERARD_INDEX_SHARDS_DIR", "").strip() or DEFAULT_SHARDS_DIR
+
+
+def shards_index_version(directory: str) -> str:
+    """
+    Versión del índice fragmentado en disco: manifiesto + fragmentos instalados.
+
+    Cambia cuando llega un fragmento nuevo, así las respuestas calculadas con
+    el índice a medio cargar no se reutilizan cuando ya está completo.
+    """
+    path = Path(directory)
+    try:
+        stat = (path / MANIFEST_FILE).stat()
+    except OSError:
+        return "sin-indice"
+    ready = sum(1 for child in path.iterdir() if child.is_dir() and index_ready(str(child)))
+    return f"shards-{stat.st_mtime_ns}-{ready}"
+
+
+def shard_key_for_hash(doc_id: str, num_shards: int) -> int:
+    """Fragmento de un documento por hash estable de su id (independiente de PYTHONHASHSEED)."""
+    digest = hashlib.blake2b(str(doc_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def year_of(source: str) -> Optional[int]:
+    """Año en el nombre del archivo fuente (ignorando el id de YouTube entre corchetes)."""
+    name = _BRACKETS_RE.sub(" ", os.path.basename(source or ""))
+    match = _YEAR_RE.search(name)
+    return int(match.group(1)) if match else None
+
+
+# --- Construcción ---
+
+def _assign_shards(ids: List[str], docs: List[Any], num_shards: int, scheme: str) -> List[Tuple[str, List[int]]]:
+    """
+    Reparte las posiciones del índice en fragmentos.
+
+    Returns:
+        [(etiqueta, posiciones)] en el orden de publicación (y de carga)
+    """
+    if scheme == "hash":
+        buckets: Dict[int, List[int]] = {}
+        for position, doc_id in enumerate(ids):
+            buckets.setdefault(shard_key_for_hash(doc_id, num_shards), []).append(position)
+        return [(f"hash-{key}", buckets[key]) for key in sorted(buckets)]
+
+    # Un fragmento por año (los más recientes primero); los documentos sin
+    # fecha se reparten por hash en `num_shards` fragmentos
+    by_year: Dict[int, List[int]] = {}
+    undated: Dict[int, List[int]] = {}
+    for position, (doc_id, doc) in enumerate(zip(ids, docs)):
+        year = year_of(doc.metadata.get("source", ""))
+        if year is None:
+            undated.setdefault(shard_key_for_hash(doc_id, num_shards), []).append(position)
+        else:
+            by_year.setdefault(year, []).append(position)
+    groups = [(str(year), by_year[year]) for year in sorted(by_year, reverse=True)]
+    groups += [(f"sin-fecha-{key}", undated[key]) for key in sorted(undated)]
+    return groups
+
+
+def _write_zip(source_dir: Path, archive: Path):
+    # Los vectores float32 apenas comprimen: nivel 6 da casi el mismo tamaño
+    # que 9 en una fracción del tiempo; el docstore (pickle) sí se reduce
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for file in sorted(source_dir.iterdir()):
+            if file.is_file():
+                zf.write(file, file.name)
+
+
+def build_shards(
+    source_dir: str = "faiss_index",
+    output_dir: str = "faiss_shards_release",
+    num_shards: int = 8,
+    scheme: str = "hash"
+) -> Dict[str, Any]:
+    """
+    Parte un índice FAISS (formato `save_local`) en fragmentos publicables.
+
+    Cada fragmento conserva los ids del docstore y la métrica del índice
+    original, así la unión de las búsquedas equivale a buscar en el índice
+    completo. El directorio de salida se reemplaza de forma atómica y contiene
+    `shard-XXX.zip` más el manifiesto.
+
+    Args:
+        source_dir: Índice FAISS completo
+        output_dir: Destino de los zips y el manifiesto
+        num_shards: Número de fragmentos (en "year", fragmentos para lo que no tiene fecha)
+        scheme: "hash" (tamaños parejos) o "year" (un fragmento por año)
+
+    Returns:
+        Manifiesto generado
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from offline_embeddings import HashingEmbeddings
+
+    if scheme not in SCHEMES:
+        raise ValueError(f"Esquema de fragmentación desconocido: {scheme} (opciones: {', '.join(SCHEMES)})")
+    if num_shards < 1:
+        raise ValueError("num_shards debe ser >= 1")
+
+    start = time.perf_counter()
+    # Solo se leen el índice y el docstore: el embedder no se usa
+    source = load_faiss_local(source_dir, HashingEmbeddings())
+    total = source.index.ntotal
+    ids = [source.index_to_docstore_id[i] for i in range(total)]
+    docs = [source.docstore.search(doc_id) for doc_id in ids]
+    vectors = source.index.reconstruct_n(0, total) if total else np.zeros((0, source.index.d), dtype="float32")
+    groups = _assign_shards(ids, docs, num_shards, scheme)
+    print(f"[INFO] Fragmentando {total} vectores de {source_dir} en {len(groups)} shards ({scheme})...")
+
+    output = Path(output_dir)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{output.name}.", dir=str(output.parent)))
+    try:
+        entries = []
+        for number, (label, positions) in enumerate(groups):
+            name = f"shard-{number:03d}"
+            index = faiss.IndexFlat(source.index.d, source.index.metric_type)
+            index.add(np.ascontiguousarray(vectors[positions], dtype="float32"))
+            shard_ids = [ids[p] for p in positions]
+            shard = FAISS(
+                embedding_function=source.embedding_function,
+                index=index,
+                docstore=InMemoryDocstore({doc_id: docs[p] for doc_id, p in zip(shard_ids, positions)}),
+                index_to_docstore_id=dict(enumerate(shard_ids)),
+                distance_strategy=source.distance_strategy
+            )
+            shard_dir = staging / name
+            shard.save_local(str(shard_dir))
+            archive = staging / f"{name}.zip"
+            _write_zip(shard_dir, archive)
+            shutil.rmtree(shard_dir)
+            entries.append({
+                "name": name,
+                "file": archive.name,
+                "label": label,
+                "vectors": len(positions),
+                "size": archive.stat().st_size,
+                "sha256": sha256_file(archive),
+            })
+            print(f"   {name} ({label}): {len(positions)} vectores, {entries[-1]['size'] / 1024 / 1024:.1f} MB")
+
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "scheme": scheme,
+            "dimension": int(source.index.d),
+            "metric": int(source.index.metric_type),
+            "total_vectors": total,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "shards": entries,
+        }
+        with open(staging / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        previous = output.with_name(output.name + ".old")
+        if output.exists():
+            shutil.rmtree(previous, ignore_errors=True)
+            os.replace(output, previous)
+        os.replace(staging, output)
+        shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    print(f"[OK] {len(entries)} shards en {output} ({time.perf_counter() - start:.1f}s)")
+    return manifest
+
+
+# --- Vectorstore fragmentado ---
+
+class _ShardedDocstore:
+    """Vista de solo lectura de los docstores de los fragmentos cargados."""
+
+    def __init__(self, dicts: List[Dict[str, Any]]):
+        self._dict = ChainMap(*dicts)
+
+    def search(self, doc_id: str):
+        return self._dict.get(doc_id, f"ID {doc_id} not found.")
+
+
+class _Snapshot:
+    """Estado inmutable de búsqueda: índice combinado, ids globales y docstore."""
+
+    def __init__(self, shards: List[Any], dimension: int, metric: int):
+        import faiss
+
+        # successive_ids: cada fragmento desplaza sus ids por los vectores de
+        # los anteriores, así la posición global indexa `ids` directamente
+        self.index = faiss.IndexShards(dimension, True, True)
+        self.index.metric_type = metric
+        self.ids: List[str] = []
+        for shard in shards:
+            self.index.add_shard(shard.index)
+            self.ids.extend(shard.index_to_docstore_id[i] for i in range(shard.index.ntotal))
+        self.docstore = _ShardedDocstore([shard.docstore._dict for shard in shards])
+        # IndexShards no retiene los índices de Python: se guardan aquí
+        self._shards = list(shards)
+
+
+class ShardedVectorStore:
+    """
+    Vectorstore sobre varios fragmentos FAISS que pueden llegar de a uno.
+    """
+
+    def __init__(self, embeddings: Any, dimension: int, metric: Optional[int] = None, total_shards: int = 0):
+        """
+        Inicializa el vectorstore vacío.
+
+        Args:
+            embeddings: Embeddings para las consultas (los mismos que generaron los fragmentos)
+            dimension: Dimensión de los vectores
+            metric: Métrica FAISS (por defecto L2)
+            total_shards: Fragmentos esperados (solo informativo)
+        """
+        import faiss
+
+        self.embeddings = embeddings
+        self.dimension = dimension
+        self.metric = faiss.METRIC_L2 if metric is None else metric
+        self.total_shards = total_shards
+        self._shards: List[Any] = []
+        self._names: List[str] = []
+        self._changed = threading.Condition()
+        self._snapshot = _Snapshot([], dimension, self.metric)
+
+    # --- Carga ---
+
+    def add_shard(self, name: str, vectorstore: Any):
+        """Añade un fragmento cargado y publica una instantánea nueva."""
+        if vectorstore.index.d != self.dimension:
+            raise ValueError(f"El shard {name} tiene dimensión {vectorstore.index.d}, se esperaba {self.dimension}")
+        with self._changed:
+            self._shards.append(vectorstore)
+            self._names.append(name)
+            self._snapshot = _Snapshot(self._shards, self.dimension, self.metric)
+            self._changed.notify_all()
+
+    @property
+    def loaded_shards(self) -> List[str]:
+        return list(self._names)
+
+    @property
+    def complete(self) -> bool:
+        return len(self._names) >= self.total_shards
+
+    def wait_for_shards(self, count: int, timeout: Optional[float] = None) -> bool:
+        """Espera hasta tener al menos `count` fragmentos cargados."""
+        with self._changed:
+            return self._changed.wait_for(lambda: len(self._names) >= count, timeout)
+
+    def notify_waiters(self):
+        """Despierta a quien espera (por ejemplo, si la carga terminó con error)."""
+        with self._changed:
+            self._changed.notify_all()
+
+    # --- Interfaz de vectorstore ---
+
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def docstore(self) -> _ShardedDocstore:
+        return self._snapshot.docstore
+
+    def _embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Tuple[Any, float]]:
+        """
+        Busca en todos los fragmentos a la vez y devuelve el top-k global.
+
+        Returns:
+            [(documento, distancia)] ordenado como lo haría un único índice FAISS
+        """
+        return self.similarity_search_with_score_by_vectors(np.asarray([embedding], dtype="float32"), k)[0]
+
+    def similarity_search_with_score_by_vectors(self, embeddings: np.ndarray, k: int = 4) -> List[List[Tuple[Any, float]]]:
+        """Como `similarity_search_with_score_by_vector` para una matriz de consultas (una búsqueda)."""
+        snapshot = self._snapshot
+        if snapshot.index.ntotal == 0 or k <= 0:
+            return [[] for _ in range(len(embeddings))]
+        queries = np.ascontiguousarray(embeddings, dtype="float32")
+        distances, positions = snapshot.index.search(queries, min(k, snapshot.index.ntotal))
+        results = []
+        for row_distances, row_positions in zip(distances, positions):
+            hits = []
+            for distance, position in zip(row_distances, row_positions):
+                if position < 0:
+                    continue
+                doc = snapshot.docstore._dict.get(snapshot.ids[position])
+                if doc is not None:
+                    hits.append((doc, float(distance)))
+            results.append(hits)
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Any]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> List[Tuple[Any, float]]:
+        return self.similarity_search_with_score_by_vector(self._embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Any]:
+        return self.similarity_search_by_vector(self._embed_query(query), k)
+
+
+# --- Descarga y carga perezosa ---
+
+class ShardedIndexLoader:
+    """
+    Descarga e instala los fragmentos del manifiesto y los añade a un
+    ShardedVectorStore a medida que quedan listos.
+    """
+
+    def __init__(
+        self,
+        manifest_url: str,
+        directory: str = DEFAULT_SHARDS_DIR,
+        embeddings: Any = None,
+        max_workers: int = 3,
+        timeout_seconds: float = 60.0,
+        **downloader_kwargs
+    ):
+        """
+        Inicializa el cargador.
+
+        Args:
+            manifest_url: URL de `shards_manifest.json` (los zips se resuelven relativos a ella)
+            directory: Directorio local de los fragmentos
+            embeddings: Embeddings de las consultas
+            max_workers: Fragmentos descargándose a la vez
+            timeout_seconds: Timeout de cada petición HTTP
+            **downloader_kwargs: Opciones extra para IndexDownloader
+        """
+        self.manifest_url = manifest_url
+        self.directory = Path(directory)
+        self.embeddings = embeddings
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout_seconds
+        self.downloader_kwargs = downloader_kwargs
+        self.manifest: Optional[Dict[str, Any]] = None
+        self.store: Optional[ShardedVectorStore] = None
+        self.errors: List[BaseException] = []
+        self.finished = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def fetch_manifest(self) -> Dict[str, Any]:
+        """
+        Descarga el manifiesto y lo guarda junto a los fragmentos; sin red usa
+        la copia local de la última vez.
+        """
+        local = self.directory / MANIFEST_FILE
+        try:
+            response = requests.get(self.manifest_url, timeout=self.timeout)
+            response.raise_for_status()
+            manifest = response.json()
+        except (requests.RequestException, ValueError) as e:
+            if not local.exists():
+                raise
+            print(f"[!] No se pudo leer el manifiesto de shards ({e}); usando la copia local")
+            with open(local, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        if manifest.get("format") != MANIFEST_FORMAT:
+            raise ValueError(f"Formato de manifiesto de shards no soportado: {manifest.get('format')}")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".manifest.", dir=str(self.directory))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, local)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return manifest
+
+    def _shard_installed(self, entry: Dict[str, Any]) -> bool:
+        path = self.directory / entry["name"]
+        try:
+            stamp = (path / SHARD_STAMP_FILE).read_text(encoding="utf-8").strip()
+        except OSError:
+            return False
+        return index_ready(str(path)) and stamp == entry["sha256"]
+
+    def ensure_shard(self, entry: Dict[str, Any]) -> Path:
+        """Instala un fragmento si falta o si su hash cambió en el manifiesto."""
+        target = self.directory / entry["name"]
+        if self._shard_installed(entry):
+            return target
+        downloader = IndexDownloader(
+            urljoin(self.manifest_url, entry["file"]),
+            str(target),
+            manifest_url=None,
+            expected_sha256=entry["sha256"],
+            require_checksum=True,
+            timeout_seconds=self.timeout,
+            **self.downloader_kwargs
+        )
+        downloader.ensure(force=True)
+        (target / SHARD_STAMP_FILE).write_text(entry["sha256"], encoding="utf-8")
+        return target
+
+    def _load_shard(self, entry: Dict[str, Any]):
+        path = self.ensure_shard(entry)
+        return load_faiss_local(str(path), self.embeddings)
+
+    def _run(self):
+        started = time.perf_counter()
+        entries = self.manifest["shards"]
+        try:
+            # Los fragmentos ya instalados se cargan primero (sin esperar a la red)
+            ordered = sorted(entries, key=lambda entry: not self._shard_installed(entry))
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gerard-shard") as pool:
+                futures = {pool.submit(self._load_shard, entry): entry for entry in ordered}
+                for future in as_completed(futures):
+                    entry = futures[future]
+                    try:
+                        self.store.add_shard(entry["name"], future.result())
+                        print(f"[OK] Shard {entry['name']} listo ({len(self.store.loaded_shards)}/"
+                              f"{len(entries)}, {time.perf_counter() - started:.1f}s)")
+                    except Exception as e:
+                        self.errors.append(e)
+                        print(f"[ERROR] Shard {entry['name']} no disponible: {e}")
+        finally:
+            self.finished.set()
+            self.store.notify_waiters()
+
+    def start(self) -> ShardedVectorStore:
+        """Lee el manifiesto y lanza la carga de los fragmentos en segundo plano."""
+        if self.store is None:
+            self.manifest = self.fetch_manifest()
+            self.store = ShardedVectorStore(
+                self.embeddings,
+                dimension=int(self.manifest["dimension"]),
+                metric=self.manifest.get("metric"),
+                total_shards=len(self.manifest["shards"])
+            )
+            self._thread = threading.Thread(target=self._run, name="gerard-shards", daemon=True)
+            self._thread.start()
+        return self.store
+
+    def wait(self, min_shards: int = 1, timeout: Optional[float] = None) -> ShardedVectorStore:
+        """
+        Espera hasta tener `min_shards` fragmentos cargados (o a que la carga termine).
+
+        Raises:
+            RuntimeError: Si la carga terminó sin ningún fragmento disponible
+        """
+        store = self.start()
+        needed = min(min_shards, store.total_shards)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not store.wait_for_shards(needed, 0.5):
+            if self.finished.is_set() or (deadline is not None and time.monotonic() >= deadline):
+                break
+        if not store.loaded_shards and store.total_shards:
+            detail = f": {self.errors[0]}" if self.errors else ""
+            raise RuntimeError(f"No se pudo cargar ningún shard del índice{detail}")
+        return store
+
+
+def open_sharded_index(
+    manifest_url: str,
+    embeddings: Any,
+    directory: Optional[str] = None,
+    min_shards: int = 1,
+    **loader_kwargs
+) -> ShardedVectorStore:
+    """
+    Abre el índice fragmentado: vuelve en cuanto hay `min_shards` cargados y
+    sigue sumando el resto en segundo plano.
+    """
+    loader = ShardedIndexLoader(manifest_url, directory or shards_dir(), embeddings, **loader_kwargs)
+    store = loader.wait(min_shards)
+    print(f"[INFO] Índice fragmentado: {len(store.loaded_shards)}/{store.total_shards} shards, "
+          f"{store.index.ntotal} vectores disponibles")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice FAISS fragmentado")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Partir un índice FAISS en shards publicables")
+    build.add_argument("--source", default="faiss_index")
+    build.add_argument("--output", default="faiss_shards_release")
+    build.add_argument("--shards", type=int, default=8)
+    build.add_argument("--scheme", choices=SCHEMES, default="hash")
+
+    fetch = sub.add_parser("fetch", help="Descargar e instalar todos los shards del manifiesto")
+    fetch.add_argument("--manifest", default=None, help="URL del manifiesto (por defecto GERARD_INDEX_SHARDS_URL)")
+    fetch.add_argument("--dir", default=None)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_shards(args.source, args.output, args.shards, args.scheme)
+        return
+
+    loader = ShardedIndexLoader(args.manifest or shards_manifest_url(), args.dir or shards_dir())
+    manifest = loader.fetch_manifest()
+    for entry in manifest["shards"]:
+        loader.ensure_shard(entry)
+    print(f"[OK] {len(manifest['shards'])} shards instalados en {loader.directory}")
+
+
+if __name__ == "__main__":
+    main()
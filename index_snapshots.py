@@ -0,0 +1,435 @@
+"""
+Instantáneas Versionadas del Índice FAISS con Cambio en Caliente para GERARD
+
+`load_resources()` carga el índice una sola vez por proceso: para usar un
+índice reconstruido había que reiniciar la app y se perdían todas las
+sesiones. Aquí cada índice publicado vive en su propio directorio
+(`faiss_index/v<N>/`) y el archivo `faiss_index/CURRENT` apunta al activo.
+Un vigilante en segundo plano detecta el cambio de puntero, carga y calienta
+la nueva instantánea y la activa de forma atómica.
+
+Características:
+- Publicación atómica: la copia se prepara en un directorio temporal, se
+  renombra a `v<N>` y solo entonces se reescribe `CURRENT` (tempfile +
+  os.replace); nunca se ve una instantánea a medias
+- Compatible con el formato anterior: sin `CURRENT`, el propio `faiss_index/`
+  es la instantánea (versión = mtime + tamaño de index.faiss)
+- Préstamos (`lease()`): una consulta en curso termina con la instantánea con
+  la que empezó aunque entretanto se active otra; la anterior se libera
+  cuando su último préstamo termina
+- La nueva instantánea se carga y se calienta (una búsqueda que recorre los
+  vectores) antes del cambio; si falla la carga, sigue la anterior
+- Listeners de cambio para invalidar cachés que dependen de la versión
+- Limpieza de versiones antiguas (se conservan las `keep` más recientes)
+- GERARD_INDEX_POLL_SECONDS: intervalo del vigilante (por defecto 30; 0 lo
+  desactiva)
+
+Uso:
+    python index_snapshots.py publish ruta/al/indice_nuevo [--keep 3]
+    python index_snapshots.py activate v2
+    python index_snapshots.py list
+
+    snapshots = IndexSnapshotManager("faiss_index", loader=cargar_vectorstore)
+    snapshots.start_watcher()
+    with snapshots.lease() as snapshot:
+        docs = hybrid_retrieval(snapshot.vectorstore, pregunta)
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+SNAPSHOT_POINTER = "CURRENT"
+DEFAULT_ROOT = "faiss_index"
+DEFAULT_POLL_SECONDS = 30.0
+DEFAULT_KEEP = 3
+NO_INDEX_VERSION = "sin-indice"
+
+_VERSION_RE = re.compile(r"^v(\d+)$")
+
+
+def poll_seconds_from_env() -> float:
+    """Intervalo del vigilante (GERARD_INDEX_POLL_SECONDS; 0 lo desactiva)."""
+    value = os.environ.get("GERARD_INDEX_POLL_SECONDS", "").strip()
+    try:
+        return max(0.0, float(value)) if value else DEFAULT_POLL_SECONDS
+    except ValueError:
+        print(f"[!] GERARD_INDEX_POLL_SECONDS inválido ({value!r}); usando {DEFAULT_POLL_SECONDS:.0f}s")
+        return DEFAULT_POLL_SECONDS
+
+
+def list_versions(root: str = DEFAULT_ROOT) -> List[int]:
+    """Números de versión publicados en `root` (`v<N>/`), de menor a mayor."""
+    path = Path(root)
+    if not path.is_dir():
+        return []
+    versions = []
+    for child in path.iterdir():
+        match = _VERSION_RE.match(child.name)
+        if match and child.is_dir():
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def read_pointer(root: str = DEFAULT_ROOT) -> Optional[str]:
+    """Versión activa según `CURRENT` (por ejemplo "v3"), o None si no hay puntero válido."""
+    try:
+        name = (Path(root) / SNAPSHOT_POINTER).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return name if _VERSION_RE.match(name) else None
+
+
+def has_snapshots(root: str = DEFAULT_ROOT) -> bool:
+    """Indica si `root` usa el formato versionado (`CURRENT` + `v<N>/`)."""
+    name = read_pointer(root)
+    return name is not None and (Path(root) / name).is_dir()
+
+
+def resolve_snapshot(root: str = DEFAULT_ROOT) -> Tuple[str, Path]:
+    """
+    Instantánea activa en disco.
+
+    Returns:
+        (versión, directorio). Con `CURRENT`: ("v3", root/v3). Con el formato
+        anterior: ("<mtime_ns>-<tamaño>", root). Sin índice: ("sin-indice", root)
+    """
+    name = read_pointer(root)
+    if name is not None and (Path(root) / name).is_dir():
+        return name, Path(root) / name
+    try:
+        stat = os.stat(os.path.join(root, "index.faiss"))
+        return f"{stat.st_mtime_ns}-{stat.st_size}", Path(root)
+    except OSError:
+        return NO_INDEX_VERSION, Path(root)
+
+
+def _write_pointer(root: Path, name: str):
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{SNAPSHOT_POINTER}.", dir=str(root))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(name + "\n")
+        os.replace(tmp_path, root / SNAPSHOT_POINTER)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def activate_snapshot(root: str, version: str):
+    """
+    Apunta `CURRENT` a una versión ya publicada (también sirve para volver atrás).
+
+    Args:
+        root: Directorio raíz de las instantáneas
+        version: "v<N>" o "<N>"
+    """
+    name = version if version.startswith("v") else f"v{version}"
+    if not _VERSION_RE.match(name) or not (Path(root) / name).is_dir():
+        raise FileNotFoundError(f"No existe la instantánea {name} en {root}")
+    _write_pointer(Path(root), name)
+    print(f"[OK] Instantánea activa: {root}/{name}")
+
+
+def prune_snapshots(root: str = DEFAULT_ROOT, keep: int = DEFAULT_KEEP) -> List[str]:
+    """
+    Borra las versiones más antiguas; la activa nunca se borra.
+
+    Returns:
+        Nombres de las versiones eliminadas
+    """
+    current = read_pointer(root)
+    versions = [f"v{n}" for n in list_versions(root)]
+    removed = []
+    for name in versions[:max(0, len(versions) - max(1, keep))]:
+        if name == current:
+            continue
+        shutil.rmtree(Path(root) / name, ignore_errors=True)
+        removed.append(name)
+    return removed
+
+
+def publish_snapshot(
+    source_dir: str,
+    root: str = DEFAULT_ROOT,
+    activate: bool = True,
+    keep: int = DEFAULT_KEEP
+) -> str:
+    """
+    Copia un índice construido como nueva versión `v<N+1>` y la activa.
+
+    Los procesos en marcha la detectan con su vigilante; no hace falta
+    reiniciarlos.
+
+    Args:
+        source_dir: Directorio con index.faiss / index.pkl
+        root: Directorio raíz de las instantáneas
+        activate: Reescribir `CURRENT` para que apunte a la nueva versión
+        keep: Versiones a conservar (0 = no borrar ninguna)
+
+    Returns:
+        Nombre de la versión publicada ("v<N>")
+    """
+    source = Path(source_dir)
+    if not (source / "index.faiss").exists() or not (source / "index.pkl").exists():
+        raise FileNotFoundError(f"{source_dir} no contiene index.faiss e index.pkl")
+    root_path = Path(root)
+    root_path.mkdir(parents=True, exist_ok=True)
+
+    versions = list_versions(root)
+    name = f"v{(versions[-1] if versions else 0) + 1}"
+    staging = Path(tempfile.mkdtemp(prefix=f".{name}.", dir=str(root_path)))
+    try:
+        shutil.copytree(source, staging, dirs_exist_ok=True)
+        # El índice offline guarda la ruta de su origen (offline_source.json):
+        # se reconstruye al activar esta versión u otra, también en un rollback
+        os.replace(staging, root_path / name)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    print(f"[OK] Instantánea publicada: {root}/{name}")
+    if activate:
+        activate_snapshot(root, name)
+        if keep:
+            removed = prune_snapshots(root, keep)
+            if removed:
+                print(f"[INFO] Instantáneas antiguas eliminadas: {', '.join(removed)}")
+    return name
+
+
+def warm_vectorstore(vectorstore: Any):
+    """
+    Recorre el índice con una búsqueda para traer sus páginas a memoria.
+
+    Con mmap, la primera consulta sobre una instantánea fría pagaría la
+    lectura del disco; así la paga el vigilante antes del cambio.
+    """
+    import numpy as np
+
+    index = vectorstore.index
+    if index.ntotal:
+        index.search(np.zeros((1, index.d), dtype="float32"), 1)
+
+
+class IndexSnapshot:
+    """Una versión cargada del índice y sus préstamos en curso."""
+
+    def __init__(self, version: str, path: Path, vectorstore: Any):
+        self.version = version
+        self.path = Path(path)
+        self.vectorstore = vectorstore
+        self.loaded_at = time.time()
+        self.leases = 0
+        self.retired = False
+
+    def __repr__(self) -> str:
+        return f"IndexSnapshot({self.version!r}, {str(self.path)!r}, leases={self.leases})"
+
+
+class IndexSnapshotManager:
+    """
+    Mantiene la instantánea activa y la cambia en caliente cuando se publica otra.
+
+    El cambio es atómico: `current()` y `lease()` devuelven la anterior hasta
+    que la nueva está cargada y caliente, y la nueva a partir de entonces.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_ROOT,
+        loader: Optional[Callable[[Path], Any]] = None,
+        warm: Optional[Callable[[Any], None]] = warm_vectorstore,
+        poll_seconds: Optional[float] = None,
+        initial: Optional[IndexSnapshot] = None
+    ):
+        """
+        Inicializa el gestor.
+
+        Args:
+            root: Directorio raíz de las instantáneas
+            loader: Función que recibe el directorio de una instantánea y
+                devuelve su vectorstore. None = instantánea fija (sin cambios)
+            warm: Función que calienta un vectorstore recién cargado (None = no calentar)
+            poll_seconds: Intervalo del vigilante (por defecto `poll_seconds_from_env()`)
+            initial: Instantánea ya cargada; si falta, se carga la activa en disco
+        """
+        self.root = root
+        self._loader = loader
+        self._warm = warm
+        self.poll_seconds = poll_seconds_from_env() if poll_seconds is None else poll_seconds
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[IndexSnapshot, IndexSnapshot], None]] = []
+        self._failed_version: Optional[str] = None
+        self.swaps = 0
+        self.failures = 0
+        self._current = initial if initial is not None else self._load(*resolve_snapshot(root))
+
+    def _load(self, version: str, path: Path) -> IndexSnapshot:
+        if self._loader is None:
+            raise RuntimeError("IndexSnapshotManager sin loader: no puede cargar instantáneas")
+        start = time.perf_counter()
+        vectorstore = self._loader(path)
+        if self._warm is not None:
+            self._warm(vectorstore)
+        print(f"[INFO] Instantánea {version} cargada y caliente ({time.perf_counter() - start:.1f}s)")
+        return IndexSnapshot(version, path, vectorstore)
+
+    @property
+    def version(self) -> str:
+        return self.current().version
+
+    def current(self) -> IndexSnapshot:
+        """Instantánea activa (para uso puntual; las consultas deben usar `lease()`)."""
+        with self._lock:
+            return self._current
+
+    @contextmanager
+    def lease(self) -> Iterator[IndexSnapshot]:
+        """
+        Presta la instantánea activa durante una consulta.
+
+        Aunque entretanto se active otra, la consulta termina con esta.
+        """
+        with self._lock:
+            snapshot = self._current
+            snapshot.leases += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.leases -= 1
+                release = snapshot.retired and snapshot.leases == 0
+            if release:
+                self._release(snapshot)
+
+    def add_listener(self, callback: Callable[[IndexSnapshot, IndexSnapshot], None]):
+        """Registra `callback(anterior, nueva)`, llamado tras cada cambio de instantánea."""
+        self._listeners.append(callback)
+
+    def _release(self, snapshot: IndexSnapshot):
+        # Sin préstamos: soltar el vectorstore para que se libere su memoria
+        snapshot.vectorstore = None
+        print(f"[INFO] Instantánea {snapshot.version} liberada")
+
+    def check_for_update(self) -> bool:
+        """
+        Comprueba `CURRENT` y, si cambió, carga, calienta y activa la nueva instantánea.
+
+        Returns:
+            True si se cambió de instantánea
+        """
+        if self._loader is None:
+            return False
+        with self._update_lock:
+            version, path = resolve_snapshot(self.root)
+            if version in (self.current().version, self._failed_version, NO_INDEX_VERSION):
+                return False
+            try:
+                snapshot = self._load(version, path)
+            except Exception as e:
+                # Se reintenta cuando se publique otra versión
+                self._failed_version = version
+                self.failures += 1
+                print(f"[ERROR] No se pudo cargar la instantánea {version} ({e}); se mantiene {self.version}")
+                return False
+
+            with self._lock:
+                previous = self._current
+                self._current = snapshot
+                previous.retired = True
+                release = previous.leases == 0
+            self._failed_version = None
+            self.swaps += 1
+            print(f"[OK] Índice cambiado en caliente: {previous.version} -> {snapshot.version}")
+
+        for callback in list(self._listeners):
+            try:
+                callback(previous, snapshot)
+            except Exception as e:
+                print(f"[!] Error en listener de cambio de índice: {e}")
+        if release:
+            self._release(previous)
+        return True
+
+    def start_watcher(self) -> bool:
+        """
+        Arranca el vigilante en segundo plano (hilo daemon).
+
+        Returns:
+            True si quedó en marcha (False si está desactivado o no hay loader)
+        """
+        if self._loader is None or self.poll_seconds <= 0:
+            return False
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="gerard-index-watcher", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Detiene el vigilante."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                print(f"[!] Vigilante del índice: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            current = self._current
+        return {
+            "version": current.version,
+            "path": str(current.path),
+            "leases": current.leases,
+            "swaps": self.swaps,
+            "failures": self.failures,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestiona las instantáneas versionadas del índice FAISS")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="Directorio raíz de las instantáneas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    publish = sub.add_parser("publish", help="Publicar un índice construido como nueva versión")
+    publish.add_argument("source", help="Directorio con index.faiss e index.pkl")
+    publish.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="Versiones a conservar (0 = todas)")
+    publish.add_argument("--no-activate", action="store_true", help="Publicar sin cambiar CURRENT")
+    activate = sub.add_parser("activate", help="Activar una versión publicada (o volver atrás)")
+    activate.add_argument("version", help="v<N>")
+    sub.add_parser("list", help="Listar versiones")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        publish_snapshot(args.source, args.root, activate=not args.no_activate, keep=args.keep)
+    elif args.command == "activate":
+        activate_snapshot(args.root, args.version)
+    else:
+        current = read_pointer(args.root)
+        versions = list_versions(args.root)
+        if not versions:
+            version, _ = resolve_snapshot(args.root)
+            print(f"[INFO] {args.root} sin versiones (formato anterior, versión {version})")
+        for n in versions:
+            marker = "*" if f"v{n}" == current else " "
+            print(f" {marker} v{n}")
+
+
+if __name__ == "__main__":
+    main()
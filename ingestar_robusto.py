@@ -11,6 +11,7 @@ Uso:
     python ingestar_robusto.py              # Crear nuevo índice
     python ingestar_robusto.py --resume     # Reanudar proceso interrumpido
     python ingestar_robusto.py --force      # Forzar recreación completa
+    python ingestar_robusto.py --force --compact-dim 256 --quantizer sq8  # Índice compacto
 """
 
 import os
@@ -98,7 +99,7 @@ def split_documents_into_chunks(documents):
     return chunks
 
 
-def create_faiss_index(text_chunks, force_recreate=False, resume=False):
+def create_faiss_index(text_chunks, force_recreate=False, resume=False, compact_options=None):
     """
     Crea índice FAISS usando el builder robusto con rate limiting.
     
@@ -106,6 +107,7 @@ def create_faiss_index(text_chunks, force_recreate=False, resume=False):
         text_chunks: Lista de chunks de documentos
         force_recreate: Si True, elimina índice existente
         resume: Si True, intenta reanudar desde checkpoint
+        compact_options: Campos de BuilderConfig del perfil compacto (None = índice exacto)
     """
     # Verificar si ya existe
     if os.path.exists(FAISS_INDEX_FILE) and not force_recreate and not resume:
@@ -138,7 +140,8 @@ def create_faiss_index(text_chunks, force_recreate=False, resume=False):
         max_retries=5,                   # 5 reintentos
         initial_backoff=2,               # Backoff inicial 2s
         max_backoff=60,                  # Backoff máximo 60s
-        checkpoint_file='faiss_checkpoint.json'
+        checkpoint_file='faiss_checkpoint.json',
+        **(compact_options or {})
     )
     
     print(f"\n⚙️ CONFIGURACIÓN:")
@@ -249,8 +252,41 @@ def main():
         action="store_true",
         help="Reanuda proceso interrumpido desde último checkpoint"
     )
+    parser.add_argument(
+        "--compact-dim",
+        type=int,
+        default=None,
+        help="Genera el perfil compacto reduciendo a esta dimensión (0 = sin reducir, solo cuantizar)"
+    )
+    parser.add_argument(
+        "--transform",
+        choices=["pca", "opq", "none"],
+        default="pca",
+        help="Transformación del perfil compacto"
+    )
+    parser.add_argument(
+        "--quantizer",
+        choices=["sq8", "fp16", "flat"],
+        default="sq8",
+        help="Cuantización escalar del perfil compacto"
+    )
+    parser.add_argument(
+        "--rerank",
+        type=int,
+        default=4,
+        help="k_factor del rerank exacto con los vectores originales (0 = sin rerank)"
+    )
     
     args = parser.parse_args()
+    compact_options = None
+    if args.compact_dim is not None:
+        compact_options = {
+            "compact": True,
+            "compact_dim": args.compact_dim or None,
+            "compact_transform": args.transform,
+            "compact_quantizer": args.quantizer,
+            "rerank_k_factor": args.rerank,
+        }
     
     # Banner inicial
     print(f"\n{'='*70}")
@@ -273,7 +309,8 @@ def main():
     create_faiss_index(
         text_chunks=text_chunks,
         force_recreate=args.force,
-        resume=args.resume
+        resume=args.resume,
+        compact_options=compact_options
     )
     
     print(f"\n{'='*70}")
@@ -10,6 +10,7 @@ Características:
 - Captura de todas las fases de procesamiento
 - Formato legible y estructurado
 - Rotación automática de archivos
+- Log JSON append-only (JSONL) seguro entre sesiones y procesos
 - Manejo robusto de errores
 - Anonimización opcional de datos sensibles
 """
@@ -21,10 +22,22 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 import hashlib
+import heapq
+import threading
 import traceback
 
 from geo_utils import GeoLocator
 from device_detector import DeviceDetector
+from jsonl_log import JsonlLogWriter, iter_records
+
+
+# Spans de tracing.py que equivalen a las fases de `mark_phase`
+SPAN_PHASES = {
+    "retrieval.hybrid": "rag",
+    "llm.generate": "llm",
+    "response.parse": "processing",
+    "response.render": "render",
+}
 
 
 class InteractionLogger:
@@ -49,7 +62,7 @@ class InteractionLogger:
             log_dir: Directorio donde se guardarán los logs
             anonymize: Si True, anonimiza IPs y datos sensibles
             max_file_size_mb: Tamaño máximo del archivo antes de rotar
-            enable_json: Si True, también guarda en formato JSON
+            enable_json: Si True, también guarda en formato JSONL
         """
         self.platform = platform
         self.log_dir = Path(log_dir)
@@ -60,6 +73,12 @@ class InteractionLogger:
         # Crear directorio de logs si no existe
         self.log_dir.mkdir(exist_ok=True)
         
+        # Escritor JSONL (una línea por interacción, con rotación por tamaño)
+        self.json_writer = JsonlLogWriter(
+            log_dir=str(self.log_dir),
+            max_file_size_mb=max_file_size_mb
+        )
+        
         # Inicializar utilidades
         self.geo_locator = GeoLocator()
         self.device_detector = DeviceDetector()
@@ -67,7 +86,12 @@ class InteractionLogger:
         # Almacenamiento temporal de interacciones en curso
         self.active_sessions: Dict[str, Dict[str, Any]] = {}
         
+        # Protege sesiones, contador y escritura cuando la instancia se comparte
+        # entre sesiones (ver services.py)
+        self._lock = threading.RLock()
+        
         # Contador de registros del día
+        self._counter_date = datetime.now().strftime("%Y-%m-%d")
         self.daily_counter = self._get_daily_counter()
     
     def _get_daily_counter(self) -> int:
@@ -125,7 +149,8 @@ class InteractionLogger:
         self,
         user: str,
         question: str,
-        request_info: Optional[Dict[str, Any]] = None
+        request_info: Optional[Dict[str, Any]] = None,
+        geo_info: Optional[Dict[str, Any]] = None
     ) -> str:
         """
         Inicia el registro de una nueva interacción.
@@ -134,12 +159,15 @@ class InteractionLogger:
             user: Nombre del usuario
             question: Pregunta realizada
             request_info: Información adicional (headers, etc.)
+            geo_info: Ubicación ya resuelta (o pendiente) por quien llama;
+                se puede completar luego con `attach_geo_info`
         
         Returns:
             session_id: ID único de la sesión
         """
-        # Generar ID único de sesión
-        session_id = f"{int(time.time() * 1000000)}"
+        # Generar ID único de sesión (sufijo aleatorio: varias sesiones pueden
+        # iniciar en el mismo microsegundo con el logger compartido)
+        session_id = f"{int(time.time() * 1000000)}{os.urandom(2).hex()}"
         
         # Inicializar datos de la sesión
         session_data = {
@@ -157,26 +185,20 @@ class InteractionLogger:
         try:
             if self.platform == "web":
                 user_agent = request_info.get("user_agent", "") if request_info else ""
-                session_data["device_info"] = self.device_detector.detect_from_web(user_agent)
+                session_data["device_info"] = self.device_detector.detect_from_web(user_agent).to_dict()
             else:
                 session_data["device_info"] = self.device_detector.detect_from_terminal()
             
-            # Obtener información geográfica (TEMPORALMENTE DESACTIVADO)
-            # session_data["geo_info"] = self.geo_locator.get_location()
-            session_data["geo_info"] = {
+            # Información geográfica: la resuelve quien llama en segundo plano
+            # (location_resolver.py); aquí nunca se hace una consulta de red
+            session_data["geo_info"] = self._prepare_geo_info(geo_info or {
                 "ip": "Desconocido",
                 "pais": "Desconocido", 
                 "ciudad": "Desconocido",
                 "region": "N/A",
                 "coordenadas": "N/A",
                 "fuente": "desactivado"
-            }
-            
-            # Anonimizar IP si está configurado
-            if self.anonymize and "ip" in session_data["geo_info"]:
-                session_data["geo_info"]["ip"] = self._anonymize_ip(
-                    session_data["geo_info"]["ip"]
-                )
+            })
         
         except Exception as e:
             session_data["device_info"] = {"error": str(e)}
@@ -186,10 +208,31 @@ class InteractionLogger:
         session_data["phases"]["start"] = time.perf_counter()
         
         # Guardar sesión activa
-        self.active_sessions[session_id] = session_data
+        with self._lock:
+            self.active_sessions[session_id] = session_data
         
         return session_id
     
+    def _prepare_geo_info(self, geo_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Copia la ubicación anonimizando la IP si está configurado."""
+        geo_info = dict(geo_info)
+        if self.anonymize and "ip" in geo_info:
+            geo_info["ip"] = self._anonymize_ip(geo_info["ip"])
+        return geo_info
+    
+    def attach_geo_info(self, session_id: str, geo_info: Dict[str, Any]):
+        """
+        Adjunta la ubicación resuelta a una interacción en curso.
+        
+        Args:
+            session_id: ID de la sesión
+            geo_info: Ubicación (formato de GeoLocator)
+        """
+        with self._lock:
+            session = self.active_sessions.get(session_id)
+            if session is not None:
+                session["geo_info"] = self._prepare_geo_info(geo_info)
+    
     def mark_phase(self, session_id: str, phase_name: str):
         """
         Marca una fase específica del procesamiento.
@@ -203,6 +246,36 @@ class InteractionLogger:
         
         self.active_sessions[session_id]["phases"][phase_name] = time.perf_counter()
     
+    def record_spans(self, session_id: str, spans: List[Any]):
+        """
+        Registra los spans de tracing.py de la interacción.
+        
+        Los spans listados en SPAN_PHASES se convierten en las fases
+        `rag_*`, `llm_*`, `processing_*` y `render_*`; todos los spans se
+        guardan resumidos en el registro JSON.
+        
+        Args:
+            session_id: ID de la sesión
+            spans: Spans terminados (tracing.Span)
+        """
+        with self._lock:
+            session = self.active_sessions.get(session_id)
+        if session is None:
+            return
+        
+        phases = session["phases"]
+        for span in spans:
+            phase = SPAN_PHASES.get(span.name)
+            if phase is None or span.end_perf is None:
+                continue
+            start_key, end_key = f"{phase}_start", f"{phase}_end"
+            phases[start_key] = min(phases.get(start_key, span.start_perf), span.start_perf)
+            phases[end_key] = max(phases.get(end_key, span.end_perf), span.end_perf)
+        
+        session.setdefault("spans", []).extend(
+            span.to_dict() for span in sorted(spans, key=lambda s: s.start_perf)
+        )
+    
     def log_response(
         self,
         session_id: str,
@@ -241,10 +314,11 @@ class InteractionLogger:
             status: "success" o "error"
             error: Mensaje de error si aplica
         """
-        if session_id not in self.active_sessions:
+        with self._lock:
+            session = self.active_sessions.pop(session_id, None)
+        if session is None:
             return
         
-        session = self.active_sessions[session_id]
         session["phases"]["end"] = time.perf_counter()
         session["status"] = status
         session["error"] = error
@@ -253,22 +327,26 @@ class InteractionLogger:
         metrics = self._calculate_metrics(session)
         session["metrics"] = metrics
         
-        # Incrementar contador diario
-        self.daily_counter += 1
-        
-        # Guardar en archivos
-        try:
-            self._save_to_txt(session, self.daily_counter)
+        with self._lock:
+            # Reiniciar el contador si cambió el día (el logger vive todo el proceso)
+            today = datetime.now().strftime("%Y-%m-%d")
+            if today != self._counter_date:
+                self._counter_date = today
+                self.daily_counter = self._get_daily_counter()
             
-            if self.enable_json:
-                self._save_to_json(session)
-        
-        except Exception as e:
-            # Guardar error en log de errores
-            self._log_error(session_id, e)
-        
-        # Limpiar sesión activa
-        del self.active_sessions[session_id]
+            # Incrementar contador diario
+            self.daily_counter += 1
+            
+            # Guardar en archivos
+            try:
+                self._save_to_txt(session, self.daily_counter)
+                
+                if self.enable_json:
+                    self._save_to_json(session)
+            
+            except Exception as e:
+                # Guardar error en log de errores
+                self._log_error(session_id, e)
     
     def _calculate_metrics(self, session: Dict[str, Any]) -> Dict[str, float]:
         """Calcula las métricas de tiempo de la sesión."""
@@ -387,9 +465,7 @@ MÉTRICAS DE RENDIMIENTO:
         return log_text
     
     def _save_to_json(self, session: Dict[str, Any]):
-        """Guarda el registro en formato JSON."""
-        log_file = self._get_log_filename("json")
-        
+        """Agrega el registro al log JSONL del día (append-only)."""
         # Preparar datos para JSON
         json_data = {
             "session_id": session["session_id"],
@@ -406,22 +482,10 @@ MÉTRICAS DE RENDIMIENTO:
             "status": session["status"],
             "error": session.get("error")
         }
+        if session.get("spans"):
+            json_data["spans"] = session["spans"]
         
-        # Leer archivo existente o crear lista vacía
-        data_list = []
-        if log_file.exists():
-            try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    data_list = json.load(f)
-            except Exception:
-                data_list = []
-        
-        # Agregar nuevo registro
-        data_list.append(json_data)
-        
-        # Guardar archivo actualizado
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(data_list, f, indent=2, ensure_ascii=False)
+        self.json_writer.append(json_data, date=session["datetime_start"].strftime("%Y-%m-%d"))
     
     def _log_error(self, session_id: str, error: Exception):
         """Registra un error en el log de errores."""
@@ -451,45 +515,49 @@ Traceback:
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d")
         
-        json_file = self.log_dir / f"interaction_log_{date}.json"
-        
-        if not json_file.exists():
-            print(f"No hay datos para la fecha {date}")
-            return
+        # Recorrer los registros en streaming (JSONL y arreglos antiguos)
+        total_interactions = 0
+        successful = 0
+        times = []
+        slowest = []  # min-heap de (tiempo, orden, registro) con las 10 más lentas
+        countries = {}
+        devices = {}
         
-        # Leer datos
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        for d in iter_records(str(self.log_dir), date):
+            total_interactions += 1
+            if d.get("status") == "success":
+                successful += 1
+            
+            time_val = d.get("metrics", {}).get("tiempo_total", 0)
+            if "metrics" in d:
+                times.append(time_val)
+            
+            item = (time_val, total_interactions, d)
+            if len(slowest) < 10:
+                heapq.heappush(slowest, item)
+            elif time_val > slowest[0][0]:
+                heapq.heapreplace(slowest, item)
+            
+            # Distribución por país
+            country = d.get("geo_info", {}).get("pais", "Desconocido")
+            countries[country] = countries.get(country, 0) + 1
+            
+            # Distribución por dispositivo
+            device = d.get("device_info", {}).get("tipo", "Desconocido")
+            devices[device] = devices.get(device, 0) + 1
         
-        if not data:
-            print("No hay registros para analizar")
+        if total_interactions == 0:
+            print(f"No hay datos para la fecha {date}")
             return
         
         # Calcular estadísticas
-        total_interactions = len(data)
-        successful = sum(1 for d in data if d["status"] == "success")
         failed = total_interactions - successful
-        
-        times = [d["metrics"].get("tiempo_total", 0) for d in data if "metrics" in d]
         avg_time = sum(times) / len(times) if times else 0
         max_time = max(times) if times else 0
         min_time = min(times) if times else 0
         
         # Top 10 consultas más lentas
-        sorted_data = sorted(data, key=lambda x: x["metrics"].get("tiempo_total", 0), reverse=True)
-        slowest = sorted_data[:10]
-        
-        # Distribución por país
-        countries = {}
-        for d in data:
-            country = d.get("geo_info", {}).get("pais", "Desconocido")
-            countries[country] = countries.get(country, 0) + 1
-        
-        # Distribución por dispositivo
-        devices = {}
-        for d in data:
-            device = d.get("device_info", {}).get("tipo", "Desconocido")
-            devices[device] = devices.get(device, 0) + 1
+        slowest = [item for _, _, item in sorted(slowest, key=lambda x: (-x[0], x[1]))]
         
         # Generar reporte
         summary_file = self.log_dir / f"performance_summary_{date}.txt"
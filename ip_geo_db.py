@@ -0,0 +1,491 @@
+"""
+Base de Datos Local de Geolocalización por Rangos de IP
+
+Resuelve IPs sin llamadas HTTP a partir de una tabla de rangos (CSV de DB-IP /
+IP2Location, o MMDB si está instalado `maxminddb`) convertida en arreglos
+NumPy ordenados. Una búsqueda es un `searchsorted`: microsegundos por IP.
+
+Características:
+- IPv4 en uint32 e IPv6 en bytes big-endian de 16 (orden = orden numérico)
+- País, ciudad y región como ids sobre tablas de textos (arreglos compactos)
+- Archivo .npz que se carga sin pickle
+- Comando de actualización que reconstruye los arreglos de forma atómica
+- Instancia compartida del proceso (None si no hay base instalada)
+
+Formatos CSV aceptados (sin encabezado, opcionalmente .gz):
+    DB-IP lite:   ip_inicio,ip_fin,continente,pais,region,ciudad[,lat,lon]
+    DB-IP país:   ip_inicio,ip_fin,pais
+    IP2Location:  num_inicio,num_fin,codigo_pais,pais,region,ciudad[,lat,lon]
+
+Uso:
+    python ip_geo_db.py refresh dbip-city-lite-2025-10.csv.gz
+    python ip_geo_db.py refresh --url https://download.db-ip.com/free/dbip-city-lite-2025-10.csv.gz
+    python ip_geo_db.py lookup 8.8.8.8
+"""
+
+import csv
+import gzip
+import ipaddress
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import maxminddb
+    MAXMINDDB_AVAILABLE = True
+except ImportError:
+    maxminddb = None
+    MAXMINDDB_AVAILABLE = False
+
+
+DEFAULT_DB_PATH = os.environ.get("GERARD_IP_DB", "data/ip_geo.npz")
+# 2: nombres de país en lugar de códigos (DB-IP ciudad) e IPv6 bajas en su tabla
+DB_FORMAT_VERSION = 2
+
+# (versión IP, inicio, fin, codigo_pais, pais, region, ciudad, lat, lon)
+RangeRow = Tuple[int, int, int, str, str, str, str, float, float]
+
+# Nombres en inglés por código ISO 3166-1, como los devuelven los proveedores
+# de red (ip-api, db-ip) y GeoLite2: los CSV de DB-IP ciudad sólo traen el código
+COUNTRY_NAMES = {
+    "AD": "Andorra", "AE": "United Arab Emirates", "AF": "Afghanistan", "AG": "Antigua and Barbuda",
+    "AI": "Anguilla", "AL": "Albania", "AM": "Armenia", "AO": "Angola", "AQ": "Antarctica", "AR": "Argentina",
+    "AS": "American Samoa", "AT": "Austria", "AU": "Australia", "AW": "Aruba", "AX": "Åland",
+    "AZ": "Azerbaijan", "BA": "Bosnia and Herzegovina", "BB": "Barbados", "BD": "Bangladesh", "BE": "Belgium",
+    "BF": "Burkina Faso", "BG": "Bulgaria", "BH": "Bahrain", "BI": "Burundi", "BJ": "Benin",
+    "BL": "Saint Barthélemy", "BM": "Bermuda", "BN": "Brunei", "BO": "Bolivia",
+    "BQ": "Bonaire, Sint Eustatius, and Saba", "BR": "Brazil", "BS": "Bahamas", "BT": "Bhutan",
+    "BV": "Bouvet Island", "BW": "Botswana", "BY": "Belarus", "BZ": "Belize", "CA": "Canada",
+    "CC": "Cocos (Keeling) Islands", "CD": "DR Congo", "CF": "Central African Republic",
+    "CG": "Congo Republic", "CH": "Switzerland", "CI": "Ivory Coast", "CK": "Cook Islands", "CL": "Chile",
+    "CM": "Cameroon", "CN": "China", "CO": "Colombia", "CR": "Costa Rica", "CU": "Cuba", "CV": "Cabo Verde",
+    "CW": "Curaçao", "CX": "Christmas Island", "CY": "Cyprus", "CZ": "Czechia", "DE": "Germany",
+    "DJ": "Djibouti", "DK": "Denmark", "DM": "Dominica", "DO": "Dominican Republic", "DZ": "Algeria",
+    "EC": "Ecuador", "EE": "Estonia", "EG": "Egypt", "EH": "Western Sahara", "ER": "Eritrea", "ES": "Spain",
+    "ET": "Ethiopia", "FI": "Finland", "FJ": "Fiji", "FK": "Falkland Islands", "FM": "Micronesia",
+    "FO": "Faroe Islands", "FR": "France", "GA": "Gabon", "GB": "United Kingdom", "GD": "Grenada",
+    "GE": "Georgia", "GF": "French Guiana", "GG": "Guernsey", "GH": "Ghana", "GI": "Gibraltar",
+    "GL": "Greenland", "GM": "Gambia", "GN": "Guinea", "GP": "Guadeloupe", "GQ": "Equatorial Guinea",
+    "GR": "Greece", "GS": "South Georgia and the South Sandwich Islands", "GT": "Guatemala", "GU": "Guam",
+    "GW": "Guinea-Bissau", "GY": "Guyana", "HK": "Hong Kong", "HM": "Heard Island and McDonald Islands",
+    "HN": "Honduras", "HR": "Croatia", "HT": "Haiti", "HU": "Hungary", "ID": "Indonesia", "IE": "Ireland",
+    "IL": "Israel", "IM": "Isle of Man", "IN": "India", "IO": "British Indian Ocean Territory", "IQ": "Iraq",
+    "IR": "Iran", "IS": "Iceland", "IT": "Italy", "JE": "Jersey", "JM": "Jamaica", "JO": "Jordan",
+    "JP": "Japan", "KE": "Kenya", "KG": "Kyrgyzstan", "KH": "Cambodia", "KI": "Kiribati", "KM": "Comoros",
+    "KN": "St Kitts and Nevis", "KP": "North Korea", "KR": "South Korea", "KW": "Kuwait",
+    "KY": "Cayman Islands", "KZ": "Kazakhstan", "LA": "Laos", "LB": "Lebanon", "LC": "Saint Lucia",
+    "LI": "Liechtenstein", "LK": "Sri Lanka", "LR": "Liberia", "LS": "Lesotho", "LT": "Lithuania",
+    "LU": "Luxembourg", "LV": "Latvia", "LY": "Libya", "MA": "Morocco", "MC": "Monaco", "MD": "Moldova",
+    "ME": "Montenegro", "MF": "Saint Martin", "MG": "Madagascar", "MH": "Marshall Islands",
+    "MK": "North Macedonia", "ML": "Mali", "MM": "Myanmar", "MN": "Mongolia", "MO": "Macao",
+    "MP": "Northern Mariana Islands", "MQ": "Martinique", "MR": "Mauritania", "MS": "Montserrat",
+    "MT": "Malta", "MU": "Mauritius", "MV": "Maldives", "MW": "Malawi", "MX": "Mexico", "MY": "Malaysia",
+    "MZ": "Mozambique", "NA": "Namibia", "NC": "New Caledonia", "NE": "Niger", "NF": "Norfolk Island",
+    "NG": "Nigeria", "NI": "Nicaragua", "NL": "Netherlands", "NO": "Norway", "NP": "Nepal", "NR": "Nauru",
+    "NU": "Niue", "NZ": "New Zealand", "OM": "Oman", "PA": "Panama", "PE": "Peru", "PF": "French Polynesia",
+    "PG": "Papua New Guinea", "PH": "Philippines", "PK": "Pakistan", "PL": "Poland",
+    "PM": "Saint Pierre and Miquelon", "PN": "Pitcairn Islands", "PR": "Puerto Rico", "PS": "Palestine",
+    "PT": "Portugal", "PW": "Palau", "PY": "Paraguay", "QA": "Qatar", "RE": "Réunion", "RO": "Romania",
+    "RS": "Serbia", "RU": "Russia", "RW": "Rwanda", "SA": "Saudi Arabia", "SB": "Solomon Islands",
+    "SC": "Seychelles", "SD": "Sudan", "SE": "Sweden", "SG": "Singapore", "SH": "Saint Helena",
+    "SI": "Slovenia", "SJ": "Svalbard and Jan Mayen", "SK": "Slovakia", "SL": "Sierra Leone",
+    "SM": "San Marino", "SN": "Senegal", "SO": "Somalia", "SR": "Suriname", "SS": "South Sudan",
+    "ST": "São Tomé and Príncipe", "SV": "El Salvador", "SX": "Sint Maarten", "SY": "Syria", "SZ": "Eswatini",
+    "TC": "Turks and Caicos Islands", "TD": "Chad", "TF": "French Southern Territories", "TG": "Togo",
+    "TH": "Thailand", "TJ": "Tajikistan", "TK": "Tokelau", "TL": "Timor-Leste", "TM": "Turkmenistan",
+    "TN": "Tunisia", "TO": "Tonga", "TR": "Türkiye", "TT": "Trinidad and Tobago", "TV": "Tuvalu",
+    "TW": "Taiwan", "TZ": "Tanzania", "UA": "Ukraine", "UG": "Uganda", "UM": "U.S. Outlying Islands",
+    "US": "United States", "UY": "Uruguay", "UZ": "Uzbekistan", "VA": "Vatican City",
+    "VC": "St Vincent and Grenadines", "VE": "Venezuela", "VG": "British Virgin Islands",
+    "VI": "U.S. Virgin Islands", "VN": "Vietnam", "VU": "Vanuatu", "WF": "Wallis and Futuna", "WS": "Samoa",
+    "XK": "Kosovo", "YE": "Yemen", "YT": "Mayotte", "ZA": "South Africa", "ZM": "Zambia", "ZW": "Zimbabwe"
+}
+
+
+def country_name(code: str) -> str:
+    """Nombre del país para un código ISO (el propio código si no se conoce)."""
+    return COUNTRY_NAMES.get(code.upper(), code)
+
+
+def _parse_ip(value: str) -> Tuple[int, int]:
+    """Devuelve (versión, entero) de una IP en texto o numérica."""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return (4 if number <= 0xFFFFFFFF else 6), number
+    address = ipaddress.ip_address(value)
+    return address.version, int(address)
+
+
+def _v6_key(number: int) -> bytes:
+    return number.to_bytes(16, "big")
+
+
+def _float(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def iter_csv_ranges(path: Path) -> Iterator[RangeRow]:
+    """
+    Lee un CSV de rangos de IP (ver formatos en la cabecera del módulo).
+
+    Las filas que no se pueden interpretar (encabezados, comentarios) se omiten.
+    """
+    with _open_text(path) as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            try:
+                start_version, start = _parse_ip(row[0])
+                end_version, end = _parse_ip(row[1])
+            except ValueError:
+                continue
+
+            numeric = row[0].strip().isdigit()
+            if numeric:
+                # IP2Location: codigo_pais, pais, region, ciudad, lat, lon
+                fields = row[2:] + [""] * 6
+                code, country, region, city, lat, lon = fields[:6]
+            elif len(row) == 3:
+                # DB-IP país: sólo el código
+                code, region, city, lat, lon = row[2], "", "", "", ""
+                country = country_name(code)
+            else:
+                # DB-IP ciudad: continente, pais, region, ciudad, lat, lon
+                fields = row[2:] + [""] * 6
+                _, code, region, city, lat, lon = fields[:6]
+                country = country_name(code)
+            if code in ("-", "ZZ"):
+                continue
+            # En IP2Location numérico el inicio de un rango IPv6 puede caber en 32 bits
+            version = 6 if 6 in (start_version, end_version) else 4
+            yield version, start, end, code, country or code, region, city, _float(lat), _float(lon)
+
+
+def iter_mmdb_ranges(path: Path) -> Iterator[RangeRow]:
+    """Lee una base MMDB (GeoLite2/DB-IP) recorriendo todas sus redes."""
+    if not MAXMINDDB_AVAILABLE:
+        raise RuntimeError("Para leer MMDB instale maxminddb: pip install maxminddb")
+    with maxminddb.open_database(str(path)) as reader:
+        for network, record in reader:
+            if not record:
+                continue
+            country = record.get("country") or record.get("registered_country") or {}
+            names = country.get("names", {})
+            city = (record.get("city") or {}).get("names", {})
+            subdivisions = record.get("subdivisions") or [{}]
+            region = subdivisions[0].get("names", {})
+            location = record.get("location") or {}
+            yield (
+                network.version,
+                int(network.network_address),
+                int(network.broadcast_address),
+                country.get("iso_code", ""),
+                names.get("en") or country_name(country.get("iso_code", "")),
+                region.get("es") or region.get("en", ""),
+                city.get("es") or city.get("en", ""),
+                float(location.get("latitude", "nan")),
+                float(location.get("longitude", "nan")),
+            )
+
+
+class IPGeoDatabase:
+    """
+    Tabla de rangos de IP en arreglos NumPy ordenados.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], path: Optional[Path] = None):
+        """
+        Args:
+            arrays: Arreglos producidos por `build` o leídos de un .npz
+            path: Archivo de origen (informativo)
+        """
+        self.path = path
+        self.v4_start = arrays["v4_start"]
+        self.v4_end = arrays["v4_end"]
+        self.v4_loc = arrays["v4_loc"]
+        self.v6_start = arrays["v6_start"]
+        self.v6_end = arrays["v6_end"]
+        self.v6_loc = arrays["v6_loc"]
+        # Ubicaciones únicas: índices a las tablas de textos + coordenadas
+        self.loc_country = arrays["loc_country"]
+        self.loc_city = arrays["loc_city"]
+        self.loc_region = arrays["loc_region"]
+        self.loc_coords = arrays["loc_coords"]
+        self.country_codes = arrays["country_codes"]
+        self.country_names = arrays["country_names"]
+        self.strings = arrays["strings"]
+        self.built_at = float(arrays["built_at"]) if "built_at" in arrays else 0.0
+
+    # --- Construcción ---
+
+    @classmethod
+    def build(cls, rows: Iterable[RangeRow]) -> "IPGeoDatabase":
+        """
+        Construye la base a partir de filas de rangos.
+
+        Args:
+            rows: Iterable de (versión, inicio, fin, codigo_pais, pais, region, ciudad, lat, lon)
+
+        Returns:
+            IPGeoDatabase en memoria
+        """
+        countries: Dict[str, int] = {}
+        country_names: List[str] = []
+        strings: Dict[str, int] = {"": 0}
+        locations: Dict[Tuple, int] = {}
+        v4: List[Tuple[int, int, int]] = []
+        v6: List[Tuple[bytes, bytes, int]] = []
+
+        for version, start, end, code, country, region, city, lat, lon in rows:
+            country_id = countries.get(code)
+            if country_id is None:
+                country_id = countries[code] = len(countries)
+                country_names.append(country)
+            city_id = strings.setdefault(city, len(strings))
+            region_id = strings.setdefault(region, len(strings))
+            key = (country_id, city_id, region_id, round(lat, 4), round(lon, 4))
+            loc_id = locations.setdefault(key, len(locations))
+            if version == 4:
+                v4.append((start, end, loc_id))
+            else:
+                v6.append((_v6_key(start), _v6_key(end), loc_id))
+
+        v4.sort()
+        v6.sort()
+        loc_keys = sorted(locations, key=locations.get)
+        arrays = {
+            "version": np.array(DB_FORMAT_VERSION),
+            "built_at": np.array(time.time()),
+            "v4_start": np.array([r[0] for r in v4], dtype=np.uint32),
+            "v4_end": np.array([r[1] for r in v4], dtype=np.uint32),
+            "v4_loc": np.array([r[2] for r in v4], dtype=np.uint32),
+            "v6_start": np.array([r[0] for r in v6], dtype="S16"),
+            "v6_end": np.array([r[1] for r in v6], dtype="S16"),
+            "v6_loc": np.array([r[2] for r in v6], dtype=np.uint32),
+            "loc_country": np.array([k[0] for k in loc_keys], dtype=np.uint16),
+            "loc_city": np.array([k[1] for k in loc_keys], dtype=np.uint32),
+            "loc_region": np.array([k[2] for k in loc_keys], dtype=np.uint32),
+            "loc_coords": np.array([(k[3], k[4]) for k in loc_keys], dtype=np.float32).reshape(-1, 2),
+            "country_codes": np.array(list(countries) or [""]),
+            "country_names": np.array(country_names or [""]),
+            "strings": np.array(sorted(strings, key=strings.get)),
+        }
+        return cls(arrays)
+
+    @classmethod
+    def from_source(cls, source: Path) -> "IPGeoDatabase":
+        """Construye la base desde un CSV (o .csv.gz) o un MMDB."""
+        source = Path(source)
+        if source.suffix == ".mmdb":
+            return cls.build(iter_mmdb_ranges(source))
+        return cls.build(iter_csv_ranges(source))
+
+    def save(self, path: Path):
+        """Guarda los arreglos en un .npz de forma atómica."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "version": np.array(DB_FORMAT_VERSION),
+            "built_at": np.array(self.built_at or time.time()),
+            "v4_start": self.v4_start, "v4_end": self.v4_end, "v4_loc": self.v4_loc,
+            "v6_start": self.v6_start, "v6_end": self.v6_end, "v6_loc": self.v6_loc,
+            "loc_country": self.loc_country, "loc_city": self.loc_city,
+            "loc_region": self.loc_region, "loc_coords": self.loc_coords,
+            "country_codes": self.country_codes, "country_names": self.country_names,
+            "strings": self.strings,
+        }
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.path = path
+
+    @classmethod
+    def load(cls, path: Path) -> "IPGeoDatabase":
+        """Carga un .npz generado por `save`."""
+        with np.load(str(path), allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        if int(arrays.get("version", 0)) != DB_FORMAT_VERSION:
+            raise ValueError(f"Versión de base de IPs no soportada en {path} (reconstruya con 'python ip_geo_db.py refresh')")
+        return cls(arrays, Path(path))
+
+    # --- Consultas ---
+
+    def __len__(self) -> int:
+        return len(self.v4_start) + len(self.v6_start)
+
+    def _find(self, ip: str) -> Optional[int]:
+        """Id de ubicación del rango que contiene la IP (o None)."""
+        address = ipaddress.ip_address(ip.strip())
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        if address.version == 4:
+            starts, ends, locs = self.v4_start, self.v4_end, self.v4_loc
+            key = np.uint32(int(address))
+        else:
+            starts, ends, locs = self.v6_start, self.v6_end, self.v6_loc
+            key = np.bytes_(_v6_key(int(address)))
+
+        index = int(np.searchsorted(starts, key, side="right")) - 1
+        if index < 0 or key > ends[index]:
+            return None
+        return int(locs[index])
+
+    def lookup(self, ip: str) -> Optional[Dict]:
+        """
+        Busca una IP en la tabla de rangos.
+
+        Args:
+            ip: IPv4 o IPv6 en texto
+
+        Returns:
+            Diccionario con el formato de GeoLocator, o None si la IP no
+            está en ningún rango (o no es válida)
+        """
+        try:
+            loc = self._find(ip)
+        except ValueError:
+            return None
+        if loc is None:
+            return None
+
+        country = int(self.loc_country[loc])
+        lat, lon = (float(v) for v in self.loc_coords[loc])
+        city = str(self.strings[self.loc_city[loc]])
+        region = str(self.strings[self.loc_region[loc]])
+        return {
+            "ip": ip,
+            "pais": str(self.country_names[country]) or "Desconocido",
+            "ciudad": city or "Desconocido",
+            "region": region or "Desconocido",
+            "coordenadas": "N/A" if np.isnan(lat) else f"{lat}, {lon}",
+            "codigo_pais": str(self.country_codes[country]) or "N/A",
+            "timezone": "N/A",
+            "org": "N/A",
+            "fuente": "ip-db local"
+        }
+
+
+_default_db: Optional[IPGeoDatabase] = None
+_default_db_loaded = False
+_default_lock = threading.Lock()
+
+
+def get_ip_database(path: Optional[str] = None) -> Optional[IPGeoDatabase]:
+    """
+    Obtiene la base local compartida del proceso.
+
+    Args:
+        path: Archivo .npz. Default: GERARD_IP_DB o data/ip_geo.npz
+
+    Returns:
+        IPGeoDatabase, o None si no hay base instalada
+    """
+    global _default_db, _default_db_loaded
+    if not _default_db_loaded:
+        with _default_lock:
+            if not _default_db_loaded:
+                db_path = Path(path or DEFAULT_DB_PATH)
+                if db_path.exists():
+                    try:
+                        _default_db = IPGeoDatabase.load(db_path)
+                        print(f"[OK] Base de IPs local cargada: {len(_default_db)} rangos")
+                    except Exception as e:
+                        print(f"[!] No se pudo cargar la base de IPs {db_path}: {e}")
+                _default_db_loaded = True
+    return _default_db
+
+
+def refresh(source: Optional[str] = None, url: Optional[str] = None, output: str = DEFAULT_DB_PATH) -> IPGeoDatabase:
+    """
+    Reconstruye la base local desde un archivo o una URL de descarga.
+
+    Args:
+        source: CSV, CSV.gz o MMDB local
+        url: URL desde la que descargar el archivo (si no hay `source`)
+        output: Archivo .npz de destino
+
+    Returns:
+        Base reconstruida
+    """
+    downloaded = None
+    if source is None:
+        if not url:
+            raise ValueError("Indique un archivo de origen o --url")
+        import requests
+
+        suffix = "".join(Path(url.split("?")[0]).suffixes[-2:]) or ".csv"
+        fd, downloaded = tempfile.mkstemp(suffix=suffix)
+        print(f"[INFO] Descargando {url}...")
+        with requests.get(url, stream=True, timeout=60) as response, os.fdopen(fd, "wb") as f:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+        source = downloaded
+
+    try:
+        start = time.perf_counter()
+        db = IPGeoDatabase.from_source(Path(source))
+        db.save(Path(output))
+        print(f"[OK] {len(db)} rangos guardados en {output} ({time.perf_counter() - start:.1f}s)")
+        return db
+    finally:
+        if downloaded:
+            os.remove(downloaded)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Base local de geolocalización por rangos de IP")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_refresh = sub.add_parser("refresh", help="Reconstruir la base desde CSV/MMDB")
+    p_refresh.add_argument("source", nargs="?", help="Archivo CSV, CSV.gz o MMDB")
+    p_refresh.add_argument("--url", help="Descargar el archivo de origen desde esta URL")
+    p_refresh.add_argument("--output", default=DEFAULT_DB_PATH, help=f"Destino (default: {DEFAULT_DB_PATH})")
+
+    p_lookup = sub.add_parser("lookup", help="Buscar una o más IPs")
+    p_lookup.add_argument("ips", nargs="+")
+    p_lookup.add_argument("--db", default=DEFAULT_DB_PATH)
+
+    args = parser.parse_args()
+    if args.command == "refresh":
+        try:
+            refresh(args.source, args.url, args.output)
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+    else:
+        db = IPGeoDatabase.load(Path(args.db))
+        for ip in args.ips:
+            start = time.perf_counter()
+            result = db.lookup(ip)
+            elapsed_us = (time.perf_counter() - start) * 1e6
+            print(f"{ip}: {result} ({elapsed_us:.0f} µs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Log de Interacciones en Formato JSONL (append-only)
+
+`InteractionLogger._save_to_json` leía el arreglo JSON completo del día, le
+agregaba un registro y reescribía todo el archivo en cada interacción: costo
+cuadrático a lo largo del día y archivo corrupto si dos sesiones escribían a
+la vez. Este módulo escribe un registro por línea y ofrece un único lector en
+streaming para todos los consumidores de los logs.
+
+Características:
+- Escritura append-only (una línea JSON por interacción)
+- Bloqueo entre hilos y entre procesos (fcntl / msvcrt)
+- Rotación por tamaño a `interaction_log_YYYY-MM-DD_partN.jsonl`
+- Lector en streaming que acepta JSONL y los arreglos JSON antiguos
+- Conversor de archivos antiguos: python jsonl_log.py convert [directorio]
+
+Uso:
+    python jsonl_log.py convert logs          # convierte *.json -> *.jsonl (original a .json.bak)
+    python jsonl_log.py convert logs --remove # y elimina los originales
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+    _HAS_FCNTL = True
+except ImportError:  # Windows
+    fcntl = None
+    _HAS_FCNTL = False
+
+try:
+    import msvcrt
+    _HAS_MSVCRT = True
+except ImportError:
+    msvcrt = None
+    _HAS_MSVCRT = False
+
+
+DEFAULT_PREFIX = "interaction_log"
+_PART_RE = re.compile(r"_part(\d+)$")
+
+
+@contextmanager
+def _file_lock(lock_path: Path):
+    """Bloqueo exclusivo entre procesos sobre un archivo auxiliar."""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a+b') as lock_file:
+        if _HAS_FCNTL:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        elif _HAS_MSVCRT:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if _HAS_FCNTL:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            elif _HAS_MSVCRT:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def ensure_line_boundary(f) -> bool:
+    """
+    Termina con un salto de línea la última línea de un archivo abierto en 'a+b'.
+
+    Si un proceso murió a mitad de escritura, el archivo acaba en una línea
+    truncada; sin esto el siguiente registro quedaría pegado a ella y se
+    perderían los dos.
+
+    Returns:
+        True si hubo que agregar el salto de línea
+    """
+    f.seek(0, os.SEEK_END)
+    if f.tell() == 0:
+        return False
+    f.seek(-1, os.SEEK_END)
+    if f.read(1) == b"\n":
+        return False
+    f.write(b"\n")
+    return True
+
+
+class JsonlLogWriter:
+    """
+    Escritor append-only de registros JSON, uno por línea y un archivo por día.
+    """
+
+    def __init__(
+        self,
+        log_dir: str = "logs",
+        prefix: str = DEFAULT_PREFIX,
+        max_file_size_mb: float = 10
+    ):
+        """
+        Inicializa el escritor.
+
+        Args:
+            log_dir: Directorio de los logs
+            prefix: Prefijo de los archivos (interaction_log_YYYY-MM-DD.jsonl)
+            max_file_size_mb: Tamaño a partir del cual se rota el archivo del día
+        """
+        self.log_dir = Path(log_dir)
+        self.prefix = prefix
+        self.max_bytes = int(max_file_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._lock_path = self.log_dir / f".{prefix}.lock"
+
+    def path_for(self, date: Optional[str] = None) -> Path:
+        """Ruta del archivo activo para una fecha (YYYY-MM-DD, default: hoy)."""
+        if date is None:
+            date = datetime.now().strftime("%Y-%m-%d")
+        return self.log_dir / f"{self.prefix}_{date}.jsonl"
+
+    def _rotate(self, path: Path):
+        """Renombra el archivo activo al siguiente `_partN` libre."""
+        counter = 1
+        while True:
+            new_path = path.with_name(f"{path.stem}_part{counter}{path.suffix}")
+            if not new_path.exists():
+                path.rename(new_path)
+                return
+            counter += 1
+
+    def append(self, record: Dict[str, Any], date: Optional[str] = None) -> Path:
+        """
+        Agrega un registro al archivo del día.
+
+        Args:
+            record: Registro serializable a JSON
+            date: Fecha (YYYY-MM-DD) del archivo destino. Default: hoy
+
+        Returns:
+            Ruta del archivo escrito
+        """
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        data = line.encode('utf-8')
+        path = self.path_for(date)
+
+        with self._lock, _file_lock(self._lock_path):
+            if self.max_bytes and path.exists() and path.stat().st_size + len(data) > self.max_bytes:
+                self._rotate(path)
+            # Una sola llamada a write en modo append: la línea queda completa
+            with open(path, 'a+b') as f:
+                ensure_line_boundary(f)
+                f.write(data)
+        return path
+
+
+# --- Lectura ---
+
+def _part_number(path: Path) -> int:
+    match = _PART_RE.search(path.stem)
+    return int(match.group(1)) if match else sys.maxsize
+
+
+def log_files_for_date(log_dir: str, date: str, prefix: str = DEFAULT_PREFIX) -> List[Path]:
+    """
+    Archivos de un día en orden cronológico.
+
+    Primero el arreglo JSON antiguo (si existe), luego las partes rotadas
+    (`_part1`, `_part2`, ...) y al final el archivo activo.
+
+    Args:
+        log_dir: Directorio de los logs
+        date: Fecha YYYY-MM-DD
+        prefix: Prefijo de los archivos
+
+    Returns:
+        Lista de rutas existentes
+    """
+    base = Path(log_dir)
+    files: List[Path] = []
+
+    legacy = base / f"{prefix}_{date}.json"
+    if legacy.exists():
+        files.append(legacy)
+
+    jsonl_files = list(base.glob(f"{prefix}_{date}_part*.jsonl"))
+    active = base / f"{prefix}_{date}.jsonl"
+    if active.exists():
+        jsonl_files.append(active)
+    files.extend(sorted(jsonl_files, key=_part_number))
+    return files
+
+
+def iter_file_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Itera los registros de un archivo, sea JSONL o un arreglo JSON antiguo.
+
+    Las líneas JSONL dañadas (por ejemplo, truncadas) se omiten.
+
+    Args:
+        path: Ruta del archivo
+
+    Yields:
+        Registros (diccionarios)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            # Detectar formato por el primer carácter significativo
+            first = ''
+            while True:
+                ch = f.read(1)
+                if not ch or not ch.isspace():
+                    first = ch
+                    break
+            f.seek(0)
+
+            if first == '[':
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError as e:
+                    print(f"[!] Arreglo JSON dañado en {path}: {e}")
+                    return
+                for record in data:
+                    if isinstance(record, dict):
+                        yield record
+                return
+
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
+    except OSError as e:
+        print(f"[!] No se pudo leer {path}: {e}")
+
+
+def iter_records(log_dir: str, date: str, prefix: str = DEFAULT_PREFIX) -> Iterator[Dict[str, Any]]:
+    """
+    Itera en streaming todos los registros de un día.
+
+    Args:
+        log_dir: Directorio de los logs
+        date: Fecha YYYY-MM-DD
+        prefix: Prefijo de los archivos
+
+    Yields:
+        Registros en orden cronológico de escritura
+    """
+    for path in log_files_for_date(log_dir, date, prefix):
+        yield from iter_file_records(path)
+
+
+def list_dates(log_dir: str, prefix: str = DEFAULT_PREFIX) -> List[str]:
+    """
+    Fechas (YYYY-MM-DD) con logs disponibles, en orden ascendente.
+
+    Args:
+        log_dir: Directorio de los logs
+        prefix: Prefijo de los archivos
+
+    Returns:
+        Lista de fechas
+    """
+    pattern = re.compile(rf"^{re.escape(prefix)}_(\d{{4}}-\d{{2}}-\d{{2}})(?:_part\d+)?\.jsonl?$")
+    dates = set()
+    for path in Path(log_dir).glob(f"{prefix}_*.json*"):
+        match = pattern.match(path.name)
+        if match:
+            dates.add(match.group(1))
+    return sorted(dates)
+
+
+def convert_array_file(path: Path, remove: bool = False, prefix: str = DEFAULT_PREFIX) -> Optional[Path]:
+    """
+    Convierte un arreglo JSON antiguo a JSONL.
+
+    Los registros se anteponen a los del `.jsonl` del mismo día si ya existe,
+    para conservar el orden cronológico. La escritura es atómica. El original
+    se renombra a `.json.bak` (o se elimina) para que el lector no lo duplique.
+
+    Args:
+        path: Archivo `.json` con un arreglo de registros
+        remove: Si True, elimina el archivo original en lugar de renombrarlo
+        prefix: Prefijo de los archivos (para compartir el bloqueo del escritor)
+
+    Returns:
+        Ruta del archivo `.jsonl`, o None si no había nada que convertir
+    """
+    path = Path(path)
+    records = list(iter_file_records(path))
+    target = path.with_suffix(".jsonl")
+    if not records:
+        return None
+
+    with _file_lock(path.parent / f".{prefix}.lock"):
+        tmp = target.with_name(target.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as out:
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            if target.exists():
+                with open(target, 'r', encoding='utf-8') as existing:
+                    for line in existing:
+                        out.write(line)
+        os.replace(tmp, target)
+        if remove:
+            path.unlink()
+        else:
+            os.replace(path, path.with_name(path.name + ".bak"))
+    return target
+
+
+def convert_directory(log_dir: str, prefix: str = DEFAULT_PREFIX, remove: bool = False) -> List[Path]:
+    """Convierte todos los arreglos `prefix_YYYY-MM-DD.json` de un directorio."""
+    converted = []
+    for path in sorted(Path(log_dir).glob(f"{prefix}_*.json")):
+        target = convert_array_file(path, remove=remove, prefix=prefix)
+        if target is not None:
+            print(f"[OK] {path.name} -> {target.name}")
+            converted.append(target)
+    return converted
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Utilidades del log JSONL de interacciones de GERARD')
+    sub = parser.add_subparsers(dest='command')
+    convert = sub.add_parser('convert', help='Convierte arreglos JSON antiguos a JSONL')
+    convert.add_argument('log_dir', nargs='?', default='logs')
+    convert.add_argument('--prefix', default=DEFAULT_PREFIX)
+    convert.add_argument('--remove', action='store_true', help='Elimina los .json originales')
+
+    args = parser.parse_args()
+    if args.command == 'convert':
+        converted = convert_directory(args.log_dir, args.prefix, args.remove)
+        print(f"[INFO] Archivos convertidos: {len(converted)}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Índice Invertido de Palabras del Docstore para GERARD
+
+La etapa por keywords de `hybrid_retrieval` recorría el docstore entero en
+cada consulta (`kw in doc.page_content.lower()` para cada documento). Este
+índice se construye una vez por vectorstore y resuelve las mismas
+coincidencias sin recorrer los documentos.
+
+Características:
+- Mismos resultados que el escaneo: una keyword (solo caracteres de palabra)
+  aparece como subcadena de un texto si y solo si es subcadena de alguna de
+  sus palabras, así que se buscan en el vocabulario (mucho menor que el
+  corpus) las palabras que la contienen y se unen sus listas de documentos.
+  Las keywords con espacios o signos se resuelven recorriendo los textos
+- Mismo orden: más keywords coincidentes primero y, a igualdad, el orden del
+  docstore
+- Listas de documentos en formato CSR (NumPy uint32): ~4 bytes por par
+  palabra-documento
+- Lotes: las keywords de todas las consultas se resuelven una sola vez
+- Un índice por vectorstore (se reconstruye si el docstore crece, como con
+  el índice fragmentado)
+
+Uso:
+    index = keyword_index_for(vectorstore)
+    docs = index.top_matches(["linaje", "reyes"], k=30)
+"""
+
+import re
+import threading
+import weakref
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+_CACHE_LIMIT = 4096
+
+
+class KeywordIndex:
+    """Índice invertido palabra -> documentos sobre un docstore."""
+
+    def __init__(self, docs: Sequence[Any]):
+        """
+        Construye el índice.
+
+        Args:
+            docs: Documentos en el orden del docstore (con `page_content`)
+        """
+        self.docs = list(docs)
+        vocabulary: Dict[str, int] = {}
+        word_ids = array("I")
+        doc_ids = array("I")
+        for position, doc in enumerate(self.docs):
+            for word in set(_WORD_RE.findall(doc.page_content.lower())):
+                word_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+                doc_ids.append(position)
+
+        words = np.frombuffer(word_ids, dtype=np.uint32) if word_ids else np.zeros(0, dtype=np.uint32)
+        positions = np.frombuffer(doc_ids, dtype=np.uint32) if doc_ids else np.zeros(0, dtype=np.uint32)
+        # Orden estable: dentro de cada palabra los documentos quedan ascendentes
+        order = np.argsort(words, kind="stable")
+        self._postings = positions[order]
+        self._offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(words, minlength=len(vocabulary)), out=self._offsets[1:])
+
+        # Vocabulario como un único texto separado por saltos de línea: buscar
+        # una subcadena en todas las palabras es un `str.find` repetido
+        self._vocabulary_text = "\n".join(vocabulary)
+        self._word_starts = []
+        offset = 0
+        for word in vocabulary:
+            self._word_starts.append(offset)
+            offset += len(word) + 1
+        self._cache: Dict[str, np.ndarray] = {}
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_docstore(cls, docstore: Any) -> "KeywordIndex":
+        """Índice sobre un docstore de LangChain (`docstore._dict`)."""
+        return cls(list(docstore._dict.values()))
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._word_starts)
+
+    def _word_ids_containing(self, keyword: str) -> List[int]:
+        text = self._vocabulary_text
+        found = []
+        start = text.find(keyword)
+        while start >= 0:
+            word_id = bisect_right(self._word_starts, start) - 1
+            found.append(word_id)
+            # Siguiente palabra: una misma palabra cuenta una sola vez
+            next_start = self._word_starts[word_id + 1] if word_id + 1 < len(self._word_starts) else len(text)
+            start = text.find(keyword, next_start)
+        return found
+
+    def positions(self, keyword: str) -> np.ndarray:
+        """
+        Documentos que contienen `keyword` como subcadena.
+
+        Returns:
+            Posiciones en el docstore, ordenadas y sin repetir
+        """
+        keyword = keyword.lower()
+        cached = self._cache.get(keyword)
+        if cached is not None:
+            return cached
+        if not keyword:
+            result = np.zeros(0, dtype=np.uint32)
+        elif not _WORD_RE.fullmatch(keyword):
+            # Con espacios o signos puede abarcar varias palabras: recorrer los textos
+            result = np.array([p for p, doc in enumerate(self.docs) if keyword in doc.page_content.lower()],
+                              dtype=np.uint32)
+        else:
+            chunks = [self._postings[self._offsets[w]:self._offsets[w + 1]] for w in self._word_ids_containing(keyword)]
+            if not chunks:
+                result = np.zeros(0, dtype=np.uint32)
+            elif len(chunks) == 1:
+                result = chunks[0]
+            else:
+                result = np.unique(np.concatenate(chunks))
+        with self._cache_lock:
+            if len(self._cache) >= _CACHE_LIMIT:
+                self._cache.clear()
+            self._cache[keyword] = result
+        return result
+
+    def _rank(self, keywords: Sequence[str], resolved: Dict[str, np.ndarray], k: int) -> Tuple[List[Any], int]:
+        arrays = [resolved[kw] for kw in keywords if len(resolved[kw])]
+        if not arrays:
+            return [], 0
+        positions, counts = np.unique(np.concatenate(arrays), return_counts=True)
+        # Más keywords primero; a igualdad, orden del docstore
+        ranked = positions[np.lexsort((positions, -counts))[:k]]
+        return [self.docs[p] for p in ranked], len(positions)
+
+    def top_matches(self, keywords: Sequence[str], k: int) -> List[Any]:
+        """
+        Los `k` documentos con más keywords (las repetidas cuentan cada vez).
+
+        Equivale a contar `kw in doc.page_content.lower()` en todo el docstore
+        y ordenar de forma estable por número de coincidencias.
+        """
+        return self.top_matches_batch([keywords], k)[0][0]
+
+    def top_matches_batch(self, keyword_lists: Sequence[Sequence[str]], k: int) -> List[Tuple[List[Any], int]]:
+        """
+        `top_matches` para varias consultas; cada keyword distinta se resuelve una vez.
+
+        Returns:
+            Por consulta: (documentos, número de documentos con alguna coincidencia)
+        """
+        resolved = {kw: self.positions(kw) for kw in {kw for keywords in keyword_lists for kw in keywords}}
+        return [self._rank(keywords, resolved, k) for keywords in keyword_lists]
+
+
+_indexes: "weakref.WeakKeyDictionary[Any, Tuple[int, KeywordIndex]]" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def keyword_index_for(vectorstore: Any) -> KeywordIndex:
+    """
+    Índice de palabras del docstore de un vectorstore (se construye la primera vez).
+
+    Se reconstruye si el docstore cambió de tamaño (fragmentos que terminan de
+    cargarse en segundo plano).
+    """
+    docstore = vectorstore.docstore
+    size = len(docstore._dict)
+    cached = _indexes.get(vectorstore)
+    if cached is not None and cached[0] == size:
+        return cached[1]
+    with _indexes_lock:
+        cached = _indexes.get(vectorstore)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        index = KeywordIndex.from_docstore(docstore)
+        _indexes[vectorstore] = (len(index), index)
+        print(f"[INFO] Índice de palabras: {len(index)} documentos, {index.vocabulary_size} palabras")
+        return index
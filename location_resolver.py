@@ -0,0 +1,284 @@
+"""
+Resolución de Ubicación en Segundo Plano para GERARD
+
+La ubicación del usuario (reverse geocoding de Nominatim con las coordenadas
+del navegador, o la IP) se resuelve en un hilo aparte que se lanza al cargar
+la sesión, así una respuesta nunca espera a una llamada HTTP de geolocalización.
+
+Características:
+- Futuros por sesión: el manejador de preguntas consulta sin bloquear
+- Ubicación "pendiente" si todavía no llegó; se adjunta al registro al terminar
+- Cache compartida de reverse geocoding por celdas (lat/lon redondeadas), así
+  usuarios cercanos no repiten la consulta
+- Consultas simultáneas de la misma celda agrupadas en una sola (QueryCoalescer)
+- Base local de IPs (ip_geo_db.py) antes que ipinfo.io
+
+Uso:
+    resolver = get_location_resolver()
+    future = resolver.submit_browser(4.61, -74.08, ip)
+    ...
+    location = future.result() if future.done() else pending_location(ip)
+"""
+
+import math
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+import requests
+
+from geo_utils import TTLCache, network_lookups_enabled
+from ip_geo_db import get_ip_database
+from metrics import record_cache
+from query_coalescer import QueryCoalescer
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
+IPINFO_URL = "https://ipinfo.io/{ip}/json"
+IPINFO_SELF_URL = "https://ipinfo.io/json"
+USER_AGENT = "GERARD-App/1.0"
+
+
+def _location(ip: str = "No disponible", city: str = "Desconocida", country: str = "Desconocido",
+              region: str = "", latitude: float = 0, longitude: float = 0, org: str = "",
+              timezone: str = "", source: str = "") -> Dict[str, Any]:
+    """Ubicación en el formato de sesión de consultar_web."""
+    return {
+        'ip': ip,
+        'city': city,
+        'country': country,
+        'region': region,
+        'latitude': latitude,
+        'longitude': longitude,
+        'org': org,
+        'timezone': timezone,
+        'source': source
+    }
+
+
+def pending_location(ip: str = "No disponible") -> Dict[str, Any]:
+    """Ubicación provisional mientras la resolución sigue en curso."""
+    location = _location(ip or "No disponible", city="Pendiente", country="Pendiente", source="pendiente")
+    location['pending'] = True
+    return location
+
+
+def unknown_location(ip: str = "No disponible") -> Dict[str, Any]:
+    return _location(ip or "No disponible", source="desconocida")
+
+
+def to_geo_info(location: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convierte una ubicación de sesión al `geo_info` de InteractionLogger.
+
+    Args:
+        location: Diccionario devuelto por LocationResolver
+
+    Returns:
+        Diccionario con ip, pais, ciudad, region, coordenadas y fuente
+    """
+    lat, lon = location.get('latitude') or 0, location.get('longitude') or 0
+    return {
+        "ip": location.get('ip', 'Desconocido'),
+        "pais": location.get('country', 'Desconocido'),
+        "ciudad": location.get('city', 'Desconocido'),
+        "region": location.get('region') or "N/A",
+        "coordenadas": f"{lat}, {lon}" if (lat or lon) else "N/A",
+        "fuente": location.get('source') or "desconocida"
+    }
+
+
+class LocationResolver:
+    """
+    Resuelve ubicaciones en un pool de hilos con cache de reverse geocoding.
+    """
+
+    def __init__(
+        self,
+        tile_degrees: float = 0.05,
+        cache_ttl_seconds: float = 7 * 24 * 3600,
+        max_cache_entries: int = 5000,
+        max_workers: int = 4,
+        timeout_seconds: float = 5.0,
+        reverse_url: str = NOMINATIM_URL,
+        ip_url: str = IPINFO_URL,
+        self_ip_url: str = IPINFO_SELF_URL
+    ):
+        """
+        Inicializa el resolvedor.
+
+        Args:
+            tile_degrees: Tamaño de la celda de cache (0.05° ≈ 5 km)
+            cache_ttl_seconds: Vigencia de cada celda
+            max_cache_entries: Celdas máximas en memoria (LRU)
+            max_workers: Hilos para resoluciones en paralelo
+            timeout_seconds: Timeout de cada petición HTTP
+            reverse_url: Endpoint de reverse geocoding (formato Nominatim)
+            ip_url: Endpoint de geolocalización por IP con {ip} (formato ipinfo)
+            self_ip_url: Endpoint cuando no se conoce la IP del cliente
+        """
+        self.tile_degrees = tile_degrees
+        self.timeout = timeout_seconds
+        self.reverse_url = reverse_url
+        self.ip_url = ip_url
+        self.self_ip_url = self_ip_url
+        self.tiles = TTLCache(cache_ttl_seconds, max_cache_entries)
+        self._coalescer = QueryCoalescer()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="location")
+
+    # --- Reverse geocoding por celdas ---
+
+    def tile_key(self, lat: float, lon: float) -> str:
+        """Celda (esquina redondeada) que contiene las coordenadas."""
+        step = self.tile_degrees
+        return f"{math.floor(lat / step) * step:.4f},{math.floor(lon / step) * step:.4f}"
+
+    def _fetch_reverse(self, lat: float, lon: float) -> Dict[str, str]:
+        response = requests.get(
+            self.reverse_url,
+            params={"format": "jsonv2", "lat": lat, "lon": lon, "accept-language": "es"},
+            headers={"User-Agent": USER_AGENT},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        address = response.json().get('address', {})
+        city = (address.get('city') or address.get('town') or address.get('village') or
+                address.get('hamlet') or address.get('municipality') or '')
+        # Algunos países devuelven state y county en lugar de city
+        if not city:
+            city = address.get('county') or address.get('state') or ''
+        return {
+            'city': city or 'Desconocida',
+            'country': address.get('country') or 'Desconocido',
+            'region': address.get('state', ''),
+        }
+
+    def reverse_geocode(self, lat: float, lon: float) -> Dict[str, str]:
+        """
+        Ciudad, país y región de unas coordenadas, compartidos por celda.
+
+        Raises:
+            requests.RequestException si el servicio falla (no se guarda en cache)
+        """
+        key = self.tile_key(lat, lon)
+        cached = self.tiles.get(key)
+        if cached is not None:
+            record_cache("reverse_geocode", hit=True)
+            return cached
+        record_cache("reverse_geocode", hit=False)
+
+        def fetch():
+            # Otro hilo pudo completarla mientras esperábamos el turno
+            found = self.tiles.get(key)
+            if found is None:
+                found = self._fetch_reverse(lat, lon)
+                self.tiles.set(key, found)
+            return found
+
+        address, _ = self._coalescer.run(key, fetch)
+        return dict(address)
+
+    # --- Resolución completa ---
+
+    def resolve_ip(self, ip: str = "") -> Dict[str, Any]:
+        """
+        Ubicación aproximada por IP: base local y, si hace falta, ipinfo.io.
+
+        Args:
+            ip: IP del cliente ('' si no se conoce: se usa la IP del servidor)
+        """
+        db = get_ip_database()
+        if db is not None and ip:
+            found = db.lookup(ip)
+            if found is not None:
+                lat, lon = 0, 0
+                if found["coordenadas"] != "N/A":
+                    lat, lon = (float(v) for v in found["coordenadas"].split(","))
+                return _location(ip, found["ciudad"], found["codigo_pais"], found["region"],
+                                 lat, lon, source=found["fuente"])
+
+        if not network_lookups_enabled():
+            return unknown_location(ip)
+
+        try:
+            url = self.ip_url.format(ip=ip) if ip else self.self_ip_url
+            data = requests.get(url, timeout=self.timeout).json()
+            loc = data.get('loc', '0,0').split(',')
+            return _location(
+                data.get('ip', ip or 'No disponible'),
+                data.get('city', 'Desconocida'),
+                data.get('country', 'Desconocido'),
+                data.get('region', ''),
+                float(loc[0]) if len(loc) > 0 and loc[0] else 0,
+                float(loc[1]) if len(loc) > 1 else 0,
+                data.get('org', ''),
+                data.get('timezone', ''),
+                source="ipinfo.io"
+            )
+        except Exception as e:
+            print(f"[!] Error ipinfo fallback: {e}")
+            return unknown_location(ip)
+
+    def resolve_browser(self, lat: float, lon: float, ip: str = "") -> Dict[str, Any]:
+        """
+        Ubicación a partir de las coordenadas del navegador.
+
+        Si el reverse geocoding falla se usa la IP, conservando las coordenadas.
+        """
+        try:
+            address = self.reverse_geocode(lat, lon)
+            return _location(ip or 'No disponible', address['city'], address['country'],
+                             address['region'], lat, lon, source="navegador")
+        except Exception as e:
+            print(f"[!] Error reverse-geocoding Nominatim: {e}")
+            location = self.resolve_ip(ip)
+            location.update({'latitude': lat, 'longitude': lon})
+            return location
+
+    def submit_ip(self, ip: str = "") -> "Future[Dict[str, Any]]":
+        """Lanza `resolve_ip` en segundo plano."""
+        return self._executor.submit(self.resolve_ip, ip)
+
+    def submit_browser(self, lat: float, lon: float, ip: str = "") -> "Future[Dict[str, Any]]":
+        """Lanza `resolve_browser` en segundo plano."""
+        return self._executor.submit(self.resolve_browser, lat, lon, ip)
+
+    @staticmethod
+    def result_or_pending(future: Optional[Future], ip: str = "", wait: float = 0.0) -> Dict[str, Any]:
+        """
+        Resultado del futuro si ya terminó (esperando como mucho `wait`).
+
+        Returns:
+            Ubicación resuelta, `pending_location` si sigue en curso o
+            `unknown_location` si falló
+        """
+        if future is None:
+            return pending_location(ip)
+        if not future.done() and wait <= 0:
+            return pending_location(ip)
+        try:
+            return future.result(timeout=wait if wait > 0 else None)
+        except FutureTimeoutError:
+            return pending_location(ip)
+        except Exception as e:
+            print(f"[!] Error resolviendo ubicación: {e}")
+            return unknown_location(ip)
+
+
+_default_resolver: Optional[LocationResolver] = None
+_default_lock = threading.Lock()
+
+
+def get_location_resolver() -> LocationResolver:
+    """
+    Obtiene el resolvedor compartido del proceso (cache común a las sesiones).
+
+    Returns:
+        Instancia única de LocationResolver
+    """
+    global _default_resolver
+    if _default_resolver is None:
+        with _default_lock:
+            if _default_resolver is None:
+                _default_resolver = LocationResolver()
+    return _default_resolver
@@ -0,0 +1,365 @@
+"""
+Almacén Columnar de Logs de Interacciones
+
+Compacta los logs diarios (JSONL o arreglos JSON antiguos, ver jsonl_log.py)
+en un archivo columnar por día con un índice por fecha, para que los análisis
+de semanas o meses no tengan que decodificar cada registro JSON.
+
+Características:
+- Ingesta incremental: sólo se recompactan los días cuyos logs cambiaron
+- Parquet vía pandas (pyarrow/fastparquet); si no hay motor, pickle de pandas
+- Índice (manifest.json) con filas, rango de fechas y firma de los archivos fuente
+- Consultas por rango: percentiles p50/p95/p99 por fase, desgloses por
+  usuario/país/dispositivo, consultas más lentas y errores
+
+Uso:
+    python log_store.py ingest                       # compacta todos los días
+    python log_store.py report 2025-10-01 2025-10-31 # resumen del rango
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from jsonl_log import iter_records, list_dates, log_files_for_date
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    try:
+        import fastparquet  # noqa: F401
+        PARQUET_AVAILABLE = True
+    except ImportError:
+        PARQUET_AVAILABLE = False
+
+
+# Fases de InteractionLogger._calculate_metrics
+PHASE_COLUMNS = {
+    "total": "tiempo_total",
+    "rag": "tiempo_rag",
+    "llm": "tiempo_llm",
+    "procesamiento": "tiempo_procesamiento",
+    "render": "tiempo_render",
+}
+
+COLUMNS = [
+    "date", "timestamp", "session_id", "user", "platform", "question", "status", "error",
+    "pais", "ciudad", "device_tipo", "os", "navegador", "sources_count", "tokens",
+] + list(PHASE_COLUMNS.values())
+
+STRING_COLUMNS = [
+    "date", "session_id", "user", "platform", "question", "status", "error",
+    "pais", "ciudad", "device_tipo", "os", "navegador",
+]
+
+
+def _flatten(record: Dict, date: str) -> Dict:
+    """Convierte un registro de InteractionLogger en una fila plana."""
+    device = record.get("device_info") or {}
+    geo = record.get("geo_info") or {}
+    metrics = record.get("metrics") or {}
+    row = {
+        "date": date,
+        "timestamp": record.get("timestamp"),
+        "session_id": record.get("session_id", ""),
+        "user": record.get("user", "Desconocido"),
+        "platform": record.get("platform", "Desconocido"),
+        "question": record.get("question", ""),
+        "status": record.get("status", "desconocido"),
+        "error": record.get("error") or "",
+        "pais": geo.get("pais", "Desconocido"),
+        "ciudad": geo.get("ciudad", "Desconocido"),
+        "device_tipo": device.get("tipo", "Desconocido"),
+        "os": device.get("os", "Desconocido"),
+        "navegador": device.get("navegador", "N/A"),
+        "sources_count": record.get("sources_count", 0) or 0,
+        "tokens": record.get("tokens"),
+    }
+    for column in PHASE_COLUMNS.values():
+        value = metrics.get(column)
+        row[column] = float(value) if value is not None else np.nan
+    return row
+
+
+def records_to_frame(records: Iterable[Dict], date: str) -> pd.DataFrame:
+    """
+    Construye el DataFrame columnar de un día.
+
+    Args:
+        records: Registros de InteractionLogger
+        date: Fecha YYYY-MM-DD de los registros
+
+    Returns:
+        DataFrame con las columnas de COLUMNS
+    """
+    frame = pd.DataFrame([_flatten(r, date) for r in records], columns=COLUMNS)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], errors="coerce")
+    frame["sources_count"] = pd.to_numeric(frame["sources_count"], errors="coerce").fillna(0).astype("int64")
+    frame["tokens"] = pd.to_numeric(frame["tokens"], errors="coerce")
+    for column in PHASE_COLUMNS.values():
+        frame[column] = frame[column].astype("float64")
+    for column in STRING_COLUMNS:
+        frame[column] = frame[column].astype(str)
+    return frame
+
+
+class LogStore:
+    """
+    Almacén columnar de interacciones con índice por fecha.
+    """
+
+    def __init__(self, log_dir: str = "logs", store_dir: Optional[str] = None):
+        """
+        Inicializa el almacén.
+
+        Args:
+            log_dir: Directorio de los logs JSONL
+            store_dir: Directorio del almacén. Default: <log_dir>/store
+        """
+        self.log_dir = Path(log_dir)
+        self.store_dir = Path(store_dir) if store_dir else self.log_dir / "store"
+        self.manifest_path = self.store_dir / "manifest.json"
+        self.extension = "parquet" if PARQUET_AVAILABLE else "pkl"
+        self.manifest = self._load_manifest()
+
+    # --- Índice ---
+
+    def _load_manifest(self) -> Dict:
+        if not self.manifest_path.exists():
+            return {"version": 1, "dates": {}}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[!] Índice del almacén de logs dañado, se reconstruirá: {e}")
+            return {"version": 1, "dates": {}}
+
+    def _save_manifest(self):
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+
+    def _source_signature(self, date: str) -> List[List]:
+        """Firma (nombre, tamaño, mtime) de los archivos fuente de un día."""
+        signature = []
+        for path in log_files_for_date(str(self.log_dir), date):
+            stat = path.stat()
+            signature.append([path.name, stat.st_size, stat.st_mtime_ns])
+        return signature
+
+    def dates(self) -> List[str]:
+        """Fechas presentes en el almacén, en orden."""
+        return sorted(self.manifest["dates"])
+
+    # --- Ingesta ---
+
+    def _write_frame(self, frame: pd.DataFrame, path: Path):
+        tmp = path.with_name(path.name + ".tmp")
+        if PARQUET_AVAILABLE:
+            frame.to_parquet(tmp, index=False)
+        else:
+            frame.to_pickle(tmp, compression="gzip")
+        os.replace(tmp, path)
+
+    def ingest(self, dates: Optional[Sequence[str]] = None, force: bool = False) -> List[str]:
+        """
+        Compacta los logs de los días indicados (o de todos) en el almacén.
+
+        Un día sólo se vuelve a compactar si sus archivos fuente cambiaron.
+
+        Args:
+            dates: Fechas YYYY-MM-DD. Default: todas las disponibles
+            force: Recompactar aunque la firma no haya cambiado
+
+        Returns:
+            Fechas compactadas en esta llamada
+        """
+        if dates is None:
+            dates = list_dates(str(self.log_dir))
+
+        updated = []
+        for date in dates:
+            signature = self._source_signature(date)
+            if not signature:
+                continue
+            entry = self.manifest["dates"].get(date)
+            if not force and entry and entry.get("sources") == signature:
+                continue
+
+            frame = records_to_frame(iter_records(str(self.log_dir), date), date)
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            path = self.store_dir / f"interactions_{date}.{self.extension}"
+            self._write_frame(frame, path)
+            self.manifest["dates"][date] = {
+                "file": path.name,
+                "rows": int(len(frame)),
+                "sources": signature,
+                "ingested_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            updated.append(date)
+
+        if updated:
+            self._save_manifest()
+            print(f"[OK] Almacén de logs actualizado: {len(updated)} día(s)")
+        return updated
+
+    # --- Lectura ---
+
+    def load(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        refresh: bool = True
+    ) -> pd.DataFrame:
+        """
+        Carga las interacciones de un rango de fechas (inclusive).
+
+        Args:
+            start: Fecha inicial YYYY-MM-DD. Default: la primera disponible
+            end: Fecha final YYYY-MM-DD. Default: la última disponible
+            columns: Columnas a leer (lectura parcial en Parquet)
+            refresh: Si True, compacta antes los días del rango que cambiaron
+
+        Returns:
+            DataFrame (vacío si no hay datos)
+        """
+        if refresh:
+            wanted = [d for d in list_dates(str(self.log_dir))
+                      if (start is None or d >= start) and (end is None or d <= end)]
+            self.ingest(wanted)
+
+        frames = []
+        for date in self.dates():
+            if (start is not None and date < start) or (end is not None and date > end):
+                continue
+            path = self.store_dir / self.manifest["dates"][date]["file"]
+            if not path.exists():
+                continue
+            if path.suffix == ".parquet":
+                frames.append(pd.read_parquet(path, columns=columns))
+            else:
+                frame = pd.read_pickle(path, compression="gzip")
+                frames.append(frame[columns] if columns else frame)
+
+        if not frames:
+            return pd.DataFrame(columns=columns or COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+
+# --- Consultas ---
+
+def latency_percentiles(frame: pd.DataFrame, quantiles=(0.5, 0.95, 0.99)) -> pd.DataFrame:
+    """
+    Percentiles de latencia por fase.
+
+    Returns:
+        DataFrame indexado por fase con columnas n, mean, p50, p95, p99, max
+    """
+    rows = {}
+    for phase, column in PHASE_COLUMNS.items():
+        if column not in frame:
+            continue
+        values = frame[column].dropna().to_numpy()
+        if values.size == 0:
+            continue
+        row = {"n": int(values.size), "mean": float(values.mean())}
+        for q, value in zip(quantiles, np.quantile(values, quantiles)):
+            row[f"p{int(round(q * 100))}"] = float(value)
+        row["max"] = float(values.max())
+        rows[phase] = row
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def breakdown(frame: pd.DataFrame, by: str, top: Optional[int] = None) -> pd.DataFrame:
+    """
+    Desglose de interacciones por una columna (user, pais, device_tipo...).
+
+    Returns:
+        DataFrame con count, share, errors y p95 del tiempo total, ordenado por count
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=["count", "share", "errors", "p95"])
+    grouped = frame.groupby(by, sort=False)
+    result = pd.DataFrame({
+        "count": grouped.size(),
+        "errors": grouped["status"].agg(lambda s: int((s == "error").sum())),
+        "p95": grouped["tiempo_total"].quantile(0.95),
+    })
+    result["share"] = result["count"] / len(frame)
+    result = result.sort_values("count", ascending=False)
+    return result.head(top) if top else result
+
+
+def slowest(frame: pd.DataFrame, n: int = 10) -> pd.DataFrame:
+    """Las `n` interacciones con mayor tiempo total."""
+    return frame.nlargest(n, "tiempo_total")[["timestamp", "user", "question", "tiempo_total", "status"]]
+
+
+def errors(frame: pd.DataFrame) -> pd.DataFrame:
+    """Errores agrupados por mensaje (primeros 100 caracteres)."""
+    failed = frame[frame["status"] == "error"]
+    if failed.empty:
+        return pd.DataFrame(columns=["count", "first", "last"])
+    messages = failed["error"].str.slice(0, 100).replace("", "Error desconocido")
+    grouped = failed.assign(message=messages).groupby("message")
+    result = pd.DataFrame({
+        "count": grouped.size(),
+        "first": grouped["timestamp"].min(),
+        "last": grouped["timestamp"].max(),
+    })
+    return result.sort_values("count", ascending=False)
+
+
+def summary(frame: pd.DataFrame) -> Dict:
+    """Totales generales del rango."""
+    total = int(len(frame))
+    successful = int((frame["status"] == "success").sum()) if total else 0
+    return {
+        "total": total,
+        "successful": successful,
+        "failed": total - successful,
+        "unique_users": int(frame["user"].nunique()) if total else 0,
+        "days": int(frame["date"].nunique()) if total else 0,
+    }
+
+
+def main():
+    """Punto de entrada de línea de comandos."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Almacén columnar de logs de GERARD')
+    parser.add_argument('--log-dir', default='logs')
+    sub = parser.add_subparsers(dest='command')
+    ingest = sub.add_parser('ingest', help='Compacta los logs diarios')
+    ingest.add_argument('--force', action='store_true')
+    report = sub.add_parser('report', help='Resumen de un rango de fechas')
+    report.add_argument('start', nargs='?', default=None, help='YYYY-MM-DD')
+    report.add_argument('end', nargs='?', default=None, help='YYYY-MM-DD')
+
+    args = parser.parse_args()
+    store = LogStore(args.log_dir)
+
+    if args.command == 'ingest':
+        store.ingest(force=args.force)
+        print(f"[INFO] Días en el almacén: {len(store.dates())}")
+    elif args.command == 'report':
+        frame = store.load(args.start, args.end)
+        print(summary(frame))
+        with pd.option_context('display.width', 120, 'display.max_colwidth', 60):
+            print(latency_percentiles(frame).round(3))
+            print(breakdown(frame, "pais", top=10))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""
+Métricas en Vivo (formato Prometheus) para GERARD
+
+`analyze_logs.py` y `email_reporter.py` sólo agregan los logs a posteriori.
+Este módulo mantiene un registro de métricas en memoria y lo expone por HTTP
+en formato de texto de Prometheus para poder graficar y alertar (p. ej. sobre
+regresiones de p95) mientras la app está corriendo.
+
+Características:
+- Contadores, gauges e histogramas con etiquetas
+- Histogramas log-lineales estilo HDR (error relativo acotado) con percentiles
+- Colectores que actualizan gauges justo antes de cada lectura
+- Integración con tracing.py: latencia por span y por interacción
+- Servidor HTTP local (/metrics y /healthz) en un hilo daemon
+
+Uso:
+    from metrics import start_metrics_server
+    start_metrics_server(9464)   # http://127.0.0.1:9464/metrics
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_PORT = 9464
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Base común: nombre, ayuda y valores por combinación de etiquetas."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Valor acumulado que sólo crece (requests, errores, aciertos de caché)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Valor que sube y baja (llamadas en curso, tamaño del índice)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    @contextmanager
+    def track_inprogress(self, **labels: Any) -> Iterator[None]:
+        """Incrementa el gauge mientras dura el bloque."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+def log_linear_bounds(min_value: float = 0.001, max_value: float = 1800.0, sub_buckets: int = 4) -> List[float]:
+    """
+    Límites superiores de cubetas log-lineales (estilo HDR).
+
+    Args:
+        min_value: Límite superior de la primera cubeta
+        max_value: Valor máximo distinguible
+        sub_buckets: Cubetas lineales por cada potencia de dos
+
+    Returns:
+        Lista creciente de límites (sin +Inf)
+    """
+    octaves = max(1, math.ceil(math.log2(max_value / min_value)))
+    bounds = [min_value]
+    for e in range(octaves):
+        base = min_value * (2 ** e)
+        for s in range(1, sub_buckets + 1):
+            bounds.append(base * (1 + s / sub_buckets))
+    return bounds
+
+
+class _HdrCounts:
+    """
+    Conteos de un histograma log-lineal.
+
+    Cada potencia de dos a partir de `min_value` se divide en
+    `sub_buckets` cubetas lineales, así el error relativo de cualquier
+    percentil es como máximo 1/sub_buckets, sin importar la escala.
+    """
+
+    __slots__ = ("counts", "total", "sum", "max_index")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0
+        self.sum = 0.0
+        self.max_index = -1
+
+
+class Histogram(_Metric):
+    """
+    Histograma de latencias estilo HDR con percentiles y exposición Prometheus.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        min_value: float = 0.001,
+        max_value: float = 1800.0,
+        sub_buckets: int = 4
+    ):
+        """
+        Args:
+            name: Nombre de la métrica (en segundos: *_seconds)
+            help_text: Descripción
+            min_value: Límite superior de la primera cubeta
+            max_value: Valor máximo distinguible (lo mayor va a +Inf)
+            sub_buckets: Cubetas lineales por cada potencia de dos
+        """
+        super().__init__(name, help_text)
+        self.min_value = min_value
+        self.sub_buckets = sub_buckets
+        self._bounds: List[float] = log_linear_bounds(min_value, max_value, sub_buckets)
+        self._series: Dict[LabelKey, _HdrCounts] = {}
+
+    @property
+    def bounds(self) -> List[float]:
+        """Límites superiores de las cubetas (sin +Inf)."""
+        return list(self._bounds)
+
+    def _index(self, value: float) -> int:
+        # Primera cubeta cuyo límite superior es >= value (len(bounds) = +Inf)
+        return bisect.bisect_left(self._bounds, value)
+
+    def observe(self, value: float, **labels: Any):
+        key = _label_key(labels)
+        index = self._index(max(0.0, value))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HdrCounts(len(self._bounds) + 1)
+            series.counts[index] += 1
+            series.total += 1
+            series.sum += value
+            if index > series.max_index:
+                series.max_index = index
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observa la duración del bloque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series.total if series else 0
+
+    def quantile(self, q: float, **labels: Any) -> float:
+        """
+        Percentil aproximado (límite superior de la cubeta que lo contiene).
+
+        Args:
+            q: Cuantil entre 0 y 1 (0.95 = p95)
+
+        Returns:
+            Valor en las unidades observadas (0.0 si no hay datos)
+        """
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if series is None or series.total == 0:
+                return 0.0
+            rank = max(1, math.ceil(q * series.total))
+            seen = 0
+            for index, count in enumerate(series.counts):
+                seen += count
+                if seen >= rank:
+                    return self._bounds[index] if index < len(self._bounds) else math.inf
+        return math.inf
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [
+                (key, list(series.counts), series.total, series.sum, series.max_index)
+                for key, series in sorted(self._series.items())
+            ]
+        lines = []
+        for key, counts, total, total_sum, max_index in snapshot:
+            cumulative = 0
+            # Sólo hasta la mayor cubeta observada: el resto repetiría el total
+            for index in range(min(max_index + 1, len(self._bounds))):
+                cumulative += counts[index]
+                le = ("le", f"{self._bounds[index]:.6g}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {total}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {total}")
+        return lines
+
+    def render_quantiles(self, quantiles=(0.5, 0.95, 0.99)) -> List[str]:
+        """Percentiles precalculados como gauge `<nombre>_quantile`."""
+        with self._lock:
+            keys = sorted(self._series)
+        name = f"{self.name}_quantile"
+        lines = [f"# HELP {name} Percentiles de {self.name} (histograma HDR)", f"# TYPE {name} gauge"]
+        for key in keys:
+            labels = dict(key)
+            for q in quantiles:
+                lines.append(f"{name}{_format_labels(key, ('quantile', str(q)))} {_format_value(self.quantile(q, **labels))}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas del proceso y colectores que las actualizan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"La métrica {name} ya existe con otro tipo")
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, **kwargs) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, **kwargs)
+
+    def register_collector(self, collector: Callable[[], None]):
+        """Registra una función que se ejecuta antes de cada exposición."""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Genera el texto de exposición de Prometheus.
+
+        Returns:
+            Texto con todas las métricas
+        """
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"[!] Error en colector de métricas: {e}")
+
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+            if isinstance(metric, Histogram):
+                lines.extend(metric.render_quantiles())
+        return "\n".join(lines) + "\n"
+
+
+_default_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Registro de métricas compartido por el proceso."""
+    return _default_registry
+
+
+# --- Métricas estándar de GERARD ---
+
+REQUESTS = _default_registry.counter(
+    "gerard_requests_total", "Interacciones atendidas por plataforma y estado")
+REQUEST_SECONDS = _default_registry.histogram(
+    "gerard_request_duration_seconds", "Latencia total de cada interacción")
+SPAN_SECONDS = _default_registry.histogram(
+    "gerard_span_duration_seconds", "Latencia por fase (span de tracing.py)")
+LLM_IN_FLIGHT = _default_registry.gauge(
+    "gerard_llm_in_flight", "Llamadas al LLM en curso")
+CACHE_REQUESTS = _default_registry.counter(
+    "gerard_cache_requests_total", "Consultas a cachés por resultado (hit/miss)")
+CACHE_HIT_RATIO = _default_registry.gauge(
+    "gerard_cache_hit_ratio", "Proporción de aciertos por caché")
+RATE_LIMITER_WAIT_SECONDS = _default_registry.histogram(
+    "gerard_rate_limiter_wait_seconds", "Esperas impuestas por el rate limiter")
+GEO_PROVIDER_SECONDS = _default_registry.histogram(
+    "gerard_geo_provider_duration_seconds", "Latencia de cada proveedor de geolocalización por resultado")
+INDEX_VECTORS = _default_registry.gauge(
+    "gerard_index_vectors", "Vectores en el índice FAISS cargado")
+INDEX_BYTES = _default_registry.gauge(
+    "gerard_index_bytes", "Tamaño en disco de los archivos del índice FAISS")
+PROCESS_MEMORY_BYTES = _default_registry.gauge(
+    "gerard_process_memory_bytes", "Memoria del proceso por tipo (rss, rss_anon, rss_file, pss)")
+
+
+def record_cache(cache: str, hit: bool):
+    """Cuenta un acierto o fallo de caché y actualiza su proporción."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.get(cache=cache, result="hit")
+    misses = CACHE_REQUESTS.get(cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(hits / (hits + misses), cache=cache)
+
+
+def set_index_metrics(vectorstore: Any, index_dir: str = "faiss_index"):
+    """Publica número de vectores y tamaño en disco del índice cargado."""
+    try:
+        INDEX_VECTORS.set(vectorstore.index.ntotal)
+    except Exception:
+        pass
+    path = Path(index_dir)
+    if path.is_dir():
+        INDEX_BYTES.set(sum(f.stat().st_size for f in path.iterdir() if f.is_file()))
+
+
+def observe_trace(spans: List[Any]):
+    """
+    Listener de tracing.py: alimenta los histogramas con cada traza terminada.
+
+    Args:
+        spans: Spans de una traza (el raíz incluido)
+    """
+    for span in spans:
+        SPAN_SECONDS.observe(span.duration, span=span.name)
+        if span.is_root and span.name == "interaction":
+            platform = span.attributes.get("platform", "desconocida")
+            status = "error" if span.status_message else "ok"
+            REQUESTS.inc(platform=platform, status=status)
+            REQUEST_SECONDS.observe(span.duration, platform=platform)
+
+
+_instrumented = set()
+_instrument_lock = threading.Lock()
+
+
+def instrument_tracer(tracer: Any):
+    """Conecta `observe_trace` a un tracer (una sola vez por tracer)."""
+    with _instrument_lock:
+        if id(tracer) in _instrumented:
+            return
+        _instrumented.add(id(tracer))
+    tracer.add_listener(observe_trace)
+
+
+# --- Servidor HTTP ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = _default_registry
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = self.registry.render().encode("utf-8")
+            content_type = CONTENT_TYPE
+            status = 200
+        elif path == "/healthz":
+            body, content_type, status = b"ok\n", "text/plain", 200
+        else:
+            body, content_type, status = b"not found\n", "text/plain", 404
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Silenciar el log de acceso de cada scrape
+        pass
+
+
+def start_metrics_server(
+    port: int = DEFAULT_PORT,
+    host: str = "127.0.0.1",
+    registry: Optional[MetricsRegistry] = None
+) -> Optional[ThreadingHTTPServer]:
+    """
+    Inicia el endpoint de métricas en un hilo daemon.
+
+    Args:
+        port: Puerto TCP (0 elige uno libre)
+        host: Interfaz de escucha (local por defecto)
+        registry: Registro a exponer. Default: el del proceso
+
+    Returns:
+        Servidor en ejecución, o None si el puerto no está disponible
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or _default_registry})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        print(f"[!] No se pudo iniciar el endpoint de métricas en {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    print(f"[OK] Métricas disponibles en http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def metrics_port_from_env(default: int = DEFAULT_PORT) -> int:
+    """Puerto configurado en GERARD_METRICS_PORT (0 desactiva el endpoint)."""
+    try:
+        return int(os.getenv("GERARD_METRICS_PORT", default))
+    except ValueError:
+        return default
@@ -0,0 +1,410 @@
+"""
+Embeddings Locales (sin red) para GERARD
+
+Cuando no se pueden inicializar los embeddings de Google (sin API key, cuota
+agotada o sin red), la búsqueda usa un backend local: TF-IDF de n-gramas de
+caracteres proyectado con el truco del hashing a un vector denso. Los vectores
+de Gemini y los locales no son comparables, así que el modo offline usa su
+propio índice FAISS (`faiss_index_offline/`), construido re-embebiendo el
+docstore del índice principal; no hace falta volver a ingerir los .srt.
+
+Características:
+- N-gramas de caracteres (3 a 5) con acentos y mayúsculas normalizados:
+  tolera errores de tipeo y variantes (masón/masones/masonería)
+- Hash estable (FNV-1a + mezcla final de murmur3), independiente de
+  PYTHONHASHSEED: documentos y consultas coinciden entre procesos
+- Signo por cubeta (hashing con signo) para cancelar colisiones en promedio
+- tf sublineal e IDF por cubeta ajustado sobre el corpus del índice
+- Vectorizado en NumPy por lotes: un solo `bincount` por lote, sin bucles
+  por carácter en Python
+- Índice offline guardado junto con el estado del embedder
+  (`offline_embeddings.npz`) y reemplazo atómico del directorio
+- Sello del índice de origen (`offline_source.json`): se reconstruye al
+  cambiar de snapshot, también al volver a uno anterior
+
+Uso:
+    python offline_embeddings.py build [--source faiss_index] [--output faiss_index_offline]
+    python offline_embeddings.py query "linaje de los masones" [--k 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import unicodedata
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from faiss_mmap import load_faiss_local
+
+EMBEDDER_FILE = "offline_embeddings.npz"
+EMBEDDER_FORMAT_VERSION = 1
+SOURCE_STAMP_FILE = "offline_source.json"
+DEFAULT_SOURCE_DIR = "faiss_index"
+DEFAULT_OFFLINE_DIR = "faiss_index_offline"
+DEFAULT_DIM = 768
+
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+_MIX_1 = np.uint64(0xff51afd7ed558ccd)
+_MIX_2 = np.uint64(0xc4ceb9fe1a85ec53)
+_SEPARATOR = "\x00"
+_NON_WORD = re.compile(r"[^\w]+")
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+
+
+def offline_index_dir() -> str:
+    """Directorio del índice offline (GERARD_OFFLINE_INDEX lo cambia)."""
+    return os.environ.get("GERARD_OFFLINE_INDEX", DEFAULT_OFFLINE_DIR)
+
+
+def offline_mode_forced() -> bool:
+    """
+    Indica si se pidió el modo offline aunque haya API key.
+
+    Útil cuando la cuota de embeddings de Google está agotada:
+    GERARD_OFFLINE_EMBEDDINGS=1 evita cualquier llamada de embeddings.
+    """
+    return os.environ.get("GERARD_OFFLINE_EMBEDDINGS", "").strip().lower() in ("1", "true", "yes", "si", "sí")
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin acentos y con un solo espacio entre palabras (con bordes)."""
+    stripped = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text.lower()))
+    # El separador de lotes nunca debe aparecer dentro de un texto
+    return " " + _NON_WORD.sub(" ", stripped.replace(_SEPARATOR, " ")).strip() + " "
+
+
+def _fmix64(h: np.ndarray) -> np.ndarray:
+    """Mezcla final de murmur3 (reparte los bits del FNV)."""
+    h = h ^ (h >> np.uint64(33))
+    h = h * _MIX_1
+    h = h ^ (h >> np.uint64(33))
+    h = h * _MIX_2
+    return h ^ (h >> np.uint64(33))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    TF-IDF de n-gramas de caracteres proyectado a `dim` dimensiones.
+
+    Implementa la interfaz de embeddings de LangChain, así que sirve
+    directamente para `FAISS.load_local` y `FAISS.from_embeddings`.
+    """
+
+    def __init__(
+        self,
+        dim: int = DEFAULT_DIM,
+        ngram_range: Tuple[int, int] = (3, 5),
+        batch_size: int = 256,
+        idf: Optional[np.ndarray] = None
+    ):
+        """
+        Inicializa el embedder.
+
+        Args:
+            dim: Dimensión de los vectores (la del índice)
+            ngram_range: Longitudes mínima y máxima de los n-gramas
+            batch_size: Textos por lote vectorizado
+            idf: Pesos IDF por cubeta (None = todos 1, sin ajustar)
+        """
+        if ngram_range[0] < 1 or ngram_range[0] > ngram_range[1]:
+            raise ValueError(f"Rango de n-gramas inválido: {ngram_range}")
+        self.dim = int(dim)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.batch_size = batch_size
+        self.idf = np.ones(self.dim, dtype=np.float32) if idf is None else np.asarray(idf, dtype=np.float32)
+        if self.idf.shape != (self.dim,):
+            raise ValueError(f"IDF de tamaño {self.idf.shape} para dimensión {self.dim}")
+        self.num_docs = 0
+
+    # --- Conteos con hashing ---
+
+    def _term_counts(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Conteos con signo de n-gramas por cubeta para un lote.
+
+        Todos los textos se concatenan (separados por \\x00) y los hashes de
+        cada longitud se calculan sobre el arreglo completo; se descartan las
+        ventanas que cruzan de un texto a otro.
+
+        Returns:
+            Matriz (len(texts), dim) de conteos con signo (float64)
+        """
+        counts = np.zeros((len(texts), self.dim), dtype=np.float64)
+        if not texts:
+            return counts
+        joined = _SEPARATOR.join(normalize_text(t) for t in texts)
+        codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        # Texto al que pertenece cada posición (-1 en los separadores)
+        separators = codes == 0
+        doc_of = np.cumsum(separators)
+        doc_of[separators] = -1
+
+        length = len(codes)
+        flat = np.zeros(len(texts) * self.dim, dtype=np.float64)
+        # FNV-1a incremental: el hash de los n-gramas de longitud n continúa
+        # el de longitud n-1 (un solo paso por carácter y longitud)
+        prefix = np.full(length, _FNV_OFFSET, dtype=np.uint64)
+        for n in range(1, self.ngram_range[1] + 1):
+            windows = length - n + 1
+            if windows <= 0:
+                break
+            prefix = prefix[:windows]
+            prefix ^= codes[n - 1:n - 1 + windows]
+            prefix *= _FNV_PRIME
+            if n < self.ngram_range[0]:
+                continue
+            h = _fmix64(prefix)
+
+            start_doc = doc_of[:windows]
+            valid = (start_doc >= 0) & (start_doc == doc_of[n - 1:n - 1 + windows])
+            h, docs = h[valid], start_doc[valid]
+            buckets = (h % np.uint64(self.dim)).astype(np.int64)
+            signs = np.where(h >> np.uint64(63), -1.0, 1.0)
+            flat += np.bincount(docs * self.dim + buckets, weights=signs, minlength=flat.size)
+        counts[:] = flat.reshape(len(texts), self.dim)
+        return counts
+
+    def _weight(self, counts: np.ndarray) -> np.ndarray:
+        """tf sublineal con signo, IDF y normalización L2 (float32)."""
+        vectors = np.sign(counts) * np.log1p(np.abs(counts))
+        vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def _batches(self, texts: Sequence[str]) -> Iterable[Sequence[str]]:
+        for start in range(0, len(texts), self.batch_size):
+            yield texts[start:start + self.batch_size]
+
+    # --- API ---
+
+    def fit(self, texts: Sequence[str]) -> "HashingEmbeddings":
+        """
+        Ajusta el IDF por cubeta sobre un corpus.
+
+        Args:
+            texts: Contenido de los documentos del índice
+
+        Returns:
+            self (para encadenar)
+        """
+        texts = list(texts)
+        df = np.zeros(self.dim, dtype=np.int64)
+        for batch in self._batches(texts):
+            df += (self._term_counts(batch) != 0).sum(axis=0)
+        self.num_docs = len(texts)
+        self.idf = (np.log((1.0 + self.num_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+        return self
+
+    def embed_array(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embebe textos como matriz NumPy (len(texts), dim), por lotes.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self._weight(self._term_counts(batch)) for batch in self._batches(texts)])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+    # --- Persistencia ---
+
+    def save(self, directory: Path):
+        """Guarda configuración e IDF en `directory/offline_embeddings.npz` (atómico)."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(directory), suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    version=np.array(EMBEDDER_FORMAT_VERSION),
+                    dim=np.array(self.dim),
+                    ngram_range=np.array(self.ngram_range),
+                    num_docs=np.array(self.num_docs),
+                    idf=self.idf
+                )
+            os.replace(tmp, directory / EMBEDDER_FILE)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, directory: Path, batch_size: int = 256) -> "HashingEmbeddings":
+        """Carga el embedder guardado por `save` en un índice offline."""
+        path = Path(directory) / EMBEDDER_FILE
+        with np.load(str(path), allow_pickle=False) as data:
+            if int(data["version"]) != EMBEDDER_FORMAT_VERSION:
+                raise ValueError(f"Versión de embeddings offline no soportada en {path}")
+            embedder = cls(
+                dim=int(data["dim"]),
+                ngram_range=tuple(int(n) for n in data["ngram_range"]),
+                batch_size=batch_size,
+                idf=data["idf"]
+            )
+            embedder.num_docs = int(data["num_docs"])
+        return embedder
+
+
+# --- Índice FAISS offline ---
+
+def offline_index_available(directory: str) -> bool:
+    path = Path(directory)
+    return (path / "index.faiss").exists() and (path / EMBEDDER_FILE).exists()
+
+
+def source_stamp(source_dir: str) -> dict:
+    """
+    Identifica el índice principal del que se construye el índice offline.
+
+    Ruta absoluta del directorio más tamaño y mtime de sus archivos: cambia
+    al reconstruir el índice en su sitio y al activar otro snapshot, aunque
+    sea uno más antiguo (rollback).
+    """
+    path = Path(source_dir).resolve()
+    files = {}
+    for name in ("index.faiss", "index.pkl"):
+        try:
+            stat = (path / name).stat()
+        except OSError:
+            continue
+        files[name] = [stat.st_size, stat.st_mtime_ns]
+    return {"source": str(path), "files": files}
+
+
+def read_source_stamp(directory: str) -> Optional[dict]:
+    """Sello guardado junto al índice offline (None si falta o está dañado)."""
+    try:
+        with open(Path(directory) / SOURCE_STAMP_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_offline_index(
+    source_dir: str = DEFAULT_SOURCE_DIR,
+    output_dir: Optional[str] = None,
+    dim: Optional[int] = None,
+    ngram_range: Tuple[int, int] = (3, 5)
+):
+    """
+    Construye el índice offline re-embebiendo el docstore del índice principal.
+
+    Los ids del docstore se conservan, así los documentos son los mismos en
+    ambos índices. El directorio de salida se reemplaza de forma atómica.
+
+    Args:
+        source_dir: Índice FAISS principal (embeddings de Gemini)
+        output_dir: Destino (por defecto `offline_index_dir()`)
+        dim: Dimensión de los vectores (por defecto la del índice principal)
+        ngram_range: Longitudes de n-gramas
+
+    Returns:
+        Vectorstore FAISS offline ya cargado
+    """
+    from langchain_community.vectorstores import FAISS
+
+    output = Path(output_dir or offline_index_dir())
+    start = time.perf_counter()
+    # Solo se lee el docstore: el embedder del índice principal no se usa
+    source = load_faiss_local(source_dir, HashingEmbeddings())
+    ids = [source.index_to_docstore_id[i] for i in range(len(source.index_to_docstore_id))]
+    docs = [source.docstore.search(doc_id) for doc_id in ids]
+    texts = [doc.page_content for doc in docs]
+    print(f"[INFO] Re-embebiendo {len(texts)} documentos de {source_dir} sin red...")
+
+    embedder = HashingEmbeddings(dim=dim or source.index.d, ngram_range=ngram_range).fit(texts)
+    vectors = embedder.embed_array(texts)
+    offline = FAISS.from_embeddings(
+        zip(texts, vectors.tolist()),
+        embedder,
+        metadatas=[doc.metadata for doc in docs],
+        ids=ids
+    )
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{output.name}.", dir=str(output.parent)))
+    try:
+        offline.save_local(str(staging))
+        embedder.save(staging)
+        with open(staging / SOURCE_STAMP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(source_stamp(source_dir), f, ensure_ascii=False)
+        previous = output.with_name(output.name + ".old")
+        if output.exists():
+            shutil.rmtree(previous, ignore_errors=True)
+            os.replace(output, previous)
+        os.replace(staging, output)
+        shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    print(f"[OK] Índice offline en {output}: {len(texts)} vectores de {embedder.dim} "
+          f"dimensiones ({time.perf_counter() - start:.1f}s)")
+    return offline
+
+
+def load_offline_index(directory: Optional[str] = None):
+    """
+    Carga un índice offline con su embedder.
+
+    Returns:
+        Vectorstore FAISS cuyas consultas se embeben localmente
+    """
+    directory = directory or offline_index_dir()
+    embedder = HashingEmbeddings.load(Path(directory))
+    return load_faiss_local(directory, embedder)
+
+
+def ensure_offline_index(source_dir: str = DEFAULT_SOURCE_DIR, directory: Optional[str] = None):
+    """
+    Carga el índice offline, construyéndolo antes si todavía no existe
+    o si se construyó desde otro índice principal (sello distinto).
+    """
+    directory = directory or offline_index_dir()
+    if offline_index_available(directory):
+        if read_source_stamp(directory) == source_stamp(source_dir):
+            return load_offline_index(directory)
+        print(f"[INFO] El índice principal cambió; reconstruyendo {directory}")
+    return build_offline_index(source_dir, directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice FAISS con embeddings locales (sin red)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Construir el índice offline desde el índice principal")
+    build.add_argument("--source", default=DEFAULT_SOURCE_DIR)
+    build.add_argument("--output", default=None)
+    build.add_argument("--dim", type=int, default=None)
+
+    query = sub.add_parser("query", help="Buscar en el índice offline")
+    query.add_argument("text")
+    query.add_argument("--index", default=None)
+    query.add_argument("--k", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_offline_index(args.source, args.output, args.dim)
+    else:
+        vectorstore = load_offline_index(args.index)
+        for doc, score in vectorstore.similarity_search_with_score(args.text, k=args.k):
+            source = os.path.basename(doc.metadata.get("source", "Desconocido"))
+            print(f"{score:.4f}  {source}: {doc.page_content[:100]!r}")
+
+
+if __name__ == "__main__":
+    main()
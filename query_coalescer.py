@@ -0,0 +1,182 @@
+"""
+Coalescencia de Consultas Idénticas (single-flight) para GERARD
+
+Cuando varios usuarios hacen la misma pregunta casi al mismo tiempo, cada una
+dispararía su propio embedding, búsqueda FAISS, escaneo por keywords y llamada
+a Gemini. Este módulo agrupa las consultas duplicadas que están en vuelo para
+que sólo una ejecute el cómputo y todas reciban el mismo resultado.
+
+Características:
+- Clave basada en la consulta normalizada + versión del índice
+- Funciona sin caché: cubre ráfagas de preguntas nunca vistas
+- Propagación de errores a todos los que esperan
+- Contadores de llamadas ahorradas
+- Seguro para múltiples hilos (sesiones de Streamlit)
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza una consulta para detectar duplicados.
+
+    Normalización Unicode NFC, casefold y espacios colapsados. Los acentos
+    se conservan: "año" y "ano" o "papá" y "papa" son preguntas distintas y
+    no deben compartir respuesta. "Qué es   el AMOR" y "qué es el amor"
+    producen la misma clave.
+
+    Args:
+        query: Consulta original del usuario
+
+    Returns:
+        Consulta normalizada
+    """
+    if not query:
+        return ""
+    text = unicodedata.normalize('NFC', query).casefold()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class _InFlightCall:
+    """Cómputo en curso compartido por todos los que piden la misma clave."""
+
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class QueryCoalescer:
+    """
+    Agrupa llamadas concurrentes con la misma clave en un único cómputo.
+
+    El primer hilo que llega con una clave ejecuta la función ("líder");
+    los que llegan mientras está en curso esperan y reciben su resultado.
+    Al terminar, la clave se libera: no se guarda nada en caché.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        self._stats = {
+            "total_requests": 0,
+            "upstream_calls": 0,
+            "coalesced": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def make_key(query: str, index_version: str = "") -> Tuple[str, str]:
+        """
+        Construye la clave de coalescencia.
+
+        Args:
+            query: Consulta del usuario
+            index_version: Versión del índice FAISS en uso
+
+        Returns:
+            Tupla (consulta normalizada, versión del índice)
+        """
+        return (normalize_query(query), str(index_version or ""))
+
+    def run(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Ejecuta `func` una sola vez por clave en vuelo.
+
+        Args:
+            key: Clave de coalescencia (ver `make_key`)
+            func: Función sin argumentos que realiza el cómputo
+
+        Returns:
+            Tupla (resultado, compartido). `compartido` es True si el
+            resultado provino del cómputo de otro hilo.
+
+        Raises:
+            Cualquier excepción lanzada por `func`, también en los hilos
+            que esperaban el mismo resultado.
+        """
+        with self._lock:
+            self._stats["total_requests"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._stats["upstream_calls"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """Número de cómputos distintos actualmente en curso."""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene los contadores de coalescencia.
+
+        Returns:
+            Diccionario con total de peticiones, llamadas reales ejecutadas,
+            llamadas ahorradas (coalescidas), errores y ratio de ahorro.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        total = stats["total_requests"]
+        stats["saved_ratio"] = (stats["coalesced"] / total) if total else 0.0
+        return stats
+
+    def reset_stats(self):
+        """Reinicia los contadores (no afecta a los cómputos en curso)."""
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+# Instancia compartida por todo el proceso (todas las sesiones de Streamlit)
+_default_coalescer: Optional[QueryCoalescer] = None
+_default_lock = threading.Lock()
+
+
+def get_query_coalescer() -> QueryCoalescer:
+    """
+    Obtiene el coalescedor compartido del proceso.
+
+    Returns:
+        Instancia única de QueryCoalescer
+    """
+    global _default_coalescer
+    if _default_coalescer is None:
+        with _default_lock:
+            if _default_coalescer is None:
+                _default_coalescer = QueryCoalescer()
+    return _default_coalescer
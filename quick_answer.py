@@ -0,0 +1,313 @@
+"""
+Respuesta Rápida (sin LLM) para GERARD
+
+Modo extractivo: en lugar de pedirle la respuesta a Gemini, se eligen los
+fragmentos de subtítulos que mejor coinciden con la pregunta y se devuelven
+con su fuente y timestamps exactos. Responde en menos de un segundo y no
+consume cuota del LLM.
+
+Características:
+- Misma recuperación híbrida (vectorial + keywords) que la cadena con LLM
+- Los documentos se dividen en cues del .srt y se puntúan ventanas de cues
+  consecutivas: términos de la pregunta con peso IDF sobre las cues
+  recuperadas, coincidencia por raíz (masón/masones/masonería) y
+  bonificación por cobertura de la pregunta
+- La mejor ventana de cada fuente, con timestamps de inicio y fin
+- Términos encontrados resaltados como ítems "emphasis" del mismo JSON
+  [{"type", "content"}] que produce el LLM: se renderiza, exporta a PDF y
+  registra con el pipeline existente
+- Detección de saturación del LLM (errores 429/503/cuota y llamadas en vuelo)
+  para usar este modo automáticamente
+
+Uso:
+    chain = QuickAnswerChain(lambda q: hybrid_retrieval(vs, q))
+    answer_json = chain.invoke({"input": "¿Quiénes son los masones?"})
+"""
+
+import json
+import math
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from metrics import LLM_IN_FLIGHT
+from tracing import get_tracer
+
+STEM_CHARS = 5
+MIN_TERM_CHARS = 3
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun bajo bien cada cual cuales
+cuando como con contra cual cuanto de del desde donde dos el ella ellas ello ellos en entre era
+eran es esa esas ese eso esos esta estaba estan estar estas este esto estos fue fueron ha habia
+han hasta hay la las le les lo los mas me mi mis mucho muy nada ni no nos nosotros o otra otras
+otro otros para pero poco por porque que quien quienes se segun ser si sido sin sobre son su sus
+tal tambien tan tanto te tiene tienen todo todos tu tus un una uno unos usted ustedes ya yo
+cuantos dime decir dice dijo habla hablar hablo sabes puedes explica explicame significa
+""".split())
+
+_TIMESTAMP_LINE = re.compile(
+    r"(\d{1,2}:\d{2}:\d{2})[,.]\d{1,3}\s*-->\s*(\d{1,2}:\d{2}:\d{2})[,.]\d{1,3}[^\n]*"
+)
+_TRAILING_INDEX = re.compile(r"\n\s*\d+\s*$")
+_BRACKETED = re.compile(r"\[[^\]]*\]")
+_WORD = re.compile(r"\w+")
+_WORD_SPLIT = re.compile(r"(\w+)")
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+
+# Errores del LLM que indican saturación o cuota (no fallos de la pregunta)
+_OVERLOAD_ERROR_NAMES = ("ResourceExhausted", "ServiceUnavailable", "TooManyRequests",
+                         "DeadlineExceeded", "RateLimit")
+_OVERLOAD_MARKERS = ("429", "503", "quota", "rate limit", "resource exhausted", "overloaded",
+                     "unavailable", "too many requests", "deadline exceeded")
+
+
+@dataclass(frozen=True)
+class Cue:
+    """Una entrada del .srt (timestamps HH:MM:SS, sin milisegundos)."""
+    start: str
+    end: str
+    text: str
+
+
+@dataclass
+class CueWindow:
+    """Ventana de cues consecutivas de una fuente, con su puntuación."""
+    source: str
+    cues: List[Cue]
+    score: float = 0.0
+    matched: Set[str] = field(default_factory=set)
+
+    @property
+    def start(self) -> str:
+        return self.cues[0].start
+
+    @property
+    def end(self) -> str:
+        return self.cues[-1].end
+
+    @property
+    def text(self) -> str:
+        return " ".join(cue.text for cue in self.cues)
+
+
+def term_key(word: str) -> str:
+    """Raíz de comparación: minúsculas, sin acentos y recortada a STEM_CHARS."""
+    plain = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", word.lower()))
+    return plain[:STEM_CHARS]
+
+
+def query_terms(query: str) -> List[str]:
+    """Raíces de las palabras significativas de la pregunta (sin repetir, en orden)."""
+    terms: List[str] = []
+    for word in _WORD.findall(query):
+        plain = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", word.lower()))
+        if len(plain) < MIN_TERM_CHARS or plain in STOPWORDS or plain.isdigit():
+            continue
+        key = plain[:STEM_CHARS]
+        if key not in terms:
+            terms.append(key)
+    return terms
+
+
+def source_label(metadata: Dict[str, Any]) -> str:
+    """Nombre legible de la fuente (como en format_docs_with_metadata)."""
+    name = os.path.basename(metadata.get("source", "Desconocido"))
+    for noise in ("[Spanish (auto-generated)]", "[DownSub.com]"):
+        name = name.replace(noise, "")
+    if name.endswith(".srt"):
+        name = name[:-4]
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def _fix_encoding(text: str) -> str:
+    """Corrige UTF-8 leído como latin-1 (los .srt se ingieren en latin-1)."""
+    if "Ã" in text or "Â" in text or "â" in text:
+        try:
+            return text.encode("latin-1").decode("utf-8")
+        except (UnicodeDecodeError, UnicodeEncodeError):
+            pass
+    return text
+
+
+def parse_cues(text: str) -> List[Cue]:
+    """
+    Divide el contenido de un documento en cues del .srt.
+
+    Args:
+        text: page_content de un chunk (uno o varios bloques .srt)
+
+    Returns:
+        Lista de Cue con texto no vacío; si no hay timestamps, una sola
+        cue sin tiempos con todo el texto
+    """
+    text = _fix_encoding(text)
+    matches = list(_TIMESTAMP_LINE.finditer(text))
+    if not matches:
+        plain = " ".join(_BRACKETED.sub(" ", text).split())
+        return [Cue("", "", plain)] if plain else []
+
+    cues = []
+    for i, match in enumerate(matches):
+        body_end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        # El número de la siguiente cue queda al final del bloque
+        body = _TRAILING_INDEX.sub("", text[match.end():body_end])
+        body = " ".join(_BRACKETED.sub(" ", body).split())
+        if body:
+            start, end = match.group(1), match.group(2)
+            cues.append(Cue(start.zfill(8), end.zfill(8), body))
+    return cues
+
+
+def is_llm_overload_error(error: BaseException) -> bool:
+    """Indica si un error del LLM se debe a saturación, cuota o indisponibilidad."""
+    name = type(error).__name__
+    if any(marker in name for marker in _OVERLOAD_ERROR_NAMES):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _OVERLOAD_MARKERS)
+
+
+def llm_max_in_flight() -> int:
+    """Llamadas al LLM simultáneas a partir de las cuales se responde en modo rápido
+    (GERARD_LLM_MAX_IN_FLIGHT; 0 desactiva el límite)."""
+    try:
+        return int(os.environ.get("GERARD_LLM_MAX_IN_FLIGHT", "8"))
+    except ValueError:
+        return 8
+
+
+def llm_overloaded() -> bool:
+    """Indica si hay demasiadas llamadas al LLM en curso en el proceso."""
+    limit = llm_max_in_flight()
+    return limit > 0 and LLM_IN_FLIGHT.get() >= limit
+
+
+class QuickAnswerChain:
+    """
+    Respuesta extractiva con la interfaz `invoke(payload) -> str` de la cadena LLM.
+    """
+
+    def __init__(
+        self,
+        retriever_func: Callable[[str], Iterable[Any]],
+        max_sources: int = 5,
+        window_cues: int = 4,
+        max_docs: int = 40,
+        notice: str = ""
+    ):
+        """
+        Inicializa la cadena.
+
+        Args:
+            retriever_func: Búsqueda híbrida (consulta -> documentos)
+            max_sources: Fuentes distintas en la respuesta
+            window_cues: Cues consecutivas por fragmento
+            max_docs: Documentos recuperados que se analizan
+            notice: Aviso inicial (p. ej. por qué no se usó el LLM)
+        """
+        self.retriever_func = retriever_func
+        self.max_sources = max_sources
+        self.window_cues = max(1, window_cues)
+        self.max_docs = max_docs
+        self.notice = notice
+
+    def invoke(self, payload) -> str:
+        query = payload if isinstance(payload, str) else payload.get("input", "")
+        return json.dumps(self.answer(query), ensure_ascii=False)
+
+    def answer(self, query: str) -> List[Dict[str, str]]:
+        """
+        Busca y arma la respuesta rápida.
+
+        Returns:
+            Lista de ítems {"type": "normal"|"emphasis", "content": ...}
+        """
+        tracer = get_tracer()
+        with tracer.span("quick_answer", max_sources=self.max_sources) as span:
+            docs = list(self.retriever_func(query))[:self.max_docs]
+            with tracer.span("quick_answer.select_windows", doc_count=len(docs)):
+                windows = self.select_windows(query, docs)
+            span.set_attributes(doc_count=len(docs), windows=len(windows))
+        return self.render(windows)
+
+    def select_windows(self, query: str, docs: Iterable[Any]) -> List[CueWindow]:
+        """
+        Mejor ventana de cues de cada fuente, ordenadas por puntuación.
+
+        Args:
+            query: Pregunta del usuario
+            docs: Documentos recuperados (page_content y metadata)
+
+        Returns:
+            Hasta `max_sources` ventanas; si ningún término coincide, la
+            primera ventana de los documentos mejor recuperados
+        """
+        terms = set(query_terms(query))
+        parsed = []
+        for doc in docs:
+            cues = parse_cues(doc.page_content)
+            if cues:
+                cue_keys = [[term_key(w) for w in _WORD.findall(cue.text)] for cue in cues]
+                cue_terms = [set(keys) & terms for keys in cue_keys]
+                cue_hits = [sum(1 for key in keys if key in terms) for keys in cue_keys]
+                parsed.append((source_label(doc.metadata), cues, cue_terms, cue_hits))
+
+        # IDF de cada término sobre todas las cues recuperadas
+        total_cues = sum(len(cues) for _, cues, _, _ in parsed)
+        df = {term: 0 for term in terms}
+        for _, _, cue_terms, _ in parsed:
+            for found in cue_terms:
+                for term in found:
+                    df[term] += 1
+        idf = {term: math.log(1 + total_cues / (1 + count)) for term, count in df.items()}
+
+        best: Dict[str, CueWindow] = {}
+        fallback: Dict[str, CueWindow] = {}
+        for source, cues, cue_terms, cue_hits in parsed:
+            if len(fallback) < self.max_sources and source not in fallback:
+                fallback[source] = CueWindow(source, cues[:self.window_cues])
+            for start in range(max(1, len(cues) - self.window_cues + 1)):
+                matched = set().union(*cue_terms[start:start + self.window_cues])
+                if not matched:
+                    continue
+                coverage = len(matched) / len(terms)
+                # Repeticiones dentro de la ventana: desempate con poco peso
+                hits = sum(cue_hits[start:start + self.window_cues])
+                score = sum(idf[term] for term in matched) * (1 + coverage) + 0.1 * hits
+                current = best.get(source)
+                if current is None or score > current.score:
+                    best[source] = CueWindow(source, cues[start:start + self.window_cues], score, matched)
+
+        if not best:
+            return list(fallback.values())
+        return sorted(best.values(), key=lambda w: w.score, reverse=True)[:self.max_sources]
+
+    def render(self, windows: List[CueWindow]) -> List[Dict[str, str]]:
+        """Convierte las ventanas en ítems JSON con los términos resaltados."""
+        items: List[Dict[str, str]] = []
+
+        def add(kind: str, text: str):
+            if items and items[-1]["type"] == kind == "normal":
+                items[-1]["content"] += text
+            elif text:
+                items.append({"type": kind, "content": text})
+
+        header = "⚡ Respuesta rápida (sin IA): fragmentos de las fuentes que mejor coinciden con tu pregunta."
+        add("normal", f"{self.notice} {header}" if self.notice else header)
+        if not windows:
+            add("normal", " No se encontraron documentos relevantes en el índice.")
+            return items
+
+        for window in windows:
+            add("normal", "\n\n«")
+            for part in _WORD_SPLIT.split(window.text):
+                if part and window.matched and term_key(part) in window.matched and len(part) >= MIN_TERM_CHARS:
+                    add("emphasis", part)
+                else:
+                    add("normal", part)
+            timestamp = f", Timestamp: {window.start} - {window.end}" if window.start else ""
+            add("normal", f"» (Fuente: {window.source}{timestamp})")
+        return items
@@ -0,0 +1,169 @@
+"""
+Pre-calentamiento en Segundo Plano de Recursos para GERARD
+
+La descarga del índice FAISS (~250 MB), la lectura de la API key, la
+construcción del LLM y `FAISS.load_local` pueden tardar minutos. Este módulo
+ejecuta esa carga en un hilo de fondo desde el arranque de la app, para que el
+primer usuario no espere detrás del spinner.
+
+Características:
+- Hilo daemon que ejecuta la función de carga una sola vez
+- Estado de preparación consultable (idle / downloading / loading / ready / error)
+- Detalle de progreso (por ejemplo, porcentaje descargado)
+- Espera con timeout para encolar preguntas hasta que todo esté listo
+- Reintento automático si la carga anterior falló
+"""
+
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Estados posibles del pre-calentamiento
+STATE_IDLE = "idle"
+STATE_DOWNLOADING = "downloading"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_ERROR = "error"
+
+STATE_LABELS = {
+    STATE_IDLE: "En espera",
+    STATE_DOWNLOADING: "Descargando índice",
+    STATE_LOADING: "Cargando modelos e índice",
+    STATE_READY: "Listo",
+    STATE_ERROR: "Error",
+}
+
+
+class ResourceWarmup:
+    """
+    Ejecuta una función de carga en segundo plano y expone su estado.
+
+    La función de carga recibe un callback `report(state, detail="")` con el
+    que informa de la fase en curso; su valor de retorno queda disponible en
+    `result` cuando el estado pasa a "ready".
+    """
+
+    def __init__(self, loader: Callable[[Callable[..., None]], Any], name: str = "gerard-warmup"):
+        """
+        Inicializa el pre-calentador.
+
+        Args:
+            loader: Función de carga. Recibe `report(state, detail="")`
+            name: Nombre del hilo de fondo
+        """
+        self._loader = loader
+        self._name = name
+        self._lock = threading.Lock()
+        # Un Event por ejecución: un hilo anterior nunca marca como terminada
+        # la carga de un reintento
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.state = STATE_IDLE
+        self.detail = ""
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> bool:
+        """
+        Lanza la carga en segundo plano si no está en curso ni terminada.
+
+        Si la carga anterior falló, se reintenta.
+
+        Returns:
+            True si se lanzó un hilo nuevo
+        """
+        with self._lock:
+            if self._thread is not None and self.state != STATE_ERROR:
+                return False
+            done = threading.Event()
+            self._done = done
+            self.state = STATE_IDLE
+            self.detail = ""
+            self.error = None
+            self.result = None
+            self.started_at = time.time()
+            self.finished_at = None
+            self._thread = threading.Thread(target=self._run, args=(done,), name=self._name, daemon=True)
+            self._thread.start()
+            return True
+
+    def _report(self, done: threading.Event, state: str, detail: str = ""):
+        """Callback entregado al loader para informar la fase actual."""
+        with self._lock:
+            if self._done is done:
+                self.state = state
+                self.detail = detail
+
+    def _finish(self, done: threading.Event, state: str, result: Any = None,
+                error: Optional[BaseException] = None):
+        """Publica el estado final y marca la ejecución como terminada (todo bajo el lock)."""
+        with self._lock:
+            if self._done is done:
+                self.result = result
+                self.error = error
+                self.state = state
+                self.detail = str(error) if error is not None else ""
+                self.finished_at = time.time()
+            done.set()
+
+    def _run(self, done: threading.Event):
+        try:
+            result = self._loader(functools.partial(self._report, done))
+        except BaseException as e:
+            print(f"[ERROR] Pre-calentamiento de recursos falló: {e}")
+            self._finish(done, STATE_ERROR, error=e)
+        else:
+            self._finish(done, STATE_READY, result=result)
+
+    def is_ready(self) -> bool:
+        """True si los recursos ya están cargados."""
+        return self.state == STATE_READY
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que la carga termine (con éxito o error).
+
+        Args:
+            timeout: Segundos máximos de espera. None espera indefinidamente
+
+        Returns:
+            True si la carga terminó dentro del plazo
+        """
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            done = self._done
+        return done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Obtiene el estado actual para mostrarlo en la interfaz.
+
+        Returns:
+            Diccionario con estado, etiqueta, detalle y segundos transcurridos
+        """
+        with self._lock:
+            state = self.state
+            detail = self.detail
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "state": state,
+            "label": STATE_LABELS.get(state, state),
+            "detail": detail,
+            "elapsed": elapsed,
+        }
+
+    def describe(self) -> str:
+        """Texto corto con el estado actual (ej: 'Descargando índice (45%) - 12s')."""
+        info = self.status()
+        text = info["label"]
+        if info["detail"]:
+            text += f" ({info['detail']})"
+        if info["state"] != STATE_IDLE:
+            text += f" - {info['elapsed']:.0f}s"
+        return text
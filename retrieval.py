@@ -0,0 +1,308 @@
+"""
+Recuperación de Documentos del Índice FAISS para GERARD
+
+Reúne la búsqueda que antes vivía en cada frontend: `consultar_web.py` usaba
+la búsqueda híbrida (k=100 vectorial + 30 por keywords) y
+`consultar_terminal.py` un `as_retriever()` con el k por defecto. Ambos usan
+ahora la misma interfaz, local (`LocalRetriever`) o remota
+(`retrieval_service.RetrievalClient`), con los mismos parámetros.
+
+Características:
+- `hybrid_retrieval`: vectorial + keywords faltantes buscadas en el índice
+  de palabras del docstore (keyword_index.py)
+- `hybrid_retrieval_batch`: varias consultas con un lote de embeddings, una
+  búsqueda FAISS matricial y una sola resolución de keywords
+- `search` / `batch_search` / `hybrid_search` / `hybrid_search_batch` con k
+  por defecto comunes
+- Cada llamada usa la instantánea del índice activa al empezar (ver
+  index_snapshots.py): una búsqueda en curso no cambia de índice a mitad
+- GERARD_RETRIEVAL_URL: dirección del servicio de recuperación compartido
+  (ver retrieval_service.py); vacío = cargar el índice en el propio proceso
+
+Uso:
+    retriever = LocalRetriever.from_vectorstore(vectorstore)
+    docs = retriever.hybrid_search("¿Qué es el amor?")
+"""
+
+import inspect
+import os
+import re
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+
+from index_snapshots import IndexSnapshot, IndexSnapshotManager, warm_vectorstore
+from keyword_index import keyword_index_for
+from tracing import get_tracer
+
+DEFAULT_K = 10
+DEFAULT_K_VECTOR = 100
+DEFAULT_K_KEYWORD = 30
+
+
+def retrieval_service_url() -> str:
+    """Dirección del servicio de recuperación (GERARD_RETRIEVAL_URL; vacío = índice local)."""
+    return os.environ.get("GERARD_RETRIEVAL_URL", "").strip()
+
+
+def hybrid_retrieval(vectorstore, query: str, k_vector: int = DEFAULT_K_VECTOR, k_keyword: int = DEFAULT_K_KEYWORD):
+    """
+    Búsqueda híbrida: vectorial + keyword fallback
+    
+    1. Hace búsqueda vectorial normal (k_vector docs)
+    2. Si los términos clave no aparecen en los resultados, 
+       busca directamente en el docstore por keywords
+    3. Combina resultados únicos
+    
+    Args:
+        vectorstore: FAISS vectorstore
+        query: consulta del usuario
+        k_vector: número de docs a recuperar con búsqueda vectorial
+        k_keyword: número de docs adicionales a buscar con keywords
+    
+    Returns:
+        Lista de documentos únicos combinados
+    """
+    tracer = get_tracer()
+    with tracer.span("retrieval.hybrid", k_vector=k_vector, k_keyword=k_keyword) as retrieval_span:
+        combined_docs = _hybrid_retrieval(tracer, vectorstore, query, k_vector, k_keyword)
+        retrieval_span.set_attribute("doc_count", len(combined_docs))
+    return combined_docs
+
+
+def _hybrid_retrieval(tracer, vectorstore, query: str, k_vector: int, k_keyword: int):
+    """Cuerpo de hybrid_retrieval con un span por etapa."""
+    # 1. Búsqueda vectorial normal (embedding y FAISS medidos por separado)
+    if hasattr(vectorstore, "_embed_query") and hasattr(vectorstore, "similarity_search_by_vector"):
+        with tracer.span("retrieval.embed_query", query_chars=len(query)):
+            embedding = vectorstore._embed_query(query)
+        with tracer.span("retrieval.faiss_search", k=k_vector) as search_span:
+            vector_docs = vectorstore.similarity_search_by_vector(embedding, k=k_vector)
+            search_span.set_attribute("doc_count", len(vector_docs))
+    else:
+        with tracer.span("retrieval.vector_search", k=k_vector) as search_span:
+            vector_docs = vectorstore.similarity_search(query, k=k_vector)
+            search_span.set_attribute("doc_count", len(vector_docs))
+    
+    # 2-3. Términos clave de la query que no aparecen en los resultados vectoriales
+    missing_keywords = _missing_keywords(query, vector_docs)
+    
+    # 4. Si hay keywords faltantes, buscarlos en el índice de palabras del docstore
+    keyword_docs = []
+    if missing_keywords:
+        print(f"[DEBUG hybrid_retrieval] Keywords faltantes en top-{k_vector}: {missing_keywords}")
+        print(f"[DEBUG hybrid_retrieval] Iniciando búsqueda keyword en docstore...")
+        
+        with tracer.span("retrieval.keyword_scan", missing_keywords=len(missing_keywords), k=k_keyword) as scan_span:
+            index = keyword_index_for(vectorstore)
+            [(keyword_docs, matches)] = index.top_matches_batch([missing_keywords], k_keyword)
+            scan_span.set_attributes(scanned=len(index), matches=matches, doc_count=len(keyword_docs))
+        
+        print(f"[DEBUG hybrid_retrieval] Encontrados {len(keyword_docs)} docs adicionales con keywords")
+    
+    # 5. Combinar resultados únicos
+    combined_docs = _combine_unique(keyword_docs, vector_docs)
+    print(f"[DEBUG hybrid_retrieval] Total docs combinados: {len(combined_docs)}")
+    return combined_docs
+
+
+def _missing_keywords(query: str, vector_docs: Sequence[Any]) -> List[str]:
+    """Palabras de 3+ letras de la query que no aparecen en ningún resultado vectorial."""
+    keywords = [w.lower() for w in re.findall(r'\b\w{3,}\b', query)]
+    vector_content = " ".join(doc.page_content.lower() for doc in vector_docs)
+    return [kw for kw in keywords if kw not in vector_content]
+
+
+def _combine_unique(keyword_docs: Sequence[Any], vector_docs: Sequence[Any]) -> List[Any]:
+    """Une ambas listas sin duplicados; primero los de keywords (tienen los términos exactos)."""
+    seen_ids = set()
+    combined_docs = []
+    for doc in list(keyword_docs) + list(vector_docs):
+        if id(doc) not in seen_ids:
+            combined_docs.append(doc)
+            seen_ids.add(id(doc))
+    return combined_docs
+
+
+def hybrid_retrieval_batch(
+    vectorstore,
+    queries: Sequence[str],
+    k_vector: int = DEFAULT_K_VECTOR,
+    k_keyword: int = DEFAULT_K_KEYWORD
+) -> List[List[Any]]:
+    """
+    `hybrid_retrieval` para varias consultas a la vez.
+
+    Un solo lote de embeddings, una sola búsqueda FAISS con la matriz de
+    consultas (BLAS/OpenMP) y las keywords de todas las consultas resueltas
+    una vez en el índice de palabras. Devuelve lo mismo que llamar a
+    `hybrid_retrieval` con cada consulta.
+
+    Args:
+        vectorstore: FAISS vectorstore
+        queries: Consultas
+        k_vector: número de docs a recuperar con búsqueda vectorial
+        k_keyword: número de docs adicionales a buscar con keywords
+
+    Returns:
+        Una lista de documentos por consulta, en el mismo orden
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    tracer = get_tracer()
+    with tracer.span("retrieval.hybrid_batch", queries=len(queries), k_vector=k_vector, k_keyword=k_keyword) as batch_span:
+        with tracer.span("retrieval.embed_queries", queries=len(queries)):
+            vectors = embed_queries(vectorstore, queries)
+        with tracer.span("retrieval.faiss_search", k=k_vector, queries=len(queries)) as search_span:
+            vector_results = search_by_vectors(vectorstore, vectors, k_vector)
+            search_span.set_attribute("doc_count", sum(len(hits) for hits in vector_results))
+        vector_docs = [[doc for doc, _ in hits] for hits in vector_results]
+
+        missing = [_missing_keywords(query, docs) for query, docs in zip(queries, vector_docs)]
+        keyword_results = [([], 0)] * len(queries)
+        if any(missing):
+            with tracer.span("retrieval.keyword_scan", missing_keywords=sum(len(m) for m in missing), k=k_keyword) as scan_span:
+                index = keyword_index_for(vectorstore)
+                keyword_results = index.top_matches_batch(missing, k_keyword)
+                scan_span.set_attributes(scanned=len(index), doc_count=sum(len(docs) for docs, _ in keyword_results))
+
+        combined = [_combine_unique(keyword_docs, docs) for (keyword_docs, _), docs in zip(keyword_results, vector_docs)]
+        batch_span.set_attribute("doc_count", sum(len(docs) for docs in combined))
+    return combined
+
+
+def embed_queries(vectorstore, queries: Sequence[str]) -> np.ndarray:
+    """
+    Embebe varias consultas en una sola llamada.
+
+    Returns:
+        Matriz float32 (len(queries), d), normalizada si el vectorstore lo hace
+    """
+    embedder = getattr(vectorstore, "embedding_function", None) or getattr(vectorstore, "embeddings", None)
+    if hasattr(embedder, "embed_array"):
+        vectors = embedder.embed_array(list(queries))
+    elif hasattr(embedder, "embed_documents"):
+        # Los embeddings de Google distinguen consultas de documentos
+        if "task_type" in inspect.signature(embedder.embed_documents).parameters:
+            vectors = embedder.embed_documents(list(queries), task_type="RETRIEVAL_QUERY")
+        else:
+            vectors = embedder.embed_documents(list(queries))
+    else:
+        vectors = [vectorstore._embed_query(query) for query in queries]
+    vectors = np.array(vectors, dtype=np.float32).reshape(len(queries), -1)
+    if getattr(vectorstore, "_normalize_L2", False):
+        import faiss
+
+        faiss.normalize_L2(vectors)
+    return vectors
+
+
+def search_by_vectors(vectorstore, vectors: np.ndarray, k: int) -> List[List[Tuple[Any, float]]]:
+    """
+    Una búsqueda FAISS para toda la matriz de consultas.
+
+    Returns:
+        Por consulta, [(documento, distancia)] como `similarity_search_with_score_by_vector`
+    """
+    if hasattr(vectorstore, "similarity_search_with_score_by_vectors"):
+        return vectorstore.similarity_search_with_score_by_vectors(vectors, k)
+    index = vectorstore.index
+    if index.ntotal == 0 or k <= 0:
+        return [[] for _ in range(len(vectors))]
+    distances, positions = index.search(np.ascontiguousarray(vectors, dtype=np.float32), min(k, index.ntotal))
+    results = []
+    for row_distances, row_positions in zip(distances, positions):
+        hits = []
+        for distance, position in zip(row_distances, row_positions):
+            if position < 0:
+                continue
+            hits.append((vectorstore.docstore.search(vectorstore.index_to_docstore_id[position]), float(distance)))
+        results.append(hits)
+    return results
+
+
+def vector_search(vectorstore, query: str, k: int = DEFAULT_K) -> List[Tuple[Any, float]]:
+    """
+    Búsqueda vectorial de una consulta.
+
+    Returns:
+        [(documento, distancia)] de más a menos parecido
+    """
+    with get_tracer().span("retrieval.vector_search", k=k) as search_span:
+        results = vectorstore.similarity_search_with_score(query, k=k)
+        search_span.set_attribute("doc_count", len(results))
+    return results
+
+
+def batch_vector_search(vectorstore, queries: Sequence[str], k: int = DEFAULT_K) -> List[List[Tuple[Any, float]]]:
+    """
+    Búsqueda vectorial de varias consultas (un lote de embeddings y una búsqueda FAISS).
+
+    Returns:
+        Una lista de [(documento, distancia)] por consulta, en el mismo orden
+    """
+    if not queries:
+        return []
+    with get_tracer().span("retrieval.batch_search", queries=len(queries), k=k):
+        return search_by_vectors(vectorstore, embed_queries(vectorstore, queries), k)
+
+
+class LocalRetriever:
+    """
+    Recuperación sobre el índice cargado en este proceso.
+
+    Misma interfaz que `retrieval_service.RetrievalClient`, así los frontends
+    no distinguen entre índice local y servicio compartido.
+    """
+
+    def __init__(self, snapshots: IndexSnapshotManager):
+        """
+        Inicializa el recuperador.
+
+        Args:
+            snapshots: Gestor de instantáneas del índice (ver index_snapshots.py)
+        """
+        self.snapshots = snapshots
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: Any, version: str = "local", path: str = "") -> "LocalRetriever":
+        """Recuperador sobre un vectorstore fijo (sin cambio de instantánea)."""
+        return cls(IndexSnapshotManager(path, initial=IndexSnapshot(version, path, vectorstore)))
+
+    @property
+    def version(self) -> str:
+        return self.snapshots.version
+
+    def document_count(self) -> int:
+        return self.snapshots.current().vectorstore.index.ntotal
+
+    def health(self) -> dict:
+        return {"status": "ok", "version": self.version, "vectors": self.document_count()}
+
+    def search(self, query: str, k: int = DEFAULT_K) -> List[Tuple[Any, float]]:
+        with self.snapshots.lease() as snapshot:
+            return vector_search(snapshot.vectorstore, query, k)
+
+    def batch_search(self, queries: Sequence[str], k: int = DEFAULT_K) -> List[List[Tuple[Any, float]]]:
+        with self.snapshots.lease() as snapshot:
+            return batch_vector_search(snapshot.vectorstore, queries, k)
+
+    def hybrid_search(self, query: str, k_vector: int = DEFAULT_K_VECTOR, k_keyword: int = DEFAULT_K_KEYWORD) -> List[Any]:
+        with self.snapshots.lease() as snapshot:
+            return hybrid_retrieval(snapshot.vectorstore, query, k_vector=k_vector, k_keyword=k_keyword)
+
+    def hybrid_search_batch(
+        self,
+        queries: Sequence[str],
+        k_vector: int = DEFAULT_K_VECTOR,
+        k_keyword: int = DEFAULT_K_KEYWORD
+    ) -> List[List[Any]]:
+        with self.snapshots.lease() as snapshot:
+            return hybrid_retrieval_batch(snapshot.vectorstore, queries, k_vector=k_vector, k_keyword=k_keyword)
+
+
+def warm_retrieval(vectorstore: Any):
+    """Calienta el índice FAISS y construye el índice de palabras antes de la primera consulta."""
+    warm_vectorstore(vectorstore)
+    keyword_index_for(vectorstore)
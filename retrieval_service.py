@@ -0,0 +1,503 @@
+"""
+Servicio Local de Recuperación Compartido para GERARD
+
+Cada frontend (`consultar_web.py`, `consultar_terminal.py`) cargaba su propio
+índice FAISS, docstore y embeddings: con la app web y la terminal en la misma
+máquina, la memoria se pagaba dos veces. Este servidor de larga duración
+carga el índice una sola vez por máquina y lo sirve por HTTP local (TCP o
+socket Unix); los frontends usan `RetrievalClient`, con la misma interfaz que
+`retrieval.LocalRetriever`.
+
+Características:
+- Servidor asyncio sin dependencias externas (HTTP/1.1 con keep-alive)
+- Las búsquedas se ejecutan en un pool de hilos (FAISS libera el GIL), así
+  las peticiones concurrentes no se bloquean entre sí
+- Endpoints JSON: GET /health, POST /search, /batch_search, /hybrid_search,
+  /hybrid_search_batch
+- Cambio de índice en caliente: el servicio vigila `faiss_index/CURRENT`
+  (ver index_snapshots.py)
+- Cliente ligero (http.client) para TCP (`http://host:puerto`) y sockets Unix
+  (`unix:///ruta/al.sock`)
+- Si GERARD_RETRIEVAL_URL está definida, los frontends usan el servicio; si
+  no responde, cargan el índice localmente como antes
+
+Uso:
+    python retrieval_service.py [--listen http://127.0.0.1:8765] [--workers 4]
+    python retrieval_service.py --listen unix:///tmp/gerard-retrieval.sock
+
+    export GERARD_RETRIEVAL_URL=http://127.0.0.1:8765
+    client = RetrievalClient()
+    docs = client.hybrid_search("¿Qué es el amor?")
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from retrieval import (
+    DEFAULT_K, DEFAULT_K_KEYWORD, DEFAULT_K_VECTOR, LocalRetriever, retrieval_service_url, warm_retrieval
+)
+from tracing import get_tracer
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+DEFAULT_WORKERS = 4
+MAX_K = 1000
+MAX_BATCH = 256
+MAX_BODY_BYTES = 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class RetrievalServiceError(RuntimeError):
+    """El servicio de recuperación no respondió o devolvió un error."""
+
+
+def parse_address(url: str) -> Tuple[str, Any]:
+    """
+    Interpreta la dirección del servicio.
+
+    Returns:
+        ("unix", ruta) o ("tcp", (host, puerto))
+    """
+    url = url.strip()
+    if url.startswith("unix:"):
+        path = url[len("unix:"):]
+        # unix:///tmp/x.sock y unix:/tmp/x.sock
+        return "unix", "/" + path.lstrip("/") if path.startswith("//") else path
+    parsed = urlparse(url if "://" in url else f"http://{url}")
+    if parsed.scheme != "http" or not parsed.hostname:
+        raise ValueError(f"Dirección del servicio de recuperación no válida: {url!r}")
+    return "tcp", (parsed.hostname, parsed.port or 80)
+
+
+def _document_to_json(doc: Any, score: Optional[float] = None) -> Dict[str, Any]:
+    item = {"page_content": doc.page_content, "metadata": doc.metadata}
+    if getattr(doc, "id", None):
+        item["id"] = doc.id
+    if score is not None:
+        item["score"] = float(score)
+    return item
+
+
+def _document_from_json(item: Dict[str, Any]):
+    from langchain_core.documents import Document
+
+    return Document(page_content=item["page_content"], metadata=item.get("metadata") or {}, id=item.get("id"))
+
+
+def _query_param(params: Dict[str, Any], name: str = "query") -> str:
+    query = params.get(name)
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError(f"'{name}' debe ser un texto no vacío")
+    return query
+
+
+def _queries_param(params: Dict[str, Any]) -> List[str]:
+    queries = params.get("queries")
+    if not isinstance(queries, list) or not 0 < len(queries) <= MAX_BATCH:
+        raise ValueError(f"'queries' debe ser una lista de 1 a {MAX_BATCH} textos")
+    return [_query_param({"query": q}) for q in queries]
+
+
+def _int_param(params: Dict[str, Any], name: str, default: int, minimum: int = 1) -> int:
+    value = params.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= MAX_K:
+        raise ValueError(f"'{name}' debe ser un entero entre {minimum} y {MAX_K}")
+    return value
+
+
+class RetrievalServer:
+    """Servidor HTTP asyncio que expone un recuperador a otros procesos."""
+
+    def __init__(self, retriever: Any, workers: int = DEFAULT_WORKERS):
+        """
+        Inicializa el servidor.
+
+        Args:
+            retriever: Recuperador con search / batch_search / hybrid_search
+                (normalmente `LocalRetriever`)
+            workers: Hilos del pool de búsquedas
+        """
+        self.retriever = retriever
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gerard-retrieval")
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "/search": self._search,
+            "/batch_search": self._batch_search,
+            "/hybrid_search": self._hybrid_search,
+            "/hybrid_search_batch": self._hybrid_search_batch,
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self.url = ""
+        self.requests = 0
+        self.errors = 0
+
+    # --- Endpoints (se ejecutan en el pool) ---
+
+    def _search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        results = self.retriever.search(_query_param(params), _int_param(params, "k", DEFAULT_K))
+        return {"results": [_document_to_json(doc, score) for doc, score in results]}
+
+    def _batch_search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        results = self.retriever.batch_search(_queries_param(params), _int_param(params, "k", DEFAULT_K))
+        return {"results": [[_document_to_json(doc, score) for doc, score in hits] for hits in results]}
+
+    def _hybrid_search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        docs = self.retriever.hybrid_search(
+            _query_param(params),
+            k_vector=_int_param(params, "k_vector", DEFAULT_K_VECTOR),
+            k_keyword=_int_param(params, "k_keyword", DEFAULT_K_KEYWORD, minimum=0)
+        )
+        return {"results": [_document_to_json(doc) for doc in docs]}
+
+    def _hybrid_search_batch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        results = self.retriever.hybrid_search_batch(
+            _queries_param(params),
+            k_vector=_int_param(params, "k_vector", DEFAULT_K_VECTOR),
+            k_keyword=_int_param(params, "k_keyword", DEFAULT_K_KEYWORD, minimum=0)
+        )
+        return {"results": [[_document_to_json(doc) for doc in docs] for docs in results]}
+
+    # --- HTTP ---
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                return 405, {"error": "Usa GET"}
+            return 200, dict(self.retriever.health(), workers=self.workers, requests=self.requests)
+        handler = self._handlers.get(path)
+        if handler is None:
+            return 404, {"error": f"Endpoint desconocido: {path}"}
+        if method != "POST":
+            return 405, {"error": "Usa POST"}
+        try:
+            params = json.loads(body.decode("utf-8") or "{}")
+            if not isinstance(params, dict):
+                raise ValueError("el cuerpo debe ser un objeto JSON")
+        except ValueError as e:
+            return 400, {"error": f"JSON no válido: {e}"}
+
+        start = time.perf_counter()
+        try:
+            with get_tracer().span("retrieval.service", endpoint=path.lstrip("/")):
+                result = await asyncio.get_running_loop().run_in_executor(self._pool, handler, params)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            print(f"[ERROR] Servicio de recuperación {path}: {e}")
+            return 500, {"error": str(e)}
+        result["version"] = self.retriever.version
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return 200, result
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": f"Cuerpo de más de {MAX_BODY_BYTES} bytes"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self._dispatch(method.upper(), path, body)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+                self.requests += 1
+                if status != 200:
+                    self.errors += 1
+
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, address: str = DEFAULT_URL) -> str:
+        """
+        Empieza a escuchar en el bucle asyncio actual.
+
+        Returns:
+            URL efectiva (con el puerto elegido si se pidió el 0)
+        """
+        kind, target = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(target):
+                os.unlink(target)
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=target)
+            self.url = f"unix://{target}"
+        else:
+            host, port = target
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+            self.url = f"http://{host}:{self._server.sockets[0].getsockname()[1]}"
+        print(f"[OK] Servicio de recuperación en {self.url} ({self.workers} hilos)")
+        return self.url
+
+    def serve_forever(self, address: str = DEFAULT_URL):
+        """Atiende peticiones hasta Ctrl+C (bloqueante)."""
+        async def run():
+            await self.start(address)
+            async with self._server:
+                await self._server.serve_forever()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            print("[INFO] Servicio de recuperación detenido")
+        finally:
+            self._pool.shutdown(wait=False)
+
+    def start_in_thread(self, address: str = DEFAULT_URL, timeout: float = 10.0) -> str:
+        """
+        Arranca el servidor en un hilo daemon con su propio bucle asyncio.
+
+        Returns:
+            URL efectiva del servidor
+        """
+        ready = threading.Event()
+        errors: List[BaseException] = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start(address))
+            except BaseException as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="gerard-retrieval-server", daemon=True)
+        self._thread.start()
+        if not ready.wait(timeout):
+            raise RetrievalServiceError(f"El servicio no arrancó en {timeout:.0f}s")
+        if errors:
+            raise errors[0]
+        return self.url
+
+    def stop(self):
+        """Detiene un servidor arrancado con `start_in_thread`."""
+        if self._loop is None:
+            return
+
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._pool.shutdown(wait=False)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+class RetrievalClient:
+    """
+    Cliente del servicio de recuperación.
+
+    Misma interfaz que `retrieval.LocalRetriever`: devuelve `Document` de
+    LangChain, así las cadenas de los frontends no cambian.
+    """
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 30.0):
+        """
+        Inicializa el cliente.
+
+        Args:
+            url: Dirección del servicio (por defecto GERARD_RETRIEVAL_URL)
+            timeout: Segundos máximos por petición
+        """
+        self.url = url or retrieval_service_url() or DEFAULT_URL
+        self.timeout = timeout
+        self._kind, self._target = parse_address(self.url)
+        self._version = ""
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._kind == "unix":
+            return _UnixHTTPConnection(self._target, self.timeout)
+        return http.client.HTTPConnection(*self._target, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection = self._connection()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            status, data = response.status, response.read()
+        except (OSError, http.client.HTTPException) as e:
+            raise RetrievalServiceError(f"Servicio de recuperación no disponible en {self.url}: {e}") from e
+        finally:
+            connection.close()
+        try:
+            result = json.loads(data.decode("utf-8"))
+        except ValueError as e:
+            raise RetrievalServiceError(f"Respuesta no válida del servicio ({status})") from e
+        if status != 200:
+            raise RetrievalServiceError(f"Servicio de recuperación {path}: {result.get('error', status)}")
+        self._version = result.get("version", self._version)
+        return result
+
+    @property
+    def version(self) -> str:
+        """Versión del índice de la última respuesta."""
+        if not self._version:
+            self.health()
+        return self._version
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def document_count(self) -> int:
+        return self.health()["vectors"]
+
+    def search(self, query: str, k: int = DEFAULT_K) -> List[Tuple[Any, float]]:
+        with get_tracer().span("retrieval.remote", endpoint="search", k=k):
+            result = self._request("POST", "/search", {"query": query, "k": k})
+        return [(_document_from_json(item), item["score"]) for item in result["results"]]
+
+    def batch_search(self, queries: Sequence[str], k: int = DEFAULT_K) -> List[List[Tuple[Any, float]]]:
+        with get_tracer().span("retrieval.remote", endpoint="batch_search", queries=len(queries), k=k):
+            result = self._request("POST", "/batch_search", {"queries": list(queries), "k": k})
+        return [[(_document_from_json(item), item["score"]) for item in hits] for hits in result["results"]]
+
+    def hybrid_search(self, query: str, k_vector: int = DEFAULT_K_VECTOR, k_keyword: int = DEFAULT_K_KEYWORD) -> List[Any]:
+        with get_tracer().span("retrieval.remote", endpoint="hybrid_search", k_vector=k_vector, k_keyword=k_keyword):
+            result = self._request("POST", "/hybrid_search",
+                                   {"query": query, "k_vector": k_vector, "k_keyword": k_keyword})
+        return [_document_from_json(item) for item in result["results"]]
+
+    def hybrid_search_batch(
+        self,
+        queries: Sequence[str],
+        k_vector: int = DEFAULT_K_VECTOR,
+        k_keyword: int = DEFAULT_K_KEYWORD
+    ) -> List[List[Any]]:
+        with get_tracer().span("retrieval.remote", endpoint="hybrid_search_batch", queries=len(queries)):
+            result = self._request("POST", "/hybrid_search_batch",
+                                   {"queries": list(queries), "k_vector": k_vector, "k_keyword": k_keyword})
+        return [[_document_from_json(item) for item in docs] for docs in result["results"]]
+
+
+def connect_retrieval_service(url: Optional[str] = None) -> Optional[RetrievalClient]:
+    """
+    Cliente del servicio configurado, si responde.
+
+    Args:
+        url: Dirección (por defecto GERARD_RETRIEVAL_URL)
+
+    Returns:
+        Cliente listo, o None si no hay servicio configurado o no responde
+        (el frontend carga entonces el índice por su cuenta)
+    """
+    url = url or retrieval_service_url()
+    if not url:
+        return None
+    try:
+        client = RetrievalClient(url, timeout=30.0)
+        health = client.health()
+    except (RetrievalServiceError, ValueError) as e:
+        print(f"[!] {e}; se carga el índice en este proceso")
+        return None
+    print(f"[OK] Usando el servicio de recuperación {url} (índice {health['version']}, {health['vectors']} vectores)")
+    return client
+
+
+def load_local_retriever(root: str = "faiss_index", api_key: Optional[str] = None) -> LocalRetriever:
+    """
+    Carga la instantánea activa del índice con los embeddings disponibles.
+
+    Con API key se usan los embeddings de Google; sin ella (o con
+    GERARD_OFFLINE_EMBEDDINGS=1), el índice offline. El vigilante de
+    instantáneas queda en marcha.
+    """
+    from faiss_mmap import load_faiss_local
+    from index_snapshots import IndexSnapshot, IndexSnapshotManager, resolve_snapshot
+    from offline_embeddings import ensure_offline_index, offline_index_dir, offline_mode_forced
+
+    if api_key and not offline_mode_forced():
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
+        loader = lambda path: load_faiss_local(str(path), embeddings)
+    else:
+        print("[!] Sin GOOGLE_API_KEY: se sirve el índice offline (embeddings locales)")
+        loader = lambda path: ensure_offline_index(str(path), offline_index_dir())
+
+    version, path = resolve_snapshot(root)
+    vectorstore = loader(path)
+    warm_retrieval(vectorstore)
+    snapshots = IndexSnapshotManager(root, loader=loader, warm=warm_retrieval,
+                                     initial=IndexSnapshot(version, path, vectorstore))
+    snapshots.start_watcher()
+    return LocalRetriever(snapshots)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de recuperación sobre el índice FAISS")
+    parser.add_argument("--listen", default=retrieval_service_url() or DEFAULT_URL,
+                        help="http://host:puerto o unix:///ruta.sock (por defecto GERARD_RETRIEVAL_URL)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Hilos de búsqueda")
+    parser.add_argument("--index", default="faiss_index", help="Directorio del índice (o de sus instantáneas)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Exponer métricas Prometheus en http://127.0.0.1:<puerto>/metrics")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if args.metrics_port:
+        from metrics import instrument_tracer, start_metrics_server
+
+        instrument_tracer(get_tracer())
+        start_metrics_server(args.metrics_port)
+
+    retriever = load_local_retriever(args.index, os.environ.get("GOOGLE_API_KEY"))
+    RetrievalServer(retriever, workers=args.workers).serve_forever(args.listen)
+
+
+if __name__ == "__main__":
+    main()
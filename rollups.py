@@ -0,0 +1,443 @@
+"""
+Agregados Incrementales (Rollups) de Interacciones
+
+Mantiene, por hora y por día, agregados que se pueden combinar entre sí para
+que los reportes diarios, semanales y mensuales se generen uniendo resúmenes
+en lugar de releer todo el historial de logs.
+
+Características:
+- Conteos y sumas (interacciones, éxitos, fallos, tiempos por fase)
+- Histogramas log-lineales de latencia por fase (p50/p95/p99 combinables)
+- Usuarios únicos exactos (conteo por usuario)
+- Top-k de preguntas frecuentes con Space-Saving (memoria acotada)
+- Actualización incremental: sólo se leen los bytes nuevos de cada JSONL
+- Un archivo por día en logs/rollups/rollup_YYYY-MM-DD.json
+
+Uso:
+    store = RollupStore("logs")
+    semana = store.period("2025-10-06", "2025-10-12")
+    stats = semana.to_stats()
+"""
+
+import bisect
+import json
+import math
+import os
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from jsonl_log import iter_file_records, list_dates, log_files_for_date
+from log_store import PHASE_COLUMNS
+from metrics import log_linear_bounds
+
+ROLLUP_VERSION = 1
+
+# Mismas cubetas que los histogramas de metrics.py (error relativo <= 25%)
+LATENCY_BOUNDS = log_linear_bounds(0.001, 1800.0, 4)
+
+
+class LatencySketch:
+    """
+    Histograma log-lineal disperso de latencias. Dos sketches se combinan
+    sumando sus cubetas, así que los percentiles de una semana salen de los
+    sketches de cada día.
+    """
+
+    __slots__ = ("buckets", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float):
+        value = max(0.0, float(value))
+        index = bisect.bisect_left(LATENCY_BOUNDS, value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencySketch"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        Percentil aproximado (límite superior de la cubeta, acotado al máximo).
+
+        Args:
+            q: Cuantil entre 0 y 1 (0.95 = p95)
+
+        Returns:
+            Segundos (0.0 si no hay datos)
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                bound = LATENCY_BOUNDS[index] if index < len(LATENCY_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets": {str(k): v for k, v in sorted(self.buckets.items())},
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencySketch":
+        sketch = cls()
+        sketch.buckets = {int(k): int(v) for k, v in data.get("buckets", {}).items()}
+        sketch.count = int(data.get("count", 0))
+        sketch.sum = float(data.get("sum", 0.0))
+        sketch.min = math.inf if data.get("min") is None else float(data["min"])
+        sketch.max = float(data.get("max", 0.0))
+        return sketch
+
+
+class TopK:
+    """
+    Elementos más frecuentes con el algoritmo Space-Saving.
+
+    Guarda como máximo `capacity` elementos; cada conteo sobreestima el real
+    como mucho en su `error`. Al combinar se suman conteos y se recorta.
+    """
+
+    __slots__ = ("capacity", "items")
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        # elemento -> [conteo, error]
+        self.items: Dict[str, List[int]] = {}
+
+    def add(self, item: str, count: int = 1):
+        entry = self.items.get(item)
+        if entry is not None:
+            entry[0] += count
+            return
+        if len(self.items) < self.capacity:
+            self.items[item] = [count, 0]
+            return
+        # Reemplazar el de menor conteo: hereda su conteo como error
+        victim = min(self.items, key=lambda k: self.items[k][0])
+        floor = self.items.pop(victim)[0]
+        self.items[item] = [floor + count, floor]
+
+    def merge(self, other: "TopK"):
+        for item, (count, error) in other.items.items():
+            entry = self.items.setdefault(item, [0, 0])
+            entry[0] += count
+            entry[1] += error
+        if len(self.items) > self.capacity:
+            keep = sorted(self.items.items(), key=lambda kv: kv[1][0], reverse=True)[:self.capacity]
+            self.items = dict(keep)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        ranked = sorted(((k, v[0]) for k, v in self.items.items()), key=lambda kv: kv[1], reverse=True)
+        return ranked[:n] if n is not None else ranked
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "items": self.items}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TopK":
+        top = cls(data.get("capacity", 100))
+        top.items = {k: [int(v[0]), int(v[1])] for k, v in data.get("items", {}).items()}
+        return top
+
+
+_COUNTERS = ("users", "devices", "locations", "countries", "browsers", "os_types", "platforms", "errors")
+
+
+class Rollup:
+    """
+    Agregado combinable de un conjunto de interacciones (una hora, un día o
+    cualquier unión de ellos).
+    """
+
+    def __init__(self, top_k: int = 100):
+        self.total = 0
+        self.successful = 0
+        self.failed = 0
+        self.latency: Dict[str, LatencySketch] = {}
+        self.questions = TopK(top_k)
+        self.counters: Dict[str, Counter] = {name: Counter() for name in _COUNTERS}
+
+    def add(self, record: Dict[str, Any]):
+        """Agrega un registro de InteractionLogger."""
+        device = record.get("device_info") or {}
+        geo = record.get("geo_info") or {}
+        metrics = record.get("metrics") or {}
+        pais = geo.get("pais", "Desconocido")
+
+        self.total += 1
+        if record.get("status") == "success":
+            self.successful += 1
+        else:
+            self.failed += 1
+            self.counters["errors"][(record.get("error") or "desconocido")[:200]] += 1
+
+        for phase, column in PHASE_COLUMNS.items():
+            value = metrics.get(column)
+            if isinstance(value, (int, float)):
+                self.latency.setdefault(phase, LatencySketch()).add(value)
+
+        self.questions.add((record.get("question") or "")[:100])
+        self.counters["users"][record.get("user", "Desconocido")] += 1
+        self.counters["devices"][device.get("tipo", "Desconocido")] += 1
+        self.counters["browsers"][device.get("navegador", "N/A")] += 1
+        self.counters["os_types"][device.get("os", "Desconocido")] += 1
+        self.counters["platforms"][record.get("platform", "Desconocido")] += 1
+        self.counters["countries"][pais] += 1
+        self.counters["locations"][f"{geo.get('ciudad', 'Desconocido')}, {pais}"] += 1
+
+    def merge(self, other: "Rollup") -> "Rollup":
+        """Combina `other` dentro de este agregado y lo devuelve."""
+        self.total += other.total
+        self.successful += other.successful
+        self.failed += other.failed
+        for phase, sketch in other.latency.items():
+            self.latency.setdefault(phase, LatencySketch()).merge(sketch)
+        self.questions.merge(other.questions)
+        for name, counter in other.counters.items():
+            self.counters.setdefault(name, Counter()).update(counter)
+        return self
+
+    def percentile(self, q: float, phase: str = "total") -> float:
+        sketch = self.latency.get(phase)
+        return sketch.quantile(q) if sketch else 0.0
+
+    def to_stats(self) -> Dict[str, Any]:
+        """
+        Estadísticas en el formato de EmailReporter.
+
+        Returns:
+            Diccionario con totales, percentiles y conteos (Counter)
+        """
+        total = self.latency.get("total", LatencySketch())
+        return {
+            "total_interactions": self.total,
+            "unique_users": len(self.counters["users"]),
+            "total_questions": self.total,
+            "avg_response_time": total.mean,
+            "p50_response_time": total.quantile(0.5),
+            "p95_response_time": total.quantile(0.95),
+            "p99_response_time": total.quantile(0.99),
+            "top_users": self.counters["users"].most_common(5),
+            "top_questions": self.questions.most_common(5),
+            "devices": self.counters["devices"],
+            "locations": self.counters["locations"],
+            "browsers": self.counters["browsers"],
+            "os_types": self.counters["os_types"],
+            "success_rate": self.successful / self.total * 100 if self.total else 0
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "successful": self.successful,
+            "failed": self.failed,
+            "latency": {phase: sketch.to_dict() for phase, sketch in self.latency.items()},
+            "questions": self.questions.to_dict(),
+            "counters": {name: dict(counter) for name, counter in self.counters.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Rollup":
+        rollup = cls()
+        rollup.total = int(data.get("total", 0))
+        rollup.successful = int(data.get("successful", 0))
+        rollup.failed = int(data.get("failed", 0))
+        rollup.latency = {phase: LatencySketch.from_dict(d) for phase, d in data.get("latency", {}).items()}
+        rollup.questions = TopK.from_dict(data.get("questions", {}))
+        for name, counter in data.get("counters", {}).items():
+            rollup.counters[name] = Counter(counter)
+        return rollup
+
+
+def _read_new_lines(path: Path, offset: int) -> Tuple[Iterator[Dict[str, Any]], int]:
+    """
+    Lee las líneas completas de un JSONL a partir de `offset`.
+
+    Returns:
+        (registros, nuevo offset). Una línea a medio escribir se deja
+        para la próxima lectura.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    records = []
+    for line in data[:end].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line.decode('utf-8')))
+        except (ValueError, UnicodeDecodeError):
+            print(f"[!] Línea inválida en {path.name}, se omite")
+    return iter(records), offset + end
+
+
+class RollupStore:
+    """
+    Agregados por hora y por día guardados junto a los logs, actualizados
+    incrementalmente a partir de los archivos JSONL.
+    """
+
+    def __init__(self, log_dir: str = "logs", rollup_dir: Optional[str] = None):
+        """
+        Inicializa el almacén de agregados.
+
+        Args:
+            log_dir: Directorio de los logs JSONL
+            rollup_dir: Directorio de los agregados. Default: <log_dir>/rollups
+        """
+        self.log_dir = Path(log_dir)
+        self.rollup_dir = Path(rollup_dir) if rollup_dir else self.log_dir / "rollups"
+
+    def _path(self, date: str) -> Path:
+        return self.rollup_dir / f"rollup_{date}.json"
+
+    def _load_state(self, date: str) -> Optional[Dict[str, Any]]:
+        path = self._path(date)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return state if state.get("version") == ROLLUP_VERSION else None
+        except Exception as e:
+            print(f"[!] Agregado dañado para {date}, se reconstruirá: {e}")
+            return None
+
+    def _save_state(self, date: str, state: Dict[str, Any]):
+        self.rollup_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(date)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def update(self, date: str) -> Dict[str, Any]:
+        """
+        Pone al día los agregados de una fecha leyendo sólo lo nuevo.
+
+        Los JSONL se leen desde el último offset (identificados por inode,
+        así una rotación a `_partN` no obliga a releer). Si un archivo
+        conocido desapareció, se acortó o es un arreglo JSON antiguo que
+        cambió, el día se reconstruye desde cero.
+
+        Args:
+            date: Fecha YYYY-MM-DD
+
+        Returns:
+            Estado del día: {"hours": {"HH": rollup}, "sources": {...}}
+        """
+        files = log_files_for_date(str(self.log_dir), date)
+        state = self._load_state(date)
+        current = {}
+        for path in files:
+            stat = path.stat()
+            # Sin inode (algunos sistemas de archivos devuelven 0) se usa el nombre
+            current[path.name] = (path, stat.st_ino or path.name, stat.st_size, stat.st_mtime_ns)
+
+        by_inode = {}
+        if state is not None:
+            by_inode = {source["inode"]: source for source in state["sources"].values()}
+            seen = {inode: (size, mtime_ns) for _, inode, size, mtime_ns in current.values()}
+            for inode, source in by_inode.items():
+                if inode not in seen or seen[inode][0] < source["offset"] or (
+                    source.get("array") and seen[inode][1] != source.get("mtime_ns")
+                ):
+                    state, by_inode = None, {}
+                    break
+
+        if state is None:
+            state = {"version": ROLLUP_VERSION, "date": date, "sources": {}, "hours": {}}
+
+        hours = {hour: Rollup.from_dict(data) for hour, data in state["hours"].items()}
+        sources = {}
+        changed = False
+        for name, (path, inode, size, mtime_ns) in current.items():
+            previous = by_inode.get(inode)
+            if path.suffix == ".json":
+                # Arreglo JSON antiguo: sólo se lee entero y una vez
+                if previous is None:
+                    records, changed = iter_file_records(path), True
+                else:
+                    records = iter(())
+                sources[name] = {"inode": inode, "offset": size, "mtime_ns": mtime_ns, "array": True}
+            else:
+                offset = previous["offset"] if previous else 0
+                if offset < size:
+                    records, offset = _read_new_lines(path, offset)
+                    changed = True
+                else:
+                    records = iter(())
+                sources[name] = {"inode": inode, "offset": offset}
+
+            for record in records:
+                hour = str(record.get("timestamp", ""))[11:13] or "00"
+                hours.setdefault(hour, Rollup()).add(record)
+
+        if changed or sources != state["sources"]:
+            state = {
+                "version": ROLLUP_VERSION,
+                "date": date,
+                "sources": sources,
+                "hours": {hour: hours[hour].to_dict() for hour in sorted(hours)},
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save_state(date, state)
+        return state
+
+    def hourly(self, date: str) -> Dict[str, Rollup]:
+        """Agregados por hora ("00".."23") de una fecha."""
+        state = self.update(date)
+        return {hour: Rollup.from_dict(data) for hour, data in state["hours"].items()}
+
+    def day(self, date: str) -> Rollup:
+        """Agregado de un día completo (unión de sus horas)."""
+        rollup = Rollup()
+        for hour in self.hourly(date).values():
+            rollup.merge(hour)
+        return rollup
+
+    def period(self, start: str, end: str) -> Rollup:
+        """
+        Agregado de un rango de fechas (inclusive) combinando los días.
+
+        Args:
+            start: Fecha inicial YYYY-MM-DD
+            end: Fecha final YYYY-MM-DD
+
+        Returns:
+            Rollup del periodo (vacío si no hay datos)
+        """
+        rollup = Rollup()
+        for date in list_dates(str(self.log_dir)):
+            if start <= date <= end:
+                rollup.merge(self.day(date))
+        return rollup
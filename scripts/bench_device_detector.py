@@ -0,0 +1,140 @@
+"""
+Microbenchmark del análisis de User-Agent de DeviceDetector.
+
+Compara, sobre un corpus de User-Agents reales:
+- la cadena anterior de comprobaciones `in` + regex (referencia)
+- las tablas de reglas sin cache (`parse_user_agent.__wrapped__`)
+- `detect_from_web` con la LRU (tráfico repetido, como en producción)
+
+Uso:
+    python scripts/bench_device_detector.py [--iterations 20000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from device_detector import DeviceDetector, parse_user_agent  # noqa: E402
+
+UA_CORPUS = [
+    # Escritorio
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.2210.91",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko",
+    "Mozilla/5.0 (Windows NT 6.3; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 OPR/105.0.0.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14.1; rv:120.0) Gecko/20100101 Firefox/120.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0",
+    "Mozilla/5.0 (X11; Fedora; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0",
+    # Móviles y tablets
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1.2 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/120.0.6099.119 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPad; CPU OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.6099.144 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 13; SM-A536B) AppleWebKit/537.36 (KHTML, like Gecko) SamsungBrowser/23.0 Chrome/115.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 12; moto g(60)) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Mobile Safari/537.36 OPR/79.0.4195.76012",
+    "Mozilla/5.0 (Android 14; Mobile; rv:121.0) Gecko/121.0 Firefox/121.0",
+    "Mozilla/5.0 (Linux; Android 13; SM-X200) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 9; KFTRWI) AppleWebKit/537.36 (KHTML, like Gecko) Silk/119.3.1 like Chrome/119.0.6045.193 Safari/537.36",
+    # Otros
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "python-requests/2.31.0",
+]
+
+
+def legacy_detect(user_agent: str) -> tuple:
+    """Cadena de comprobaciones anterior (tipo, os, navegador), como referencia."""
+    ua_lower = user_agent.lower()
+    mobile = ['android', 'iphone', 'ipad', 'ipod', 'blackberry', 'windows phone', 'mobile', 'webos', 'opera mini']
+    if any(k in ua_lower for k in mobile):
+        tipo = "Tablet" if ('ipad' in ua_lower or 'tablet' in ua_lower) else "Móvil"
+    elif any(k in ua_lower for k in ['tablet', 'kindle', 'silk', 'playbook']):
+        tipo = "Tablet"
+    else:
+        tipo = "PC"
+
+    if 'windows' in ua_lower:
+        os_name = "Windows"
+    elif 'mac os x' in ua_lower or 'macos' in ua_lower:
+        re.search(r'mac os x ([\d_]+)', ua_lower)
+        os_name = "macOS"
+    elif 'iphone os' in ua_lower or 'ios' in ua_lower:
+        re.search(r'os ([\d_]+)', ua_lower)
+        os_name = "iOS"
+    elif 'android' in ua_lower:
+        re.search(r'android ([\d.]+)', ua_lower)
+        os_name = "Android"
+    elif 'linux' in ua_lower:
+        os_name = "Linux"
+    else:
+        os_name = "Desconocido"
+
+    ua = user_agent
+    if 'Edg/' in ua:
+        browser = "Edge"
+        re.search(r'Edg/([\d.]+)', ua)
+    elif 'Chrome/' in ua and 'Safari/' in ua:
+        browser = "Chrome"
+        re.search(r'Chrome/([\d.]+)', ua)
+    elif 'Firefox/' in ua:
+        browser = "Firefox"
+        re.search(r'Firefox/([\d.]+)', ua)
+    elif 'Safari/' in ua:
+        browser = "Safari"
+        re.search(r'Version/([\d.]+)', ua)
+    else:
+        browser = "Desconocido"
+    return tipo, os_name, browser
+
+
+def bench(label: str, func, inputs) -> float:
+    start = time.perf_counter()
+    for ua in inputs:
+        func(ua)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / len(inputs) * 1e6
+    print(f"{label:<40}{per_call:>10.2f} µs/llamada")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de DeviceDetector")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    inputs = [random.choice(UA_CORPUS) for _ in range(args.iterations)]
+    detector = DeviceDetector()
+    uncached = parse_user_agent.__wrapped__
+
+    print(f"Corpus: {len(UA_CORPUS)} User-Agents, {len(inputs)} llamadas\n")
+    legacy = bench("Cadena if/elif anterior", legacy_detect, inputs)
+    compiled = bench("Tablas de reglas (sin cache)", uncached, inputs)
+    parse_user_agent.cache_clear()
+    cached = bench("detect_from_web (LRU)", detector.detect_from_web, inputs)
+
+    info = parse_user_agent.cache_info()
+    print(f"\nLRU: {info.hits} aciertos, {info.misses} fallos, tamaño {info.currsize}/{info.maxsize}")
+    print(f"Aceleración con LRU: {legacy / cached:.1f}x  (sin cache: {legacy / compiled:.1f}x)")
+
+    print("\nDiferencias con la cadena anterior (correcciones de prioridad):")
+    for ua in UA_CORPUS:
+        new = parse_user_agent(ua)
+        old = legacy_detect(ua)
+        if (new.tipo, new.os, new.navegador) != old:
+            print(f"  {old} -> {(new.tipo, new.os, new.navegador)}\n    {ua[:90]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Contenedor de Servicios Compartidos para GERARD
+
+Antes, cada pregunta construía un InteractionLogger nuevo (GeoLocator leyendo
+el caché geográfico, DeviceDetector y el recuento de "REGISTRO #" del log del
+día) y un GoogleSheetsLogger nuevo que volvía a autorizar gspread y a abrir la
+hoja por la red. Este módulo mantiene esos objetos como singletons del proceso.
+
+Características:
+- Singletons perezosos y seguros para múltiples hilos
+- Reconexión perezosa de Google Sheets con intervalo mínimo entre intentos
+- Chequeos de salud de cada servicio
+- Fábricas inyectables para pruebas
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from interaction_logger import InteractionLogger
+
+try:
+    from google_sheets_logger import GoogleSheetsLogger
+    GOOGLE_SHEETS_AVAILABLE = True
+except ImportError:
+    GoogleSheetsLogger = None
+    GOOGLE_SHEETS_AVAILABLE = False
+
+
+def _default_interaction_logger() -> InteractionLogger:
+    return InteractionLogger(
+        platform="web",
+        log_dir="logs",
+        anonymize=False,
+        max_file_size_mb=10,
+        enable_json=True
+    )
+
+
+def _default_sheets_logger():
+    if not GOOGLE_SHEETS_AVAILABLE:
+        return None
+    return GoogleSheetsLogger()
+
+
+def _sheets_usable(sheets) -> bool:
+    """Indica si el logger de Sheets acepta filas (conectado o con spool)."""
+    if sheets is None:
+        return False
+    return bool(getattr(sheets, "accepts_rows", getattr(sheets, "enabled", False)))
+
+
+class ServicesContainer:
+    """
+    Contenedor de servicios de registro compartidos por todas las sesiones.
+    """
+
+    def __init__(
+        self,
+        interaction_logger_factory: Callable[[], Any] = _default_interaction_logger,
+        sheets_logger_factory: Callable[[], Any] = _default_sheets_logger,
+        reconnect_interval_seconds: float = 60.0
+    ):
+        """
+        Inicializa el contenedor (no crea ningún servicio todavía).
+
+        Args:
+            interaction_logger_factory: Construye el InteractionLogger
+            sheets_logger_factory: Construye el GoogleSheetsLogger (o None)
+            reconnect_interval_seconds: Tiempo mínimo entre intentos de
+                reconexión con Google Sheets
+        """
+        self._interaction_logger_factory = interaction_logger_factory
+        self._sheets_logger_factory = sheets_logger_factory
+        self.reconnect_interval = reconnect_interval_seconds
+
+        self._lock = threading.RLock()
+        self._interaction_logger = None
+        self._sheets_logger = None
+        self._sheets_last_attempt: Optional[float] = None
+        self._sheets_attempts = 0
+
+    def get_interaction_logger(self):
+        """
+        Obtiene el InteractionLogger compartido, creándolo la primera vez.
+
+        Returns:
+            InteractionLogger del proceso
+
+        Raises:
+            Cualquier excepción de la fábrica (se reintenta en la próxima llamada)
+        """
+        logger = self._interaction_logger
+        if logger is not None:
+            return logger
+        with self._lock:
+            if self._interaction_logger is None:
+                self._interaction_logger = self._interaction_logger_factory()
+            return self._interaction_logger
+
+    def get_device_detector(self):
+        """Obtiene el DeviceDetector del InteractionLogger compartido."""
+        return self.get_interaction_logger().device_detector
+
+    def get_sheets_logger(self):
+        """
+        Obtiene el logger de Google Sheets si acepta filas.
+
+        Con escritura asíncrona el logger se devuelve aunque esté desconectado:
+        las filas van al spool y la reconexión la hace sólo el hilo del
+        escritor. Sin escritor, se intenta reconectar desde aquí como máximo
+        una vez por `reconnect_interval`; entre intentos se devuelve None sin
+        tocar la red.
+
+        Returns:
+            GoogleSheetsLogger utilizable o None
+        """
+        sheets = self._sheets_logger
+        if _sheets_usable(sheets):
+            return sheets
+
+        with self._lock:
+            sheets = self._sheets_logger
+            if _sheets_usable(sheets):
+                return sheets
+
+            now = time.monotonic()
+            if (self._sheets_last_attempt is not None
+                    and now - self._sheets_last_attempt < self.reconnect_interval):
+                return None
+            self._sheets_last_attempt = now
+            self._sheets_attempts += 1
+
+            try:
+                if sheets is None:
+                    sheets = self._sheets_logger_factory()
+                    self._sheets_logger = sheets
+                elif hasattr(sheets, "reconnect"):
+                    print("[INFO] Reconectando Google Sheets Logger...")
+                    sheets.reconnect()
+            except Exception as e:
+                print(f"[!] Error inicializando Google Sheets Logger: {e}")
+                return None
+
+            if _sheets_usable(sheets):
+                return sheets
+            return None
+
+    def health_check(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Revisa el estado de cada servicio sin crear ni reconectar nada.
+
+        Returns:
+            Diccionario {servicio: {"ok": bool, ...detalles}}
+        """
+        health: Dict[str, Dict[str, Any]] = {}
+
+        logger = self._interaction_logger
+        if logger is None:
+            health["interaction_logger"] = {"ok": False, "detail": "no inicializado"}
+        else:
+            log_dir = Path(getattr(logger, "log_dir", "logs"))
+            writable = log_dir.is_dir()
+            health["interaction_logger"] = {
+                "ok": writable,
+                "detail": str(log_dir) if writable else f"directorio no disponible: {log_dir}",
+                "active_sessions": len(getattr(logger, "active_sessions", {}))
+            }
+
+        sheets = self._sheets_logger
+        if sheets is None:
+            health["google_sheets"] = {
+                "ok": False,
+                "detail": "no disponible" if not GOOGLE_SHEETS_AVAILABLE else "no conectado",
+                "attempts": self._sheets_attempts
+            }
+        else:
+            health["google_sheets"] = {
+                "ok": bool(getattr(sheets, "enabled", False)),
+                "detail": getattr(sheets, "last_error", None) or "conectado",
+                "attempts": self._sheets_attempts
+            }
+
+        return health
+
+    def reset(self):
+        """Descarta los servicios creados (se recrean en el próximo uso)."""
+        with self._lock:
+            self._interaction_logger = None
+            self._sheets_logger = None
+            self._sheets_last_attempt = None
+            self._sheets_attempts = 0
+
+
+_services: Optional[ServicesContainer] = None
+_services_lock = threading.Lock()
+
+
+def get_services() -> ServicesContainer:
+    """
+    Obtiene el contenedor de servicios del proceso.
+
+    Returns:
+        Instancia única de ServicesContainer
+    """
+    global _services
+    if _services is None:
+        with _services_lock:
+            if _services is None:
+                _services = ServicesContainer()
+    return _services
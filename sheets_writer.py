@@ -0,0 +1,300 @@
+"""
+Escritor Asíncrono por Lotes para Google Sheets
+
+`worksheet.append_row` se ejecutaba dentro de la petición del usuario: cada
+respuesta esperaba un viaje de ida y vuelta a la API de Sheets. Este módulo
+encola las filas y las envía desde un hilo de fondo con `append_rows`.
+
+Características:
+- Cola en memoria + hilo daemon de escritura
+- Envío por lotes al alcanzar un tamaño o un intervalo de tiempo
+- Reintentos con backoff exponencial (las filas nunca se descartan)
+- Spool local append-only (JSONL) con las filas pendientes
+- Reenvío automático de filas no confirmadas al reiniciar
+- Probado contra un worksheet falso (sólo requiere `append_rows`)
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class SheetsBatchWriter:
+    """
+    Envía filas a un worksheet de Google Sheets en segundo plano.
+
+    Cada fila se registra primero en el spool (`{"op": "row"}`) y, cuando el
+    lote se confirma, se agrega una marca `{"op": "ack"}` con sus IDs. Al
+    arrancar se reenvían las filas sin confirmación y se compacta el spool.
+    """
+
+    def __init__(
+        self,
+        worksheet_provider: Callable[[], Any],
+        spool_file: str = "logs/.sheets_spool.jsonl",
+        batch_size: int = 20,
+        flush_interval: float = 5.0,
+        initial_backoff: float = 2.0,
+        max_backoff: float = 120.0,
+        value_input_option: str = "RAW",
+        on_error: Optional[Callable[[Exception], None]] = None
+    ):
+        """
+        Inicializa el escritor (no arranca el hilo hasta `start`).
+
+        Args:
+            worksheet_provider: Devuelve el worksheet a usar (o lanza excepción
+                si no hay conexión). Se llama en el hilo de fondo.
+            spool_file: Archivo JSONL append-only con las filas pendientes
+            batch_size: Filas máximas por llamada a `append_rows`
+            flush_interval: Segundos máximos que una fila espera en la cola
+            initial_backoff: Espera inicial tras un error de envío
+            max_backoff: Espera máxima entre reintentos
+            value_input_option: Opción de entrada de valores para `append_rows`
+            on_error: Callback opcional invocado con cada error de envío
+        """
+        self.worksheet_provider = worksheet_provider
+        self.spool_file = Path(spool_file)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.value_input_option = value_input_option
+        self.on_error = on_error
+
+        self._queue: "queue.Queue[Tuple[str, List[Any]]]" = queue.Queue()
+        self._pending: List[Tuple[str, List[Any]]] = []
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flush_requested = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._failures = 0
+        self._next_attempt = 0.0
+        self._stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "batches": 0,
+            "errors": 0,
+            "replayed": 0,
+        }
+
+    # --- Spool ---
+
+    def _append_spool(self, record: Dict[str, Any]):
+        """Agrega una línea al spool (append-only). Requiere `_spool_lock`."""
+        try:
+            self.spool_file.parent.mkdir(parents=True, exist_ok=True)
+            line = json.dumps(record, ensure_ascii=False)
+            with open(self.spool_file, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+                f.flush()
+        except Exception as e:
+            print(f"[!] Error escribiendo spool de Google Sheets: {e}")
+
+    def _load_spool(self) -> List[Tuple[str, List[Any]]]:
+        """Lee el spool y devuelve las filas sin confirmación, en orden."""
+        if not self.spool_file.exists():
+            return []
+
+        rows: Dict[str, List[Any]] = {}
+        try:
+            with open(self.spool_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Línea truncada por un cierre abrupto
+                        continue
+                    if record.get("op") == "row":
+                        rows[record["id"]] = record["row"]
+                    elif record.get("op") == "ack":
+                        for row_id in record.get("ids", []):
+                            rows.pop(row_id, None)
+        except Exception as e:
+            print(f"[!] Error leyendo spool de Google Sheets: {e}")
+            return []
+        return list(rows.items())
+
+    def _compact_spool(self, pending: List[Tuple[str, List[Any]]]):
+        """
+        Reescribe el spool de forma atómica dejando sólo las filas pendientes.
+        Requiere `_spool_lock`.
+        """
+        try:
+            self.spool_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.spool_file.with_name(self.spool_file.name + ".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for row_id, row in pending:
+                    f.write(json.dumps({"op": "row", "id": row_id, "row": row}, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.spool_file)
+        except Exception as e:
+            print(f"[!] Error compactando spool de Google Sheets: {e}")
+
+    # --- API pública ---
+
+    def start(self):
+        """Arranca el hilo de fondo y reenvía las filas pendientes del spool."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            with self._spool_lock:
+                pending = self._load_spool()
+                self._compact_spool(pending)
+            if pending:
+                print(f"[INFO] Reenviando {len(pending)} filas pendientes del spool de Google Sheets")
+                self._stats["replayed"] += len(pending)
+                self._idle.clear()
+                for item in pending:
+                    self._queue.put(item)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, row: List[Any]) -> str:
+        """
+        Encola una fila para enviarla en segundo plano. No hace E/S de red.
+
+        Args:
+            row: Valores de la fila
+
+        Returns:
+            ID de la fila en el spool
+        """
+        if self._thread is None:
+            self.start()
+        row_id = uuid.uuid4().hex
+        with self._spool_lock:
+            self._append_spool({"op": "row", "id": row_id, "row": row})
+            self._idle.clear()
+            self._queue.put((row_id, row))
+            self._stats["enqueued"] += 1
+        return row_id
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Pide un envío inmediato y espera a que la cola quede vacía.
+
+        Args:
+            timeout: Segundos máximos de espera
+
+        Returns:
+            True si no quedan filas pendientes
+        """
+        self._flush_requested.set()
+        self._next_attempt = 0.0
+        return self._idle.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Detiene el hilo intentando enviar lo pendiente dentro del plazo.
+        Lo que no se envíe queda en el spool para el próximo arranque.
+        """
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._flush_requested.set()
+        self._thread.join(timeout)
+
+    def pending_count(self) -> int:
+        """Número de filas aún no confirmadas."""
+        return len(self._pending) + self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores del escritor."""
+        stats = dict(self._stats)
+        stats["pending"] = self.pending_count()
+        stats["consecutive_failures"] = self._failures
+        return stats
+
+    # --- Hilo de fondo ---
+
+    def _backoff(self) -> float:
+        wait = min(self.initial_backoff * (2 ** (self._failures - 1)), self.max_backoff)
+        # Jitter aleatorio (±20%)
+        return wait + wait * 0.2 * (2 * random.random() - 1)
+
+    def _drain_queue(self, timeout: float):
+        """Mueve filas de la cola a la lista pendiente (espera hasta `timeout`)."""
+        try:
+            item = self._queue.get(timeout=max(timeout, 0.01))
+            self._pending.append(item)
+        except queue.Empty:
+            return
+        while True:
+            try:
+                self._pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _send_pending(self):
+        """Envía las filas pendientes en lotes; en error programa un reintento."""
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            try:
+                worksheet = self.worksheet_provider()
+                worksheet.append_rows([row for _, row in batch], value_input_option=self.value_input_option)
+            except Exception as e:
+                self._failures += 1
+                self._stats["errors"] += 1
+                wait = self._backoff()
+                self._next_attempt = time.monotonic() + wait
+                print(f"[!] Error enviando lote a Google Sheets ({len(batch)} filas): {e}. Reintento en {wait:.1f}s")
+                if self.on_error:
+                    try:
+                        self.on_error(e)
+                    except Exception:
+                        pass
+                return
+
+            del self._pending[:len(batch)]
+            self._failures = 0
+            self._stats["sent"] += len(batch)
+            self._stats["batches"] += 1
+            with self._spool_lock:
+                self._append_spool({"op": "ack", "ids": [row_id for row_id, _ in batch]})
+            print(f"[OK] Lote de {len(batch)} filas registrado en Google Sheets")
+
+        # Todo confirmado: el spool sólo contiene historia, se puede vaciar.
+        # `enqueue` escribe el spool y encola bajo el mismo lock, así que con la
+        # cola vacía no hay filas nuevas sin enviar en el archivo.
+        with self._spool_lock:
+            if self._queue.empty():
+                self._compact_spool([])
+
+    def _run(self):
+        last_send = time.monotonic()
+        while True:
+            stopping = self._stop.is_set()
+            self._drain_queue(0.01 if stopping else min(self.flush_interval, 0.5))
+
+            now = time.monotonic()
+            due = (
+                len(self._pending) >= self.batch_size
+                or (self._pending and now - last_send >= self.flush_interval)
+                or self._flush_requested.is_set()
+            )
+            if self._pending and due and now >= self._next_attempt:
+                self._send_pending()
+                last_send = time.monotonic()
+
+            if not self._pending and self._queue.empty():
+                self._flush_requested.clear()
+                self._idle.set()
+                if stopping:
+                    return
+            elif stopping and self._failures:
+                # Al detener no se espera el backoff completo: lo pendiente queda en el spool
+                return
+            else:
+                self._idle.clear()
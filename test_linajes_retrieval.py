@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import FAISS
 
+from retrieval import batch_vector_search
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -33,14 +35,14 @@ queries = [
     "linaje bis linaje trick linaje hack",
 ]
 
-for query in queries:
+# Recuperar top-5 de todas las consultas: un lote de embeddings y una búsqueda FAISS
+results = batch_vector_search(vectorstore, queries, k=5)
+
+for query, docs in zip(queries, results):
     print(f"\n{'='*80}")
     print(f"🔍 BÚSQUEDA: {query}")
     print('='*80)
     
-    # Recuperar top-5
-    docs = vectorstore.similarity_search_with_score(query, k=5)
-    
     if not docs:
         print("❌ NO SE ENCONTRARON DOCUMENTOS")
         continue
@@ -0,0 +1,12 @@
+import pytest
+
+from tracing import Tracer, set_tracer
+
+
+@pytest.fixture(autouse=True)
+def isolated_tracer(tmp_path):
+    """Tracer compartido que exporta dentro de tmp_path en lugar de logs/traces."""
+    tracer = Tracer(export_dir=str(tmp_path / "traces"))
+    previous = set_tracer(tracer)
+    yield tracer
+    set_tracer(previous)
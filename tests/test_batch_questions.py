@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from batch_questions import RateLimiter, completed_ids, parse_questions, run_batch
+
+
+def _output():
+    return os.path.join(tempfile.mkdtemp(), "resultados.jsonl")
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_parse_plain_and_jsonl():
+    lines = ["# comentario", "", "¿Quién es Ra?", '{"id": "faq-1", "question": "¿Qué es la Ley del Uno?", "tema": "ley"}',
+             '{"pregunta": "¿Qué es la cosecha?"}', "¿Quién es Ra?"]
+    questions = parse_questions(lines)
+    assert [q.question for q in questions] == ["¿Quién es Ra?", "¿Qué es la Ley del Uno?", "¿Qué es la cosecha?",
+                                              "¿Quién es Ra?"]
+    assert questions[1].id == "faq-1" and questions[1].extra == {"tema": "ley"}
+    # Ids estables entre ejecuciones y distintos para las repetidas
+    assert questions[0].id == parse_questions(["¿Quién es Ra?"])[0].id
+    assert questions[3].id == questions[0].id + "-2"
+    with pytest.raises(ValueError, match="Línea 1"):
+        parse_questions(['{"id": 3}'])
+
+
+def test_results_and_resume():
+    output = _output()
+    questions = parse_questions(["uno", "dos", "falla", "tres"])
+    calls = []
+
+    def answer_fn(question):
+        calls.append(question)
+        if question == "falla":
+            raise RuntimeError("cuota agotada")
+        return {"answer": question.upper(), "sources": ["a.srt"], "timings": {"retrieval_ms": 1.0, "llm_ms": 2.0}}
+
+    summary = run_batch(questions, answer_fn, output, concurrency=2, requests_per_minute=0)
+    assert (summary["ok"], summary["errors"], summary["skipped"]) == (3, 1, 0)
+    records = {r["question"]: r for r in _records(output)}
+    assert records["dos"]["answer"] == "DOS" and records["dos"]["sources"] == ["a.srt"]
+    assert set(records["dos"]["timings"]) == {"retrieval_ms", "llm_ms", "wait_ms", "total_ms"}
+    assert records["falla"]["status"] == "error" and "cuota agotada" in records["falla"]["error"]
+    assert completed_ids(output) == {q.id for q in questions if q.question != "falla"}
+
+    # Al relanzar solo se reintenta la que falló
+    calls.clear()
+    summary = run_batch(questions, lambda q: {"answer": "ok"}, output, requests_per_minute=0)
+    assert (summary["ok"], summary["skipped"]) == (1, 3)
+    assert completed_ids(output) == {q.id for q in questions}
+
+
+def test_resume_after_truncated_last_line():
+    output = _output()
+    questions = parse_questions(["uno", "dos"])
+    run_batch(questions[:1], lambda q: {"answer": q}, output, requests_per_minute=0)
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "%s", "status": "o' % questions[1].id)   # interrumpido a mitad de línea
+
+    summary = run_batch(questions, lambda q: {"answer": q}, output, requests_per_minute=0)
+    assert (summary["ok"], summary["skipped"]) == (1, 1)
+    with open(output, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert json.loads(lines[-1])["question"] == "dos"
+    assert completed_ids(output) == {q.id for q in questions}
+
+
+def test_concurrency_is_bounded():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def answer_fn(question):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return {"answer": question}
+
+    questions = parse_questions([f"pregunta {i}" for i in range(12)])
+    summary = run_batch(questions, answer_fn, _output(), concurrency=3, requests_per_minute=0)
+    assert summary["ok"] == 12
+    assert 1 < peak[0] <= 3
+
+
+def test_rate_limiter_window():
+    limiter = RateLimiter(3, window_seconds=0.3)
+    start = time.monotonic()
+    waits = [limiter.acquire() for _ in range(6)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] > 0.2
+    assert time.monotonic() - start >= 0.25
+    assert RateLimiter(0).acquire() == 0.0
@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from bench_retrieval import BenchConfig, compare_results, run_benchmark, synthetic_corpus, write_json_atomic
+
+
+def test_synthetic_corpus_is_deterministic():
+    first = synthetic_corpus(50, queries=10, vocabulary=500, seed=7)
+    second = synthetic_corpus(50, queries=10, vocabulary=500, seed=7)
+    assert first.texts == second.texts and first.queries == second.queries
+    assert "-->" in first.texts[0] and first.metadatas[0]["source"].endswith(".srt")
+    assert synthetic_corpus(50, queries=10, vocabulary=500, seed=8).texts != first.texts
+    # Cada consulta sale de una frase de su documento de origen
+    for query, position in zip(first.queries, first.query_sources):
+        assert query.split()[0] in first.texts[position]
+
+
+def test_run_benchmark_small():
+    config = BenchConfig(sizes=[300], index_types=["Flat", "SQ8"], threads=[1], queries=20, dim=64, vocabulary=800)
+    result = run_benchmark(config)
+    metrics = result["metrics"]
+    assert metrics["n300.Flat.recall_at_10"] == 1.0
+    assert 0.0 < metrics["n300.SQ8.recall_at_10"] <= 1.0
+    for name in ("n300.Flat.build_s", "n300.SQ8.index_bytes", "n300.Flat.t1.search.p99_ms", "n300.SQ8.t1.batch_qps",
+                 "n300.keyword.build_s", "n300.hybrid.query.p50_ms", "n300.context.assemble.p90_ms"):
+        assert name in metrics, name
+    assert result["meta"]["config"]["sizes"] == [300]
+
+    path = os.path.join(tempfile.mkdtemp(), "bench", "resultado.json")
+    write_json_atomic(result, path)
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["metrics"] == metrics
+    assert compare_results(result, result) == []
+
+
+def test_compare_results_flags_regressions():
+    baseline = {"metrics": {"n1.Flat.t1.search.p50_ms": 1.0, "n1.Flat.t1.batch_qps": 1000.0,
+                            "n1.Flat.recall_at_10": 0.9, "n1.keyword.query.p50_ms": 0.01,
+                            "n1.Flat.build_s": 2.0, "n1.SQ8.index_bytes": 1000, "n1.quitada_ms": 5.0}}
+    current = {"metrics": {"n1.Flat.t1.search.p50_ms": 1.5, "n1.Flat.t1.batch_qps": 600.0,
+                           "n1.Flat.recall_at_10": 0.6, "n1.keyword.query.p50_ms": 0.03,
+                           "n1.Flat.build_s": 1.0, "n1.SQ8.index_bytes": 5000}}
+    regressions = {item["metric"]: item for item in compare_results(current, baseline, tolerance=0.25)}
+    # Latencia +50%, QPS -40% y recall -33% son regresiones; el build más rápido no
+    assert set(regressions) == {"n1.Flat.t1.search.p50_ms", "n1.Flat.t1.batch_qps", "n1.Flat.recall_at_10"}
+    assert regressions["n1.Flat.t1.search.p50_ms"]["change"] == 0.5
+    # Por debajo del mínimo absoluto (0.05 ms, 1 MiB) el ruido no cuenta
+    assert "n1.keyword.query.p50_ms" not in regressions and "n1.SQ8.index_bytes" not in regressions
+    assert np.isclose(regressions["n1.Flat.recall_at_10"]["change"], -1 / 3, atol=1e-3)
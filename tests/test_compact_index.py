@@ -0,0 +1,92 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from compact_index import CompactProfile, compact_index, compact_index_dir, recall_at_k
+from faiss_mmap import load_faiss_local
+from offline_embeddings import HashingEmbeddings
+
+DIM = 64
+
+
+def _vectors(n=3000, seed=0):
+    # Baja dimensión intrínseca, como los embeddings reales: PCA conserva casi todo
+    rng = np.random.default_rng(seed)
+    latent = rng.normal(size=(n, 12)).astype("float32")
+    vectors = latent @ rng.normal(size=(12, DIM)).astype("float32") + 0.05 * rng.normal(size=(n, DIM)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _flat(vectors):
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vectors)
+    return index
+
+
+def test_factory_strings():
+    assert CompactProfile(dim=256).factory_string(768) == "PCAR256,SQ8"
+    assert CompactProfile(dim=256, transform="opq", quantizer="fp16").factory_string(768) == "OPQ16_256,SQfp16"
+    assert CompactProfile(dim=None, quantizer="sq8").factory_string(768) == "SQ8"
+    assert CompactProfile(dim=768).factory_string(768) == "SQ8"
+    with pytest.raises(ValueError):
+        CompactProfile(dim=1024).factory_string(768)
+    with pytest.raises(ValueError):
+        CompactProfile(quantizer="pq").factory_string(768)
+
+
+def test_recall_at_k():
+    truth = np.array([[1, 2, 3], [4, 5, 6]])
+    assert recall_at_k(truth, np.array([[3, 2, 1], [4, 9, 9]]), 3) == pytest.approx(4 / 6)
+
+
+def test_compact_index_reports_size_and_recall(tmp_path):
+    vectors = _vectors()
+    output = tmp_path / "index.faiss"
+    compact, report = compact_index(_flat(vectors), str(output),
+                                    CompactProfile(dim=16, eval_queries=100, rerank_k_factor=4))
+
+    assert compact.ntotal == len(vectors) and compact.d == DIM
+    assert report.factory == "PCAR16,SQ8"
+    assert report.queries == 100
+    assert report.reduction > 8
+    assert report.recall > 0.6
+    assert report.recall_rerank >= report.recall and report.recall_rerank > 0.95
+
+    assert faiss.read_index(str(output)).ntotal == len(vectors)
+    assert faiss.read_index(str(tmp_path / "index.full.faiss")).ntotal == len(vectors)
+    saved = json.loads((tmp_path / "index.compact.json").read_text(encoding="utf-8"))
+    assert saved["profile"]["dim"] == 16
+    assert saved["report"]["recall"] == report.recall
+
+
+def test_load_attaches_exact_rerank(tmp_path, monkeypatch):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    vectors = _vectors(1500)
+    ids = [f"id{i}" for i in range(len(vectors))]
+    vectorstore = FAISS(HashingEmbeddings(dim=DIM), _flat(vectors),
+                        InMemoryDocstore({doc_id: Document(page_content=doc_id) for doc_id in ids}),
+                        dict(enumerate(ids)))
+    vectorstore.save_local(str(tmp_path))
+    compact_index_dir(str(tmp_path), CompactProfile(dim=16, eval_queries=50, rerank_k_factor=8))
+
+    loaded = load_faiss_local(str(tmp_path), HashingEmbeddings(dim=DIM))
+    assert isinstance(loaded.index, faiss.IndexRefine) and loaded.index.k_factor == 8
+    docs = loaded.similarity_search_with_score_by_vector(vectors[7].tolist(), k=5)
+    exact = vectorstore.similarity_search_with_score_by_vector(vectors[7].tolist(), k=5)
+    assert [d.page_content for d, _ in docs] == [d.page_content for d, _ in exact]
+    np.testing.assert_allclose([s for _, s in docs], [s for _, s in exact], rtol=1e-4, atol=1e-6)
+
+    monkeypatch.setenv("GERARD_FAISS_RERANK", "0")
+    plain = load_faiss_local(str(tmp_path), HashingEmbeddings(dim=DIM))
+    assert isinstance(plain.index, faiss.IndexPreTransform)
+
+    # Recompactar parte de los vectores originales; sin rerank se descartan
+    compact_index_dir(str(tmp_path), CompactProfile(dim=32, quantizer="fp16", eval_queries=50, rerank_k_factor=0))
+    assert not (tmp_path / "index.full.faiss").exists()
+    assert faiss.read_index(str(tmp_path / "index.faiss")).ntotal == len(vectors)
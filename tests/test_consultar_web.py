@@ -33,3 +33,28 @@ def test_format_docs_with_metadata():
     out = format_docs_with_metadata([doc])
     assert "Hola mundo" in out
     assert "archivo.srt" in out
+
+
+def test_warm_up_without_api_key_builds_offline_index(tmp_path, monkeypatch):
+    from langchain_community.vectorstores import FAISS
+
+    import consultar_web
+    from offline_embeddings import HashingEmbeddings, offline_index_available
+
+    # Despliegue nuevo: sólo el índice base descargado, sin índice offline ni clave
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("GERARD_RETRIEVAL_URL", raising=False)
+    monkeypatch.delenv("GERARD_OFFLINE_INDEX", raising=False)
+    monkeypatch.setattr(consultar_web, "resolve_api_key", lambda: None)
+    texts = ["El linaje de los masones", "Receta de paella valenciana", "Las logias y sus grados"]
+    FAISS.from_texts(texts, HashingEmbeddings(dim=64)).save_local("faiss_index")
+
+    states = []
+    resources = consultar_web._warm_up_resources(lambda state, detail="": states.append(state))
+    try:
+        assert offline_index_available("faiss_index_offline")
+        assert resources["vectorstore"].index.ntotal == len(texts)
+        assert resources["llm"] is None
+        assert states[-1] == consultar_web.STATE_LOADING
+    finally:
+        resources["snapshots"].stop()
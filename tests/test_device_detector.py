@@ -0,0 +1,72 @@
+import dataclasses
+
+import pytest
+
+from device_detector import DEFAULT_WEB_INFO, DeviceDetector, DeviceInfo, parse_user_agent
+
+IPHONE = ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_1_2 like Mac OS X) AppleWebKit/605.1.15 "
+          "(KHTML, like Gecko) Version/17.1.2 Mobile/15E148 Safari/604.1")
+IPAD = ("Mozilla/5.0 (iPad; CPU OS 17_1 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1")
+
+
+@pytest.mark.parametrize("user_agent, expected", [
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/120.0.0.0 Safari/537.36",
+     ("PC", "Windows", "10/11", "Chrome", "120.0.0.0")),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/120.0.0.0 Safari/537.36 Edg/120.0.2210.91",
+     ("PC", "Windows", "10/11", "Edge", "120.0.2210.91")),
+    ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/119.0.0.0 Safari/537.36 OPR/105.0.0.0",
+     ("PC", "Windows", "10/11", "Opera", "105.0.0.0")),
+    ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+     "Version/17.1 Safari/605.1.15",
+     ("PC", "macOS", "10.15.7", "Safari", "17.1")),
+    (IPHONE, ("Móvil", "iOS", "17.1.2", "Safari", "17.1.2")),
+    (IPAD, ("Tablet", "iOS", "17.1", "Safari", "17.1")),
+    ("Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) "
+     "Chrome/120.0.6099.144 Mobile Safari/537.36",
+     ("Móvil", "Android", "14", "Chrome", "120.0.6099.144")),
+    ("Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0",
+     ("PC", "Ubuntu", "Desconocido", "Firefox", "115.0")),
+    ("Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko",
+     ("PC", "Windows", "7", "Internet Explorer", "11.0")),
+    ("python-requests/2.31.0",
+     ("PC", "Desconocido", "N/A", "Desconocido", "N/A")),
+])
+def test_parse_user_agent(user_agent, expected):
+    info = parse_user_agent(user_agent)
+    assert (info.tipo, info.os, info.os_version, info.navegador, info.navegador_version) == expected
+    assert info.user_agent == user_agent
+
+
+def test_repeated_user_agent_returns_shared_instance():
+    parse_user_agent.cache_clear()
+    detector_a, detector_b = DeviceDetector(), DeviceDetector()
+    first = detector_a.detect_from_web(IPHONE)
+    second = detector_b.detect_from_web(IPHONE)
+    assert first is second
+    assert parse_user_agent.cache_info().hits == 1
+
+
+def test_device_info_is_frozen_and_dict_compatible():
+    info = parse_user_agent(IPAD)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        info.tipo = "PC"
+    assert not hasattr(info, "__dict__")
+    assert info["tipo"] == "Tablet"
+    assert info.get("os") == "iOS"
+    assert info.get("no_existe", "x") == "x"
+    with pytest.raises(KeyError):
+        info["no_existe"]
+    data = info.to_dict()
+    assert data["navegador"] == "Safari"
+    assert set(data) == {f.name for f in dataclasses.fields(DeviceInfo)}
+
+
+def test_empty_user_agent_returns_default():
+    detector = DeviceDetector()
+    assert detector.detect_from_web("") is DEFAULT_WEB_INFO
+    assert detector.detect_from_web(None) is DEFAULT_WEB_INFO
+    assert DEFAULT_WEB_INFO.user_agent == "No disponible"
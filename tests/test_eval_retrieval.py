@@ -0,0 +1,112 @@
+import math
+import os
+import tempfile
+
+import pytest
+from langchain_core.documents import Document
+
+import eval_retrieval
+from eval_retrieval import (
+    build_chunked_index, format_report, load_golden, matched_expectations, parse_config, parse_golden,
+    register_retriever, run_evaluation, score_ranking
+)
+
+SRT = """1
+00:00:01,000 --> 00:00:04,000
+{first}
+
+2
+00:00:05,000 --> 00:00:09,500
+{second}
+"""
+
+
+def _doc(source, first="hola", second="mundo", offset=""):
+    text = SRT.format(first=first, second=second)
+    if offset:
+        text = text.replace("00:00:0", offset)
+    return Document(page_content=text, metadata={"source": source})
+
+
+def test_parse_golden():
+    golden = parse_golden([
+        "# comentario",
+        '{"id": "a", "query": "linaje ra", "expected": ["MENSAJES OCULTOS", '
+        '{"source": "masones", "timestamp": "00:12:25-00:12:53", "grade": 2}], "tema": "linajes"}',
+        '{"query": "portal", "expected": [{"source": "El sol", "timestamp": "10:01"}]}',
+    ])
+    assert [g.id for g in golden] == ["a", "q3"]
+    assert golden[0].expected[0].source == "MENSAJES OCULTOS" and golden[0].expected[0].start is None
+    assert (golden[0].expected[1].start, golden[0].expected[1].end, golden[0].expected[1].grade) == (745, 773, 2)
+    assert golden[0].extra == {"tema": "linajes"}
+    assert golden[1].expected[0].start == golden[1].expected[0].end == 601
+    with pytest.raises(ValueError, match="línea 1"):
+        parse_golden(['{"query": "sin fuentes"}'])
+    # El golden set del repositorio es válido
+    assert load_golden(os.path.join(os.path.dirname(__file__), "..", "eval", "golden_queries.jsonl"))
+
+
+def test_relevance_and_scores():
+    golden = parse_golden(['{"query": "q", "expected": [{"source": "Mensajes Ocultos", "timestamp": "00:00:05-00:00:06", '
+                           '"grade": 2}, "la atlántida"]}'])[0]
+    inside = _doc("C:\\srt\\DESCUBRIENDO LOS MENSAJES OCULTOS [DownSub.com].srt")
+    outside = _doc("C:\\srt\\DESCUBRIENDO LOS MENSAJES OCULTOS [DownSub.com].srt", offset="00:01:0")
+    atlantis = _doc("documentos_srt/El año q desaparecio la atlantida.srt")
+    other = _doc("documentos_srt/otro.srt")
+    assert matched_expectations(inside, golden.expected) == {0}
+    assert matched_expectations(outside, golden.expected) == set()
+    assert matched_expectations(atlantis, golden.expected) == {1}
+
+    matches = [matched_expectations(d, golden.expected) for d in (other, atlantis, atlantis, inside)]
+    scores = score_ranking(matches, golden.expected, [1, 2, 4])
+    assert scores["mrr"] == 0.5 and scores["first_relevant_rank"] == 2
+    assert (scores["recall@1"], scores["recall@2"], scores["recall@4"]) == (0.0, 0.5, 1.0)
+    # El segundo chunk del mismo archivo no suma otra vez
+    ideal = 3 + 1 / math.log2(3)
+    assert scores["ndcg@4"] == pytest.approx((1 / math.log2(3) + 3 / math.log2(5)) / ideal)
+    assert score_ranking([set()], golden.expected, [1])["mrr"] == 0.0
+
+
+def test_run_evaluation_with_registered_retriever():
+    from langchain_community.vectorstores import FAISS
+
+    from offline_embeddings import HashingEmbeddings
+
+    docs = [_doc("los masones.quienes son.srt", "los masones y las logias", "quienes son"),
+            _doc("El sol un portal a la quinta dimensión.srt", "el sol es un portal", "quinta dimensión"),
+            _doc("Como es una reencarnacion.srt", "cómo trabaja la reencarnación", "el alma vuelve")]
+    embedder = HashingEmbeddings(dim=64).fit([d.page_content for d in docs])
+    vectorstore = FAISS.from_documents(docs, embedder)
+    golden = parse_golden(['{"id": "m", "query": "quienes son los masones", "expected": ["los masones"]}',
+                           '{"id": "s", "query": "portal del sol", "expected": ["portal a la quinta"]}'])
+
+    @register_retriever("al_reves")
+    def reversed_vector(vectorstore, query, k=3):
+        return list(reversed(vectorstore.similarity_search(query, k=k)))
+
+    try:
+        configs = [parse_config("vector:k=3"), parse_config("hybrid:k_vector=1,k_keyword=2"), parse_config("al_reves")]
+        report = run_evaluation({"mini": vectorstore}, golden, configs, cutoffs=[1, 3])
+    finally:
+        eval_retrieval._RETRIEVERS.pop("al_reves")
+    results = {r["config"]: r for r in report["results"]}
+    assert results["vector:k=3"]["metrics"]["recall@1"] == 1.0
+    assert results["vector:k=3"]["metrics"]["mrr"] == 1.0
+    assert results["al_reves"]["metrics"]["recall@1"] == 0.0 and results["al_reves"]["metrics"]["recall@3"] == 1.0
+    assert results["hybrid:k_vector=1,k_keyword=2"]["metrics"]["mean_docs"] >= 1
+    assert {"p50_ms", "p99_ms", "mean_context_chars", "ndcg@3"} <= set(results["al_reves"]["metrics"])
+    assert [q["id"] for q in results["al_reves"]["queries"]] == ["m", "s"]
+    assert "al_reves" in format_report(report)
+    with pytest.raises(ValueError, match="desconocida"):
+        parse_config("no_existe")
+
+
+def test_build_chunked_index():
+    directory = tempfile.mkdtemp()
+    with open(os.path.join(directory, "uno.srt"), "w", encoding="utf-8") as f:
+        f.write(SRT.format(first="linaje ra bis jac tric", second="las cuatro razas") * 20)
+    with open(os.path.join(directory, "dos.srt"), "wb") as f:
+        f.write(SRT.format(first="atlántida", second="dos hermanos").encode("latin-1"))
+    vectorstore = build_chunked_index(directory, chunk_size=300, dim=64)
+    assert vectorstore.index.ntotal > 2
+    assert any("atlántida" in d.page_content for d in vectorstore.docstore._dict.values())
@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from faiss_mmap import format_memory, load_faiss_local, memory_usage, mmap_enabled
+from offline_embeddings import HashingEmbeddings
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+TEXTS = ["masones y logias", "linaje de los reyes", "paella con mariscos", "constelaciones del sur"]
+linux_only = pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="requiere /proc")
+
+
+@pytest.fixture
+def saved_index(tmp_path):
+    from langchain_community.vectorstores import FAISS
+
+    embedder = HashingEmbeddings(dim=32).fit(TEXTS)
+    vectorstore = FAISS.from_texts(TEXTS, embedder, metadatas=[{"source": f"doc{i}.srt"} for i in range(4)])
+    vectorstore.save_local(str(tmp_path / "faiss_index"))
+    return embedder, vectorstore, tmp_path / "faiss_index"
+
+
+def test_mmap_enabled_env(monkeypatch):
+    monkeypatch.setenv("GERARD_FAISS_MMAP", "0")
+    assert not mmap_enabled()
+    monkeypatch.setenv("GERARD_FAISS_MMAP", "sí")
+    assert mmap_enabled()
+    monkeypatch.delenv("GERARD_FAISS_MMAP")
+    assert mmap_enabled() == (os.name != "nt")
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_load_keeps_langchain_api(saved_index, use_mmap):
+    embedder, original, path = saved_index
+    loaded = load_faiss_local(str(path), embedder, mmap=use_mmap)
+
+    assert loaded.index.ntotal == len(TEXTS)
+    assert loaded.index_to_docstore_id == original.index_to_docstore_id
+    assert set(loaded.docstore._dict) == set(original.docstore._dict)
+    embedding = embedder.embed_query("logias masónicas")
+    expected = original.similarity_search_with_score_by_vector(embedding, k=4)
+    actual = loaded.similarity_search_with_score_by_vector(embedding, k=4)
+    assert [d.page_content for d, _ in actual] == [d.page_content for d, _ in expected]
+    np.testing.assert_allclose([s for _, s in actual], [s for _, s in expected], rtol=1e-6)
+
+
+@linux_only
+def test_memory_usage_report():
+    usage = memory_usage()
+    assert {"rss", "rss_anon", "rss_file"} <= set(usage)
+    assert usage["rss"] >= usage["rss_anon"] > 0
+    assert "RSS" in format_memory(usage)
+    assert format_memory({}) == "sin datos"
+
+
+@linux_only
+def test_mmap_keeps_vectors_out_of_private_memory(tmp_path):
+    import faiss
+
+    if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        pytest.skip("faiss sin IO_FLAG_MMAP_IFC")
+    index = faiss.IndexFlatL2(256)
+    index.add(np.random.default_rng(0).random((60_000, 256), dtype=np.float32))   # ~61 MB
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+
+    code = (
+        "import json, sys, numpy as np, faiss;"
+        "from faiss_mmap import memory_usage, read_faiss_index;"
+        "before = memory_usage();"
+        "index = read_faiss_index(sys.argv[1], mmap=sys.argv[2] == '1');"
+        "index.search(np.zeros((1, 256), dtype='float32'), 5);"
+        "after = memory_usage();"
+        "print(json.dumps({k: after[k] - before[k] for k in ('rss_anon', 'rss_file')}))"
+    )
+
+    def growth(flag):
+        result = subprocess.run([sys.executable, "-c", code, str(tmp_path / "index.faiss"), flag],
+                                capture_output=True, text=True, check=True, cwd=ROOT)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    heap, mapped = growth("0"), growth("1")
+    mb = 1024 * 1024
+    assert heap["rss_anon"] > 50 * mb
+    assert mapped["rss_anon"] < 10 * mb
+    assert mapped["rss_file"] > 50 * mb
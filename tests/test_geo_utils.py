@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from geo_utils import CircuitBreaker, GeoLocator
+
+
+class StubProvider:
+    """Servidor HTTP local que responde siempre lo mismo, con retardo opcional."""
+
+    def __init__(self, body, status=200, delay=0.0):
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(delay)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/{{ip}}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DBIP_BODY = {"countryName": "Colombia", "city": "Bogotá", "countryCode": "CO"}
+IPAPI_COM_BODY = {"status": "success", "country": "Colombia", "city": "Medellín", "countryCode": "CO"}
+
+
+@pytest.fixture
+def stubs():
+    created = []
+
+    def make(*args, **kwargs):
+        stub = StubProvider(*args, **kwargs)
+        created.append(stub)
+        return stub
+
+    yield make
+    for stub in created:
+        stub.close()
+
+
+def test_fastest_valid_provider_wins(tmp_path, stubs):
+    slow = stubs(DBIP_BODY, delay=1.5)
+    fast = stubs(IPAPI_COM_BODY)
+    locator = GeoLocator(
+        cache_file=str(tmp_path / "geo.json"),
+        provider_urls={"db-ip.com": slow.url, "ip-api.com": fast.url},
+        timeout_seconds=3,
+    )
+
+    start = time.perf_counter()
+    location = locator.get_location("203.0.113.7")
+    elapsed = time.perf_counter() - start
+
+    assert location["fuente"] == "ip-api.com"
+    assert location["ciudad"] == "Medellín"
+    assert elapsed < 1.0
+
+
+def test_failing_provider_opens_circuit(tmp_path, stubs):
+    broken = stubs({"error": "boom"}, status=500)
+    good = stubs(IPAPI_COM_BODY, delay=0.05)
+    locator = GeoLocator(
+        cache_file=str(tmp_path / "geo.json"),
+        provider_urls={"db-ip.com": broken.url, "ip-api.com": good.url},
+        failure_threshold=3,
+        reset_timeout_seconds=0.6,
+    )
+
+    for i in range(6):
+        assert locator.get_location(f"203.0.113.{i}")["fuente"] == "ip-api.com"
+
+    assert broken.requests == 3
+    stats = locator.provider_stats()
+    assert stats["db-ip.com"]["state"] == CircuitBreaker.OPEN
+    assert stats["db-ip.com"]["failures"] == 3
+    assert stats["ip-api.com"]["successes"] == 6
+    assert stats["ip-api.com"]["avg_latency"] >= 0.05
+
+    # Pasado el reset_timeout se deja pasar una sola prueba
+    time.sleep(0.65)
+    locator.get_location("203.0.113.50")
+    locator.get_location("203.0.113.51")
+    assert broken.requests == 4
+
+
+def test_cache_is_persisted_in_batches_and_reloaded(tmp_path, stubs):
+    provider = stubs(DBIP_BODY)
+    cache_file = tmp_path / "geo.json"
+    options = dict(
+        cache_file=str(cache_file),
+        provider_urls={"db-ip.com": provider.url},
+        persist_batch_size=3,
+        persist_interval_seconds=3600,
+    )
+    locator = GeoLocator(**options)
+
+    locator.get_location("198.51.100.1")
+    locator.get_location("198.51.100.2")
+    assert not cache_file.exists()
+
+    locator.get_location("198.51.100.3")
+    saved = json.loads(cache_file.read_text(encoding="utf-8"))
+    assert sorted(saved) == ["198.51.100.1", "198.51.100.2", "198.51.100.3"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+    # Otro proceso arranca con el cache en disco: no vuelve a consultar
+    requests_before = provider.requests
+    reloaded = GeoLocator(**options)
+    assert reloaded.get_location("198.51.100.2")["pais"] == "Colombia"
+    assert provider.requests == requests_before
+
+
+def test_cache_evicts_least_recently_used(tmp_path, stubs):
+    provider = stubs(DBIP_BODY)
+    locator = GeoLocator(
+        cache_file=str(tmp_path / "geo.json"),
+        provider_urls={"db-ip.com": provider.url},
+        max_cache_entries=2,
+    )
+    for ip in ("198.51.100.1", "198.51.100.2"):
+        locator.get_location(ip)
+    locator.get_location("198.51.100.1")  # vuelve a ser el más reciente
+    locator.get_location("198.51.100.3")
+
+    assert "198.51.100.1" in locator.cache
+    assert "198.51.100.2" not in locator.cache
+    assert len(locator.cache) == 2
+
+
+def test_cancelled_half_open_probe_reopens_circuit(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    locator = GeoLocator(
+        cache_file=str(tmp_path / "geo.json"),
+        provider_urls={"db-ip.com": "http://127.0.0.1:9/{ip}"},
+        timeout_seconds=0.2,
+        reset_timeout_seconds=0.1,
+    )
+    breaker = locator.breakers["db-ip.com"]
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(0.0)
+    time.sleep(0.15)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # Un solo worker ocupado: la prueba sigue en cola al vencer el timeout
+    locator._executor = ThreadPoolExecutor(max_workers=1)
+    probed = []
+    assert locator._race([
+        ("lento", lambda: time.sleep(0.5)),
+        ("db-ip.com", lambda: probed.append(True)),
+    ]) is None
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    locator._executor.shutdown(wait=True)
+    assert not probed
+
+    time.sleep(0.15)
+    assert breaker.allow()
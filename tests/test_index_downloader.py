@@ -0,0 +1,224 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from index_downloader import (
+    MARKER_FILE, ChecksumMismatchError, IndexDownloader, IndexDownloadError, build_manifest,
+    index_ready, parse_manifest
+)
+
+INDEX_BYTES = os.urandom(300_000)
+PKL_BYTES = b"docstore" * 5000
+
+
+def _zip_bytes(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+ARCHIVE = _zip_bytes({"faiss_index/index.faiss": INDEX_BYTES, "faiss_index/index.pkl": PKL_BYTES})
+ARCHIVE_SHA = hashlib.sha256(ARCHIVE).hexdigest()
+
+
+@pytest.fixture
+def server():
+    """Servidor con Range; `state` controla cortes, manifiesto y soporte de Range."""
+    state = {
+        "archive": ARCHIVE,
+        "manifest": f"{ARCHIVE_SHA}  faiss_index.zip\n",
+        "ranges": True,
+        "drop_after": None,   # cortar la próxima respuesta tras N bytes
+        "requests": [],
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            data = state["archive"]
+            if self.path.endswith(".sha256"):
+                if state["manifest"] is None:
+                    self.send_error(404)
+                    return
+                body = state["manifest"].encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            range_header = self.headers.get("Range")
+            state["requests"].append(range_header)
+            start, end = 0, len(data) - 1
+            if range_header and state["ranges"]:
+                first, _, last = range_header.split("=", 1)[1].partition("-")
+                start = int(first)
+                end = int(last) if last else len(data) - 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            else:
+                self.send_response(200)
+            body = data[start:end + 1]
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            drop = state["drop_after"]
+            if drop is not None and len(body) > drop and len(body) > 1:
+                state["drop_after"] = None
+                self.wfile.write(body[:drop])
+                self.wfile.flush()
+                self.connection.shutdown(2)
+                return
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{httpd.server_address[1]}/faiss_index.zip"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _downloader(server, tmp_path, **kwargs):
+    kwargs.setdefault("segments", 1)
+    kwargs.setdefault("backoff_seconds", 0.01)
+    kwargs.setdefault("chunk_size", 16 * 1024)
+    return IndexDownloader(server["url"], str(tmp_path / "faiss_index"), **kwargs)
+
+
+def _assert_installed(tmp_path):
+    target = tmp_path / "faiss_index"
+    assert index_ready(str(target))
+    assert (target / "index.faiss").read_bytes() == INDEX_BYTES
+    assert (target / "index.pkl").read_bytes() == PKL_BYTES
+    # Sin restos de staging ni de la descarga
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["faiss_index"]
+
+
+def test_parse_manifest_formats():
+    assert parse_manifest("ABC  faiss_index.zip\ndef  index.faiss\n", "faiss_index.zip") == (
+        "abc", {"index.faiss": "def"})
+    assert parse_manifest("abc", "faiss_index.zip") == ("abc", {})
+    assert parse_manifest('{"archive": {"sha256": "AA"}, "files": {"index.pkl": "BB"}}', "x.zip") == (
+        "aa", {"index.pkl": "bb"})
+
+
+def test_single_stream_download_verifies_and_installs(server, tmp_path):
+    progress = []
+    _downloader(server, tmp_path, progress_callback=progress.append).ensure()
+    _assert_installed(tmp_path)
+    assert progress[-1] == 100
+    assert progress == sorted(progress)
+
+
+def test_parallel_segments(server, tmp_path):
+    _downloader(server, tmp_path, segments=4, min_segment_bytes=1024).ensure()
+    _assert_installed(tmp_path)
+    ranges = [r for r in server["requests"] if r != "bytes=0-0"]
+    assert len(ranges) == 4
+    assert all(r.startswith("bytes=") for r in ranges)
+
+
+def test_resumes_after_dropped_connection(server, tmp_path):
+    server["drop_after"] = 100_000
+    _downloader(server, tmp_path).ensure()
+    _assert_installed(tmp_path)
+    # El reintento pidió solo lo que faltaba (desde el último bloque escrito)
+    resumed = server["requests"][-1]
+    assert resumed.startswith("bytes=")
+    assert 100_000 - 16 * 1024 <= int(resumed.split("=")[1].split("-")[0]) <= 100_000
+
+
+def test_resumes_from_previous_process(server, tmp_path):
+    server["drop_after"] = 50_000
+    failing = _downloader(server, tmp_path, max_retries=0)
+    with pytest.raises(IndexDownloadError):
+        failing.ensure()
+    assert failing.part_path.exists() and failing.state_path.exists()
+    assert not (tmp_path / "faiss_index").exists()
+
+    _downloader(server, tmp_path).ensure()
+    _assert_installed(tmp_path)
+    assert 50_000 - 16 * 1024 <= int(server["requests"][-1].split("=")[1].split("-")[0]) <= 50_000
+
+
+def test_server_without_range_support(server, tmp_path):
+    server["ranges"] = False
+    _downloader(server, tmp_path, segments=4, min_segment_bytes=1024).ensure()
+    _assert_installed(tmp_path)
+
+
+def test_checksum_mismatch_keeps_previous_index(server, tmp_path):
+    target = tmp_path / "faiss_index"
+    target.mkdir()
+    (target / "index.faiss").write_bytes(b"old")
+    server["manifest"] = "0" * 64 + "  faiss_index.zip\n"
+
+    downloader = _downloader(server, tmp_path)
+    with pytest.raises(ChecksumMismatchError):
+        downloader.ensure()
+    assert (target / "index.faiss").read_bytes() == b"old"
+    assert not downloader.part_path.exists()
+
+
+def test_per_file_hash_from_json_manifest(server, tmp_path):
+    server["manifest"] = ('{"archive": {"sha256": "%s"}, "files": {"index.pkl": "%s"}}'
+                          % (ARCHIVE_SHA, "f" * 64))
+    with pytest.raises(ChecksumMismatchError):
+        _downloader(server, tmp_path).ensure()
+    assert not (tmp_path / "faiss_index").exists()
+
+
+def test_missing_manifest(server, tmp_path):
+    server["manifest"] = None
+    with pytest.raises(IndexDownloadError):
+        _downloader(server, tmp_path, require_checksum=True).ensure()
+    # Sin require_checksum se instala (con aviso)
+    _downloader(server, tmp_path).ensure()
+    assert index_ready(str(tmp_path / "faiss_index"))
+
+
+def test_release_manifest_is_accepted_by_the_downloader(server, tmp_path):
+    archive = tmp_path / "release" / "faiss_index.zip"
+    archive.parent.mkdir()
+    archive.write_bytes(ARCHIVE)
+    manifest = build_manifest(archive)
+    assert parse_manifest(json.dumps(manifest), "faiss_index.zip") == (ARCHIVE_SHA, {
+        "faiss_index/index.faiss": hashlib.sha256(INDEX_BYTES).hexdigest(),
+        "faiss_index/index.pkl": hashlib.sha256(PKL_BYTES).hexdigest(),
+    })
+
+    server["manifest"] = json.dumps(manifest)
+    _downloader(server, tmp_path / "install", require_checksum=True).ensure()
+    assert index_ready(str(tmp_path / "install" / "faiss_index"))
+
+
+def test_atomic_replace_of_existing_index(server, tmp_path):
+    target = tmp_path / "faiss_index"
+    target.mkdir()
+    (target / "index.faiss").write_bytes(b"old")
+    (target / "stale.txt").write_text("x")
+    _downloader(server, tmp_path).ensure(force=True)
+    _assert_installed(tmp_path)
+    assert not (target / "stale.txt").exists()
+    assert (target / MARKER_FILE).exists()
+
+
+def test_rejects_zip_path_traversal(server, tmp_path):
+    server["archive"] = _zip_bytes({"index.faiss": b"x", "index.pkl": b"y", "../evil.txt": b"z"})
+    server["manifest"] = None
+    with pytest.raises(IndexDownloadError):
+        _downloader(server, tmp_path).ensure()
+    assert not (tmp_path / "evil.txt").exists()
+    assert not (tmp_path / "faiss_index").exists()
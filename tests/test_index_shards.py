@@ -0,0 +1,152 @@
+import functools
+import json
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from index_downloader import sha256_file
+from index_shards import (
+    MANIFEST_FILE, ShardedIndexLoader, build_shards, open_sharded_index, shard_key_for_hash, year_of
+)
+from offline_embeddings import HashingEmbeddings
+
+TOPICS = ["masones y logias", "linaje de los reyes", "paella con mariscos", "constelaciones del sur",
+          "historia de Egipto", "meditación y respiración"]
+TEXTS = [f"{TOPICS[i % len(TOPICS)]} parte {i}" for i in range(36)]
+SOURCES = [f"docs/{i % 12 + 1} de abril de {2020 + i % 3} [abc{i}].es.srt" if i % 4 else f"docs/mensaje {i}.srt"
+           for i in range(36)]
+EMBEDDER = HashingEmbeddings(dim=64).fit(TEXTS)
+
+
+@pytest.fixture
+def source_index(tmp_path):
+    from langchain_community.vectorstores import FAISS
+
+    vectorstore = FAISS.from_texts(TEXTS, EMBEDDER, metadatas=[{"source": s} for s in SOURCES],
+                                   ids=[f"id{i}" for i in range(len(TEXTS))])
+    path = tmp_path / "faiss_index"
+    vectorstore.save_local(str(path))
+    return vectorstore, path
+
+
+@pytest.fixture
+def release(source_index, tmp_path):
+    """Shards publicados en un servidor HTTP; `state["hold"]` retiene los shards salvo el primero."""
+    output = tmp_path / "release"
+    manifest = build_shards(str(source_index[1]), str(output), num_shards=4)
+    state = {"hold": threading.Event(), "requests": [], "manifest": manifest}
+    state["hold"].set()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"].append(self.path)
+            if self.path.endswith(".zip") and not self.path.endswith("shard-000.zip"):
+                state["hold"].wait(10)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=str(output)))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{httpd.server_address[1]}/{MANIFEST_FILE}"
+    yield state
+    state["hold"].set()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_year_and_hash_keys():
+    assert year_of("docs/10 de abril de 2021 [3NkCcxM0aIM].es.srt") == 2021
+    assert year_of("docs/mensaje [x2019yz].srt") is None
+    assert year_of("") is None
+    assert shard_key_for_hash("id7", 8) == shard_key_for_hash("id7", 8)
+    assert {shard_key_for_hash(f"id{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_build_shards_manifest(source_index, tmp_path):
+    output = tmp_path / "release"
+    manifest = build_shards(str(source_index[1]), str(output), num_shards=4)
+
+    assert manifest["total_vectors"] == len(TEXTS)
+    assert manifest["dimension"] == 64
+    assert sum(entry["vectors"] for entry in manifest["shards"]) == len(TEXTS)
+    for entry in manifest["shards"]:
+        assert sha256_file(output / entry["file"]) == entry["sha256"]
+    assert json.loads((output / MANIFEST_FILE).read_text(encoding="utf-8")) == manifest
+    assert sorted(p.name for p in output.iterdir()) == sorted(
+        [MANIFEST_FILE] + [entry["file"] for entry in manifest["shards"]])
+
+
+def test_build_shards_by_year(source_index, tmp_path):
+    manifest = build_shards(str(source_index[1]), str(tmp_path / "release"), num_shards=2, scheme="year")
+    labels = [entry["label"] for entry in manifest["shards"]]
+    assert labels[:3] == ["2022", "2021", "2020"]
+    assert all(label.startswith("sin-fecha-") for label in labels[3:])
+    assert sum(entry["vectors"] for entry in manifest["shards"]) == len(TEXTS)
+
+
+def test_sharded_search_matches_single_index(source_index, release, tmp_path):
+    vectorstore, _ = source_index
+    store = open_sharded_index(release["url"], EMBEDDER, str(tmp_path / "shards"),
+                               min_shards=len(release["manifest"]["shards"]))
+    assert store.complete and store.index.ntotal == len(TEXTS)
+    assert sorted(store.docstore._dict) == sorted(vectorstore.docstore._dict)
+
+    for query in ("logias masónicas", "reyes y linajes", "paella"):
+        embedding = EMBEDDER.embed_query(query)
+        expected = vectorstore.similarity_search_with_score_by_vector(embedding, k=10)
+        actual = store.similarity_search_with_score_by_vector(embedding, k=10)
+        assert [doc.page_content for doc, _ in actual] == [doc.page_content for doc, _ in expected]
+        np.testing.assert_allclose([s for _, s in actual], [s for _, s in expected], rtol=1e-5)
+    assert len(store.similarity_search("masones", k=100)) == len(TEXTS)
+
+
+def test_serves_after_first_shard_and_fills_in_background(release, tmp_path):
+    release["hold"].clear()
+    loader = ShardedIndexLoader(release["url"], str(tmp_path / "shards"), EMBEDDER, max_workers=4)
+    store = loader.wait(min_shards=1, timeout=10)
+
+    first = release["manifest"]["shards"][0]
+    assert store.loaded_shards == [first["name"]]
+    assert store.index.ntotal == first["vectors"]
+    assert store.similarity_search("masones", k=3)
+
+    release["hold"].set()
+    assert loader.finished.wait(10)
+    assert store.complete and not loader.errors
+    assert store.index.ntotal == len(TEXTS)
+
+
+def test_reuses_installed_shards_without_network(release, tmp_path):
+    directory = str(tmp_path / "shards")
+    ShardedIndexLoader(release["url"], directory, EMBEDDER).wait(min_shards=99)
+    downloads = {path for path in release["requests"] if path.endswith(".zip")}
+    assert len(downloads) == len(release["manifest"]["shards"])
+
+    # Con el manifiesto sin cambios no se vuelve a descargar nada
+    del release["requests"][:]
+    ShardedIndexLoader(release["url"], directory, EMBEDDER).wait(min_shards=99)
+    assert release["requests"] == ["/" + MANIFEST_FILE]
+
+    # Sin red: manifiesto local y shards ya instalados
+    offline = ShardedIndexLoader("http://127.0.0.1:9/" + MANIFEST_FILE, directory, EMBEDDER, timeout_seconds=2)
+    store = offline.wait(min_shards=99)
+    assert store.complete and store.index.ntotal == len(TEXTS)
+
+
+def test_corrupt_shard_is_reported(release, tmp_path):
+    manifest_path = tmp_path / "release" / MANIFEST_FILE
+    manifest = release["manifest"]
+    manifest["shards"][1]["sha256"] = "0" * 64
+    manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    loader = ShardedIndexLoader(release["url"], str(tmp_path / "shards"), EMBEDDER,
+                                max_retries=0, backoff_seconds=0.01)
+    store = loader.wait(min_shards=99)
+    assert loader.errors
+    assert manifest["shards"][1]["name"] not in store.loaded_shards
+    assert len(store.loaded_shards) == len(manifest["shards"]) - 1
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from faiss_mmap import load_faiss_local
+from index_snapshots import (
+    IndexSnapshotManager, activate_snapshot, has_snapshots, list_versions, prune_snapshots, publish_snapshot,
+    read_pointer, resolve_snapshot
+)
+from offline_embeddings import HashingEmbeddings
+
+EMBEDDER = HashingEmbeddings(dim=32).fit(["masones y logias", "linaje de los reyes", "paella con mariscos"])
+
+
+def _build(path, texts):
+    from langchain_community.vectorstores import FAISS
+
+    FAISS.from_texts(texts, EMBEDDER).save_local(str(path))
+    return path
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / "faiss_index"
+    publish_snapshot(str(_build(tmp_path / "build1", ["masones y logias"])), str(root))
+    return root
+
+
+def _manager(root, **kwargs):
+    return IndexSnapshotManager(str(root), loader=lambda path: load_faiss_local(str(path), EMBEDDER),
+                                poll_seconds=0, **kwargs)
+
+
+def test_publish_and_pointer(root, tmp_path):
+    assert has_snapshots(str(root))
+    assert resolve_snapshot(str(root)) == ("v1", root / "v1")
+
+    publish_snapshot(str(_build(tmp_path / "build2", ["a", "b"])), str(root), activate=False)
+    assert list_versions(str(root)) == [1, 2]
+    assert read_pointer(str(root)) == "v1"
+    activate_snapshot(str(root), "v2")
+    assert resolve_snapshot(str(root))[0] == "v2"
+    with pytest.raises(FileNotFoundError):
+        activate_snapshot(str(root), "v9")
+
+
+def test_legacy_layout(tmp_path):
+    legacy = _build(tmp_path / "faiss_index", ["masones y logias"])
+    version, path = resolve_snapshot(str(legacy))
+    assert path == legacy and version.count("-") == 1
+    assert not has_snapshots(str(legacy))
+    assert resolve_snapshot(str(tmp_path / "nada"))[0] == "sin-indice"
+
+
+def test_prune_keeps_current(root, tmp_path):
+    for i in range(2, 5):
+        publish_snapshot(str(_build(tmp_path / f"build{i}", [f"texto {i}"])), str(root), keep=0)
+    activate_snapshot(str(root), "v1")
+    publish_snapshot(str(_build(tmp_path / "build5", ["otro"])), str(root), activate=False)
+    assert prune_snapshots(str(root), keep=2) == ["v2", "v3"]
+    assert list_versions(str(root)) == [1, 4, 5]
+
+
+def test_swap_is_atomic_and_leases_finish_on_old_snapshot(root, tmp_path):
+    manager = _manager(root)
+    swaps = []
+    manager.add_listener(lambda old, new: swaps.append((old.version, new.version)))
+    assert manager.version == "v1" and not manager.check_for_update()
+
+    with manager.lease() as old:
+        publish_snapshot(str(_build(tmp_path / "build2", ["masones y logias", "linaje de los reyes"])), str(root))
+        assert manager.check_for_update()
+        # La consulta en curso sigue con su vectorstore; las nuevas usan el nuevo
+        assert old.version == "v1" and old.vectorstore.index.ntotal == 1
+        with manager.lease() as new:
+            assert new.version == "v2" and new.vectorstore.index.ntotal == 2
+        assert old.retired and old.vectorstore is not None
+    assert old.vectorstore is None
+    assert swaps == [("v1", "v2")]
+    assert manager.get_stats()["swaps"] == 1
+
+
+def test_failed_load_keeps_current_snapshot(root, tmp_path):
+    manager = _manager(root)
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    (broken / "index.faiss").write_bytes(b"no es un indice")
+    (broken / "index.pkl").write_bytes(b"")
+    publish_snapshot(str(broken), str(root))
+
+    assert not manager.check_for_update()
+    assert manager.version == "v1" and manager.failures == 1
+    # La misma versión rota no se reintenta en cada sondeo
+    assert not manager.check_for_update() and manager.failures == 1
+
+    publish_snapshot(str(_build(tmp_path / "build3", ["a", "b", "c"])), str(root))
+    assert manager.check_for_update() and manager.version == "v3"
+
+
+def test_watcher_picks_up_new_snapshot(root, tmp_path):
+    manager = IndexSnapshotManager(str(root), loader=lambda path: load_faiss_local(str(path), EMBEDDER),
+                                   poll_seconds=0.05)
+    swapped = threading.Event()
+    manager.add_listener(lambda old, new: swapped.set())
+    assert manager.start_watcher()
+    try:
+        publish_snapshot(str(_build(tmp_path / "build2", ["a", "b"])), str(root))
+        assert swapped.wait(10)
+        assert manager.current().vectorstore.index.ntotal == 2
+    finally:
+        manager.stop()
+
+
+def test_fixed_snapshot_without_loader(root):
+    manager = _manager(root)
+    fixed = IndexSnapshotManager(str(root), initial=manager.current(), poll_seconds=1)
+    assert not fixed.start_watcher()
+    assert not fixed.check_for_update()
@@ -0,0 +1,81 @@
+import gzip
+
+from geo_utils import GeoLocator
+from ip_geo_db import IPGeoDatabase, refresh
+
+DBIP_CSV = """\
+1.0.0.0,1.0.0.255,OC,AU,Queensland,South Brisbane,-27.4767,153.017
+8.8.8.0,8.8.8.255,NA,US,California,Mountain View,37.422,-122.085
+181.48.0.0,181.63.255.255,SA,CO,Bogota D.C.,Bogotá,4.61,-74.08
+2001:db8::,2001:db8::ffff,EU,ES,Madrid,Madrid,40.4,-3.7
+"""
+
+IP2LOCATION_CSV = """\
+"16777216","16777471","AU","Australia","Queensland","Brisbane","-27.46794","153.02809"
+"""
+
+
+def _build(tmp_path, text=DBIP_CSV, name="dbip.csv.gz"):
+    source = tmp_path / name
+    with gzip.open(source, "wt", encoding="utf-8") as f:
+        f.write(text)
+    output = tmp_path / "ip_geo.npz"
+    refresh(str(source), output=str(output))
+    return IPGeoDatabase.load(output)
+
+
+def test_lookup_ranges_and_boundaries(tmp_path):
+    db = _build(tmp_path)
+    assert len(db) == 4
+
+    assert db.lookup("8.8.8.8")["ciudad"] == "Mountain View"
+    assert db.lookup("181.48.0.0")["codigo_pais"] == "CO"
+    assert db.lookup("181.63.255.255")["ciudad"] == "Bogotá"
+    assert db.lookup("181.64.0.0") is None
+    assert db.lookup("0.255.255.255") is None
+    assert db.lookup("2001:db8::1234")["region"] == "Madrid"
+    assert db.lookup("2001:db8::1:0") is None
+    assert db.lookup("::ffff:8.8.8.8")["codigo_pais"] == "US"
+    assert db.lookup("no-es-una-ip") is None
+
+
+def test_ip2location_numeric_format(tmp_path):
+    db = _build(tmp_path, IP2LOCATION_CSV, name="ip2location.csv.gz")
+    location = db.lookup("1.0.0.200")
+    assert location["pais"] == "Australia"
+    assert location["coordenadas"].startswith("-27.46")
+
+
+def test_geolocator_uses_local_db_without_network(tmp_path):
+    db = _build(tmp_path)
+    locator = GeoLocator(
+        cache_file=str(tmp_path / "geo.json"),
+        provider_urls={"db-ip.com": "http://127.0.0.1:9/{ip}"},
+        local_db=db,
+        network_fallback=False,
+    )
+
+    assert locator.get_location("181.50.1.1")["fuente"] == "ip-db local"
+    unknown = locator.get_location("203.0.113.9")
+    assert unknown["pais"] == "Desconocido"
+    assert locator.provider_stats()["db-ip.com"]["failures"] == 0
+
+
+def test_country_names_match_network_providers(tmp_path):
+    db = _build(tmp_path)
+    # Los CSV de DB-IP ciudad sólo traen el código: se guarda el nombre como en ip-api/db-ip
+    assert db.lookup("181.50.1.1")["pais"] == "Colombia"
+    assert db.lookup("2001:db8::1")["pais"] == "Spain"
+    assert db.lookup("8.8.8.8")["codigo_pais"] == "US"
+
+    countries = _build(tmp_path, "8.8.8.0,8.8.8.255,US\n", name="dbip-country.csv.gz")
+    assert countries.lookup("8.8.8.8")["pais"] == "United States"
+
+
+def test_low_ipv6_ranges_stay_in_ipv6_table(tmp_path):
+    text = "::1,::1,NA,US,,Loopback,,\n::2,::ffff:ffff,NA,US,,Compat,,\n0.0.0.0,0.0.0.255,EU,DE,,Berlin,,\n"
+    db = _build(tmp_path, text)
+    assert db.lookup("::1")["ciudad"] == "Loopback"
+    assert db.lookup("::2")["ciudad"] == "Compat"
+    assert db.lookup("0.0.0.1")["ciudad"] == "Berlin"
+    assert len(db.v4_start) == 1 and len(db.v6_start) == 2
@@ -0,0 +1,63 @@
+import json
+import threading
+
+from jsonl_log import JsonlLogWriter, convert_array_file, iter_records, list_dates, log_files_for_date
+
+
+def test_concurrent_appends_produce_one_valid_line_each(tmp_path):
+    writer = JsonlLogWriter(log_dir=str(tmp_path))
+
+    def worker(n):
+        for i in range(50):
+            writer.append({"user": f"u{n}", "i": i, "question": "¿qué es el amor?"}, date="2025-10-13")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    lines = (tmp_path / "interaction_log_2025-10-13.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 200
+    assert all(json.loads(line)["question"] == "¿qué es el amor?" for line in lines)
+
+
+def test_append_after_truncated_line_starts_a_new_line(tmp_path):
+    writer = JsonlLogWriter(log_dir=str(tmp_path))
+    writer.append({"i": 0}, date="2025-10-13")
+    path = writer.path_for("2025-10-13")
+    with open(path, "ab") as f:
+        f.write(b'{"i": 1, "question": "cort')   # proceso muerto a mitad de escritura
+    writer.append({"i": 2}, date="2025-10-13")
+    writer.append({"i": 3}, date="2025-10-13")
+
+    lines = path.read_bytes().split(b"\n")
+    assert lines[1] == b'{"i": 1, "question": "cort'
+    assert [json.loads(line)["i"] for line in lines[2:] if line] == [2, 3]
+    assert [r["i"] for r in iter_records(str(tmp_path), "2025-10-13")] == [0, 2, 3]
+
+
+def test_rotation_keeps_chronological_order(tmp_path):
+    writer = JsonlLogWriter(log_dir=str(tmp_path), max_file_size_mb=50 / (1024 * 1024))
+    for i in range(20):
+        writer.append({"i": i}, date="2025-10-13")
+
+    files = log_files_for_date(str(tmp_path), "2025-10-13")
+    assert len(files) > 1
+    assert files[-1].name == "interaction_log_2025-10-13.jsonl"
+    assert [r["i"] for r in iter_records(str(tmp_path), "2025-10-13")] == list(range(20))
+
+
+def test_reader_accepts_legacy_arrays_and_converter(tmp_path):
+    legacy = tmp_path / "interaction_log_2025-10-12.json"
+    legacy.write_text(json.dumps([{"i": 0}, {"i": 1}], indent=2), encoding="utf-8")
+    JsonlLogWriter(log_dir=str(tmp_path)).append({"i": 2}, date="2025-10-12")
+    with open(tmp_path / "interaction_log_2025-10-12.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"i": 3, "trunc')  # línea truncada por un cierre abrupto
+
+    assert [r["i"] for r in iter_records(str(tmp_path), "2025-10-12")] == [0, 1, 2]
+    assert list_dates(str(tmp_path)) == ["2025-10-12"]
+
+    convert_array_file(legacy)
+    assert not legacy.exists()
+    assert [r["i"] for r in iter_records(str(tmp_path), "2025-10-12")] == [0, 1, 2]
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from location_resolver import LocationResolver, to_geo_info
+
+NOMINATIM_BODY = {"address": {"city": "Bogotá", "state": "Bogotá D.C.", "country": "Colombia"}}
+
+
+@pytest.fixture
+def nominatim():
+    state = {"requests": 0, "delay": 0.0, "status": 200}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            time.sleep(state["delay"])
+            payload = json.dumps(NOMINATIM_BODY).encode("utf-8")
+            self.send_response(state["status"])
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}/reverse"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_nearby_users_share_a_tile(nominatim):
+    resolver = LocationResolver(reverse_url=nominatim["url"], tile_degrees=0.05)
+
+    first = resolver.resolve_browser(4.6097, -74.0817, "181.50.1.1")
+    second = resolver.resolve_browser(4.6123, -74.0801, "181.50.1.2")
+    far = resolver.resolve_browser(6.2442, -75.5812)
+
+    assert first["city"] == second["city"] == "Bogotá"
+    assert second["latitude"] == 4.6123
+    assert far["source"] == "navegador"
+    assert nominatim["requests"] == 2
+
+
+def test_concurrent_lookups_of_a_tile_are_coalesced(nominatim):
+    nominatim["delay"] = 0.2
+    resolver = LocationResolver(reverse_url=nominatim["url"], max_workers=8)
+
+    futures = [resolver.submit_browser(4.61 + i * 0.001, -74.08) for i in range(6)]
+    results = [f.result(timeout=5) for f in futures]
+
+    assert {r["city"] for r in results} == {"Bogotá"}
+    assert nominatim["requests"] == 1
+
+
+def test_pending_until_the_future_finishes(nominatim, monkeypatch):
+    monkeypatch.setenv("GERARD_GEO_NETWORK", "0")
+    nominatim["delay"] = 0.3
+    resolver = LocationResolver(reverse_url=nominatim["url"])
+
+    future = resolver.submit_browser(4.61, -74.08, "181.50.1.1")
+    pending = LocationResolver.result_or_pending(future, "181.50.1.1")
+    assert pending["pending"] is True
+    assert to_geo_info(pending)["fuente"] == "pendiente"
+
+    resolved = LocationResolver.result_or_pending(future, "181.50.1.1", wait=5)
+    assert resolved["city"] == "Bogotá"
+    assert to_geo_info(resolved)["coordenadas"] == "4.61, -74.08"
+
+
+def test_reverse_failure_falls_back_without_caching(nominatim, monkeypatch):
+    monkeypatch.setenv("GERARD_GEO_NETWORK", "0")
+    nominatim["status"] = 503
+    resolver = LocationResolver(reverse_url=nominatim["url"])
+
+    location = resolver.resolve_browser(4.61, -74.08, "203.0.113.5")
+    assert location["source"] == "desconocida"
+    assert location["latitude"] == 4.61
+
+    nominatim["status"] = 200
+    assert resolver.resolve_browser(4.61, -74.08)["city"] == "Bogotá"
+    assert nominatim["requests"] == 2
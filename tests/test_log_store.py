@@ -0,0 +1,67 @@
+from jsonl_log import JsonlLogWriter
+from log_store import LogStore, breakdown, errors, latency_percentiles, slowest, summary
+
+
+def _record(user, pais, total, status="success", error=None):
+    return {
+        "timestamp": "2025-10-13T10:00:00",
+        "user": user,
+        "platform": "web",
+        "question": f"pregunta de {user}",
+        "status": status,
+        "error": error,
+        "geo_info": {"pais": pais, "ciudad": "Bogotá"},
+        "device_info": {"tipo": "PC", "os": "Windows", "navegador": "Chrome"},
+        "metrics": {"tiempo_total": total, "tiempo_rag": total / 4, "tiempo_llm": total / 2},
+    }
+
+
+def _write_days(tmp_path):
+    writer = JsonlLogWriter(log_dir=str(tmp_path))
+    for i in range(10):
+        writer.append(_record("ANA", "Colombia", 1.0 + i), date="2025-10-12")
+    for i in range(5):
+        writer.append(_record("LUIS", "México", 20.0 + i), date="2025-10-13")
+    writer.append(_record("LUIS", "México", 0.5, status="error", error="Timeout"), date="2025-10-13")
+    return writer
+
+
+def test_ingest_is_incremental(tmp_path):
+    writer = _write_days(tmp_path)
+    store = LogStore(str(tmp_path))
+
+    assert store.ingest() == ["2025-10-12", "2025-10-13"]
+    assert store.ingest() == []
+
+    writer.append(_record("ANA", "Colombia", 3.0), date="2025-10-13")
+    assert store.ingest() == ["2025-10-13"]
+    # El índice persiste entre instancias
+    assert LogStore(str(tmp_path)).manifest["dates"]["2025-10-13"]["rows"] == 7
+
+
+def test_range_queries(tmp_path):
+    _write_days(tmp_path)
+    store = LogStore(str(tmp_path))
+
+    frame = store.load("2025-10-12", "2025-10-13")
+    assert len(frame) == 16
+    assert len(store.load("2025-10-13", "2025-10-13")) == 6
+
+    totals = summary(frame)
+    assert totals["failed"] == 1 and totals["unique_users"] == 2 and totals["days"] == 2
+
+    percentiles = latency_percentiles(frame)
+    assert {"total", "rag", "llm"} <= set(percentiles.index)
+    assert percentiles.loc["total", "max"] == 24.0
+    assert percentiles.loc["total", "p50"] <= percentiles.loc["total", "p95"] <= percentiles.loc["total", "p99"]
+
+    countries = breakdown(frame, "pais")
+    assert countries.loc["Colombia", "count"] == 10
+    assert countries.loc["México", "errors"] == 1
+
+    assert list(slowest(frame, 2)["tiempo_total"]) == [24.0, 23.0]
+    assert errors(frame).loc["Timeout", "count"] == 1
+
+
+def test_load_without_logs_returns_empty_frame(tmp_path):
+    assert LogStore(str(tmp_path)).load("2025-10-01", "2025-10-31").empty
@@ -0,0 +1,53 @@
+import urllib.request
+
+from metrics import Histogram, MetricsRegistry, observe_trace, REQUESTS, SPAN_SECONDS, start_metrics_server
+from tracing import Tracer
+
+
+def test_hdr_histogram_quantiles_have_bounded_error():
+    hist = Histogram("gerard_test_seconds", "prueba")
+    values = [0.001 * i for i in range(1, 10001)]  # 1 ms .. 10 s
+    for v in values:
+        hist.observe(v)
+
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        approx = hist.quantile(q)
+        assert exact <= approx <= exact * 1.25
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("gerard_x_total", "ayuda").inc(2, status="ok")
+    registry.gauge("gerard_y", "ayuda").set(3)
+    hist = registry.histogram("gerard_z_seconds", "ayuda")
+    hist.observe(0.0015, phase="llm")
+    hist.observe(5.0, phase="llm")
+
+    text = registry.render()
+    assert '# TYPE gerard_x_total counter' in text
+    assert 'gerard_x_total{status="ok"} 2' in text
+    assert 'gerard_y 3' in text
+    assert 'gerard_z_seconds_bucket{phase="llm",le="0.00175"} 1' in text
+    assert 'gerard_z_seconds_bucket{phase="llm",le="+Inf"} 2' in text
+    assert 'gerard_z_seconds_count{phase="llm"} 2' in text
+    assert 'gerard_z_seconds_quantile{phase="llm",quantile="0.95"}' in text
+
+
+def test_traces_feed_metrics_and_server_exposes_them():
+    tracer = Tracer(export_dir=None)
+    tracer.add_listener(observe_trace)
+    before = REQUESTS.get(platform="pytest", status="ok")
+    with tracer.span("interaction", platform="pytest"):
+        with tracer.span("retrieval.hybrid"):
+            pass
+    assert REQUESTS.get(platform="pytest", status="ok") == before + 1
+    assert SPAN_SECONDS.count(span="retrieval.hybrid") >= 1
+
+    server = start_metrics_server(0)
+    try:
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+        assert 'gerard_requests_total{platform="pytest",status="ok"}' in body
+    finally:
+        server.shutdown()
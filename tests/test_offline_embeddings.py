@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from offline_embeddings import (
+    EMBEDDER_FILE, HashingEmbeddings, build_offline_index, ensure_offline_index,
+    load_offline_index, normalize_text
+)
+
+CORPUS = [
+    "Los masones y la masonería a lo largo de la historia de Europa",
+    "El linaje de los reyes de España y sus casas reales",
+    "Receta de paella valenciana con mariscos y azafrán",
+    "La hermandad masónica, sus logias y grados simbólicos",
+    "Astronomía: las constelaciones visibles desde el hemisferio sur",
+]
+
+
+def test_normalize_text_strips_accents_and_punctuation():
+    assert normalize_text("¡Masonería, ÑANDÚ!") == " masoneria nandu "
+
+
+def test_vectors_are_normalized_and_batch_independent():
+    embedder = HashingEmbeddings(dim=256, batch_size=2).fit(CORPUS)
+    batched = embedder.embed_array(CORPUS)
+    assert batched.shape == (len(CORPUS), 256)
+    assert batched.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, rtol=1e-5)
+    # El resultado no depende de con qué otros textos comparte lote
+    single = np.vstack([embedder.embed_array([text]) for text in CORPUS])
+    np.testing.assert_allclose(batched, single, rtol=1e-5, atol=1e-6)
+
+
+def test_query_ranks_related_documents_first():
+    embedder = HashingEmbeddings(dim=512).fit(CORPUS)
+    docs = embedder.embed_array(CORPUS)
+    scores = docs @ np.array(embedder.embed_query("logias masonicas"))
+    assert set(np.argsort(scores)[::-1][:2]) == {0, 3}
+
+
+def test_hash_is_stable_across_processes():
+    code = ("from offline_embeddings import HashingEmbeddings;"
+            "v = HashingEmbeddings(dim=64).embed_query('linaje de los masones');"
+            "print(','.join(f'{x:.6f}' for x in v))")
+    outputs = set()
+    for seed in ("1", "2"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True,
+                                text=True, check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+        outputs.add(result.stdout.strip())
+    assert len(outputs) == 1
+
+
+def test_empty_and_short_texts():
+    embedder = HashingEmbeddings(dim=32)
+    assert embedder.embed_array([]).shape == (0, 32)
+    vectors = embedder.embed_array(["", "a"])
+    assert vectors.shape == (2, 32)
+    assert not np.isnan(vectors).any()
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    embedder = HashingEmbeddings(dim=128, ngram_range=(2, 4)).fit(CORPUS)
+    embedder.save(tmp_path)
+    loaded = HashingEmbeddings.load(tmp_path)
+    assert loaded.dim == 128
+    assert loaded.ngram_range == (2, 4)
+    assert loaded.num_docs == len(CORPUS)
+    np.testing.assert_array_equal(loaded.idf, embedder.idf)
+    np.testing.assert_array_equal(loaded.embed_array(CORPUS), embedder.embed_array(CORPUS))
+
+
+def _build_source_index(path, texts=CORPUS):
+    from langchain_community.vectorstores import FAISS
+
+    # Hace las veces del índice de Gemini: solo importa su docstore
+    vectorstore = FAISS.from_texts(
+        texts, HashingEmbeddings(dim=96),
+        metadatas=[{"source": f"doc{i}.srt"} for i in range(len(texts))],
+        ids=[f"id{i}" for i in range(len(texts))]
+    )
+    vectorstore.save_local(str(path))
+
+
+def test_build_offline_index_keeps_docstore_and_dimension(tmp_path):
+    source, output = tmp_path / "faiss_index", tmp_path / "faiss_index_offline"
+    _build_source_index(source)
+
+    offline = build_offline_index(str(source), str(output))
+    assert (output / EMBEDDER_FILE).exists()
+    assert offline.index.d == 96
+    assert sorted(offline.docstore._dict) == [f"id{i}" for i in range(len(CORPUS))]
+
+    reloaded = load_offline_index(str(output))
+    top = reloaded.similarity_search("paella con mariscos", k=1)[0]
+    assert top.metadata["source"] == "doc2.srt"
+    assert not list(tmp_path.glob(".faiss_index_offline.*"))
+
+
+def test_ensure_offline_index_rebuilds_when_source_changes(tmp_path):
+    source, output = tmp_path / "faiss_index", tmp_path / "faiss_index_offline"
+    _build_source_index(source)
+    ensure_offline_index(str(source), str(output))
+    built_at = (output / "index.faiss").stat().st_mtime
+
+    # Sin cambios en el índice principal se reutiliza
+    ensure_offline_index(str(source), str(output))
+    assert (output / "index.faiss").stat().st_mtime == built_at
+
+    newer = built_at + 10
+    os.utime(source / "index.faiss", (newer, newer))
+    time.sleep(0.01)
+    ensure_offline_index(str(source), str(output))
+    assert (output / "index.faiss").stat().st_mtime > built_at
+
+
+def test_ensure_offline_index_rebuilds_on_rollback_to_older_snapshot(tmp_path):
+    v1, v2 = tmp_path / "snapshots" / "v1", tmp_path / "snapshots" / "v2"
+    output = tmp_path / "faiss_index_offline"
+    _build_source_index(v1, CORPUS[:2])
+    _build_source_index(v2, CORPUS)
+
+    assert len(ensure_offline_index(str(v2), str(output)).docstore._dict) == len(CORPUS)
+    # v1 es más antiguo que el índice offline, pero es otro origen
+    assert (v1 / "index.faiss").stat().st_mtime <= (output / "index.faiss").stat().st_mtime
+    assert len(ensure_offline_index(str(v1), str(output)).docstore._dict) == 2
+
+
+def test_invalid_ngram_range():
+    with pytest.raises(ValueError):
+        HashingEmbeddings(ngram_range=(4, 2))
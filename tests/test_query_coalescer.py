@@ -0,0 +1,94 @@
+import threading
+import time
+
+from query_coalescer import QueryCoalescer, normalize_query
+
+
+def test_normalize_query_ignores_case_and_spacing_but_keeps_accents():
+    assert normalize_query('  Qué es   el AMOR\n') == 'qué es el amor'
+    # Misma letra en forma descompuesta (NFD) y compuesta (NFC)
+    assert normalize_query('Que\u0301 es') == normalize_query('Qué es')
+    assert normalize_query('el año') != normalize_query('el ano')
+    assert normalize_query('papá') != normalize_query('papa')
+    assert normalize_query('') == ''
+
+
+def test_concurrent_duplicates_share_one_call():
+    coalescer = QueryCoalescer()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return 'respuesta'
+
+    key = coalescer.make_key('que es el amor', 'v1')
+    results = []
+
+    def worker():
+        results.append(coalescer.run(key, compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    # esperar a que todos estén dentro antes de liberar al líder
+    deadline = time.time() + 2
+    while coalescer.get_stats()['total_requests'] < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert [r[0] for r in results] == ['respuesta'] * 5
+    assert sum(1 for _, shared in results if shared) == 4
+    stats = coalescer.get_stats()
+    assert stats['upstream_calls'] == 1
+    assert stats['coalesced'] == 4
+    assert stats['in_flight'] == 0
+
+
+def test_keys_differ_by_index_version_and_nothing_is_cached():
+    coalescer = QueryCoalescer()
+    assert coalescer.make_key('Hola', 'v1') != coalescer.make_key('Hola', 'v2')
+
+    key = coalescer.make_key('hola', 'v1')
+    coalescer.run(key, lambda: 1)
+    value, shared = coalescer.run(key, lambda: 2)
+    assert (value, shared) == (2, False)
+
+
+def test_errors_propagate_to_waiters():
+    coalescer = QueryCoalescer()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(2)
+        raise RuntimeError('fallo gemini')
+
+    key = coalescer.make_key('x')
+    errors = []
+
+    def worker():
+        try:
+            coalescer.run(key, failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=worker)
+    follower.start()
+    deadline = time.time() + 2
+    while coalescer.get_stats()['coalesced'] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert errors == ['fallo gemini', 'fallo gemini']
+    assert coalescer.get_stats()['errors'] == 1
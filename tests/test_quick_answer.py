@@ -0,0 +1,111 @@
+import json
+
+from langchain_core.documents import Document
+
+from metrics import LLM_IN_FLIGHT
+from quick_answer import (
+    QuickAnswerChain, is_llm_overload_error, llm_overloaded, parse_cues, query_terms
+)
+
+SRT_MASONES = """1
+00:00:01,000 --> 00:00:04,000
+hola muy buenos días a todos
+
+2
+00:00:04,000 --> 00:00:07,500
+hoy vamos a hablar de los masones
+
+3
+00:00:07,500 --> 00:00:10,000
+y de la masonería [Música] del grado 33
+
+4
+00:00:10,000 --> 00:00:13,000
+que se ha ocultado por siglos
+"""
+
+SRT_OTRO = """1
+00:01:00,000 --> 00:01:03,000
+la paella se cocina con azafrán
+
+2
+00:01:03,000 --> 00:01:06,000
+y un buen caldo de mariscos
+"""
+
+
+def _docs():
+    return [
+        Document(page_content=SRT_OTRO, metadata={"source": "docs/Cocina [Spanish (auto-generated)].srt"}),
+        Document(page_content=SRT_MASONES, metadata={"source": "docs/Los masones [DownSub.com].srt"}),
+    ]
+
+
+def test_parse_cues_reads_timestamps_and_strips_noise():
+    cues = parse_cues(SRT_MASONES)
+    assert [c.start for c in cues] == ["00:00:01", "00:00:04", "00:00:07", "00:00:10"]
+    assert cues[1].end == "00:00:07"
+    assert cues[2].text == "y de la masonería del grado 33"
+    assert all("\n" not in c.text for c in cues)
+
+
+def test_parse_cues_without_timestamps():
+    cues = parse_cues("texto libre   sin subtítulos")
+    assert len(cues) == 1 and cues[0].start == "" and cues[0].text == "texto libre sin subtítulos"
+    assert parse_cues("") == []
+
+
+def test_query_terms_drop_stopwords_and_share_stems():
+    assert query_terms("¿Qué dijo sobre los masones y la masonería?") == ["mason"]
+
+
+def test_answer_picks_matching_window_with_timestamps_and_highlights():
+    chain = QuickAnswerChain(lambda q: _docs(), max_sources=2, window_cues=2)
+    items = json.loads(chain.invoke({"input": "¿Quiénes son los masones?"}))
+
+    assert items[0]["type"] == "normal"
+    assert items[0]["content"].startswith("⚡ Respuesta rápida")
+    assert {"type": "emphasis", "content": "masones"} in items
+    text = "".join(item["content"] for item in items)
+    assert "(Fuente: Los masones, Timestamp: 00:00:04 - 00:00:10)" in text
+    # La fuente sin coincidencias no aparece
+    assert "Cocina" not in text
+    assert all(item["type"] in ("normal", "emphasis") for item in items)
+
+
+def test_answer_falls_back_to_top_documents_without_matches():
+    chain = QuickAnswerChain(lambda q: _docs(), max_sources=1, window_cues=1, notice="Aviso.")
+    items = chain.answer("astronomía")
+    text = "".join(item["content"] for item in items)
+    assert text.startswith("Aviso. ⚡")
+    assert "(Fuente: Cocina, Timestamp: 00:01:00 - 00:01:03)" in text
+    assert not any(item["type"] == "emphasis" for item in items)
+
+
+def test_answer_without_documents():
+    items = QuickAnswerChain(lambda q: []).answer("masones")
+    assert "No se encontraron documentos" in items[-1]["content"]
+
+
+def test_overload_detection():
+    class ResourceExhausted(Exception):
+        pass
+
+    assert is_llm_overload_error(ResourceExhausted("quota"))
+    assert is_llm_overload_error(RuntimeError("429 Too Many Requests"))
+    assert is_llm_overload_error(RuntimeError("The model is overloaded. Please try again later."))
+    assert not is_llm_overload_error(ValueError("Invalid JSON in response"))
+
+
+def test_llm_overloaded_uses_in_flight_gauge(monkeypatch):
+    monkeypatch.setenv("GERARD_LLM_MAX_IN_FLIGHT", "2")
+    base = LLM_IN_FLIGHT.get()
+    try:
+        LLM_IN_FLIGHT.set(1)
+        assert not llm_overloaded()
+        LLM_IN_FLIGHT.set(2)
+        assert llm_overloaded()
+        monkeypatch.setenv("GERARD_LLM_MAX_IN_FLIGHT", "0")
+        assert not llm_overloaded()
+    finally:
+        LLM_IN_FLIGHT.set(base)
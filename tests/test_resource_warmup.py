@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from resource_warmup import (
+    STATE_DOWNLOADING, STATE_ERROR, STATE_IDLE, STATE_LOADING, STATE_READY, ResourceWarmup
+)
+
+
+def test_reports_states_until_ready():
+    proceed = threading.Event()
+
+    def loader(report):
+        report(STATE_DOWNLOADING, "45%")
+        proceed.wait(5)
+        report(STATE_LOADING)
+        return {"llm": "ok"}
+
+    warmup = ResourceWarmup(loader)
+    assert warmup.status()["state"] == STATE_IDLE
+    assert warmup.describe() == "En espera"
+    assert warmup.start()
+    assert not warmup.start()  # ya en curso
+
+    assert not warmup.wait(timeout=0.05)
+    assert warmup.status()["state"] == STATE_DOWNLOADING
+    assert warmup.describe().startswith("Descargando índice (45%) - ")
+    assert not warmup.is_ready()
+
+    proceed.set()
+    assert warmup.wait(timeout=5)
+    assert warmup.is_ready()
+    assert warmup.result == {"llm": "ok"}
+    assert warmup.error is None
+    assert warmup.describe().startswith("Listo - ")
+    assert not warmup.start()  # terminada: no se relanza
+
+
+def test_error_is_kept_and_start_retries():
+    attempts = []
+
+    def loader(report):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("sin red")
+        return "recursos"
+
+    warmup = ResourceWarmup(loader)
+    assert warmup.wait(timeout=5)  # wait() arranca la carga si hace falta
+    assert warmup.status()["state"] == STATE_ERROR
+    assert isinstance(warmup.error, RuntimeError)
+    assert warmup.result is None
+    assert warmup.describe().startswith("Error (sin red)")
+
+    assert warmup.start()
+    assert warmup.wait(timeout=5)
+    assert warmup.result == "recursos"
+    assert warmup.error is None
+    assert len(attempts) == 2
+
+
+def test_late_finish_of_previous_run_does_not_complete_a_retry():
+    release_retry = threading.Event()
+    calls = []
+
+    def loader(report):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("falla")
+        release_retry.wait(5)
+        return "ok"
+
+    warmup = ResourceWarmup(loader)
+    warmup.start()
+    assert warmup.wait(timeout=5)
+    previous_run = warmup._done
+
+    assert warmup.start()
+    # El hilo anterior termina tarde, con el reintento ya en marcha
+    warmup._report(previous_run, STATE_LOADING, "tarde")
+    warmup._finish(previous_run, STATE_ERROR, error=RuntimeError("tarde"))
+    assert not warmup.wait(timeout=0.1)
+    assert warmup.error is None and warmup.result is None
+    assert warmup.status()["detail"] == ""
+
+    release_retry.set()
+    assert warmup.wait(timeout=5)
+    assert warmup.result == "ok"
+
+
+@pytest.mark.parametrize("timeout", [0.0, 0.05])
+def test_wait_times_out_while_loading(timeout):
+    release = threading.Event()
+    warmup = ResourceWarmup(lambda report: release.wait(5))
+    warmup.start()
+    try:
+        assert warmup.wait(timeout=timeout) is False
+        assert warmup.status()["elapsed"] >= 0
+    finally:
+        release.set()
+    assert warmup.wait(timeout=5)
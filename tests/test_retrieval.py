@@ -0,0 +1,74 @@
+import random
+
+import numpy as np
+import pytest
+
+from keyword_index import KeywordIndex, keyword_index_for
+from offline_embeddings import HashingEmbeddings
+from retrieval import batch_vector_search, hybrid_retrieval, hybrid_retrieval_batch, vector_search
+
+WORDS = ["masones", "logias", "linaje", "reyes", "paella", "mariscos", "constelaciones", "egipto",
+         "meditación", "respiración", "amor", "verdad", "ra", "bis", "jac", "tric", "sur", "norte"]
+
+
+def _texts(n=300, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))) + f" bloque{i}" for i in range(n)]
+
+
+@pytest.fixture(scope="module")
+def vectorstore():
+    from langchain_community.vectorstores import FAISS
+
+    texts = _texts()
+    embedder = HashingEmbeddings(dim=64).fit(texts)
+    return FAISS.from_texts(texts, embedder, metadatas=[{"source": f"doc{i}.srt"} for i in range(len(texts))])
+
+
+def _scan(docs, keywords, k):
+    """Etapa por keywords original: recorrer todo el docstore."""
+    matches = []
+    for doc in docs:
+        content = doc.page_content.lower()
+        count = sum(1 for kw in keywords if kw in content)
+        if count:
+            matches.append((count, doc))
+    matches.sort(key=lambda item: item[0], reverse=True)
+    return [doc for _, doc in matches[:k]]
+
+
+def test_keyword_index_matches_full_scan(vectorstore):
+    docs = list(vectorstore.docstore._dict.values())
+    index = KeywordIndex(docs)
+    rng = random.Random(1)
+    cases = [["mason"], ["linaje", "linaje", "reyes"], ["bloque1"], ["ogia", "aell"], ["inexistente"],
+             ["ra bis"], ["respiración", "tric", "norte"]]
+    cases += [rng.sample(WORDS, 3) for _ in range(20)]
+    for keywords in cases:
+        expected = _scan(docs, keywords, 30)
+        assert [id(d) for d in index.top_matches(keywords, 30)] == [id(d) for d in expected], keywords
+
+    assert keyword_index_for(vectorstore) is keyword_index_for(vectorstore)
+
+
+def test_vector_batch_matches_single_queries(vectorstore):
+    queries = ["logias masónicas", "linaje de los reyes", "paella", "meditación y respiración"]
+    batch = batch_vector_search(vectorstore, queries, k=7)
+    for query, hits in zip(queries, batch):
+        single = vector_search(vectorstore, query, k=7)
+        assert [d.page_content for d, _ in hits] == [d.page_content for d, _ in single]
+        np.testing.assert_allclose([s for _, s in hits], [s for _, s in single], rtol=1e-5, atol=1e-6)
+    assert batch_vector_search(vectorstore, [], k=3) == []
+
+
+def test_hybrid_batch_matches_single_queries(vectorstore):
+    queries = ["linaje ra bis jac tric", "bloque17 y bloque250", "amor y verdad", "egipto bloque3 sur",
+               "paella de mariscos del norte", "constelaciones"]
+    batch = hybrid_retrieval_batch(vectorstore, queries, k_vector=5, k_keyword=15)
+    assert len(batch) == len(queries)
+    for query, docs in zip(queries, batch):
+        single = hybrid_retrieval(vectorstore, query, k_vector=5, k_keyword=15)
+        assert [id(d) for d in docs] == [id(d) for d in single], query
+    # Las keywords que no están en el top vectorial entran por el índice de palabras
+    assert any("bloque250" in d.page_content for d in batch[1])
+    assert hybrid_retrieval_batch(vectorstore, []) == []
@@ -0,0 +1,132 @@
+import http.client
+import json
+import os
+import tempfile
+import threading
+
+import pytest
+
+from offline_embeddings import HashingEmbeddings
+from retrieval import LocalRetriever, hybrid_retrieval
+from retrieval_service import (
+    RetrievalClient, RetrievalServer, RetrievalServiceError, connect_retrieval_service, parse_address
+)
+
+TEXTS = ["masones y logias del sur", "linaje de los reyes antiguos", "paella con mariscos",
+         "constelaciones del sur", "historia de Egipto", "meditación y respiración consciente"]
+
+
+@pytest.fixture(scope="module")
+def retriever():
+    from langchain_community.vectorstores import FAISS
+
+    embedder = HashingEmbeddings(dim=64).fit(TEXTS)
+    vectorstore = FAISS.from_texts(TEXTS, embedder, metadatas=[{"source": f"doc{i}.srt"} for i in range(len(TEXTS))])
+    return LocalRetriever.from_vectorstore(vectorstore, version="v7")
+
+
+@pytest.fixture(scope="module")
+def server(retriever):
+    server = RetrievalServer(retriever, workers=4)
+    server.start_in_thread("http://127.0.0.1:0")
+    yield server
+    server.stop()
+
+
+def test_parse_address():
+    assert parse_address("http://127.0.0.1:8765") == ("tcp", ("127.0.0.1", 8765))
+    assert parse_address("localhost:9000") == ("tcp", ("localhost", 9000))
+    assert parse_address("unix:///tmp/gerard.sock") == ("unix", "/tmp/gerard.sock")
+    assert parse_address("unix:/tmp/gerard.sock") == ("unix", "/tmp/gerard.sock")
+    with pytest.raises(ValueError):
+        parse_address("ftp://host")
+
+
+def test_client_matches_local_retriever(retriever, server):
+    client = RetrievalClient(server.url)
+    health = client.health()
+    assert health["status"] == "ok" and health["vectors"] == len(TEXTS)
+    assert client.version == "v7"
+
+    local = retriever.search("logias masónicas", k=3)
+    remote = client.search("logias masónicas", k=3)
+    assert [d.page_content for d, _ in remote] == [d.page_content for d, _ in local]
+    assert [s for _, s in remote] == pytest.approx([s for _, s in local])
+    assert remote[0][0].metadata == local[0][0].metadata
+
+    queries = ["reyes", "paella", "estrellas del sur"]
+    batch = client.batch_search(queries, k=2)
+    assert [[d.page_content for d, _ in hits] for hits in batch] == [
+        [d.page_content for d, _ in retriever.search(q, k=2)] for q in queries]
+
+    vectorstore = retriever.snapshots.current().vectorstore
+    expected = hybrid_retrieval(vectorstore, "historia de Egipto y sus reyes", k_vector=2, k_keyword=3)
+    hybrid = client.hybrid_search("historia de Egipto y sus reyes", k_vector=2, k_keyword=3)
+    assert [d.page_content for d in hybrid] == [d.page_content for d in expected]
+    hybrid_batch = client.hybrid_search_batch(["historia de Egipto y sus reyes", "paella"], k_vector=2, k_keyword=3)
+    assert [d.page_content for d in hybrid_batch[0]] == [d.page_content for d in expected]
+
+
+def test_concurrent_requests(server):
+    client = RetrievalClient(server.url)
+    results, errors = {}, []
+
+    def worker(i):
+        try:
+            results[i] = [d.page_content for d, _ in client.search(TEXTS[i % len(TEXTS)], k=1)]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(24)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert not errors
+    assert all(results[i] == [TEXTS[i % len(TEXTS)]] for i in range(24))
+
+
+def test_errors(server):
+    client = RetrievalClient(server.url)
+    with pytest.raises(RetrievalServiceError, match="query"):
+        client.search("", k=3)
+    with pytest.raises(RetrievalServiceError, match="'k'"):
+        client.search("reyes", k=0)
+
+    host, port = parse_address(server.url)[1]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.request("POST", "/nada", body=b"{}")
+    assert connection.getresponse().status == 404
+    connection.close()
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.request("POST", "/search", body=b"no es json")
+    response = connection.getresponse()
+    assert response.status == 400 and "JSON" in json.loads(response.read())["error"]
+    connection.close()
+
+    with pytest.raises(RetrievalServiceError):
+        RetrievalClient("http://127.0.0.1:9", timeout=2).health()
+    assert connect_retrieval_service("http://127.0.0.1:9") is None
+
+
+def test_keep_alive_connection(server):
+    host, port = parse_address(server.url)[1]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    for query in ("reyes", "paella"):
+        connection.request("POST", "/search", body=json.dumps({"query": query, "k": 1}).encode("utf-8"))
+        response = connection.getresponse()
+        assert response.status == 200 and json.loads(response.read())["version"] == "v7"
+    connection.close()
+
+
+@pytest.mark.skipif(not hasattr(__import__("socket"), "AF_UNIX"), reason="requiere sockets Unix")
+def test_unix_socket(retriever):
+    path = os.path.join(tempfile.mkdtemp(), "retrieval.sock")
+    server = RetrievalServer(retriever, workers=2)
+    url = server.start_in_thread(f"unix://{path}")
+    try:
+        client = connect_retrieval_service(url)
+        assert client is not None
+        assert [d.page_content for d, _ in client.search("paella", k=1)] == ["paella con mariscos"]
+    finally:
+        server.stop()
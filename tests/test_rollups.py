@@ -0,0 +1,83 @@
+import json
+
+from jsonl_log import JsonlLogWriter
+from rollups import LatencySketch, RollupStore, TopK
+
+
+def _record(user, total, hour=10, question="¿qué es el amor?", status="success"):
+    return {
+        "timestamp": f"2025-10-13T{hour:02d}:15:00",
+        "user": user,
+        "platform": "web",
+        "question": question,
+        "status": status,
+        "geo_info": {"pais": "Colombia", "ciudad": "Bogotá"},
+        "device_info": {"tipo": "PC", "os": "Windows", "navegador": "Chrome"},
+        "metrics": {"tiempo_total": total, "tiempo_llm": total / 2},
+    }
+
+
+def test_sketch_merge_matches_single_sketch():
+    values = [0.2 * i for i in range(1, 501)]
+    whole, left, right = LatencySketch(), LatencySketch(), LatencySketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+
+    assert left.to_dict() == whole.to_dict()
+    # Error relativo acotado por las cubetas log-lineales (1/4)
+    assert abs(whole.quantile(0.95) - 95.0) / 95.0 <= 0.25
+    assert whole.quantile(1.0) == 100.0
+
+
+def test_topk_keeps_heavy_hitters_with_bounded_memory():
+    top = TopK(capacity=10)
+    for i in range(1000):
+        top.add("frecuente" if i % 3 == 0 else f"rara-{i}")
+    assert len(top.items) == 10
+    assert top.most_common(1)[0][0] == "frecuente"
+
+
+def test_store_reads_only_appended_lines(tmp_path):
+    writer = JsonlLogWriter(log_dir=str(tmp_path))
+    for i in range(3):
+        writer.append(_record("ANA", 1.0 + i, hour=9), date="2025-10-13")
+
+    store = RollupStore(str(tmp_path))
+    assert store.day("2025-10-13").total == 3
+
+    writer.append(_record("LUIS", 30.0, hour=15, status="error"), date="2025-10-13")
+    state_file = tmp_path / "rollups" / "rollup_2025-10-13.json"
+    offset_before = next(iter(json.loads(state_file.read_text(encoding="utf-8"))["sources"].values()))["offset"]
+
+    hours = store.hourly("2025-10-13")
+    assert sorted(hours) == ["09", "15"]
+    assert hours["09"].total == 3 and hours["15"].failed == 1
+    offset_after = next(iter(json.loads(state_file.read_text(encoding="utf-8"))["sources"].values()))["offset"]
+    assert offset_after > offset_before
+
+    # Sin cambios: mismo resultado, sin reprocesar
+    stats = store.day("2025-10-13").to_stats()
+    assert stats["total_interactions"] == 4
+    assert stats["unique_users"] == 2
+    assert stats["success_rate"] == 75.0
+
+
+def test_period_merges_days_and_survives_rotation(tmp_path):
+    writer = JsonlLogWriter(log_dir=str(tmp_path), max_file_size_mb=400 / (1024 * 1024))
+    store = RollupStore(str(tmp_path))
+    for day in ("2025-10-12", "2025-10-13"):
+        for i in range(4):
+            writer.append(_record(f"U{i}", 2.0), date=day)
+        store.day(day)
+    # Más registros después de rotar el archivo activo
+    for i in range(4):
+        writer.append(_record("ANA", 8.0, question="otra"), date="2025-10-13")
+
+    assert len(list(tmp_path.glob("*_part*.jsonl"))) > 0
+    week = store.period("2025-10-06", "2025-10-19")
+    assert week.total == 12
+    assert len(week.counters["users"]) == 5
+    assert week.questions.most_common(2) == [("¿qué es el amor?", 8), ("otra", 4)]
+    assert week.latency["total"].max == 8.0
@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import interaction_logger
+from interaction_logger import InteractionLogger
+from services import ServicesContainer
+
+
+class DownSheets:
+    """Logger de Sheets sin conexión que cuenta los intentos de reconexión."""
+
+    def __init__(self):
+        self.enabled = False
+        self.last_error = "sin red"
+        self.reconnects = 0
+        self.network_back = False
+
+    def reconnect(self):
+        self.reconnects += 1
+        self.enabled = self.network_back
+
+
+def test_concurrent_callers_share_one_interaction_logger():
+    created = []
+
+    def factory():
+        time.sleep(0.05)  # ventana para que los hilos compitan
+        logger = SimpleNamespace(device_detector=object(), log_dir="logs", active_sessions={})
+        created.append(logger)
+        return logger
+
+    services = ServicesContainer(interaction_logger_factory=factory)
+    barrier = threading.Barrier(8)
+    loggers, detectors = [], []
+
+    def worker():
+        barrier.wait()
+        loggers.append(services.get_interaction_logger())
+        detectors.append(services.get_device_detector())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert len(created) == 1
+    assert all(logger is created[0] for logger in loggers)
+    assert all(detector is created[0].device_detector for detector in detectors)
+
+
+def test_sheets_reconnect_is_throttled():
+    sheets = DownSheets()
+    factory_calls = []
+
+    def factory():
+        factory_calls.append(1)
+        return sheets
+
+    services = ServicesContainer(sheets_logger_factory=factory, reconnect_interval_seconds=0.2)
+    for _ in range(20):
+        assert services.get_sheets_logger() is None
+    assert len(factory_calls) == 1
+    assert sheets.reconnects == 0
+
+    time.sleep(0.25)
+    for _ in range(20):
+        assert services.get_sheets_logger() is None
+    assert len(factory_calls) == 1
+    assert sheets.reconnects == 1
+
+    sheets.network_back = True
+    time.sleep(0.25)
+    assert services.get_sheets_logger() is sheets
+    assert sheets.reconnects == 2
+
+
+def test_health_check_reports_sheets_down(tmp_path):
+    services = ServicesContainer(
+        interaction_logger_factory=lambda: SimpleNamespace(log_dir=str(tmp_path), active_sessions={"a": {}}),
+        sheets_logger_factory=DownSheets,
+    )
+    health = services.health_check()
+    assert health["interaction_logger"]["ok"] is False
+    assert health["google_sheets"]["ok"] is False
+    assert health["google_sheets"]["attempts"] == 0
+
+    services.get_interaction_logger()
+    assert services.get_sheets_logger() is None
+    health = services.health_check()
+    assert health["interaction_logger"] == {"ok": True, "detail": str(tmp_path), "active_sessions": 1}
+    assert health["google_sheets"] == {"ok": False, "detail": "sin red", "attempts": 1}
+
+
+def test_daily_counter_resets_on_date_change(tmp_path, monkeypatch):
+    clock = {"now": datetime(2025, 3, 1, 23, 59)}
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock["now"]
+
+    monkeypatch.setattr(interaction_logger, "datetime", FakeDatetime)
+    logger = InteractionLogger(platform="terminal", log_dir=str(tmp_path), enable_json=False)
+
+    reads = []
+    original = logger._get_daily_counter
+    monkeypatch.setattr(logger, "_get_daily_counter", lambda: reads.append(1) or original())
+
+    def log_one():
+        logger.end_interaction(logger.start_interaction("ana", "¿qué es el amor?"))
+
+    log_one()
+    log_one()
+    assert logger.daily_counter == 2
+    assert reads == []  # el contador vive en memoria: no se relee el txt
+
+    clock["now"] = datetime(2025, 3, 2, 0, 1)
+    log_one()
+    assert logger.daily_counter == 1
+    assert len(reads) == 1
+    log_one()
+    assert logger.daily_counter == 2
+    assert len(reads) == 1
+
+    assert (tmp_path / "interaction_log_2025-03-01.txt").read_text(encoding="utf-8").count("REGISTRO #") == 2
+    new_day = (tmp_path / "interaction_log_2025-03-02.txt").read_text(encoding="utf-8")
+    assert "REGISTRO #001" in new_day and "REGISTRO #002" in new_day
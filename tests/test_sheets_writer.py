@@ -0,0 +1,104 @@
+import json
+
+from sheets_writer import SheetsBatchWriter
+
+
+class FakeWorksheet:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def append_rows(self, rows, value_input_option="RAW"):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("cuota excedida")
+        self.calls.append([list(r) for r in rows])
+
+
+def make_writer(tmp_path, worksheet, **kwargs):
+    options = dict(batch_size=3, flush_interval=0.05, initial_backoff=0.01, max_backoff=0.05)
+    options.update(kwargs)
+    return SheetsBatchWriter(lambda: worksheet, spool_file=str(tmp_path / "spool.jsonl"), **options)
+
+
+def test_rows_are_sent_in_batches(tmp_path):
+    sheet = FakeWorksheet()
+    writer = make_writer(tmp_path, sheet, flush_interval=10)
+    for i in range(7):
+        writer.enqueue([i, "pregunta"])
+    assert writer.flush(timeout=5)
+    writer.stop()
+
+    sent = [row[0] for batch in sheet.calls for row in batch]
+    assert sent == list(range(7))
+    assert all(len(batch) <= 3 for batch in sheet.calls)
+    assert writer.get_stats()["sent"] == 7
+    # todo confirmado: el spool queda vacío
+    assert (tmp_path / "spool.jsonl").read_text() == ""
+
+
+def test_failures_are_retried_with_backoff(tmp_path):
+    sheet = FakeWorksheet(failures=2)
+    errors = []
+    writer = make_writer(tmp_path, sheet, on_error=errors.append)
+    writer.enqueue(["a"])
+    assert writer.flush(timeout=5)
+    writer.stop()
+
+    assert sheet.calls == [[["a"]]]
+    assert len(errors) == 2
+    assert writer.get_stats()["errors"] == 2
+
+
+def test_unsent_rows_are_replayed_on_restart(tmp_path):
+    down = FakeWorksheet(failures=10**6)
+    writer = make_writer(tmp_path, down, initial_backoff=10)
+    writer.enqueue(["pendiente-1"])
+    writer.enqueue(["pendiente-2"])
+    writer.flush(timeout=0.5)
+    writer.stop(timeout=0.5)
+
+    lines = [json.loads(l) for l in (tmp_path / "spool.jsonl").read_text().splitlines()]
+    assert [l["row"] for l in lines if l["op"] == "row"] == [["pendiente-1"], ["pendiente-2"]]
+
+    sheet = FakeWorksheet()
+    restarted = make_writer(tmp_path, sheet)
+    restarted.start()
+    assert restarted.flush(timeout=5)
+    restarted.stop()
+
+    assert [row for batch in sheet.calls for row in batch] == [["pendiente-1"], ["pendiente-2"]]
+    assert restarted.get_stats()["replayed"] == 2
+
+
+def test_rows_logged_while_disconnected_are_sent_after_reconnect(tmp_path):
+    from google_sheets_logger import GoogleSheetsLogger
+    from services import ServicesContainer
+
+    sheet = FakeWorksheet()
+
+    class FlakyLogger(GoogleSheetsLogger):
+        connects = 0
+
+        def _connect(self):
+            # El primer intento (al arrancar) falla; los siguientes conectan
+            FlakyLogger.connects += 1
+            self.configured = True
+            if FlakyLogger.connects > 1:
+                self.worksheet = sheet
+                self.enabled = True
+
+    logger = FlakyLogger(spool_file=str(tmp_path / "spool.jsonl"))
+    assert not logger.enabled
+
+    services = ServicesContainer(sheets_logger_factory=lambda: logger)
+    assert services.get_sheets_logger() is logger
+    logger.log_interaction("id-1", "ana", "¿qué es el alma?", "respuesta")
+    assert services.get_sheets_logger() is logger
+    assert logger.writer.flush(timeout=5)
+    logger.writer.stop()
+
+    # La reconexión la hizo el hilo del escritor, una sola vez
+    assert FlakyLogger.connects == 2
+    assert logger.enabled
+    assert [row[0] for batch in sheet.calls for row in batch] == ["id-1"]
@@ -0,0 +1,87 @@
+import json
+import time
+
+from interaction_logger import InteractionLogger
+from tracing import Tracer, get_tracer, set_tracer
+
+
+def test_nested_spans_export_otlp_json(tmp_path):
+    tracer = Tracer(export_dir=str(tmp_path))
+    root = tracer.start_span("interaction", user="ana")
+    with tracer.span("retrieval.hybrid", k_vector=100) as retrieval:
+        with tracer.span("retrieval.faiss_search") as search:
+            search.set_attribute("doc_count", 7)
+    root.end()
+
+    assert search.parent_id == retrieval.span_id
+    assert retrieval.parent_id == root.span_id
+    assert search.trace_id == root.trace_id
+
+    lines = list(tmp_path.glob("traces_*.jsonl"))[0].read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_name = {s["name"]: s for s in spans}
+    assert set(by_name) == {"interaction", "retrieval.hybrid", "retrieval.faiss_search"}
+    assert "parentSpanId" not in by_name["interaction"]
+    assert by_name["retrieval.faiss_search"]["attributes"] == [{"key": "doc_count", "value": {"intValue": "7"}}]
+
+
+def test_errors_are_recorded_on_the_span(tmp_path):
+    tracer = Tracer(export_dir=None)
+    root = tracer.start_span("interaction")
+    try:
+        with tracer.span("llm.generate"):
+            raise RuntimeError("429")
+    except RuntimeError:
+        pass
+    spans = tracer.finished_spans(root.trace_id)
+    root.end()
+    assert spans[0].to_dict()["error"] == "RuntimeError: 429"
+
+
+def test_spans_feed_interaction_logger_phases(tmp_path):
+    tracer = Tracer(export_dir=None)
+    logger = InteractionLogger(platform="terminal", log_dir=str(tmp_path))
+    session_id = logger.start_interaction("ana", "¿qué es el amor?")
+
+    root = tracer.start_span("interaction")
+    with tracer.span("retrieval.hybrid"):
+        time.sleep(0.01)
+    with tracer.span("llm.generate"):
+        time.sleep(0.02)
+    logger.record_spans(session_id, tracer.finished_spans(root.trace_id))
+    logger.end_interaction(session_id)
+    root.end()
+
+    record = json.loads(next(tmp_path.glob("interaction_log_*.jsonl")).read_text(encoding="utf-8"))
+    assert record["metrics"]["tiempo_rag"] >= 0.01
+    assert record["metrics"]["tiempo_llm"] >= 0.02
+    assert [s["name"] for s in record["spans"]] == ["retrieval.hybrid", "llm.generate"]
+
+
+def test_only_interaction_traces_are_exported(tmp_path):
+    tracer = Tracer(export_dir=str(tmp_path))
+    seen = []
+    tracer.add_listener(seen.append)
+    with tracer.span("retrieval.vector_search"):
+        pass
+    assert not list(tmp_path.glob("traces_*.jsonl"))
+
+    with tracer.span("interaction"):
+        with tracer.span("retrieval.vector_search"):
+            pass
+    lines = next(tmp_path.glob("traces_*.jsonl")).read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    # Los listeners (métricas) siguen recibiendo todas las trazas
+    assert [spans[-1].name for spans in seen] == ["retrieval.vector_search", "interaction"]
+
+
+def test_set_tracer_swaps_the_shared_tracer(isolated_tracer):
+    quiet = Tracer(export_dir=None)
+    previous = set_tracer(quiet)
+    try:
+        assert previous is isolated_tracer
+        assert get_tracer() is quiet
+    finally:
+        set_tracer(previous)
+    assert get_tracer() is isolated_tracer
@@ -0,0 +1,378 @@
+"""
+Trazas por Fases para GERARD
+
+API mínima de spans para saber de dónde viene la latencia de una respuesta:
+embed_query, búsqueda FAISS, escaneo por keywords, formateo del contexto,
+Gemini, parseo del JSON o renderizado.
+
+Características:
+- Context manager y decorador (`span`, `traced`) con spans anidados
+- Atributos por span (k, número de documentos, caracteres de contexto...)
+- Propagación del span activo con contextvars (hilos de LangChain incluidos)
+- Exportación en formato OTLP/JSON de OpenTelemetry (una línea por traza)
+- Sólo se exportan las trazas de interacciones (raíz "interaction")
+- Tracer por defecto reemplazable (`set_tracer`) para pruebas y benchmarks
+- Conversión de spans a fases de InteractionLogger (rag/llm/processing/render)
+
+Uso:
+    tracer = get_tracer()
+    with tracer.span("retrieval.hybrid", k_vector=100) as sp:
+        docs = ...
+        sp.set_attribute("doc_count", len(docs))
+
+Los archivos quedan en logs/traces/traces_YYYY-MM-DD.jsonl y pueden
+importarse con cualquier herramienta que lea el formato de archivo OTLP/JSON.
+Las trazas cuya raíz no es una interacción (llamadas sueltas a retrieval,
+servicio de recuperación, benchmarks) sólo llegan a los listeners.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Estados OTLP (StatusCode)
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Nombres de span raíz cuyas trazas se exportan por defecto
+DEFAULT_EXPORT_ROOTS = ("interaction",)
+
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar(
+    "gerard_current_span", default=None
+)
+
+
+class Span:
+    """
+    Operación con nombre, duración y atributos dentro de una traza.
+    """
+
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_id", "attributes",
+        "start_ns", "end_ns", "start_perf", "end_perf", "status", "status_message",
+        "_token"
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.start_ns = time.time_ns()
+        # perf_counter: misma base de tiempo que InteractionLogger.mark_phase
+        self.start_perf = time.perf_counter()
+        self.end_ns: Optional[int] = None
+        self.end_perf: Optional[float] = None
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self._token = None
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent_id is None
+
+    @property
+    def duration(self) -> float:
+        """Duración en segundos (hasta ahora si el span sigue abierto)."""
+        end = self.end_perf if self.end_perf is not None else time.perf_counter()
+        return end - self.start_perf
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def record_exception(self, error: BaseException):
+        """Marca el span como fallido con el mensaje de la excepción."""
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        """Cierra el span y restaura el span activo anterior."""
+        if self.end_perf is not None:
+            return
+        self.end_perf = time.perf_counter()
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Cerrado desde otro contexto: sólo limpiar si sigue activo
+                if _current_span.get() is self:
+                    _current_span.set(None)
+            self._token = None
+        self.tracer._on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Resumen compacto para guardar junto al registro de la interacción."""
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+            "error": self.status_message if self.status == STATUS_ERROR else None,
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Convierte un valor Python al AnyValue de OTLP/JSON."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class Tracer:
+    """
+    Crea spans, agrupa los terminados por traza y exporta cada traza completa
+    cuando termina su span raíz.
+    """
+
+    def __init__(
+        self,
+        service_name: str = "gerard",
+        export_dir: Optional[str] = "logs/traces",
+        max_open_traces: int = 1000,
+        export_roots: Optional[Iterable[str]] = DEFAULT_EXPORT_ROOTS
+    ):
+        """
+        Inicializa el tracer.
+
+        Args:
+            service_name: Valor de `service.name` en el recurso OTLP
+            export_dir: Directorio de exportación (None desactiva la exportación)
+            max_open_traces: Trazas sin cerrar que se conservan en memoria
+            export_roots: Nombres de span raíz cuyas trazas se exportan
+                (None exporta todas)
+        """
+        self.service_name = service_name
+        self.export_dir = Path(export_dir) if export_dir else None
+        self.export_roots = frozenset(export_roots) if export_roots is not None else None
+        self.max_open_traces = max_open_traces
+        self._lock = threading.Lock()
+        self._finished: Dict[str, List[Span]] = {}
+        self._listeners: List[Callable[[List[Span]], None]] = []
+
+    # --- Creación de spans ---
+
+    def start_span(self, name: str, parent: Optional[Span] = None, activate: bool = True, **attributes: Any) -> Span:
+        """
+        Abre un span. Debe cerrarse con `span.end()`.
+
+        Args:
+            name: Nombre del span (ej: "retrieval.faiss_search")
+            parent: Span padre. Default: el span activo en este contexto
+            activate: Si True, el span pasa a ser el activo hasta `end()`
+            **attributes: Atributos iniciales
+
+        Returns:
+            Span abierto
+        """
+        if parent is None:
+            parent = _current_span.get()
+        span = Span(self, name, parent, attributes)
+        if activate:
+            span._token = _current_span.set(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Context manager que abre un span hijo del activo y lo cierra al salir."""
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end()
+
+    def traced(self, name: Optional[str] = None, **attributes: Any):
+        """
+        Decorador que ejecuta la función dentro de un span.
+
+        Args:
+            name: Nombre del span. Default: nombre de la función
+            **attributes: Atributos fijos del span
+        """
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, **attributes):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # --- Spans terminados ---
+
+    def _on_end(self, span: Span):
+        with self._lock:
+            spans = self._finished.setdefault(span.trace_id, [])
+            spans.append(span)
+            if not span.is_root:
+                if len(self._finished) > self.max_open_traces:
+                    # Descartar la traza más antigua cuyo span raíz nunca se cerró
+                    self._finished.pop(next(iter(self._finished)), None)
+                return
+            del self._finished[span.trace_id]
+            listeners = list(self._listeners)
+
+        if self.export_roots is None or span.name in self.export_roots:
+            self.export(spans)
+        for listener in listeners:
+            try:
+                listener(spans)
+            except Exception as e:
+                print(f"[!] Error en listener de trazas: {e}")
+
+    def finished_spans(self, trace_id: str) -> List[Span]:
+        """Spans ya terminados de una traza cuyo span raíz sigue abierto."""
+        with self._lock:
+            return list(self._finished.get(trace_id, []))
+
+    def add_listener(self, listener: Callable[[List[Span]], None]):
+        """Registra una función que recibe los spans de cada traza terminada."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    # --- Exportación ---
+
+    def to_otlp(self, spans: List[Span]) -> Dict[str, Any]:
+        """
+        Convierte spans al formato ExportTraceServiceRequest de OTLP/JSON.
+
+        Args:
+            spans: Spans terminados
+
+        Returns:
+            Diccionario serializable a JSON
+        """
+        otlp_spans = []
+        for span in spans:
+            item = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": _otlp_attributes(span.attributes),
+                "status": {"code": span.status},
+            }
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            if span.status_message:
+                item["status"]["message"] = span.status_message
+            otlp_spans.append(item)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "gerard.tracing"},
+                    "spans": otlp_spans,
+                }],
+            }]
+        }
+
+    def export(self, spans: List[Span]):
+        """Agrega la traza al archivo OTLP/JSON del día (una línea por traza)."""
+        if self.export_dir is None or not spans:
+            return
+        try:
+            self.export_dir.mkdir(parents=True, exist_ok=True)
+            path = self.export_dir / f"traces_{datetime.now().strftime('%Y-%m-%d')}.jsonl"
+            line = json.dumps(self.to_otlp(spans), ensure_ascii=False, default=str) + "\n"
+            with self._lock:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except Exception as e:
+            print(f"[!] Error exportando traza: {e}")
+
+
+def current_span() -> Optional[Span]:
+    """Span activo en el contexto actual (o None)."""
+    return _current_span.get()
+
+
+_default_tracer: Optional[Tracer] = None
+_default_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Obtiene el tracer compartido del proceso.
+
+    Returns:
+        Instancia única de Tracer
+    """
+    global _default_tracer
+    if _default_tracer is None:
+        with _default_lock:
+            if _default_tracer is None:
+                _default_tracer = Tracer()
+    return _default_tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> Optional[Tracer]:
+    """
+    Reemplaza el tracer compartido del proceso.
+
+    Args:
+        tracer: Nuevo tracer (por ejemplo `Tracer(export_dir=None)` para no
+            exportar nada). None vuelve a crear el de por defecto en el
+            próximo `get_tracer()`
+
+    Returns:
+        Tracer anterior (o None si todavía no se había creado), para
+        restaurarlo después
+    """
+    global _default_tracer
+    with _default_lock:
+        previous = _default_tracer
+        _default_tracer = tracer
+    return previous
+
+
+def span(name: str, **attributes: Any):
+    """Atajo para `get_tracer().span(...)`."""
+    return get_tracer().span(name, **attributes)
+
+
+def traced(name: Optional[str] = None, **attributes: Any):
+    """
+    Atajo para `get_tracer().traced(...)`. El tracer se resuelve en cada
+    llamada, así que puede usarse al importar el módulo.
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
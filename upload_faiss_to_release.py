@@ -2,14 +2,24 @@
 Script para comprimir y subir índice FAISS a GitHub Release
 SOLUCIÓN DEFINITIVA: Nunca más reconstruir
 """
+import json
 import os
 import zipfile
 import requests
 from pathlib import Path
 
+from faiss_mmap import FULL_VECTORS_SUFFIX
+from index_downloader import build_manifest
+from index_shards import MANIFEST_FILE, build_shards
+
 # Configuración
 FAISS_DIR = Path(r"e:\proyecto-gemini-limpio\faiss_index")
 OUTPUT_ZIP = Path(r"e:\proyecto-gemini-limpio\faiss_index.zip")
+# Manifiesto SHA-256 que IndexDownloader busca en <url>.sha256
+OUTPUT_MANIFEST = OUTPUT_ZIP.with_name(OUTPUT_ZIP.name + ".sha256")
+# Shards para carga perezosa (GERARD_INDEX_SHARDS_URL = <release>/shards_manifest.json)
+SHARDS_DIR = Path(r"e:\proyecto-gemini-limpio\faiss_shards_release")
+NUM_SHARDS = 8
 GITHUB_TOKEN = input("Pega tu GitHub Personal Access Token: ").strip()
 REPO = "arguellosolanogerardo-cloud/consultor-gerard-v2"
 TAG = "faiss-v1.0"
@@ -21,13 +31,24 @@ print(f"   Destino: {OUTPUT_ZIP}\n")
 # Comprimir
 with zipfile.ZipFile(OUTPUT_ZIP, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
     for file in FAISS_DIR.glob("*"):
-        if file.is_file():
+        # Los vectores originales de un índice compacto (rerank exacto) no se publican
+        if file.is_file() and not file.name.endswith(FULL_VECTORS_SUFFIX):
             print(f"   Comprimiendo: {file.name}")
             zipf.write(file, file.name)
 
 zip_size_mb = OUTPUT_ZIP.stat().st_size / 1024 / 1024
 print(f"\n✅ Comprimido: {zip_size_mb:.2f} MB\n")
 
+print("🔐 PASO 1a: Calculando manifiesto SHA-256...")
+manifest = build_manifest(OUTPUT_ZIP, "faiss_index.zip")
+OUTPUT_MANIFEST.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+print(f"   SHA-256: {manifest['archive']['sha256']}")
+print(f"\n✅ Manifiesto generado: {OUTPUT_MANIFEST}\n")
+
+print("🧩 PASO 1b: Generando shards del índice...")
+shards_manifest = build_shards(str(FAISS_DIR), str(SHARDS_DIR), NUM_SHARDS)
+print(f"\n✅ {len(shards_manifest['shards'])} shards generados en {SHARDS_DIR}\n")
+
 print("📤 PASO 2: Creando GitHub Release...")
 
 # Crear release
@@ -79,6 +100,24 @@ if response.status_code == 201:
         print(f"✅ Archivo subido exitosamente!\n")
         print(f"📥 URL de descarga:")
         print(f"   {download_url}\n")
+
+        print("📤 PASO 4: Subiendo manifiesto SHA-256, shards y manifiesto de shards...")
+        release_files = [(OUTPUT_MANIFEST.name, OUTPUT_MANIFEST, "application/json")]
+        release_files += [(entry["file"], SHARDS_DIR / entry["file"], "application/zip")
+                          for entry in shards_manifest["shards"]]
+        release_files.append((MANIFEST_FILE, SHARDS_DIR / MANIFEST_FILE, "application/json"))
+        for name, path, content_type in release_files:
+            with open(path, 'rb') as f:
+                shard_response = requests.post(
+                    f"{upload_url}?name={name}",
+                    headers={"Authorization": f"Bearer {GITHUB_TOKEN}", "Content-Type": content_type},
+                    data=f
+                )
+            if shard_response.status_code == 201:
+                print(f"   ✅ {name}")
+            else:
+                print(f"   ❌ {name}: {shard_response.status_code} {shard_response.text}")
+        print(f"\n   GERARD_INDEX_SHARDS_URL={download_url.rsplit('/', 1)[0]}/{MANIFEST_FILE}\n")
         print("="*60)
         print("✅✅✅ ÉXITO TOTAL")
         print("="*60)